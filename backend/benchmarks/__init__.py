@@ -0,0 +1,3 @@
+"""
+性能計測用のベンチマーク
+"""
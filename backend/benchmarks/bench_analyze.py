@@ -0,0 +1,551 @@
+"""
+AnalysisService.analyze のレイテンシ計測
+
+実際のセッションで発生した外部呼び出し（Gemini, GPT, 埋め込み, Qdrant検索, BigQuery）を
+フィクスチャに記録し、外部サービスに接続せずに再生してレイテンシを計測する。
+再生時は各呼び出しに任意の遅延を注入でき、ステージごとと全体の p50/p95 を表示する。
+
+ローカルのPostgreSQLミラーと集計テーブルへの振り分けは計測対象外のため無効にする。
+
+使い方:
+    # 実環境で記録（APIキーと各サービスへの接続が必要）
+    PYTHONPATH=src python -m benchmarks.bench_analyze record --output session.json
+
+    # オフラインで再生
+    PYTHONPATH=src python -m benchmarks.bench_analyze replay benchmarks/fixtures/analyze_sample.json \\
+        --latency intent=800 --latency sql_generation=1500 --repeat 5
+"""
+
+import json
+import math
+import random
+import statistics
+import time
+from collections import namedtuple
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from unittest import mock
+
+import click
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from analytics_chat_agent.config import get_settings
+from analytics_chat_agent.core import sql_generator
+from analytics_chat_agent.core.analyzer import analysis_service
+from analytics_chat_agent.core.analyzer.analysis_service import AnalysisService
+from analytics_chat_agent.core.field_resolver import FieldResolver
+from analytics_chat_agent.core.lexical_index import get_lexical_index
+from analytics_chat_agent.types import QueryResult
+
+DEFAULT_CORPUS = Path(__file__).parent / "data" / "analyze_questions.txt"
+
+FIXTURE_VERSION = 1
+
+# 計測対象のステージ（呼び出し順）
+STAGES = ["intent", "embedding", "vector_search", "sql_generation", "bigquery"]
+
+# 再生時に Qdrant の ScoredPoint の代わりに返す検索結果
+ReplayHit = namedtuple("ReplayHit", ["payload", "score"])
+
+console = Console()
+
+
+class ReplayMismatchError(RuntimeError):
+    """記録されていない外部呼び出しが発生した場合のエラー"""
+
+
+def load_corpus(path: Path) -> List[str]:
+    """
+    質問コーパスを読み込む（1行1質問、# で始まる行と空行は無視）
+
+    Args:
+        path: コーパスファイルのパス
+
+    Returns:
+        List[str]: 質問のリスト
+    """
+    lines = path.read_text(encoding="utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.startswith("#")]
+
+
+def percentile(values: List[float], p: float) -> float:
+    """
+    最近傍順位法でパーセンタイルを求める
+
+    Args:
+        values: 値のリスト
+        p: パーセンタイル（0〜100）
+
+    Returns:
+        float: パーセンタイル値（値がない場合は0）
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(math.ceil(p / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def _build_service(field_resolver: Optional[FieldResolver] = None) -> AnalysisService:
+    """
+    計測用の AnalysisService を作成する
+
+    Args:
+        field_resolver: 使用する FieldResolver（指定しない場合は通常どおり作成）
+
+    Returns:
+        AnalysisService: 省略可能な機能（ローカル実行への振り分け・意図分類・SQLテンプレートなど）を組み込まないサービス
+    """
+    settings = get_settings()
+    return AnalysisService(
+        field_resolver or FieldResolver(),
+        max_sql_regenerations=settings.get("analysis", {}).get("max_sql_regenerations", 1),
+    )
+
+
+def _rows_to_json(results: List[Any]) -> List[Dict[str, Any]]:
+    """クエリ結果をJSONに保存できる辞書のリストに変換する"""
+    rows = [r.values if isinstance(r, QueryResult) else r for r in results]
+    return json.loads(json.dumps(rows, ensure_ascii=False, default=str))
+
+
+class SessionRecorder:
+    """実際の外部呼び出しを記録するクラス"""
+
+    def __init__(self):
+        self.sessions: List[Dict[str, Any]] = []
+        self._calls: Dict[str, List[Dict[str, Any]]] = {}
+
+    def start(self, question: str) -> None:
+        """
+        質問ごとの記録を開始する
+
+        Args:
+            question: 質問
+        """
+        self._calls = {stage: [] for stage in STAGES}
+        self.sessions.append({"question": question, "calls": self._calls})
+
+    def record(
+        self,
+        stage: str,
+        func: Callable[..., Any],
+        to_request: Callable[..., Dict[str, Any]],
+        to_response: Callable[[Any], Dict[str, Any]],
+    ) -> Callable[..., Any]:
+        """
+        呼び出しの入出力と経過時間を記録する関数を返す
+
+        Args:
+            stage: ステージ名
+            func: 元の関数
+            to_request: 引数を記録用の辞書に変換する関数
+            to_response: 戻り値を記録用の辞書に変換する関数
+
+        Returns:
+            Callable[..., Any]: 記録付きの関数
+        """
+        def recorded(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._calls[stage].append({
+                **to_request(*args, **kwargs),
+                **to_response(result),
+                "elapsed_ms": round(elapsed_ms, 1),
+            })
+            return result
+
+        return recorded
+
+    def patch(self, stack: ExitStack, service: AnalysisService) -> None:
+        """
+        外部呼び出しを記録付きのものに差し替える
+
+        Args:
+            stack: 差し替えを元に戻すための ExitStack
+            service: 記録対象のサービス
+        """
+        stack.enter_context(mock.patch.object(
+            analysis_service, "call_gemini",
+            self.record(
+                "intent", analysis_service.call_gemini,
+                lambda prompt: {"prompt": prompt},
+                lambda response: {"response": response},
+            ),
+        ))
+        stack.enter_context(mock.patch.object(
+            sql_generator, "call_gpt",
+            self.record(
+                "sql_generation", sql_generator.call_gpt,
+                lambda prompt, model=None: {"prompt": prompt},
+                lambda response: {"response": response},
+            ),
+        ))
+        # 結果キャッシュを使わずにBigQueryの実行時間を記録する
+        run_bigquery_query = analysis_service.run_bigquery_query
+        stack.enter_context(mock.patch.object(
+            analysis_service, "run_bigquery_query",
+            self.record(
+                "bigquery", lambda query: run_bigquery_query(query, use_cache=False),
+                lambda query: {"query": query},
+                lambda results: {"rows": _rows_to_json(results)},
+            ),
+        ))
+
+        resolver = service.field_resolver
+        # 埋め込みは再生時に使われないため次元数のみ記録する
+        resolver.model.encode = self.record(
+            "embedding", resolver.model.encode,
+            lambda text, **kwargs: {"text": text},
+            lambda vector: {"dimension": int(np.asarray(vector).shape[-1])},
+        )
+        resolver.client.search = self.record(
+            "vector_search", resolver.client.search,
+            lambda **kwargs: {"limit": kwargs.get("limit")},
+            lambda hits: {"hits": [{"payload": hit.payload, "score": hit.score} for hit in hits]},
+        )
+
+
+class SessionPlayer:
+    """記録した外部呼び出しを再生するクラス"""
+
+    def __init__(
+        self,
+        fixture: Dict[str, Any],
+        latencies_ms: Dict[str, float],
+        use_recorded_latency: bool = False,
+        jitter: float = 0.0,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            fixture: 記録したフィクスチャ
+            latencies_ms: ステージごとに注入する遅延（ミリ秒）
+            use_recorded_latency: 遅延の指定がないステージで記録時の経過時間を注入するかどうか
+            jitter: 遅延に加えるゆらぎの割合（0.1 なら ±10%）
+            seed: ゆらぎの乱数シード
+        """
+        self.sessions = {s["question"]: s["calls"] for s in fixture["sessions"]}
+        self.latencies_ms = latencies_ms
+        self.use_recorded_latency = use_recorded_latency
+        self.jitter = jitter
+        self.prompt_mismatches = 0
+        self._rng = random.Random(seed)
+        self._calls: Dict[str, List[Dict[str, Any]]] = {}
+        self._positions: Dict[str, int] = {}
+
+    def start(self, question: str) -> None:
+        """
+        質問ごとの再生を開始する
+
+        Args:
+            question: 質問
+
+        Raises:
+            KeyError: 質問がフィクスチャに記録されていない場合
+        """
+        self._calls = self.sessions[question]
+        self._positions = {stage: 0 for stage in STAGES}
+
+    def _next(self, stage: str) -> Dict[str, Any]:
+        """
+        次に再生する呼び出しを取得し、遅延を注入する
+
+        Args:
+            stage: ステージ名
+
+        Returns:
+            Dict[str, Any]: 記録した呼び出し
+
+        Raises:
+            ReplayMismatchError: 記録した呼び出し回数を超えた場合
+        """
+        calls = self._calls.get(stage, [])
+        position = self._positions[stage]
+        if position >= len(calls):
+            raise ReplayMismatchError(
+                f"{stage} の呼び出しが記録より多く発生しました（記録: {len(calls)}回）"
+            )
+        self._positions[stage] += 1
+        call = calls[position]
+
+        if stage in self.latencies_ms:
+            latency_ms = self.latencies_ms[stage]
+        elif self.use_recorded_latency:
+            latency_ms = call.get("elapsed_ms", 0.0)
+        else:
+            latency_ms = 0.0
+        if latency_ms > 0:
+            if self.jitter:
+                latency_ms *= 1 + self._rng.uniform(-self.jitter, self.jitter)
+            time.sleep(latency_ms / 1000)
+        return call
+
+    def _check_prompt(self, call: Dict[str, Any], prompt: str) -> None:
+        """プロンプトが記録時と異なる場合は件数を数える（再生は続行する）"""
+        if "prompt" in call and call["prompt"] != prompt:
+            self.prompt_mismatches += 1
+
+    def call_gemini(self, prompt: str) -> str:
+        call = self._next("intent")
+        self._check_prompt(call, prompt)
+        return call["response"]
+
+    def call_gpt(self, prompt: str, model: Optional[str] = None) -> str:
+        call = self._next("sql_generation")
+        self._check_prompt(call, prompt)
+        return call["response"]
+
+    def encode(self, text: str, **kwargs: Any) -> np.ndarray:
+        call = self._next("embedding")
+        return np.zeros(call["dimension"], dtype=np.float32)
+
+    def search(self, **kwargs: Any) -> List[ReplayHit]:
+        call = self._next("vector_search")
+        return [ReplayHit(hit["payload"], hit["score"]) for hit in call["hits"]]
+
+    def run_bigquery_query(self, query: str, use_cache: bool = True) -> List[QueryResult]:
+        call = self._next("bigquery")
+        return [QueryResult(values=row) for row in call["rows"]]
+
+
+class StageClock:
+    """ステージごとの経過時間を集計するクラス"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {stage: [] for stage in STAGES + ["other", "total"]}
+        self._current: Dict[str, float] = {}
+
+    def start(self) -> None:
+        """質問ごとの計測を開始する"""
+        self._current = {stage: 0.0 for stage in STAGES}
+
+    def wrap(self, stage: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        経過時間を計測する関数を返す
+
+        Args:
+            stage: ステージ名
+            func: 元の関数
+
+        Returns:
+            Callable[..., Any]: 計測付きの関数
+        """
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._current[stage] += (time.perf_counter() - start) * 1000
+
+        return timed
+
+    def finish(self, total_ms: float) -> None:
+        """
+        質問ごとの計測を終了する
+
+        Args:
+            total_ms: analyze 全体の経過時間（ミリ秒）
+        """
+        for stage, elapsed in self._current.items():
+            self.samples[stage].append(elapsed)
+        # 外部呼び出し以外（プロンプト構築、パースなど）に費やした時間
+        self.samples["other"].append(max(total_ms - sum(self._current.values()), 0.0))
+        self.samples["total"].append(total_ms)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        ステージごとの統計を返す
+
+        Returns:
+            List[Dict[str, Any]]: ステージ名と p50/p95/平均（ミリ秒）
+        """
+        return [
+            {
+                "stage": stage,
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+                "mean_ms": statistics.fmean(values) if values else 0.0,
+                "samples": len(values),
+            }
+            for stage, values in self.samples.items()
+        ]
+
+
+def _build_replay_service(player: SessionPlayer, clock: StageClock) -> Tuple[AnalysisService, ExitStack]:
+    """
+    外部呼び出しを再生に差し替えた AnalysisService を作成する
+
+    Args:
+        player: 再生する呼び出し
+        clock: 経過時間の集計先
+
+    Returns:
+        Tuple[AnalysisService, ExitStack]: サービスと差し替えを元に戻すための ExitStack
+    """
+    resolver = FieldResolver.__new__(FieldResolver)
+    resolver.collection_name = "ga4_schema"
+    resolver.model = mock.Mock(encode=clock.wrap("embedding", player.encode))
+    resolver.client = mock.Mock(search=clock.wrap("vector_search", player.search))
+    resolver.search_params = None
+    # 記録時と同じ呼び出しの順序になるよう、字句インデックスは記録時と同じ設定で作成する
+    settings = get_settings()
+    resolver.lexical_settings = settings.get("field_resolution", {}).get("lexical", {})
+    resolver.lexical_index = (
+        get_lexical_index(settings["ga4_schema"]) if resolver.lexical_settings.get("enabled", True) else None
+    )
+
+    stack = ExitStack()
+    stack.enter_context(mock.patch.object(
+        analysis_service, "call_gemini", clock.wrap("intent", player.call_gemini)
+    ))
+    stack.enter_context(mock.patch.object(
+        sql_generator, "call_gpt", clock.wrap("sql_generation", player.call_gpt)
+    ))
+    stack.enter_context(mock.patch.object(
+        analysis_service, "run_bigquery_query", clock.wrap("bigquery", player.run_bigquery_query)
+    ))
+    return _build_service(resolver), stack
+
+
+def _parse_latencies(values: Tuple[str, ...]) -> Dict[str, float]:
+    """--latency stage=ms の指定を辞書に変換する"""
+    latencies = {}
+    for value in values:
+        stage, _, ms = value.partition("=")
+        if stage not in STAGES or not ms:
+            raise click.BadParameter(
+                f"{value}（ステージは {', '.join(STAGES)} のいずれか、形式は stage=ms）",
+                param_hint="--latency",
+            )
+        latencies[stage] = float(ms)
+    return latencies
+
+
+def _print_summary(summary: List[Dict[str, Any]], errors: int, mismatches: int) -> None:
+    """計測結果を表形式で表示する"""
+    table = Table(title="AnalysisService.analyze レイテンシ（ミリ秒）")
+    table.add_column("stage")
+    table.add_column("p50", justify="right")
+    table.add_column("p95", justify="right")
+    table.add_column("mean", justify="right")
+    table.add_column("samples", justify="right")
+    for row in summary:
+        table.add_row(
+            row["stage"],
+            f"{row['p50_ms']:.1f}",
+            f"{row['p95_ms']:.1f}",
+            f"{row['mean_ms']:.1f}",
+            str(row["samples"]),
+        )
+    console.print(table)
+    if errors:
+        console.print(f"[red]{errors}件の質問で分析に失敗しました[/red]")
+    if mismatches:
+        console.print(f"[yellow]記録時と異なるプロンプトが{mismatches}件ありました[/yellow]")
+
+
+@click.group()
+def cli() -> None:
+    """AnalysisService.analyze のレイテンシ計測"""
+    pass
+
+
+@cli.command()
+@click.option("--corpus", type=click.Path(exists=True, path_type=Path), default=DEFAULT_CORPUS,
+              help="質問コーパス（1行1質問）")
+@click.option("--output", type=click.Path(path_type=Path), required=True, help="フィクスチャの保存先")
+def record(corpus: Path, output: Path) -> None:
+    """実際のサービスを呼び出して外部呼び出しを記録する"""
+    questions = load_corpus(corpus)
+    service = _build_service()
+    recorder = SessionRecorder()
+
+    with ExitStack() as stack:
+        recorder.patch(stack, service)
+        for question in questions:
+            console.print(f"記録中: {question}")
+            recorder.start(question)
+            try:
+                service.analyze(question)
+            except Exception as e:
+                console.print(f"[red]分析に失敗しました: {e}[/red]")
+
+    fixture = {
+        "version": FIXTURE_VERSION,
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        "sessions": recorder.sessions,
+    }
+    output.write_text(json.dumps(fixture, ensure_ascii=False, indent=2), encoding="utf-8")
+    console.print(f"{len(questions)}件の質問を記録しました: {output}")
+
+
+@cli.command()
+@click.argument("fixture_path", type=click.Path(exists=True, path_type=Path))
+@click.option("--latency", multiple=True, help="注入する遅延（stage=ms、複数指定可）")
+@click.option("--use-recorded-latency", is_flag=True, help="遅延の指定がないステージに記録時の経過時間を注入する")
+@click.option("--jitter", default=0.0, type=float, help="遅延のゆらぎの割合（例: 0.1）")
+@click.option("--repeat", default=3, type=int, help="コーパス全体の繰り返し回数")
+@click.option("--warmup", default=1, type=int, help="計測から除外する最初の繰り返し回数")
+@click.option("--seed", default=0, type=int, help="ゆらぎの乱数シード")
+@click.option("--output", type=click.Path(path_type=Path), help="結果をJSONで保存するパス")
+def replay(
+    fixture_path: Path,
+    latency: Tuple[str, ...],
+    use_recorded_latency: bool,
+    jitter: float,
+    repeat: int,
+    warmup: int,
+    seed: int,
+    output: Optional[Path],
+) -> None:
+    """記録した外部呼び出しを再生してレイテンシを計測する"""
+    fixture = json.loads(fixture_path.read_text(encoding="utf-8"))
+    if fixture.get("version") != FIXTURE_VERSION:
+        raise click.BadParameter(f"未対応のフィクスチャのバージョンです: {fixture.get('version')}")
+
+    player = SessionPlayer(
+        fixture,
+        _parse_latencies(latency),
+        use_recorded_latency=use_recorded_latency,
+        jitter=jitter,
+        seed=seed,
+    )
+    clock = StageClock()
+    errors = 0
+    service, stack = _build_replay_service(player, clock)
+
+    with stack:
+        for iteration in range(warmup + repeat):
+            measuring = iteration >= warmup
+            for session in fixture["sessions"]:
+                player.start(session["question"])
+                clock.start()
+                start = time.perf_counter()
+                try:
+                    service.analyze(session["question"])
+                except Exception as e:
+                    if measuring:
+                        errors += 1
+                        console.print(f"[red]{session['question']}: {e}[/red]")
+                    continue
+                if measuring:
+                    clock.finish((time.perf_counter() - start) * 1000)
+
+    summary = clock.summary()
+    _print_summary(summary, errors, player.prompt_mismatches)
+    if output:
+        output.write_text(
+            json.dumps({"stages": summary, "errors": errors}, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+        console.print(f"結果を保存しました: {output}")
+
+
+if __name__ == "__main__":
+    cli()
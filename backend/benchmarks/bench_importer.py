@@ -0,0 +1,237 @@
+"""
+EventsImporter のスループット計測
+
+合成したGA4エクスポートを FakeBigQueryConnection 経由でローカルのPostgreSQLに
+インポートし、データサイズごとに rows/sec、ピークRSS、ステージごとの時間
+（fetch, normalize, ddl, write, rollup）を計測する。
+
+各サイズは別プロセスで実行するため、ピークRSSはサイズごとの値になる。
+計測用のデータベースはスキーマごと作り直すため、本番と同じデータベースは指定できない。
+
+使い方:
+    PYTHONPATH=src python -m benchmarks.bench_importer --sizes 1000,10000,100000
+"""
+
+import json
+import resource
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import click
+from rich.console import Console
+from rich.table import Table
+
+from analytics_chat_agent.config import get_settings
+from analytics_chat_agent.core.database import PostgresConnection
+from analytics_chat_agent.core.importer import EventsImporter
+
+from .fake_bigquery import FakeBigQueryConnection
+from .synthetic_ga4 import SyntheticGA4Config
+
+SQL_DIR = Path(__file__).parent.parent / "data" / "sql"
+
+STAGES = ["fetch", "normalize", "ddl", "write", "rollup"]
+
+console = Console()
+
+
+@dataclass
+class BenchmarkResult:
+    """
+    1サイズ分の計測結果
+    """
+    events_per_day: int
+    days: int
+    params_per_event: int
+    distinct_keys: int
+    param_storage: str
+    param_rows: int = 0  # BigQueryから取得した行数（イベント × パラメータ）
+    events: int = 0  # インポートしたイベント数
+    total_seconds: float = 0.0
+    rows_per_second: float = 0.0
+    peak_rss_mb: float = 0.0
+    stages: Dict[str, float] = field(default_factory=dict)  # ステージごとの秒数
+    error: Optional[str] = None
+
+
+class StageTimer:
+    """メソッドを差し替えてステージごとの経過時間を集計するクラス"""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {stage: 0.0 for stage in STAGES}
+
+    def wrap(self, obj: Any, method_name: str, stage: str) -> None:
+        """
+        インスタンスのメソッドを計測付きのものに差し替える
+
+        Args:
+            obj: 対象のインスタンス
+            method_name: メソッド名
+            stage: 集計先のステージ名
+        """
+        method: Callable[..., Any] = getattr(obj, method_name)
+
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.seconds[stage] += time.perf_counter() - start
+
+        setattr(obj, method_name, timed)
+
+
+def _peak_rss_mb() -> float:
+    """プロセスのピークRSS（MB）を返す"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linuxはキロバイト、macOSはバイト単位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _reset_database(pg_conn: PostgresConnection) -> None:
+    """計測用データベースのスキーマを作り直す"""
+    pg_conn.execute_query("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+    for sql_path in sorted(SQL_DIR.glob("*.sql")):
+        pg_conn.execute_query(sql_path.read_text(encoding="utf-8"))
+
+
+def run_single(
+    config: SyntheticGA4Config, pg_settings: Dict[str, Any], param_storage: str
+) -> BenchmarkResult:
+    """
+    1サイズ分のインポートを計測する（子プロセスで実行される）
+
+    Args:
+        config: 合成データの生成設定
+        pg_settings: 計測用データベースの接続設定
+        param_storage: パラメータの格納先（columns または jsonb）
+
+    Returns:
+        BenchmarkResult: 計測結果
+    """
+    result = BenchmarkResult(
+        events_per_day=config.events_per_day,
+        days=config.days,
+        params_per_event=config.params_per_event,
+        distinct_keys=config.distinct_keys,
+        param_storage=param_storage,
+    )
+    try:
+        with PostgresConnection(pg_settings) as pg_conn:
+            _reset_database(pg_conn)
+            bq_conn = FakeBigQueryConnection(config)
+            importer = EventsImporter(bq_conn, pg_conn, param_storage=param_storage)
+
+            timer = StageTimer()
+            timer.wrap(bq_conn, "execute_query", "fetch")
+            timer.wrap(importer, "_normalize_events", "normalize")
+            timer.wrap(importer.schema_manager, "add_virtual_column", "ddl")
+            timer.wrap(importer, "_insert_events", "write")
+            if importer.rollup_builder is not None:
+                timer.wrap(importer.rollup_builder, "rebuild_all", "rollup")
+
+            start = time.perf_counter()
+            result.events = importer.import_all_events()
+            result.total_seconds = time.perf_counter() - start
+
+        # DDLは正規化処理の中で実行されるため、normalize からは除く
+        timer.seconds["normalize"] -= timer.seconds["ddl"]
+        result.stages = timer.seconds
+        result.param_rows = config.events_per_day * config.days * config.params_per_event
+        result.rows_per_second = result.param_rows / result.total_seconds if result.total_seconds else 0.0
+    except Exception:
+        result.error = traceback.format_exc(limit=3)
+    result.peak_rss_mb = _peak_rss_mb()
+    return result
+
+
+def _print_results(results: List[BenchmarkResult]) -> None:
+    """計測結果を表形式で表示する"""
+    table = Table(title="EventsImporter ベンチマーク")
+    table.add_column("events/day", justify="right")
+    table.add_column("params/event", justify="right")
+    table.add_column("keys", justify="right")
+    table.add_column("storage")
+    table.add_column("rows", justify="right")
+    table.add_column("rows/sec", justify="right")
+    table.add_column("peak RSS (MB)", justify="right")
+    for stage in STAGES:
+        table.add_column(f"{stage} (s)", justify="right")
+
+    for r in results:
+        if r.error:
+            table.add_row(
+                str(r.events_per_day), str(r.params_per_event), str(r.distinct_keys),
+                r.param_storage, "-", "[red]失敗[/red]", f"{r.peak_rss_mb:.1f}", *["-"] * len(STAGES)
+            )
+            continue
+        table.add_row(
+            str(r.events_per_day),
+            str(r.params_per_event),
+            str(r.distinct_keys),
+            r.param_storage,
+            str(r.param_rows),
+            f"{r.rows_per_second:,.0f}",
+            f"{r.peak_rss_mb:.1f}",
+            *[f"{r.stages[stage]:.3f}" for stage in STAGES],
+        )
+    console.print(table)
+
+    for r in results:
+        if r.error:
+            console.print(f"[red]events/day={r.events_per_day} の計測に失敗しました[/red]\n{r.error}")
+
+
+@click.command()
+@click.option("--sizes", default="1000,10000,50000", help="1日あたりのイベント数（カンマ区切り）")
+@click.option("--days", default=1, type=int, help="日数")
+@click.option("--params-per-event", default=8, type=int, help="1イベントあたりのパラメータ数")
+@click.option("--distinct-keys", default=20, type=int, help="パラメータキーの種類数")
+@click.option("--param-storage", type=click.Choice(["columns", "jsonb"]), default="columns",
+              help="パラメータの格納先")
+@click.option("--database", default="ga4_bench", help="計測用データベース名（スキーマを作り直す）")
+@click.option("--output", type=click.Path(path_type=Path), help="結果をJSONで保存するパス")
+def main(
+    sizes: str,
+    days: int,
+    params_per_event: int,
+    distinct_keys: int,
+    param_storage: str,
+    database: str,
+    output: Optional[Path],
+) -> None:
+    """合成データでEventsImporterのスループットを計測する"""
+    settings = get_settings()
+    if database == settings["postgres"]["database"]:
+        raise click.BadParameter("設定ファイルと同じデータベースは計測に使用できません", param_hint="--database")
+    pg_settings = {**settings["postgres"], "database": database}
+
+    results = []
+    for size in [int(s) for s in sizes.split(",") if s.strip()]:
+        config = SyntheticGA4Config(
+            events_per_day=size,
+            params_per_event=params_per_event,
+            distinct_keys=distinct_keys,
+            days=days,
+        )
+        console.print(f"計測中: events/day={size}, days={days} ...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            results.append(executor.submit(run_single, config, pg_settings, param_storage).result())
+
+    _print_results(results)
+    if output:
+        output.write_text(
+            json.dumps([asdict(r) for r in results], ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+        console.print(f"結果を保存しました: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+合成データを返すBigQuery接続
+"""
+
+import re
+from collections import namedtuple
+from itertools import groupby
+from typing import Any, List
+
+from analytics_chat_agent.core.database import BigQueryConnection
+from analytics_chat_agent.core.importer.row_layout import event_key
+
+from .synthetic_ga4 import SyntheticGA4Config, generate_rows
+
+_SUFFIX_FILTER_PATTERN = re.compile(r"_TABLE_SUFFIX\s*=\s*'(\d{8})'")
+_KEY_FILTER_PATTERN = re.compile(r"param\.key\s+IN\s*\(([^)]*)\)", re.IGNORECASE)
+
+TableRow = namedtuple("TableRow", ["suffix"])
+
+
+class FakeBigQueryConnection(BigQueryConnection):
+    """
+    BigQueryに接続せず、合成データを返すBigQuery接続
+
+    EventsImporter が発行するクエリの `_TABLE_SUFFIX` とパラメータキーの絞り込みを解釈する。
+    INFORMATION_SCHEMA.TABLES への問い合わせには合成データの日別テーブルの一覧を返す。
+    """
+
+    def __init__(self, config: SyntheticGA4Config):
+        """
+        Args:
+            config: 合成データの生成設定
+        """
+        super().__init__({})
+        self.config = config
+
+    def _connect(self) -> None:
+        """接続は不要"""
+        return None
+
+    def close(self) -> None:
+        """接続は不要"""
+        pass
+
+    def execute_query(self, query: str) -> List[Any]:
+        """
+        クエリの絞り込み条件に合う合成データを返す
+
+        Args:
+            query: EventsImporter が生成したSQL
+
+        Returns:
+            List[Any]: 行データ
+        """
+        if "INFORMATION_SCHEMA.TABLES" in query:
+            return [TableRow(suffix) for suffix in self.config.table_suffixes()]
+
+        suffix_match = _SUFFIX_FILTER_PATTERN.search(query)
+        table_suffix = suffix_match.group(1) if suffix_match else None
+
+        key_match = _KEY_FILTER_PATTERN.search(query)
+        keys = None
+        if key_match:
+            keys = {key.strip().strip("'") for key in key_match.group(1).split(",")}
+
+        # LEFT JOIN UNNEST と同様に、キーが1つも残らないイベントは param_key が None の1行にする
+        rows = []
+        for _, event_rows in groupby(generate_rows(self.config, table_suffix), key=event_key):
+            event_rows = list(event_rows)
+            kept = [row for row in event_rows if keys is None or row.param_key in keys]
+            rows.extend(kept or [event_rows[0]._replace(param_key=None, param_value=None)])
+        return rows
@@ -0,0 +1,139 @@
+"""
+GA4エクスポートを模した合成データの生成
+
+EventsImporter が BigQuery から取得する行（イベント × event_params を UNNEST した行）と
+同じ形の行を生成する。
+"""
+
+import random
+from collections import namedtuple
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+# EventsImporter._build_base_query の結果と同じカラムを持つ行
+SyntheticRow = namedtuple(
+    "SyntheticRow",
+    [
+        "event_bundle_sequence_id",
+        "event_date",
+        "event_timestamp",
+        "event_name",
+        "user_pseudo_id",
+        "batch_event_index",
+        "param_key",
+        "param_value",
+    ],
+)
+
+# 集計テーブルが参照するため必ず含めるキー
+_FIXED_KEYS = ["page_location", "ga_session_id"]
+
+_EVENT_NAMES = ["page_view", "scroll", "click", "user_engagement", "session_start"]
+
+
+@dataclass
+class SyntheticGA4Config:
+    """
+    合成データの生成設定
+    """
+    events_per_day: int = 1000  # 1日あたりのイベント数
+    params_per_event: int = 8  # 1イベントあたりのパラメータ数
+    distinct_keys: int = 20  # パラメータキーの種類数
+    days: int = 1  # 日数
+    users: int = 500  # ユーザー数
+    start_date: date = date(2024, 1, 1)  # 開始日
+    seed: int = 0  # 乱数シード
+
+    def table_suffixes(self) -> List[str]:
+        """生成対象のテーブルサフィックスの一覧を返す"""
+        return [
+            (self.start_date + timedelta(days=i)).strftime("%Y%m%d")
+            for i in range(self.days)
+        ]
+
+
+def param_keys(config: SyntheticGA4Config) -> List[str]:
+    """
+    生成するパラメータキーの一覧を返す
+
+    Args:
+        config: 生成設定
+
+    Returns:
+        List[str]: パラメータキー
+    """
+    extra = max(config.distinct_keys - len(_FIXED_KEYS), 0)
+    return _FIXED_KEYS + [f"bench_key_{i:03d}" for i in range(extra)]
+
+
+def _param_value(key: str, key_index: int, rng: random.Random, session_id: int) -> Dict[str, Any]:
+    """
+    event_params.value と同じ形の値を生成する
+
+    キーごとに型を固定し、string_value / int_value / double_value のいずれかに値を入れる。
+    """
+    value: Dict[str, Any] = {
+        "string_value": None,
+        "int_value": None,
+        "float_value": None,
+        "double_value": None,
+    }
+    if key == "page_location":
+        value["string_value"] = f"https://example.com/page/{rng.randrange(200)}"
+    elif key == "ga_session_id":
+        value["int_value"] = session_id
+    elif key_index % 3 == 0:
+        value["string_value"] = f"value_{rng.randrange(1000)}"
+    elif key_index % 3 == 1:
+        value["int_value"] = rng.randrange(1_000_000)
+    else:
+        value["double_value"] = rng.random() * 100
+    return value
+
+
+def generate_rows(
+    config: SyntheticGA4Config, table_suffix: Optional[str] = None
+) -> Iterator[SyntheticRow]:
+    """
+    合成データの行を生成する
+
+    Args:
+        config: 生成設定
+        table_suffix: 指定した場合はその日付の行のみ生成する
+
+    Yields:
+        SyntheticRow: イベント × パラメータの行
+    """
+    keys = param_keys(config)
+    params_per_event = min(config.params_per_event, len(keys))
+    optional_keys = list(range(len(_FIXED_KEYS), len(keys)))
+
+    for day_index, suffix in enumerate(config.table_suffixes()):
+        if table_suffix is not None and suffix != table_suffix:
+            continue
+        rng = random.Random(config.seed * 100_003 + day_index)
+        event_date = config.start_date + timedelta(days=day_index)
+        day_start = datetime(event_date.year, event_date.month, event_date.day, tzinfo=timezone.utc)
+
+        for event_index in range(config.events_per_day):
+            event_id = day_index * config.events_per_day + event_index + 1
+            user_index = rng.randrange(config.users)
+            session_id = 1_700_000_000 + user_index * 10 + rng.randrange(3)
+            timestamp = day_start + timedelta(seconds=rng.randrange(86400))
+            event_name = rng.choice(_EVENT_NAMES)
+
+            chosen = list(range(min(len(_FIXED_KEYS), params_per_event)))
+            chosen += rng.sample(optional_keys, max(params_per_event - len(chosen), 0))
+            for key_index in chosen:
+                key = keys[key_index]
+                yield SyntheticRow(
+                    event_bundle_sequence_id=event_id,
+                    event_date=event_date,
+                    event_timestamp=timestamp,
+                    event_name=event_name,
+                    user_pseudo_id=f"user_{user_index}",
+                    batch_event_index=event_index,
+                    param_key=key,
+                    param_value=_param_value(key, key_index, rng, session_id),
+                )
@@ -0,0 +1,18 @@
+CREATE TABLE IF NOT EXISTS import_runs (
+    id SERIAL PRIMARY KEY,
+    mode TEXT NOT NULL,                     -- full など
+    source TEXT NOT NULL,                   -- 例: ungift.analytics_336047273.events_*
+    status TEXT NOT NULL DEFAULT 'running', -- running, completed, failed
+    error TEXT,                             -- failed の場合のエラー内容
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS import_checkpoints (
+    run_id INTEGER NOT NULL REFERENCES import_runs (id) ON DELETE CASCADE,
+    chunk TEXT NOT NULL,                    -- 完了したチャンク（テーブルのサフィックス YYYYMMDD）
+    row_count BIGINT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 1,    -- 完了までの試行回数
+    completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (run_id, chunk)
+);
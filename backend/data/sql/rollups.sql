@@ -0,0 +1,16 @@
+CREATE TABLE IF NOT EXISTS daily_event_rollup (
+    event_date DATE NOT NULL,
+    event_name TEXT NOT NULL,
+    page_location TEXT NOT NULL DEFAULT '',   -- page_location がないイベントは空文字
+    event_count BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (event_date, event_name, page_location)
+);
+
+CREATE TABLE IF NOT EXISTS daily_session_rollup (
+    event_date DATE PRIMARY KEY,
+    user_count BIGINT NOT NULL,               -- user_pseudo_id のユニーク数
+    session_count BIGINT NOT NULL,            -- user_pseudo_id × ga_session_id のユニーク数
+    event_count BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
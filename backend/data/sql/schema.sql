@@ -1,5 +1,9 @@
+-- events と子テーブルは event_date で範囲パーティション化する。
+-- 日別のパーティション（<テーブル名>_pYYYYMMDD）はインポート時に SchemaManager が作成・削除する。
+-- パーティション化前のデータベースは migrate-event-partitions コマンドで移行する。
+
 CREATE TABLE events (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     "app_info" JSONB,
     "batch_event_index" BIGINT,
     "batch_ordering_id" BIGINT,
@@ -8,7 +12,12 @@ CREATE TABLE events (
     "device" JSONB,
     "ecommerce" JSONB,
     "event_bundle_sequence_id" BIGINT,
+    "event_date" DATE NOT NULL,
+    "event_timestamp" TIMESTAMPTZ,
+    "event_name" TEXT,
+    "user_pseudo_id" TEXT,
     "event_dimensions" JSONB,
+    "event_params" JSONB,  -- param_storage が jsonb の場合のイベントパラメータ（型付きの値）
     "event_previous_timestamp" BIGINT,
     "event_server_timestamp_offset" BIGINT,
     "event_value_in_usd" FLOAT,
@@ -51,23 +60,32 @@ CREATE TABLE events (
     "bq_column_batch_page_id" BIGINT,
     "bq_column_entrances" BIGINT,
     "bq_column_percent_scrolled" FLOAT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date)
+) PARTITION BY RANGE (event_date);
+
+-- ローカル実行の event_date による絞り込み・並べ替え用（パーティションごとに作成される）
+CREATE INDEX events_event_date_idx ON events (event_date);
+CREATE INDEX events_event_params_idx ON events USING GIN (event_params);
 
 CREATE TABLE app_info (
-    id SERIAL PRIMARY KEY,
-    parent_id BIGINT NOT NULL REFERENCES events(id),
+    id SERIAL,
+    parent_id BIGINT NOT NULL,
+    event_date DATE NOT NULL,
     "firebase_app_id" TEXT,
     "app_id" TEXT,
     "install_source" TEXT,
     "install_store" TEXT,
     "version" TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES events (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE collected_traffic_source (
-    id SERIAL PRIMARY KEY,
-    parent_id BIGINT NOT NULL REFERENCES events(id),
+    id SERIAL,
+    parent_id BIGINT NOT NULL,
+    event_date DATE NOT NULL,
     "dclid" TEXT,
     "gclid" TEXT,
     "manual_campaign_id" TEXT,
@@ -80,12 +98,15 @@ CREATE TABLE collected_traffic_source (
     "manual_source_platform" TEXT,
     "manual_term" TEXT,
     "srsltid" TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES events (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE device (
-    id SERIAL PRIMARY KEY,
-    parent_id BIGINT NOT NULL REFERENCES events(id),
+    id SERIAL,
+    parent_id BIGINT NOT NULL,
+    event_date DATE NOT NULL,
     "advertising_id" TEXT,
     "browser" TEXT,
     "browser_version" TEXT,
@@ -101,21 +122,27 @@ CREATE TABLE device (
     "time_zone_offset_seconds" BIGINT,
     "vendor_id" TEXT,
     "web_info" JSONB,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES events (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE web_info (
-    id SERIAL PRIMARY KEY,
-    parent_id BIGINT NOT NULL REFERENCES device(id),
+    id SERIAL,
+    parent_id BIGINT NOT NULL,
+    event_date DATE NOT NULL,
     "browser" TEXT,
     "browser_version" TEXT,
     "hostname" TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES device (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE ecommerce (
-    id SERIAL PRIMARY KEY,
-    parent_id BIGINT NOT NULL REFERENCES events(id),
+    id SERIAL,
+    parent_id BIGINT NOT NULL,
+    event_date DATE NOT NULL,
     "purchase_revenue" FLOAT,
     "purchase_revenue_in_usd" FLOAT,
     "refund_value" FLOAT,
@@ -127,19 +154,25 @@ CREATE TABLE ecommerce (
     "total_item_quantity" BIGINT,
     "transaction_id" TEXT,
     "unique_items" BIGINT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES events (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE event_dimensions (
-    id SERIAL PRIMARY KEY,
-    parent_id BIGINT NOT NULL REFERENCES events(id),
+    id SERIAL,
+    parent_id BIGINT NOT NULL,
+    event_date DATE NOT NULL,
     "hostname" TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES events (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE items (
-    id SERIAL PRIMARY KEY,
-    parent_id BIGINT NOT NULL REFERENCES events(id),
+    id SERIAL,
+    parent_id BIGINT NOT NULL,
+    event_date DATE NOT NULL,
     "affiliation" TEXT,
     "coupon" TEXT,
     "creative_name" TEXT,
@@ -167,61 +200,79 @@ CREATE TABLE items (
     "promotion_id" TEXT,
     "promotion_name" TEXT,
     "quantity" BIGINT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES events (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE item_params (
-    id SERIAL PRIMARY KEY,
-    parent_id INT NOT NULL REFERENCES items(id),
+    id SERIAL,
+    parent_id INT NOT NULL,
+    event_date DATE NOT NULL,
     "key" TEXT,
     "value" JSONB,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES items (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE value (
-    id SERIAL PRIMARY KEY,
-    parent_id INT NOT NULL REFERENCES item_params(id),
+    id SERIAL,
+    parent_id INT NOT NULL,
+    event_date DATE NOT NULL,
     "double_value" FLOAT,
     "float_value" FLOAT,
     "int_value" INT,
     "string_value" TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES item_params (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE privacy_info (
-    id SERIAL PRIMARY KEY,
-    parent_id INT NOT NULL REFERENCES events(id),
+    id SERIAL,
+    parent_id INT NOT NULL,
+    event_date DATE NOT NULL,
     "ads_storage" TEXT,
     "analytics_storage" TEXT,
     "uses_transient_token" TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES events (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE publisher (
-    id SERIAL PRIMARY KEY,
-    parent_id INT NOT NULL REFERENCES events(id),
+    id SERIAL,
+    parent_id INT NOT NULL,
+    event_date DATE NOT NULL,
     "ad_format" TEXT,
     "ad_revenue_in_usd" FLOAT,
     "ad_source_name" TEXT,
     "ad_unit_id" TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES events (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE session_traffic_source_last_click (
-    id SERIAL PRIMARY KEY,
-    parent_id INT NOT NULL REFERENCES events(id),
+    id SERIAL,
+    parent_id INT NOT NULL,
+    event_date DATE NOT NULL,
     "cm360_campaign" JSONB,
     "cross_channel_campaign" JSONB,
     "dv360_campaign" JSONB,
     "google_ads_campaign" JSONB,
     "manual_campaign" JSONB,
     "sa360_campaign" JSONB,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES events (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE cm360_campaign (
-    id SERIAL PRIMARY KEY,
-    parent_id INT NOT NULL REFERENCES session_traffic_source_last_click(id),
+    id SERIAL,
+    parent_id INT NOT NULL,
+    event_date DATE NOT NULL,
     "account_id" TEXT,
     "account_name" TEXT,
     "advertiser_id" TEXT,
@@ -242,12 +293,15 @@ CREATE TABLE cm360_campaign (
     "site_id" TEXT,
     "site_name" TEXT,
     "source" TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES session_traffic_source_last_click (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE cross_channel_campaign (
-    id SERIAL PRIMARY KEY,
-    parent_id INT NOT NULL REFERENCES session_traffic_source_last_click(id),
+    id SERIAL,
+    parent_id INT NOT NULL,
+    event_date DATE NOT NULL,
     "campaign_id" TEXT,
     "campaign_name" TEXT,
     "default_channel_group" TEXT,
@@ -255,12 +309,15 @@ CREATE TABLE cross_channel_campaign (
     "primary_channel_group" TEXT,
     "source" TEXT,
     "source_platform" TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES session_traffic_source_last_click (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE dv360_campaign (
-    id SERIAL PRIMARY KEY,
-    parent_id INT NOT NULL REFERENCES session_traffic_source_last_click(id),
+    id SERIAL,
+    parent_id INT NOT NULL,
+    event_date DATE NOT NULL,
     "advertiser_id" TEXT,
     "advertiser_name" TEXT,
     "campaign_id" TEXT,
@@ -278,24 +335,30 @@ CREATE TABLE dv360_campaign (
     "partner_id" TEXT,
     "partner_name" TEXT,
     "source" TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES session_traffic_source_last_click (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE google_ads_campaign (
-    id SERIAL PRIMARY KEY,
-    parent_id INT NOT NULL REFERENCES session_traffic_source_last_click(id),
+    id SERIAL,
+    parent_id INT NOT NULL,
+    event_date DATE NOT NULL,
     "account_name" TEXT,
     "ad_group_id" TEXT,
     "ad_group_name" TEXT,
     "campaign_id" TEXT,
     "campaign_name" TEXT,
     "customer_id" TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES session_traffic_source_last_click (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE manual_campaign (
-    id SERIAL PRIMARY KEY,
-    parent_id INT NOT NULL REFERENCES session_traffic_source_last_click(id),
+    id SERIAL,
+    parent_id INT NOT NULL,
+    event_date DATE NOT NULL,
     "campaign_id" TEXT,
     "campaign_name" TEXT,
     "content" TEXT,
@@ -305,12 +368,15 @@ CREATE TABLE manual_campaign (
     "source" TEXT,
     "source_platform" TEXT,
     "term" TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES session_traffic_source_last_click (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE sa360_campaign (
-    id SERIAL PRIMARY KEY,
-    parent_id INT NOT NULL REFERENCES session_traffic_source_last_click(id),
+    id SERIAL,
+    parent_id INT NOT NULL,
+    event_date DATE NOT NULL,
     "ad_group_id" TEXT,
     "ad_group_name" TEXT,
     "campaign_id" TEXT,
@@ -321,22 +387,30 @@ CREATE TABLE sa360_campaign (
     "manager_account_name" TEXT,
     "medium" TEXT,
     "source" TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES session_traffic_source_last_click (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE traffic_source (
-    id SERIAL PRIMARY KEY,
-    parent_id INT NOT NULL REFERENCES events(id),
+    id SERIAL,
+    parent_id INT NOT NULL,
+    event_date DATE NOT NULL,
     "medium" TEXT,
     "name" TEXT,
     "source" TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES events (id, event_date)
+) PARTITION BY RANGE (event_date);
 
 CREATE TABLE user_ltv (
-    id SERIAL PRIMARY KEY,
-    parent_id INT NOT NULL REFERENCES events(id),
+    id SERIAL,
+    parent_id INT NOT NULL,
+    event_date DATE NOT NULL,
     "currency" TEXT,
     "revenue" FLOAT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, event_date),
+    FOREIGN KEY (parent_id, event_date) REFERENCES events (id, event_date)
+) PARTITION BY RANGE (event_date);
@@ -4,5 +4,13 @@ CREATE TABLE IF NOT EXISTS virtual_keys (
     description TEXT,                       -- 例: 表示されたページのURL
     parent_field TEXT NOT NULL,             -- 例: event_params.key
     field_type TEXT NOT NULL,               -- STRING, INTEGER, FLOAT, BOOLEAN など
+    storage TEXT NOT NULL DEFAULT 'column', -- column: bq_column_<name>、jsonb: events.event_params
+    query_count BIGINT NOT NULL DEFAULT 0,  -- 分析クエリで参照された回数（カラムへの昇格に使用）
+    last_queried_at TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+);
+
+-- 既存の virtual_keys テーブルへのカラム追加
+ALTER TABLE virtual_keys ADD COLUMN IF NOT EXISTS storage TEXT NOT NULL DEFAULT 'column';
+ALTER TABLE virtual_keys ADD COLUMN IF NOT EXISTS query_count BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE virtual_keys ADD COLUMN IF NOT EXISTS last_queried_at TIMESTAMP;
@@ -5,5 +5,18 @@ CLIコマンドの実装
 from .analyze import analyze
 from .version import version
 from .import_ga4_schema import import_ga4_schema
+from .promote_param_keys import promote_param_keys
+from .migrate_event_partitions import migrate_event_partitions
+from .export_embedding_model import export_embedding_model
+from .vector_snapshot import export_vector_snapshot, restore_vector_snapshot
 
-__all__ = ["analyze", "version", "import_ga4_schema"]
+__all__ = [
+    "analyze",
+    "version",
+    "import_ga4_schema",
+    "promote_param_keys",
+    "migrate_event_partitions",
+    "export_embedding_model",
+    "export_vector_snapshot",
+    "restore_vector_snapshot",
+]
@@ -29,7 +29,7 @@ def analyze(query: str):
     """
     try:
         # 分析サービスの初期化
-        service = AnalysisService()
+        service = AnalysisService.from_settings()
 
         # 分析の実行
         result = service.analyze(query)
@@ -65,7 +65,7 @@ def analyze(query: str):
         console.print(field_table)
 
         # SQLの表示
-        console.print("\n[bold]生成されたSQL[/bold]")
+        console.print(f"\n[bold]生成されたSQL[/bold]（実行先: {result['engine']}）")
         console.print(result["sql"])
 
         # クエリ結果の表示
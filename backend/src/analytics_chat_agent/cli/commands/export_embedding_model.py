@@ -0,0 +1,47 @@
+"""
+埋め込みモデルを ONNX 形式にエクスポートするコマンド
+"""
+
+import logging
+from pathlib import Path
+from typing import Optional
+
+import click
+
+from ...config import get_settings
+from ...core.embedding import CACHE_DIR
+from ...core.embedding.export import export_onnx_model
+
+logger = logging.getLogger(__name__)
+
+
+@click.command("export-embedding-model")
+@click.option("--output-dir", type=click.Path(file_okay=False, path_type=Path),
+              help="出力先ディレクトリ（指定しない場合は設定ファイルの model.onnx.path）")
+@click.option("--no-quantize", is_flag=True, help="int8 に量子化したモデルを出力しない")
+@click.option("--max-length", type=int, default=256, show_default=True, help="最大トークン数")
+def export_embedding_model(output_dir: Optional[Path], no_quantize: bool, max_length: int):
+    """
+    フィールド解決に使用する埋め込みモデルを ONNX Runtime 用にエクスポートする
+
+    出力後に settings.json の model.backend を "onnx" にすると、PyTorch を読み込まずにベクトル化する。
+    """
+    model_settings = get_settings()["model"]
+    if output_dir is None:
+        output_dir = Path(model_settings.get("onnx", {})["path"])
+
+    try:
+        paths = export_onnx_model(
+            model_settings["name"],
+            output_dir,
+            quantize=not no_quantize,
+            max_length=max_length,
+            cache_folder=CACHE_DIR,
+        )
+    except (ImportError, ValueError) as e:
+        logger.error(f"モデルのエクスポートエラー: {e}")
+        click.echo(f"エラー: {str(e)}")
+        raise click.Abort()
+
+    for path in paths:
+        click.echo(f"出力しました: {path}")
@@ -4,21 +4,33 @@ GA4イベントデータのインポートコマンド
 
 import logging
 import click
+from contextlib import ExitStack
 from datetime import datetime
+from pathlib import Path
+from typing import Optional
 from ...config import get_settings
-from ...core.database import BigQueryConnection, PostgresConnection
-from ...core.importer import EventsImporter
+from ...core.database import BigQueryConnection, PostgresConnection, PooledPostgresConnection
+from ...core.importer import EventsImporter, FileEventSource
+from ...core.schema import SchemaManager
 import psycopg2
 
 logger = logging.getLogger(__name__)
 
-def import_ga4_events(mode: str, target_date: str):
+def import_ga4_events(
+    mode: str, target_date: str, from_files: Optional[Path], workers: Optional[int], resume: bool
+):
     """
     GA4のイベントデータをBigQueryからPostgreSQLにインポートする
 
     MODE:
         full: PostgreSQLの全データを削除し、BigQueryから全期間のデータを取得して流し込む
         date: 指定された日付のデータのみPostgreSQLから削除し、その日のデータだけ再インポートする
+
+    full モードは日別のテーブルごとに完了を記録するため、途中で失敗した場合は
+    --resume を指定して再実行すると完了済みのテーブルを飛ばして続きから実行できる。
+
+    --from-files を指定した場合はBigQueryに接続せず、ディレクトリ内のエクスポートファイル
+    （events_YYYYMMDD の Parquet / Avro / 改行区切りJSON）から読み込む。
     """
     try:
         # 日付モードの場合、日付の検証
@@ -29,27 +41,53 @@ def import_ga4_events(mode: str, target_date: str):
                 datetime.strptime(target_date, '%Y-%m-%d')
             except ValueError:
                 raise click.BadParameter('target-dateはYYYY-MM-DD形式で指定してください')
+        if resume and (mode != 'full' or from_files):
+            raise click.BadParameter('--resumeはBigQueryからのfullモードでのみ指定できます')
 
         # 設定を取得
         settings = get_settings()
         
-        # データベース接続を確立
-        with BigQueryConnection(settings["bigquery"]) as bq_conn, \
-             PostgresConnection(settings["postgres"]) as pg_conn:
+        # データベース接続を確立（プール設定がある場合はコネクションプールを使用）
+        pg_conn_class = (
+            PooledPostgresConnection if "pool" in settings["postgres"] else PostgresConnection
+        )
+        with ExitStack() as stack:
+            bq_conn = (
+                None if from_files else stack.enter_context(BigQueryConnection(settings["bigquery"]))
+            )
+            pg_conn = stack.enter_context(pg_conn_class(settings["postgres"]))
+
+            # 日別パーティションに挿入するため、パーティション化前のテーブルには取り込まない
+            if not SchemaManager(pg_conn).is_events_partitioned():
+                raise RuntimeError(
+                    "events テーブルがパーティション化されていません。"
+                    "先に migrate-event-partitions を実行してください"
+                )
             
             # インポーターを初期化
             importer = EventsImporter(bq_conn, pg_conn)
             
             # モードに応じてインポートを実行
-            if mode == 'full':
-                click.echo("フルインポートモードで実行します...")
-                count = importer.import_all_events()
+            if from_files:
+                workers = workers or settings.get("importer", {}).get("file_workers")
+                source = FileEventSource(from_files, workers=workers)
+                click.echo(f"エクスポートファイルからインポートします（{source.directory}、{source.workers}プロセス）...")
+                count = importer.import_events_from_files(
+                    source, target_date if mode == 'date' else None
+                )
+                click.echo(f"{count}件のイベントデータをインポートしました。")
+            elif mode == 'full':
+                click.echo("フルインポートモードで実行します" + ("（前回の続きから）..." if resume else "..."))
+                count = importer.import_all_events(resume=resume)
                 click.echo(f"{count}件のイベントデータをインポートしました。")
             else:
                 click.echo(f"日付指定モードで実行します（対象日: {target_date}）...")
                 count = importer.import_events_by_date(target_date)
                 click.echo(f"{count}件のイベントデータをインポートしました。")
 
+            if isinstance(pg_conn, PooledPostgresConnection):
+                logger.info(f"コネクションプールの統計: {pg_conn.stats()}")
+
     except psycopg2.Error as e:
         logger.error(f"PostgreSQLエラー: {str(e)}")
         logger.error(f"エラーコード: {e.pgcode}")
@@ -65,7 +103,14 @@ def import_ga4_events(mode: str, target_date: str):
 cmd = click.command()(
     click.option('--mode', type=click.Choice(['full', 'date']), required=True, help='インポートモード')(
         click.option('--target-date', help='対象日付 (YYYY-MM-DD形式、dateモード時必須)')(
-            import_ga4_events
+            click.option('--from-files', type=click.Path(exists=True, file_okay=False, path_type=Path),
+                         help='BigQueryの代わりに読み込むエクスポートファイルのディレクトリ')(
+                click.option('--workers', type=int, help='エクスポートファイルの解析に使用するプロセス数')(
+                    click.option('--resume', is_flag=True, help='前回失敗したfullモードの実行を続きから再開する')(
+                        import_ga4_events
+                    )
+                )
+            )
         )
     )
 ) 
\ No newline at end of file
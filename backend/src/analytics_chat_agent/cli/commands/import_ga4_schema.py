@@ -14,10 +14,14 @@ def get_ga4_virtual_csv_path() -> Path:
     settings = get_settings()
     return Path(settings["ga4_schema"]["virtual_csv_path"])
 
+def get_intent_examples_csv_path() -> Path:
+    settings = get_settings()
+    return Path(settings["ga4_schema"]["intent_examples_csv_path"])
+
 @click.command()
 def import_ga4_schema():
     """
-    GA4のスキーマと仮想キーをQdrantにインポートする
+    GA4のスキーマと仮想キー、意図分類の例文をQdrantにインポートする
     """
     try:
         importer = SchemaImporter()
@@ -37,6 +41,14 @@ def import_ga4_schema():
         else:
             click.echo(f"仮想キーCSVファイルが見つかりません（スキップ）: {virtual_csv_path}")
 
+        # 意図分類の例文（オプション扱い）
+        examples_csv_path = get_intent_examples_csv_path()
+        if examples_csv_path.exists():
+            count_examples = importer.import_intent_examples(examples_csv_path)
+            click.echo(f"{count_examples}件の意図の例文をインポートしました。")
+        else:
+            click.echo(f"意図の例文CSVファイルが見つかりません（スキップ）: {examples_csv_path}")
+
     except Exception as e:
         logger.error(f"スキーマインポートエラー: {e}")
         click.echo(f"エラー: {str(e)}")
@@ -0,0 +1,50 @@
+"""
+events と子テーブルを event_date の範囲パーティションに移行するコマンド
+"""
+
+import logging
+from pathlib import Path
+
+import click
+import psycopg2
+
+from ...config import get_settings
+from ...core.database import PostgresConnection
+from ...core.schema import SchemaManager
+
+logger = logging.getLogger(__name__)
+
+# パーティション化したテーブルの定義（docker-compose で初期化時にも読み込まれる）
+SCHEMA_SQL_PATH = Path(__file__).parent.parent.parent.parent.parent / "data" / "sql" / "schema.sql"
+
+
+@click.command("migrate-event-partitions")
+@click.option("--schema-file", type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              default=SCHEMA_SQL_PATH, show_default=True, help="パーティション化したテーブルを定義するSQL")
+@click.option("--recreate", is_flag=True,
+              help="既存の行を移さずにテーブルを作り直す（その後 --mode full で再インポートが必要）")
+def migrate_event_partitions(schema_file: Path, recreate: bool):
+    """
+    パーティション化前の events と子テーブルを event_date の範囲パーティションに移行する
+
+    既存のテーブルを作り直し、INSERT ... SELECT で行を移す。events に event_date がない
+    （日付の列を追加する前にインポートした）データベースは --recreate で作り直して再インポートする。
+    """
+    settings = get_settings()
+    try:
+        with PostgresConnection(settings["postgres"]) as pg_conn:
+            manager = SchemaManager(pg_conn)
+            if manager.is_events_partitioned():
+                click.echo("events テーブルはすでにパーティション化されています。")
+                return
+            schema_sql = schema_file.read_text(encoding="utf-8")
+            moved = manager.migrate_to_partitioned(schema_sql, copy_rows=not recreate)
+    except (psycopg2.Error, RuntimeError) as e:
+        logger.error(f"パーティション化への移行エラー: {str(e)}")
+        click.echo(f"エラー: {str(e)}")
+        raise click.Abort()
+
+    if recreate:
+        click.echo("テーブルを作り直しました。import-ga4-events --mode full で再インポートしてください。")
+    else:
+        click.echo(f"{moved}件のイベントをパーティション化したテーブルに移行しました。")
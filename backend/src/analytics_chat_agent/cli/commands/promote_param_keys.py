@@ -0,0 +1,41 @@
+"""
+event_params（JSONB）のキーをカラムに昇格させるコマンド
+"""
+
+import logging
+from typing import Optional
+
+import click
+import psycopg2
+
+from ...config import get_settings
+from ...core.database import PostgresConnection
+from ...core.schema import SchemaManager
+
+logger = logging.getLogger(__name__)
+
+
+@click.command("promote-param-keys")
+@click.option("--min-query-count", type=int, help="昇格させる参照回数の下限（指定しない場合は設定ファイルの値）")
+def promote_param_keys(min_query_count: Optional[int]):
+    """
+    分析クエリでの参照回数が多い event_params のキーを bq_column_<key> カラムに昇格させる
+    """
+    settings = get_settings()
+    if min_query_count is None:
+        min_query_count = (
+            settings.get("importer", {}).get("param_promotion", {}).get("min_query_count", 20)
+        )
+
+    try:
+        with PostgresConnection(settings["postgres"]) as pg_conn:
+            promoted = SchemaManager(pg_conn).promote_hot_keys(min_query_count)
+    except psycopg2.Error as e:
+        logger.error(f"PostgreSQLエラー: {str(e)}")
+        click.echo(f"エラー: {str(e)}")
+        raise click.Abort()
+
+    if promoted:
+        click.echo(f"{len(promoted)}件のキーをカラムに昇格しました: {', '.join(promoted)}")
+    else:
+        click.echo(f"参照回数が{min_query_count}回以上のキーはありません。")
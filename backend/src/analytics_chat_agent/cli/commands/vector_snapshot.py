@@ -0,0 +1,88 @@
+"""
+スキーマのベクトルのスナップショットを出力・復元するコマンド
+"""
+
+import logging
+from pathlib import Path
+from typing import Optional
+
+import click
+from qdrant_client import QdrantClient
+
+from ...config import get_settings
+from ...core.vector_snapshot import (
+    check_snapshot,
+    csv_fingerprint,
+    export_collection,
+    load_snapshot,
+    restore_collection,
+    save_snapshot,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _schema_csv_paths(settings) -> list:
+    schema_settings = settings["ga4_schema"]
+    keys = ("csv_path", "virtual_csv_path", "intent_examples_csv_path")
+    return [Path(schema_settings[key]) for key in keys if key in schema_settings]
+
+
+def _create_client(settings) -> QdrantClient:
+    return QdrantClient(url=settings["qdrant"]["url"], api_key=settings["qdrant"]["api_key"])
+
+
+@click.command("export-vector-snapshot")
+@click.option("--output", type=click.Path(dir_okay=False, path_type=Path),
+              help="出力先（指定しない場合は設定ファイルの vector_snapshot.path）")
+def export_vector_snapshot(output: Optional[Path]):
+    """
+    Qdrant のスキーマのコレクションをベクトルとペイロードのファイルに出力する
+    """
+    settings = get_settings()
+    output = output or Path(settings["vector_snapshot"]["path"])
+    try:
+        snapshot = export_collection(
+            _create_client(settings),
+            settings["qdrant"]["collection_name"],
+            settings["model"]["name"],
+            csv_fingerprint(_schema_csv_paths(settings)),
+        )
+        save_snapshot(snapshot, output)
+    except Exception as e:
+        logger.error(f"スナップショットの出力エラー: {e}")
+        click.echo(f"エラー: {str(e)}")
+        raise click.Abort()
+
+    click.echo(f"{len(snapshot.ids)}件のベクトルを出力しました: {output}")
+
+
+@click.command("restore-vector-snapshot")
+@click.option("--input", "input_path", type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              help="スナップショットのファイル（指定しない場合は設定ファイルの vector_snapshot.path）")
+def restore_vector_snapshot(input_path: Optional[Path]):
+    """
+    スナップショットから Qdrant のスキーマのコレクションを作り直す（モデルによるベクトル化は行わない）
+
+    Qdrant を使わない場合は settings.json の vector_snapshot.local_index を true にすると、
+    FieldResolver がスナップショットを直接メモリに読み込む。
+    """
+    settings = get_settings()
+    input_path = input_path or Path(settings["vector_snapshot"]["path"])
+    try:
+        snapshot = load_snapshot(input_path)
+        check_snapshot(
+            snapshot, settings["model"]["name"], csv_fingerprint(_schema_csv_paths(settings))
+        )
+        count = restore_collection(
+            _create_client(settings),
+            settings["qdrant"]["collection_name"],
+            snapshot,
+            settings["qdrant"],
+        )
+    except Exception as e:
+        logger.error(f"スナップショットの復元エラー: {e}")
+        click.echo(f"エラー: {str(e)}")
+        raise click.Abort()
+
+    click.echo(f"{count}件のベクトルを復元しました。")
@@ -10,8 +10,17 @@ import os
 import click
 from dotenv import load_dotenv
 
-from .commands import analyze, version
+from .commands import (
+    analyze,
+    version,
+    promote_param_keys,
+    migrate_event_partitions,
+    export_embedding_model,
+    export_vector_snapshot,
+    restore_vector_snapshot,
+)
 from .commands.import_ga4_events import cmd as import_ga4_events
+from .profiling import enable_profiling
 
 # .envファイルの読み込み
 env_path = Path(__file__).parent.parent.parent.parent / ".env"
@@ -25,14 +34,25 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 @click.group()
-def cli():
+@click.option("--profile", is_flag=True, help="CPU時間とメモリ割り当てを計測してレポートを出力する")
+@click.option("--profile-dir", type=click.Path(file_okay=False, path_type=Path), default=".profiles",
+              show_default=True, help="プロファイルの出力先ディレクトリ")
+@click.option("--profile-top", type=int, default=30, show_default=True, help="レポートに出力する上位件数")
+@click.pass_context
+def cli(ctx: click.Context, profile: bool, profile_dir: Path, profile_top: int):
     """GA4の分析クエリを自然言語から生成・実行するCLIツール"""
-    pass
+    if profile:
+        enable_profiling(ctx, profile_dir, profile_top)
 
 # コマンドの登録
 cli.add_command(analyze)
 cli.add_command(version)
 cli.add_command(import_ga4_events)
+cli.add_command(promote_param_keys)
+cli.add_command(migrate_event_partitions)
+cli.add_command(export_embedding_model)
+cli.add_command(export_vector_snapshot)
+cli.add_command(restore_vector_snapshot)
 
 if __name__ == "__main__":
     cli()
\ No newline at end of file
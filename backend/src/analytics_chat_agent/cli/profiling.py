@@ -0,0 +1,173 @@
+"""
+CLIコマンドのプロファイリング
+
+`--profile` を指定して実行したコマンドのCPU時間（cProfile）とメモリ割り当て（tracemalloc）を計測し、
+プロファイル用のディレクトリに以下のファイルを出力する。
+
+    <日時>-<コマンド名>.prof         cProfile の生データ（snakeviz などで表示できる）
+    <日時>-<コマンド名>-cpu.txt      関数ごとのCPU時間（累積時間順・自己時間順）
+    <日時>-<コマンド名>-memory.txt   メモリ使用量のピーク時点の割り当て箇所
+
+cProfile はメインスレッドのみを計測するため、ワーカースレッド内の処理は
+呼び出し元の待ち時間としてのみ現れる。
+"""
+
+import cProfile
+import io
+import pstats
+import threading
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+import click
+
+
+class CommandProfiler:
+    """コマンド実行中のCPU時間とメモリ割り当てを計測するクラス"""
+
+    def __init__(
+        self,
+        output_dir: Path,
+        command_name: str,
+        top: int = 30,
+        sample_interval_seconds: float = 0.5,
+        tracemalloc_frames: int = 10,
+    ):
+        """
+        Args:
+            output_dir: レポートの出力先ディレクトリ
+            command_name: 実行するコマンド名（ファイル名に使用）
+            top: レポートに出力する上位件数
+            sample_interval_seconds: メモリ使用量のピークを確認する間隔（秒）
+            tracemalloc_frames: 割り当て箇所ごとに保持するスタックの深さ
+        """
+        self.output_dir = output_dir
+        self.command_name = command_name
+        self.top = top
+        self.sample_interval = sample_interval_seconds
+        self.tracemalloc_frames = tracemalloc_frames
+        self._profiler = cProfile.Profile()
+        self._stop_sampling = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._peak_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._peak_snapshot_size = 0
+
+    def start(self) -> None:
+        """計測を開始する"""
+        tracemalloc.start(self.tracemalloc_frames)
+        self._sampler = threading.Thread(target=self._sample_peak, daemon=True)
+        self._sampler.start()
+        self._profiler.enable()
+
+    def stop(self) -> List[Path]:
+        """
+        計測を終了してレポートを出力する
+
+        Returns:
+            List[Path]: 出力したファイルのパス
+        """
+        self._profiler.disable()
+        self._stop_sampling.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self._take_snapshot_if_peak()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        prefix = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{self.command_name}"
+        prof_path = self.output_dir / f"{prefix}.prof"
+        cpu_path = self.output_dir / f"{prefix}-cpu.txt"
+        memory_path = self.output_dir / f"{prefix}-memory.txt"
+
+        self._profiler.dump_stats(str(prof_path))
+        cpu_path.write_text(self._cpu_report(), encoding="utf-8")
+        memory_path.write_text(self._memory_report(peak), encoding="utf-8")
+        return [prof_path, cpu_path, memory_path]
+
+    def _sample_peak(self) -> None:
+        """一定間隔でメモリ使用量を確認し、ピークを更新したときにスナップショットを取得する"""
+        while not self._stop_sampling.wait(self.sample_interval):
+            self._take_snapshot_if_peak()
+
+    def _take_snapshot_if_peak(self) -> None:
+        """
+        前回のスナップショットより使用量が1割以上増えている場合にスナップショットを取得する
+
+        スナップショットの取得は重いため、わずかな増加では取り直さない。
+        """
+        current, _ = tracemalloc.get_traced_memory()
+        if current > self._peak_snapshot_size * 1.1:
+            self._peak_snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            ])
+            self._peak_snapshot_size = current
+
+    def _cpu_report(self) -> str:
+        """
+        関数ごとのCPU時間のレポートを作成する
+
+        Returns:
+            str: 累積時間順と自己時間順の上位の関数
+        """
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=stream)
+        stream.write(f"# {self.command_name}: 累積時間順（上位{self.top}件）\n")
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        stream.write(f"\n# {self.command_name}: 自己時間順（上位{self.top}件）\n")
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top)
+        return stream.getvalue()
+
+    def _memory_report(self, peak: int) -> str:
+        """
+        メモリ使用量のピーク時点の割り当て箇所のレポートを作成する
+
+        Args:
+            peak: tracemalloc が記録したピーク使用量（バイト）
+
+        Returns:
+            str: 割り当て量の多い行と呼び出し元のスタック
+        """
+        lines = [
+            f"# {self.command_name}: ピークメモリ使用量 {peak / (1024 * 1024):.1f} MiB",
+            f"# スナップショット取得時点の使用量 {self._peak_snapshot_size / (1024 * 1024):.1f} MiB",
+            "",
+            f"## 割り当て量の多い行（上位{self.top}件）",
+        ]
+        if self._peak_snapshot is None:
+            return "\n".join(lines) + "\n"
+
+        for stat in self._peak_snapshot.statistics("lineno")[:self.top]:
+            frame = stat.traceback[0]
+            lines.append(
+                f"{stat.size / 1024:10.1f} KiB {stat.count:10d} blocks  {frame.filename}:{frame.lineno}"
+            )
+
+        lines += ["", "## 割り当て量の多い呼び出し経路（上位10件）"]
+        for stat in self._peak_snapshot.statistics("traceback")[:10]:
+            lines.append(f"{stat.size / 1024:.1f} KiB, {stat.count} blocks")
+            lines += [f"    {line}" for line in stat.traceback.format(most_recent_first=True)]
+        return "\n".join(lines) + "\n"
+
+
+def enable_profiling(ctx: click.Context, output_dir: Path, top: int) -> None:
+    """
+    サブコマンドの実行をプロファイリングし、終了時にレポートを出力する
+
+    Args:
+        ctx: CLIグループのコンテキスト
+        output_dir: レポートの出力先ディレクトリ
+        top: レポートに出力する上位件数
+    """
+    profiler = CommandProfiler(output_dir, ctx.invoked_subcommand or "cli", top=top)
+
+    def finish() -> None:
+        for path in profiler.stop():
+            click.echo(f"プロファイルを出力しました: {path}", err=True)
+
+    profiler.start()
+    ctx.call_on_close(finish)
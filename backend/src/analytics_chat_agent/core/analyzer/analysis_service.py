@@ -3,32 +3,193 @@
 """
 
 import logging
-import json
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 
+import psycopg2
+
+from ..combined_generator import CombinedGenerator, CombinedResponseError
+from ..database import PostgresConnection
 from ..field_resolver import FieldResolver
-from ..sql_generator import generate_sql
-from ..sql_executor import run_bigquery_query
+from ..intent_classifier import IntentClassifier
+from ..lexical_index import get_lexical_index
+from ..query_router import QueryRouter, ENGINE_BIGQUERY, ENGINE_POSTGRES
+from ..sql_generator import generate_sql, generate_postgres_sql
+from ..sql_templates import SqlTemplateMatcher
+from ..sql_validator import SqlValidationError, SqlValidator
+from ..sql_executor import run_bigquery_query, estimate_bytes_saved, format_bytes, QueryBudgetExceededError
+from ..sql_rewriter import SqlRewriter
 from ..llm import call_gemini
+from ..llm_response import intent_from_dict, parse_json_response
+from ..tracing import trace_span
+from .question_cache import CachedAnswer, QuestionCache
+from .rollup_matcher import RollupMatcher, ENGINE_ROLLUP
+from ...config import get_settings
 from ...types import Intent, FieldMappingResult, QueryResult
 
 logger = logging.getLogger(__name__)
 
 class AnalysisService:
-    """分析サービス"""
+    """
+    分析サービス
+
+    省略可能な機能（ローカル実行への振り分け・意図分類・SQLテンプレートなど）は引数で受け取り、
+    指定しない場合は無効になる。設定ファイルから作成する場合は from_settings を使用する。
+    """
+
+    def __init__(
+        self,
+        field_resolver: FieldResolver,
+        *,
+        max_sql_regenerations: int = 1,
+        max_sql_repairs: int = 2,
+        query_router: Optional[QueryRouter] = None,
+        rollup_matcher: Optional[RollupMatcher] = None,
+        intent_classifier: Optional[IntentClassifier] = None,
+        sql_templates: Optional[SqlTemplateMatcher] = None,
+        question_cache: Optional[QuestionCache] = None,
+        combined_generator: Optional[CombinedGenerator] = None,
+        sql_validator: Optional[SqlValidator] = None,
+        sql_rewriter: Optional[SqlRewriter] = None,
+        estimate_rewrite_savings: bool = True,
+    ):
+        """
+        Args:
+            field_resolver: フィールドの解決に使用する FieldResolver
+            max_sql_regenerations: 推定スキャン量が上限を超えた場合にSQLを再生成する回数
+            max_sql_repairs: SQLの検証で問題が見つかった場合にSQLを再生成する回数
+            query_router: ローカルのPostgreSQLミラーへの振り分け
+            rollup_matcher: 集計テーブルの参照
+            intent_classifier: 例文の近傍による意図分類（確信度が低い場合のみGeminiで抽出）
+            sql_templates: 意図ごとのSQLテンプレート（一致した場合はGPTによるSQL生成を省略）
+            question_cache: 言い換えの質問で意図抽出とSQL生成を省略するためのキャッシュ
+            combined_generator: 意図・フィールド・SQLを1回の GPT 呼び出しで生成（意図を分類できない場合のみ）
+            sql_validator: 生成したSQLのスキーマによる検証（問題があればBigQueryに送らずに再生成）
+            sql_rewriter: スキャン量を抑える書き換え（期間・カラムの絞り込みと LIMIT の追加）
+            estimate_rewrite_savings: 書き換えで削減されるスキャン量をドライランで推定する場合はTrue
+        """
+        self.field_resolver = field_resolver
+        self.max_sql_regenerations = max_sql_regenerations
+        self.max_sql_repairs = max_sql_repairs
+        self.query_router = query_router
+        self.rollup_matcher = rollup_matcher
+        self.intent_classifier = intent_classifier
+        self.sql_templates = sql_templates
+        self.question_cache = question_cache
+        self.combined_generator = combined_generator
+        self.sql_validator = sql_validator
+        self.sql_rewriter = sql_rewriter
+        self.estimate_rewrite_savings = estimate_rewrite_savings
+
+    @classmethod
+    def from_settings(
+        cls,
+        settings: Optional[Dict[str, Any]] = None,
+        field_resolver: Optional[FieldResolver] = None,
+    ) -> "AnalysisService":
+        """
+        設定ファイルの内容から分析サービスを作成する
+
+        Args:
+            settings: 設定（指定しない場合は settings.json）
+            field_resolver: 使用する FieldResolver（指定しない場合は作成する）
+
+        Returns:
+            AnalysisService: 設定で有効な機能を組み込んだ分析サービス
+        """
+        settings = settings or get_settings()
+        field_resolver = field_resolver or FieldResolver()
+        components: Dict[str, Any] = {}
+
+        validation_settings = settings.get("sql_validation", {})
+        rewrite_settings = settings.get("sql_rewrite", {})
+        if validation_settings.get("enabled", True) or rewrite_settings.get("enabled", True):
+            lexical_index = get_lexical_index(settings["ga4_schema"])
+            if lexical_index is not None and validation_settings.get("enabled", True):
+                components["sql_validator"] = SqlValidator.from_settings(settings["bigquery"], lexical_index)
+            if lexical_index is not None and rewrite_settings.get("enabled", True):
+                components["sql_rewriter"] = SqlRewriter.from_settings(
+                    rewrite_settings, settings["bigquery"], lexical_index
+                )
+
+        # ローカルのPostgreSQLミラーへの振り分け（接続は初回利用時に確立される）
+        routing_settings = settings.get("routing", {})
+        if routing_settings.get("prefer_local", False):
+            pg_conn = PostgresConnection(settings["postgres"])
+            components["query_router"] = QueryRouter(
+                pg_conn,
+                statement_timeout_ms=routing_settings.get("statement_timeout_ms", 10000),
+                max_rows=routing_settings.get("max_local_rows", 100000),
+                itersize=routing_settings.get("local_itersize", 2000),
+            )
+            if routing_settings.get("use_rollups", True):
+                components["rollup_matcher"] = RollupMatcher(pg_conn)
 
-    def __init__(self):
-        self.field_resolver = FieldResolver()
+        classifier_settings = settings.get("intent_classifier", {})
+        if classifier_settings.get("enabled", False):
+            components["intent_classifier"] = IntentClassifier.from_settings(
+                classifier_settings,
+                field_resolver.client,
+                field_resolver.collection_name,
+                search_params=field_resolver.search_params,
+                lexical_index=field_resolver.lexical_index,
+            )
+
+        if settings.get("sql_templates", {}).get("enabled", True):
+            components["sql_templates"] = SqlTemplateMatcher(settings["bigquery"], field_resolver.lexical_index)
+
+        cache_settings = settings.get("question_cache", {})
+        if cache_settings.get("enabled", False):
+            components["question_cache"] = QuestionCache.from_settings(cache_settings, settings["model"]["name"])
+
+        combined_settings = settings.get("combined_generation", {})
+        if combined_settings.get("enabled", False):
+            components["combined_generator"] = CombinedGenerator.from_settings(
+                combined_settings, settings["bigquery"]
+            )
+
+        return cls(
+            field_resolver,
+            max_sql_regenerations=settings.get("analysis", {}).get("max_sql_regenerations", 1),
+            max_sql_repairs=validation_settings.get("max_repairs", 2),
+            estimate_rewrite_savings=rewrite_settings.get("estimate_savings", True),
+            **components,
+        )
+
+    def _classify_intent(self, query: str, query_vector: Optional[List[float]]) -> Optional[Intent]:
+        """
+        例文の近傍で意図を分類する
+
+        Args:
+            query: 自然言語クエリ
+            query_vector: ベクトル化済みのクエリ
+
+        Returns:
+            Optional[Intent]: 意図（十分な確信度で分類できない場合はNone）
+        """
+        if self.intent_classifier is None or query_vector is None:
+            return None
+
+        with trace_span("intent_classification") as span:
+            try:
+                intent = self.intent_classifier.classify(query, query_vector)
+            except Exception as e:
+                logger.warning(f"ローカルの意図分類に失敗したためLLMで抽出します: {e}")
+                intent = None
+            span.set_attribute("local", intent is not None)
+        return intent
 
     def _extract_intent(self, query: str) -> Intent:
         """
-        クエリから意図を抽出する
+        Gemini でクエリから意図を抽出する
 
         Args:
             query: 自然言語クエリ
 
         Returns:
             Intent: 抽出された意図
+
+        Raises:
+            RuntimeError: レスポンスが不正な形式の場合
         """
         prompt = f"""
         以下のクエリから分析意図を抽出してください。
@@ -40,12 +201,14 @@ class AnalysisService:
             "description": "分析の説明",
             "parameters": {{
                 "time_range": "時間範囲（例：7d, 30d, 1y）",
-                "other_params": "その他のパラメータ"
+                "other_params": "絞り込み条件などその他のパラメータ（なければ空文字）"
             }}
         }}
 
         分析タイプのキーは以下のいずれかを使用してください：
         - user_count: ユーザー数分析
+        - page_view: ページビュー数分析
+        - event_count: イベント数分析
         - sales_trend: 売上推移分析
         - conversion_rate: コンバージョン率分析
         - retention: リテンション分析
@@ -59,19 +222,337 @@ class AnalysisService:
         5. レスポンスは純粋なJSONのみを返してください
         """
 
-        response = call_gemini(prompt)
+        with trace_span("intent_extraction"):
+            response = call_gemini(prompt)
         logger.debug(f"意図抽出のレスポンス: {response}")
         
         try:
-            intent_dict = json.loads(response)
-            return Intent(
-                key=intent_dict["key"],
-                description=intent_dict["description"],
-                parameters=intent_dict["parameters"]
-            )
-        except json.JSONDecodeError as e:
-            logger.error(f"意図抽出のレスポンスをJSONとしてパースできませんでした: {e}")
-            raise RuntimeError("意図抽出のレスポンスが不正な形式です")
+            return intent_from_dict(parse_json_response(response))
+        except ValueError as e:
+            logger.error(f"意図抽出のレスポンスを解析できませんでした: {e}")
+            raise RuntimeError("意図抽出のレスポンスが不正な形式です") from e
+
+    def _validate_sql(self, sql: str) -> List[str]:
+        """
+        生成したSQLをスキーマで検証する
+
+        Args:
+            sql: 生成したSQL
+
+        Returns:
+            List[str]: 問題点（問題がない場合、または検証しない場合は空）
+        """
+        if self.sql_validator is None:
+            return []
+
+        with trace_span("sql_validation") as span:
+            problems = self.sql_validator.validate(sql)
+            span.set_attribute("valid", not problems)
+        return problems
+
+    def _rewrite_sql(
+        self, sql: str, intent: Optional[Intent], field_mapping: FieldMappingResult, query: Optional[str] = None
+    ) -> str:
+        """
+        検証済みのSQLをスキャン量が少なくなるよう書き換える
+
+        書き換え後のSQLも検証し、問題が見つかった場合は書き換えずに元のSQLを返す。
+
+        Args:
+            sql: 検証済みのSQL
+            intent: 抽出された意図
+            field_mapping: フィールドマッピング結果
+            query: 自然言語クエリ（期間の絞り込みの可否の判定に使用）
+
+        Returns:
+            str: 書き換え後のSQL（書き換えない場合は元のSQL）
+        """
+        if self.sql_rewriter is None:
+            return sql
+
+        with trace_span("sql_rewrite") as span:
+            result = self.sql_rewriter.rewrite(sql, intent, field_mapping, query=query)
+            span.set_attribute("rewrites", len(result.changes))
+            if not result.changes:
+                return sql
+            # 書き換えで参照できないカラムなどが生じた場合は元のSQLを実行する
+            problems = self._validate_sql(result.sql)
+            if problems:
+                logger.warning(f"書き換え後のSQLの検証で問題が見つかったため元のSQLを実行します: {problems}")
+                span.set_attribute("rewrites", 0)
+                return sql
+
+            savings = ""
+            if result.reduces_scan and self.estimate_rewrite_savings:
+                try:
+                    bytes_saved = estimate_bytes_saved(sql, result.sql)
+                    span.set_attribute("bytes_saved", bytes_saved)
+                    savings = f"、推定スキャン量 {format_bytes(bytes_saved)} 削減"
+                except RuntimeError as e:
+                    logger.warning(f"書き換えによるスキャン量の削減を推定できませんでした: {e}")
+        logger.info(f"SQLを書き換えました（{'、'.join(result.changes)}{savings}）:\n{result.sql}")
+        return result.sql
+
+    def _generate_and_run_sql(
+        self,
+        field_mapping: FieldMappingResult,
+        sql: Optional[str] = None,
+        intent: Optional[Intent] = None,
+        query: Optional[str] = None,
+    ) -> Tuple[str, List[QueryResult]]:
+        """
+        SQLを生成して実行する
+
+        SQLの検証で問題が見つかった場合は、問題点を伝えてBigQueryに送る前にSQLを再生成する。
+        検証済みのSQLは意図の時間範囲と参照するカラムに合わせて書き換えてから実行する。
+        推定スキャン量が上限を超えた場合は、期間を狭めるよう指示してSQLを再生成する。
+
+        Args:
+            field_mapping: フィールドマッピング結果
+            sql: 生成済みのSQL（指定した場合は初回の生成を省略）
+            intent: 抽出された意図（SQLの書き換えに使用）
+            query: 自然言語クエリ（SQLの書き換えに使用）
+
+        Returns:
+            Tuple[str, List[QueryResult]]: 実行したSQLとクエリ結果
+
+        Raises:
+            SqlValidationError: 再生成しても検証で問題が見つかる場合
+            QueryBudgetExceededError: 再生成しても上限を超える場合
+        """
+        feedback = None
+        repairs = 0
+        regenerations = 0
+        while True:
+            if sql is None:
+                with trace_span("sql_generation", dialect="bigquery", attempt=repairs + regenerations):
+                    sql = generate_sql(field_mapping, feedback=feedback)
+            logger.info(f"生成されたSQL:\n{sql}")
+
+            problems = self._validate_sql(sql)
+            if problems:
+                if repairs >= self.max_sql_repairs:
+                    raise SqlValidationError(problems)
+                repairs += 1
+                logger.warning(f"SQLの検証で問題が見つかったため再生成します: {problems}")
+                feedback = (
+                    "前回のSQLには以下の問題があったため実行されませんでした。\n"
+                    + "\n".join(f"- {problem}" for problem in problems)
+                    + f"\n前回のSQL:\n{sql}"
+                )
+                sql = None
+                continue
+
+            sql = self._rewrite_sql(sql, intent, field_mapping, query=query)
+            try:
+                return sql, run_bigquery_query(sql)
+            except QueryBudgetExceededError as e:
+                if regenerations >= self.max_sql_regenerations:
+                    raise
+                regenerations += 1
+                logger.warning(f"{e} 期間を狭めてSQLを再生成します")
+                feedback = (
+                    f"前回のSQLは推定スキャン量が上限を超えたため実行されませんでした（{e}）。"
+                    "_TABLE_SUFFIX の日付範囲をより狭く指定し、必要なカラムだけを参照してください。\n"
+                    f"前回のSQL:\n{sql}"
+                )
+                sql = None
+
+    def _run_combined(
+        self, query: str, query_vector: Optional[List[float]]
+    ) -> Optional[Tuple[Intent, FieldMappingResult, str, str, List[Any]]]:
+        """
+        1回の GPT 呼び出しで意図・フィールド・SQLを生成して実行する
+
+        生成した意図とフィールドで集計テーブル・ローカルのPostgreSQLミラー・SQLテンプレートのいずれかで
+        回答できる場合はそちらを優先し、いずれでも回答できない場合のみ生成したSQLを実行する。
+
+        Args:
+            query: 自然言語クエリ
+            query_vector: ベクトル化済みのクエリ
+
+        Returns:
+            Optional[Tuple[Intent, FieldMappingResult, str, str, List[Any]]]:
+                意図・フィールドマッピング結果・実行先・実行したSQL・クエリ結果
+                （再生成しても応答が不正な場合はNone）
+        """
+        if self.combined_generator is None:
+            return None
+
+        candidates = self.field_resolver.resolve_fields(query, query_vector=query_vector)
+        logger.info(f"フィールドの候補を解決: {candidates}")
+        try:
+            answer = self.combined_generator.generate(query, candidates)
+        except CombinedResponseError as e:
+            logger.warning(f"一括生成に失敗したため意図抽出とSQL生成を個別に行います: {e}")
+            return None
+        logger.info(f"意図を抽出: {answer.intent}")
+
+        rollup = self._run_rollup(answer.intent)
+        if rollup is not None:
+            sql, results = rollup
+            return answer.intent, FieldMappingResult(fields=[], description=""), ENGINE_ROLLUP, sql, results
+        resolved = self._run_without_generation(query, answer.intent, answer.field_mapping)
+        if resolved is not None:
+            engine, sql, results = resolved
+            return answer.intent, answer.field_mapping, engine, sql, results
+        logger.info(f"生成されたSQL:\n{answer.sql}")
+        sql, results = self._generate_and_run_sql(
+            answer.field_mapping, sql=answer.sql, intent=answer.intent, query=query
+        )
+        return answer.intent, answer.field_mapping, ENGINE_BIGQUERY, sql, results
+
+    def _run_without_generation(
+        self, query: str, intent: Intent, field_mapping: FieldMappingResult
+    ) -> Optional[Tuple[str, str, List[Any]]]:
+        """
+        GPT によるSQL生成を行わずに回答できる場合は実行する
+
+        ローカルのPostgreSQLミラー、SQLテンプレートの順に試す。
+
+        Args:
+            query: 自然言語クエリ
+            intent: 抽出された意図
+            field_mapping: フィールドマッピング結果
+
+        Returns:
+            Optional[Tuple[str, str, List[Any]]]: 実行先・実行したSQL・クエリ結果
+                （いずれでも回答できない場合はNone）
+        """
+        local = self._run_local(intent, field_mapping)
+        if local is not None:
+            sql, results = local
+            return ENGINE_POSTGRES, sql, results
+        template = self._run_template(query, intent, field_mapping)
+        if template is not None:
+            sql, results = template
+            return ENGINE_BIGQUERY, sql, results
+        return None
+
+    def _run_template(
+        self, query: str, intent: Intent, field_mapping: FieldMappingResult
+    ) -> Optional[Tuple[str, List[QueryResult]]]:
+        """
+        意図に対応するSQLテンプレートがある場合はテンプレートのSQLを実行する
+
+        Args:
+            query: 自然言語クエリ
+            intent: 抽出された意図
+            field_mapping: フィールドマッピング結果
+
+        Returns:
+            Optional[Tuple[str, List[QueryResult]]]: 実行したSQLとクエリ結果
+                （テンプレートで回答できない場合はNone）
+        """
+        if self.sql_templates is None:
+            return None
+
+        with trace_span("sql_template", intent=intent.key) as span:
+            template_query = self.sql_templates.match(query, intent, field_mapping)
+            span.set_attribute("matched", template_query is not None)
+        if template_query is None:
+            return None
+        logger.info(f"SQLテンプレートで回答します: {template_query.intent_key}（集計軸: {template_query.dimension}）")
+        logger.info(f"生成されたSQL:\n{template_query.sql}")
+        return template_query.sql, run_bigquery_query(template_query.sql)
+
+    def _run_rollup(self, intent: Intent) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        日次集計テーブルで回答できる場合は集計テーブルから結果を取得する
+
+        Args:
+            intent: 抽出された意図
+
+        Returns:
+            Optional[Tuple[str, List[Dict[str, Any]]]]: 実行したSQLとクエリ結果
+                （集計テーブルで回答できない場合はNone）
+        """
+        if self.rollup_matcher is None:
+            return None
+
+        try:
+            rollup_query = self.rollup_matcher.match(intent)
+            if rollup_query is None:
+                return None
+            logger.info(f"集計テーブルで回答します: {rollup_query.intent_key}")
+            with trace_span("rollup.query", intent=rollup_query.intent_key) as span:
+                results = self.rollup_matcher.run(rollup_query)
+                span.set_attribute("rows", len(results))
+            return self.rollup_matcher.render(rollup_query), results
+        except psycopg2.Error as e:
+            logger.warning(f"集計テーブルの参照に失敗しました: {e}")
+            return None
+
+    def _run_local(
+        self, intent: Intent, field_mapping: FieldMappingResult
+    ) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        ローカルのPostgreSQLミラーで回答できる場合はSQLを生成して実行する
+
+        Args:
+            intent: 抽出された意図
+            field_mapping: フィールドマッピング結果
+
+        Returns:
+            Optional[Tuple[str, List[Dict[str, Any]]]]: 実行したSQLとクエリ結果
+                （ローカルで回答できない場合はNone）
+        """
+        if self.query_router is None:
+            return None
+
+        try:
+            decision = self.query_router.route(intent, field_mapping)
+            logger.info(f"実行先を判定: {decision.engine}（{decision.reason}）")
+            if decision.engine != ENGINE_POSTGRES:
+                return None
+
+            with trace_span("sql_generation", dialect="postgres"):
+                sql = generate_postgres_sql(
+                    field_mapping, decision.columns, decision.start_date, decision.end_date
+                )
+            logger.info(f"生成されたSQL（PostgreSQL）:\n{sql}")
+            with trace_span("postgres.query") as span:
+                results = self.query_router.run_local(sql)
+                span.set_attribute("rows", len(results))
+            return sql, results
+        except (psycopg2.Error, RuntimeError) as e:
+            logger.warning(f"ローカル実行に失敗したためBigQueryで実行します: {e}")
+            return None
+
+    def _run_cached(
+        self, cached: CachedAnswer
+    ) -> Optional[Tuple[Intent, FieldMappingResult, str, str, List[Any]]]:
+        """
+        キャッシュした意図とSQLを再利用して実行する
+
+        Args:
+            cached: 類似する過去の質問の回答
+
+        Returns:
+            Optional[Tuple[Intent, FieldMappingResult, str, str, List[Any]]]:
+                意図・フィールドマッピング結果・実行先・実行したSQL・クエリ結果
+                （キャッシュした実行先で実行できない場合はNone）
+        """
+        intent = cached.to_intent()
+        field_mapping = cached.to_field_mapping()
+        if cached.engine == ENGINE_ROLLUP:
+            rollup = self._run_rollup(intent)
+            if rollup is None:
+                return None
+            sql, results = rollup
+            return intent, field_mapping, ENGINE_ROLLUP, sql, results
+        if cached.engine == ENGINE_POSTGRES:
+            if self.query_router is None:
+                return None
+            try:
+                with trace_span("postgres.query") as span:
+                    results = self.query_router.run_local(cached.sql)
+                    span.set_attribute("rows", len(results))
+            except (psycopg2.Error, RuntimeError) as e:
+                logger.warning(f"キャッシュしたSQLのローカル実行に失敗しました: {e}")
+                return None
+            return intent, field_mapping, ENGINE_POSTGRES, cached.sql, results
+        return intent, field_mapping, ENGINE_BIGQUERY, cached.sql, run_bigquery_query(cached.sql)
 
     def analyze(self, query: str) -> Dict[str, Any]:
         """
@@ -83,51 +564,91 @@ class AnalysisService:
         Returns:
             Dict[str, Any]: 分析結果
         """
-        try:
-            # 意図の抽出
-            intent = self._extract_intent(query)
-            logger.info(f"意図を抽出: {intent}")
+        with trace_span("analyze") as root_span:
+            try:
+                # 類似する過去の質問があれば意図抽出とSQL生成を省略
+                query_vector = None
+                answer = None
+                if self.question_cache is not None or self.intent_classifier is not None:
+                    with trace_span("embedding"):
+                        query_vector = self.field_resolver.model.encode(query).tolist()
+                if self.question_cache is not None:
+                    with trace_span("question_cache.lookup") as span:
+                        cached = self.question_cache.lookup(query, query_vector)
+                        span.set_attribute("hit", cached is not None)
+                        if cached is not None:
+                            span.set_attribute("similarity", cached[1])
+                    if cached is not None:
+                        logger.info(f"類似する質問の回答を再利用します: {cached[0].question}（類似度 {cached[1]:.3f}）")
+                        answer = self._run_cached(cached[0])
 
-            # フィールドの解決
-            field_mapping = self.field_resolver.resolve_fields(query)
-            logger.info(f"フィールドを解決: {field_mapping}")
+                if answer is not None:
+                    intent, field_mapping, engine, sql, results = answer
+                else:
+                    # 例文の近傍で意図を分類できない場合は、意図・フィールド・SQLを一括生成
+                    intent = self._classify_intent(query, query_vector)
+                    combined = self._run_combined(query, query_vector) if intent is None else None
+                    if combined is not None:
+                        intent, field_mapping, engine, sql, results = combined
+                    else:
+                        # 意図の抽出
+                        if intent is None:
+                            intent = self._extract_intent(query)
+                        logger.info(f"意図を抽出: {intent}")
 
-            # SQLの生成
-            sql = generate_sql(field_mapping)
-            logger.info(f"生成されたSQL:\n{sql}")
+                        # 集計テーブルで回答できる場合はフィールド解決とSQL生成を省略
+                        rollup = self._run_rollup(intent)
+                        if rollup is not None:
+                            engine = ENGINE_ROLLUP
+                            field_mapping = FieldMappingResult(fields=[], description="")
+                            sql, results = rollup
+                        else:
+                            # フィールドの解決
+                            field_mapping = self.field_resolver.resolve_fields(query, query_vector=query_vector)
+                            logger.info(f"フィールドを解決: {field_mapping}")
 
-            # クエリの実行
-            results = run_bigquery_query(sql)
-            logger.info(f"クエリを実行: {len(results)}件の結果")
+                            # SQLの生成と実行（ローカルでもテンプレートでも回答できない場合はGPTでSQLを生成）
+                            resolved = self._run_without_generation(query, intent, field_mapping)
+                            if resolved is not None:
+                                engine, sql, results = resolved
+                            else:
+                                engine = ENGINE_BIGQUERY
+                                sql, results = self._generate_and_run_sql(field_mapping, intent=intent, query=query)
 
-            # 結果を辞書に変換
-            results_dict = []
-            for r in results:
-                if isinstance(r, QueryResult):
-                    # values辞書をそのまま使用
-                    results_dict.append(r.values)
-                else:
-                    # 辞書の場合はそのまま使用
-                    results_dict.append(r)
-
-            return {
-                "query": query,
-                "intent": {
-                    "key": intent.key,
-                    "description": intent.description,
-                    "parameters": intent.parameters
-                },
-                "fields": {
-                    "fields": [{"name": f.name, "type": f.type} for f in field_mapping.fields],
-                    "description": field_mapping.description
-                },
-                "sql": sql,
-                "results": results_dict
-            }
-
-        except Exception as e:
-            logger.error(f"分析中にエラーが発生: {str(e)}")
-            logger.error(f"エラーの詳細: {type(e).__name__}: {str(e)}")
-            import traceback
-            logger.error(f"スタックトレース:\n{traceback.format_exc()}")
-            raise 
\ No newline at end of file
+                    if self.question_cache is not None:
+                        self.question_cache.put(query, query_vector, intent, field_mapping, sql, engine)
+                logger.info(f"クエリを実行: {len(results)}件の結果")
+                root_span.set_attributes({"intent": intent.key, "engine": engine, "rows": len(results)})
+
+                # 結果を辞書に変換
+                results_dict = []
+                for r in results:
+                    if isinstance(r, QueryResult):
+                        # values辞書をそのまま使用
+                        results_dict.append(r.values)
+                    else:
+                        # 辞書の場合はそのまま使用
+                        results_dict.append(r)
+
+                return {
+                    "query": query,
+                    "intent": {
+                        "key": intent.key,
+                        "description": intent.description,
+                        "parameters": intent.parameters
+                    },
+                    "fields": {
+                        "fields": [{"name": f.name, "type": f.type} for f in field_mapping.fields],
+                        "description": field_mapping.description
+                    },
+                    "sql": sql,
+                    "engine": engine,
+                    "results": results_dict
+                }
+
+            except Exception as e:
+                logger.error(f"分析中にエラーが発生: {str(e)}")
+                logger.error(f"エラーの詳細: {type(e).__name__}: {str(e)}")
+                import traceback
+                logger.error(f"スタックトレース:\n{traceback.format_exc()}")
+                raise 
\ No newline at end of file
@@ -0,0 +1,316 @@
+"""
+質問単位のセマンティックキャッシュ
+
+言い換えの質問（「先週のPV数」と「過去7日間のページビュー」など）で意図抽出とSQL生成の
+LLM 呼び出しを繰り返さないよう、質問の埋め込みと、抽出した意図・フィールド・生成したSQLを保存し、
+類似度がしきい値以上の過去の質問があればその結果を再利用する。
+
+「過去7日」と「過去30日」、「先週」と「先月」のように期間だけが異なる質問は埋め込みが近くなるため、
+質問の期間（時間範囲に変換した日付範囲。時間範囲にならない「今月」などはその表現）と、期間以外に
+含まれる数値が一致しない場合は再利用しない。「先週」と「過去7日間」は同じ期間として扱う。
+生成したSQLには日付が含まれることがあるため、エントリは ttl_seconds を過ぎると使用しない。
+再利用回数と最終利用時刻はメモリ上で更新し、ファイルへの書き込みは flush_interval_seconds ごとの
+put とプロセスの終了時にまとめて行う（書き込みは一時ファイルからの置き換え）。
+
+設定例（settings.json）:
+    "question_cache": {
+        "enabled": true,
+        "path": ".cache/questions/questions.json",
+        "similarity_threshold": 0.92,
+        "max_entries": 1000,
+        "ttl_seconds": 86400,
+        "flush_interval_seconds": 60
+    }
+"""
+
+import atexit
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..time_range import calendar_phrases, parse_time_phrase, parse_time_range, remove_time_phrases
+from ...types import Field, FieldMappingResult, Intent
+
+logger = logging.getLogger(__name__)
+
+_NUMBER_PATTERN = re.compile(r"\d+")
+
+
+def normalize_question(question: str) -> str:
+    """
+    比較用に質問を正規化する（全角英数字を半角にし、空白を除き、小文字化する）
+
+    Args:
+        question: 質問
+
+    Returns:
+        str: 正規化した質問
+    """
+    return "".join(unicodedata.normalize("NFKC", question).lower().split())
+
+
+def _question_scope(question: str) -> Tuple[Any, ...]:
+    """
+    再利用の可否の判定に使う質問の期間と数値を返す
+
+    Args:
+        question: 質問
+
+    Returns:
+        Tuple[Any, ...]: 期間（日付範囲、またはカレンダー上の期間の表現）と、期間の表現以外に含まれる数値
+    """
+    time_range = parse_time_phrase(question)
+    period: Any = parse_time_range(time_range) if time_range else tuple(calendar_phrases(question))
+    return period, _NUMBER_PATTERN.findall(normalize_question(remove_time_phrases(question)))
+
+
+@dataclass
+class CachedAnswer:
+    """
+    キャッシュした質問と回答の生成結果
+    """
+    question: str  # 質問
+    vector: List[float]  # 質問の埋め込み（正規化済み）
+    intent: Dict[str, Any]  # 抽出した意図（key・description・parameters）
+    fields: List[Dict[str, str]]  # 解決したフィールド（name・type）
+    description: str  # フィールドの説明
+    sql: str  # 実行したSQL
+    engine: str  # 実行先（bigquery・postgres・rollup）
+    created_at: float = field(default_factory=time.time)  # 作成時刻（エポック秒）
+    hits: int = 0  # 再利用された回数
+    last_used_at: float = 0.0  # 最後に再利用された時刻（エポック秒、再利用されていない場合は0）
+
+    def to_intent(self) -> Intent:
+        return Intent(
+            key=self.intent["key"],
+            description=self.intent["description"],
+            parameters=self.intent["parameters"],
+        )
+
+    def to_field_mapping(self) -> FieldMappingResult:
+        return FieldMappingResult(
+            fields=[Field(name=f["name"], type=f["type"]) for f in self.fields],
+            description=self.description,
+        )
+
+
+class QuestionCache:
+    """
+    質問の埋め込みで過去の回答を検索するキャッシュ
+
+    エントリは数百〜数千件程度のため、JSON ファイルに保存し、正規化したベクトルの内積で全件を比較する。
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        model_name: str,
+        similarity_threshold: float = 0.92,
+        max_entries: int = 1000,
+        ttl_seconds: int = 86400,
+        flush_interval_seconds: float = 60.0,
+    ):
+        """
+        Args:
+            path: キャッシュファイルのパス
+            model_name: 埋め込みに使用するモデル名（異なるモデルのエントリは破棄する）
+            similarity_threshold: 再利用するコサイン類似度の下限
+            max_entries: 保存するエントリの最大数（超えた分は再利用の少ない、最近使われていないものから削除）
+            ttl_seconds: エントリを再利用する秒数
+            flush_interval_seconds: put でファイルに書き込む最短の間隔（秒）
+        """
+        self.path = path
+        self.model_name = model_name
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.flush_interval_seconds = flush_interval_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: Optional[List[CachedAnswer]] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._dirty = False
+        self._last_saved: Optional[float] = None
+        self._flush_registered = False
+
+    @classmethod
+    def from_settings(cls, cache_settings: Dict[str, Any], model_name: str) -> "QuestionCache":
+        """
+        設定からキャッシュを生成する
+
+        Args:
+            cache_settings: settings.json の question_cache セクション
+            model_name: 埋め込みに使用するモデル名
+
+        Returns:
+            QuestionCache: キャッシュ
+        """
+        return cls(
+            path=Path(cache_settings["path"]),
+            model_name=model_name,
+            similarity_threshold=float(cache_settings.get("similarity_threshold", 0.92)),
+            max_entries=int(cache_settings.get("max_entries", 1000)),
+            ttl_seconds=int(cache_settings.get("ttl_seconds", 86400)),
+            flush_interval_seconds=float(cache_settings.get("flush_interval_seconds", 60)),
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        """このプロセスでの検索のヒット率"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _load(self) -> List[CachedAnswer]:
+        """キャッシュファイルを読み込む（初回のみ）"""
+        if self._entries is not None:
+            return self._entries
+        self._entries = []
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored.get("model_name") == self.model_name:
+                self._entries = [CachedAnswer(**entry) for entry in stored["entries"]]
+            else:
+                logger.info("埋め込みモデルが変わったため質問キャッシュを破棄します")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"質問キャッシュの読み込みに失敗しました: {self.path}: {e}")
+        self._matrix = None
+        return self._entries
+
+    def _save(self) -> None:
+        """一時ファイル経由でキャッシュファイルを書き込む"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "model_name": self.model_name,
+            "entries": [asdict(entry) for entry in self._entries or []],
+        }
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"質問キャッシュの書き込みに失敗しました: {self.path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+        self._dirty = False
+        self._last_saved = time.monotonic()
+
+    def _mark_dirty(self) -> None:
+        """未保存の変更があることを記録する（プロセスの終了時に書き込まれる）"""
+        self._dirty = True
+        if not self._flush_registered:
+            atexit.register(self.flush)
+            self._flush_registered = True
+
+    def flush(self) -> None:
+        """未保存の変更（追加したエントリ・再利用回数）をキャッシュファイルに書き込む"""
+        if self._dirty:
+            self._save()
+
+    def _vectors(self) -> np.ndarray:
+        """エントリのベクトルを (件数, 次元数) の配列として返す"""
+        if self._matrix is None:
+            entries = self._load()
+            self._matrix = (
+                np.asarray([entry.vector for entry in entries], dtype=np.float32)
+                if entries else np.zeros((0, 0), dtype=np.float32)
+            )
+        return self._matrix
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(self, question: str, vector: Sequence[float]) -> Optional[Tuple[CachedAnswer, float]]:
+        """
+        類似する過去の質問を検索する
+
+        Args:
+            question: 質問
+            vector: 質問の埋め込み
+
+        Returns:
+            Optional[Tuple[CachedAnswer, float]]: 再利用できる回答と類似度（ない場合はNone）
+        """
+        entries = self._load()
+        matrix = self._vectors()
+        query = self._normalize(vector)
+        if entries and matrix.shape[1] == query.shape[0]:
+            scores = matrix @ query
+            now = time.time()
+            scope = _question_scope(question)
+            for index in np.argsort(-scores, kind="stable"):
+                similarity = float(scores[index])
+                if similarity < self.similarity_threshold:
+                    break
+                entry = entries[index]
+                if now - entry.created_at > self.ttl_seconds or _question_scope(entry.question) != scope:
+                    continue
+                entry.hits += 1
+                entry.last_used_at = now
+                self.hits += 1
+                self._mark_dirty()
+                return entry, similarity
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        question: str,
+        vector: Sequence[float],
+        intent: Intent,
+        field_mapping: FieldMappingResult,
+        sql: str,
+        engine: str,
+    ) -> None:
+        """
+        質問と回答の生成結果を保存する
+
+        同じ質問（正規化後）のエントリは置き換え、期限切れのエントリは削除する。
+        ファイルへの書き込みは前回の書き込みから flush_interval_seconds 以上経過した場合のみ行う。
+
+        Args:
+            question: 質問
+            vector: 質問の埋め込み
+            intent: 抽出した意図
+            field_mapping: 解決したフィールド
+            sql: 実行したSQL
+            engine: 実行先
+        """
+        now = time.time()
+        key = normalize_question(question)
+        entries = [
+            entry for entry in self._load()
+            if normalize_question(entry.question) != key and now - entry.created_at <= self.ttl_seconds
+        ]
+        entries.append(CachedAnswer(
+            question=question,
+            vector=self._normalize(vector).tolist(),
+            intent={"key": intent.key, "description": intent.description, "parameters": intent.parameters},
+            fields=[{"name": f.name, "type": f.type} for f in field_mapping.fields],
+            description=field_mapping.description,
+            sql=sql,
+            engine=engine,
+            created_at=now,
+        ))
+        if len(entries) > self.max_entries:
+            # 再利用の少ない、最近使われていないエントリから削除する
+            entries.sort(
+                key=lambda entry: (entry.hits, max(entry.last_used_at, entry.created_at)), reverse=True
+            )
+            entries = sorted(entries[:self.max_entries], key=lambda entry: entry.created_at)
+        self._entries = entries
+        self._matrix = None
+        self._mark_dirty()
+        if self._last_saved is None or time.monotonic() - self._last_saved >= self.flush_interval_seconds:
+            self._save()
@@ -0,0 +1,146 @@
+"""
+分析意図を日次集計テーブルへのクエリに対応付けるモジュール
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from ..database import PostgresConnection
+from ..time_range import parse_time_range
+from ...types import Intent
+
+logger = logging.getLogger(__name__)
+
+ENGINE_ROLLUP = "rollup"
+
+# 意図のキーごとの集計テーブルへのクエリ
+_ROLLUP_QUERIES = {
+    "user_count": """
+        SELECT event_date, user_count, session_count
+        FROM daily_session_rollup
+        WHERE event_date BETWEEN %(start_date)s AND %(end_date)s
+        ORDER BY event_date
+    """,
+    "page_view": """
+        SELECT event_date, SUM(event_count) AS page_view_count
+        FROM daily_event_rollup
+        WHERE event_name = 'page_view'
+        AND event_date BETWEEN %(start_date)s AND %(end_date)s
+        GROUP BY event_date
+        ORDER BY event_date
+    """,
+    "event_count": """
+        SELECT event_date, event_name, SUM(event_count) AS event_count
+        FROM daily_event_rollup
+        WHERE event_date BETWEEN %(start_date)s AND %(end_date)s
+        GROUP BY event_date, event_name
+        ORDER BY event_date, event_name
+    """,
+}
+
+# 絞り込み条件を表すパラメータ（いずれかが指定されていれば集計テーブルでは回答しない）
+_FILTER_PARAMETERS = ("conditions", "other_params")
+
+
+@dataclass
+class RollupQuery:
+    """
+    集計テーブルへのクエリ
+    """
+    intent_key: str  # 対応する意図のキー
+    sql: str  # SQL
+    params: Dict[str, Any]  # クエリパラメータ
+
+
+class RollupMatcher:
+    """分析意図を日次集計テーブルへのクエリに対応付けるクラス"""
+
+    def __init__(self, pg_conn: PostgresConnection):
+        """
+        Args:
+            pg_conn: PostgreSQL接続
+        """
+        self.pg_conn = pg_conn
+
+    def match(self, intent: Intent) -> Optional[RollupQuery]:
+        """
+        意図が集計テーブルで回答できる場合はクエリを返す
+
+        Args:
+            intent: 抽出された意図
+
+        Returns:
+            Optional[RollupQuery]: 集計テーブルへのクエリ（回答できない場合はNone）
+        """
+        sql = _ROLLUP_QUERIES.get(intent.key)
+        if sql is None:
+            return None
+
+        if any(intent.parameters.get(name) for name in _FILTER_PARAMETERS):
+            logger.debug(f"絞り込み条件があるため集計テーブルは使用しません: {intent.parameters}")
+            return None
+
+        date_range = parse_time_range(intent.parameters.get("time_range"))
+        if date_range is None:
+            return None
+
+        start_date, end_date = date_range
+        if not self._is_covered(start_date, end_date):
+            logger.debug(f"{start_date}〜{end_date} の集計が揃っていません")
+            return None
+
+        return RollupQuery(
+            intent_key=intent.key,
+            sql=sql,
+            params={"start_date": start_date, "end_date": end_date},
+        )
+
+    def run(self, rollup_query: RollupQuery) -> List[Dict[str, Any]]:
+        """
+        集計テーブルへのクエリを実行する
+
+        Args:
+            rollup_query: 集計テーブルへのクエリ
+
+        Returns:
+            List[Dict[str, Any]]: クエリ結果
+        """
+        rows = self.pg_conn.execute_query(rollup_query.sql, rollup_query.params)
+        return [dict(row) for row in rows]
+
+    def render(self, rollup_query: RollupQuery) -> str:
+        """
+        パラメータを埋め込んだ表示用のSQLを返す
+
+        Args:
+            rollup_query: 集計テーブルへのクエリ
+
+        Returns:
+            str: SQL文字列
+        """
+        with self.pg_conn.connection.cursor() as cursor:
+            return cursor.mogrify(rollup_query.sql, rollup_query.params).decode("utf-8")
+
+    def _is_covered(self, start_date: date, end_date: date) -> bool:
+        """
+        期間内の全日付の集計が存在するか確認する
+
+        Args:
+            start_date: 開始日
+            end_date: 終了日
+
+        Returns:
+            bool: 全日付の集計が存在する場合はTrue
+        """
+        query = """
+            SELECT COUNT(*) AS days
+            FROM daily_session_rollup
+            WHERE event_date BETWEEN %(start_date)s AND %(end_date)s
+        """
+        result = self.pg_conn.execute_query(
+            query, {"start_date": start_date, "end_date": end_date}
+        )
+        expected_days = (end_date - start_date).days + 1
+        return bool(result) and result[0]["days"] >= expected_days
@@ -0,0 +1,258 @@
+"""
+意図・フィールド・SQLの一括生成
+
+意図抽出（Gemini）とSQL生成（GPT）の2回の LLM 呼び出しを、JSON スキーマで応答の形式を指定した
+1回の GPT 呼び出しにまとめる。フィールドは埋め込み検索で解決した候補から選ばせ、
+応答はローカルで検証して、問題があれば問題点を伝えて1回だけ再生成する。
+
+response_format には、構造化出力（json_schema）に対応したモデルでは "json_schema" を、
+対応していないモデルでは "json_object" を指定する（スキーマはプロンプトにも記載する）。
+
+設定例（settings.json）:
+    "combined_generation": {
+        "enabled": true,
+        "response_format": "json_object",
+        "max_repairs": 1
+    }
+"""
+
+import json
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from .intent_classifier import INTENT_DESCRIPTIONS
+from .llm import call_gpt
+from .llm_response import intent_from_dict, parse_json_response, strip_code_fence
+from .sql_generator import BIGQUERY_SQL_RULES
+from .tracing import trace_span
+from ..types import Field, FieldMappingResult, Intent
+
+logger = logging.getLogger(__name__)
+
+# 応答のJSONスキーマ
+COMBINED_RESPONSE_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "intent": {
+            "type": "object",
+            "properties": {
+                "key": {"type": "string", "enum": list(INTENT_DESCRIPTIONS)},
+                "description": {"type": "string"},
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "time_range": {"type": "string"},
+                        "other_params": {"type": "string"},
+                    },
+                    "required": ["time_range", "other_params"],
+                    "additionalProperties": False,
+                },
+            },
+            "required": ["key", "description", "parameters"],
+            "additionalProperties": False,
+        },
+        "fields": {"type": "array", "items": {"type": "string"}},
+        "sql": {"type": "string"},
+    },
+    "required": ["intent", "fields", "sql"],
+    "additionalProperties": False,
+}
+
+_SELECT_PATTERN = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+
+class CombinedResponseError(ValueError):
+    """一括生成の応答が不正な場合のエラー"""
+
+
+@dataclass
+class CombinedAnswer:
+    """
+    一括生成の結果
+    """
+    intent: Intent  # 意図
+    field_mapping: FieldMappingResult  # 選択されたフィールド
+    sql: str  # SQL
+
+
+class CombinedGenerator:
+    """1回の GPT 呼び出しで意図・フィールド・SQLを生成するクラス"""
+
+    def __init__(self, table: str, response_format: str = "json_schema", max_repairs: int = 1):
+        """
+        Args:
+            table: SQLで参照するテーブル（project.dataset.events_*）
+            response_format: 応答の形式（json_schema または json_object）
+            max_repairs: 応答が不正な場合に再生成する最大回数
+        """
+        if response_format not in ("json_schema", "json_object"):
+            raise ValueError(f"対応していない応答の形式です: {response_format}")
+        self.table = table
+        self.response_format = response_format
+        self.max_repairs = max_repairs
+
+    @classmethod
+    def from_settings(
+        cls, combined_settings: Dict[str, Any], bigquery_settings: Dict[str, Any]
+    ) -> "CombinedGenerator":
+        """
+        設定から生成器を作成する
+
+        Args:
+            combined_settings: settings.json の combined_generation セクション
+            bigquery_settings: settings.json の bigquery セクション
+
+        Returns:
+            CombinedGenerator: 生成器
+        """
+        return cls(
+            table=f"{bigquery_settings['project_id']}.{bigquery_settings['dataset_id']}.events_*",
+            response_format=combined_settings.get("response_format", "json_schema"),
+            max_repairs=int(combined_settings.get("max_repairs", 1)),
+        )
+
+    def _response_format(self) -> Dict[str, Any]:
+        """call_gpt に渡す response_format を作成する"""
+        if self.response_format == "json_object":
+            return {"type": "json_object"}
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": "analysis", "strict": True, "schema": COMBINED_RESPONSE_SCHEMA},
+        }
+
+    def build_prompt(self, question: str, candidates: FieldMappingResult) -> str:
+        """
+        一括生成のプロンプトを作成する
+
+        Args:
+            question: 自然言語の質問
+            candidates: 埋め込み検索で解決したフィールドの候補
+
+        Returns:
+            str: プロンプト
+        """
+        fields_info = "\n".join(f"- {field.name} ({field.type})" for field in candidates.fields)
+        intents_info = "\n".join(f"- {key}: {description}" for key, description in INTENT_DESCRIPTIONS.items())
+        return f"""あなたはBigQueryとGA4構造に精通したデータアナリストです。
+
+        以下の質問について、分析意図の抽出、使用するフィールドの選択、Google Analytics 4（GA4）の
+        BigQuery連携テーブルに対するSQLの生成をまとめて行い、JSONで返してください。
+
+        # 質問
+        {question}
+
+        # 出力形式（このJSONスキーマに従うJSONオブジェクトのみを返すこと）
+        {json.dumps(COMBINED_RESPONSE_SCHEMA, ensure_ascii=False)}
+
+        - intent.key は以下のいずれか
+        {intents_info}
+        - intent.parameters.time_range は時間範囲（例：7d, 30d, 1y）、other_params は絞り込み条件などその他のパラメータ（なければ空文字）
+        - fields はフィールドの候補から質問に必要なものを1つ以上選び、候補のフィールド名をそのまま記載すること
+        - sql にはSQL文のみを記載すること
+
+        {BIGQUERY_SQL_RULES}
+
+        ※ SQLの要件の「SQL文のみを出力」は sql の値に適用し、応答全体は出力形式のJSONとすること
+
+        # フィールドの候補
+        {fields_info}
+        """
+
+    def parse(self, response: str, candidates: FieldMappingResult) -> CombinedAnswer:
+        """
+        応答を解析して検証する
+
+        Args:
+            response: GPTの応答
+            candidates: プロンプトで提示したフィールドの候補
+
+        Returns:
+            CombinedAnswer: 一括生成の結果
+
+        Raises:
+            CombinedResponseError: 応答が不正な場合（メッセージに問題点を列挙する）
+        """
+        try:
+            data = parse_json_response(response)
+        except ValueError as e:
+            raise CombinedResponseError(str(e)) from e
+
+        problems: List[str] = []
+        intent = None
+        try:
+            intent = intent_from_dict(data.get("intent") or {})
+            if intent.key not in INTENT_DESCRIPTIONS:
+                problems.append(f"intent.key が不正です: {intent.key}")
+        except ValueError as e:
+            problems.append(str(e))
+
+        field_types = {field.name: field.type for field in candidates.fields}
+        names = data.get("fields")
+        if not isinstance(names, list) or not names:
+            problems.append("fields にフィールドが1つもありません")
+            names = []
+        unknown = [name for name in names if not isinstance(name, str) or name not in field_types]
+        if unknown:
+            problems.append(f"候補にないフィールドが選択されています: {', '.join(map(str, unknown))}")
+
+        sql = data.get("sql")
+        if not isinstance(sql, str) or not sql.strip():
+            problems.append("sql が空です")
+        else:
+            sql = strip_code_fence(sql)
+            if not _SELECT_PATTERN.match(sql):
+                problems.append("SQLが SELECT または WITH で始まっていません")
+            if self.table not in sql:
+                problems.append(f"テーブル名がフルパス（{self.table}）で指定されていません")
+            if "_table_suffix" not in sql.lower():
+                problems.append("_TABLE_SUFFIX による日付の絞り込みがありません")
+
+        if problems:
+            raise CombinedResponseError("\n".join(problems))
+        return CombinedAnswer(
+            intent=intent,
+            field_mapping=FieldMappingResult(
+                fields=[Field(name=name, type=field_types[name]) for name in names],
+                description=candidates.description,
+            ),
+            sql=sql,
+        )
+
+    def generate(self, question: str, candidates: FieldMappingResult) -> CombinedAnswer:
+        """
+        意図・フィールド・SQLを生成する
+
+        応答が不正な場合は問題点と前回の応答をプロンプトに加えて再生成する。
+
+        Args:
+            question: 自然言語の質問
+            candidates: 埋め込み検索で解決したフィールドの候補
+
+        Returns:
+            CombinedAnswer: 一括生成の結果
+
+        Raises:
+            CombinedResponseError: 再生成しても応答が不正な場合
+        """
+        prompt = self.build_prompt(question, candidates)
+        feedback = ""
+        for attempt in range(self.max_repairs + 1):
+            with trace_span("combined_generation", attempt=attempt) as span:
+                response = call_gpt(prompt + feedback, response_format=self._response_format())
+                try:
+                    return self.parse(response, candidates)
+                except CombinedResponseError as e:
+                    span.set_attribute("valid", False)
+                    if attempt >= self.max_repairs:
+                        logger.error(f"一括生成の応答が不正です: {e}")
+                        raise
+                    logger.warning(f"一括生成の応答が不正なため再生成します: {e}")
+                    feedback = f"""
+        # 前回の応答の問題点（必ず修正すること）
+        {e}
+
+        # 前回の応答
+        {response}
+        """
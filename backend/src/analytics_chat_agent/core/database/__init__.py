@@ -5,9 +5,12 @@
 from .base import DatabaseConnection
 from .bigquery import BigQueryConnection
 from .postgres import PostgresConnection
+from .postgres_pool import PooledPostgresConnection, PoolStats
 
 __all__ = [
     "DatabaseConnection",
     "BigQueryConnection",
     "PostgresConnection",
+    "PooledPostgresConnection",
+    "PoolStats",
 ] 
\ No newline at end of file
@@ -4,14 +4,21 @@ PostgreSQL接続管理
 
 import os
 import logging
-from typing import Any, Dict, Optional
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Sequence
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 
 from .base import DatabaseConnection
 
 logger = logging.getLogger(__name__)
 
+# iter_query が返す行の形式
+ROW_FORMAT_DICT = "dict"  # 1行ずつ辞書
+ROW_FORMAT_TUPLE = "tuple"  # 1行ずつタプル
+ROW_FORMAT_COLUMNAR = "columnar"  # itersize 行ごとに カラム名 → 値のリスト
+ROW_FORMATS = (ROW_FORMAT_DICT, ROW_FORMAT_TUPLE, ROW_FORMAT_COLUMNAR)
+
 class PostgresConnection(DatabaseConnection):
     """PostgreSQL接続管理クラス"""
 
@@ -22,14 +29,23 @@ class PostgresConnection(DatabaseConnection):
         Returns:
             psycopg2.extensions.connection: PostgreSQL接続
         """
-        return psycopg2.connect(
-            host=self.settings["host"],
-            port=self.settings["port"],
-            dbname=self.settings["database"],
-            user=self.settings["user"],
-            password=os.getenv("POSTGRES_PASSWORD"),
-            cursor_factory=RealDictCursor
-        )
+        return psycopg2.connect(**self._connection_params())
+
+    def _connection_params(self) -> Dict[str, Any]:
+        """
+        psycopg2.connect に渡す接続パラメータを取得
+
+        Returns:
+            Dict[str, Any]: 接続パラメータ
+        """
+        return {
+            "host": self.settings["host"],
+            "port": self.settings["port"],
+            "dbname": self.settings["database"],
+            "user": self.settings["user"],
+            "password": os.getenv("POSTGRES_PASSWORD"),
+            "cursor_factory": RealDictCursor,
+        }
 
     def close(self) -> None:
         """PostgreSQL接続を閉じる"""
@@ -95,4 +111,102 @@ class PostgresConnection(DatabaseConnection):
             if params_list:
                 logger.error(f"パラメータ: {params_list[0]}")  # 最初のパラメータのみ出力
             # エラーをそのまま伝播
-            raise 
\ No newline at end of file
+            raise
+
+    def insert_rows(
+        self,
+        table: str,
+        columns: Sequence[str],
+        rows: Sequence[Sequence[Any]],
+        page_size: int = 1000,
+    ) -> None:
+        """
+        複数行を一括で挿入（1文に複数行をまとめて送信する）
+
+        Args:
+            table: 挿入先のテーブル名
+            columns: カラム名（各行の値の並び）
+            rows: 挿入する行（タプルまたはリスト）
+            page_size: 1文にまとめる行数
+
+        Raises:
+            psycopg2.Error: PostgreSQLエラーが発生した場合
+        """
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s"
+        try:
+            with self.connection.cursor() as cursor:
+                execute_values(cursor, query, rows, page_size=page_size)
+                self.connection.commit()
+        except psycopg2.Error as e:
+            # エラー情報をログに出力
+            logger.error("PostgreSQLエラーが発生しました:")
+            logger.error(f"エラー: {str(e)}")
+            logger.error(f"エラーコード: {e.pgcode}")
+            logger.error(f"エラーメッセージ: {e.pgerror}")
+            logger.error(f"クエリ: {query}")
+            if rows:
+                logger.error(f"パラメータ: {rows[0]}")  # 最初の行のみ出力
+            # エラーをそのまま伝播
+            raise
+
+    def iter_query(
+        self,
+        query: str,
+        params: Optional[Dict[str, Any]] = None,
+        itersize: int = 2000,
+        row_format: str = ROW_FORMAT_DICT,
+    ) -> Iterator[Any]:
+        """
+        SELECT文の結果をサーバーサイドカーソルで少しずつ取得する
+
+        結果全体をクライアントに読み込まず、itersize 行ずつサーバーから取得するため、
+        大きな結果でもメモリ使用量は itersize 行分に収まる。
+        カーソルは現在のトランザクション内で宣言され、取得の終了時（途中で止めた場合も含む）に閉じる。
+        トランザクションのコミット・ロールバックは呼び出し元に任せる。
+
+        Args:
+            query: 実行するSQLクエリ（SELECT文）
+            params: クエリパラメータ
+            itersize: 1回のラウンドトリップで取得する行数
+            row_format: 行の形式（dict: 辞書、tuple: タプル、columnar: itersize 行ごとの カラム名 → 値のリスト）
+
+        Yields:
+            Any: 行（columnar の場合は Dict[str, List[Any]] のバッチ）
+
+        Raises:
+            ValueError: 未知の行の形式が指定された場合
+            psycopg2.Error: PostgreSQLエラーが発生した場合
+        """
+        if row_format not in ROW_FORMATS:
+            raise ValueError(f"未知の行の形式です: {row_format}")
+
+        cursor_factory = RealDictCursor if row_format == ROW_FORMAT_DICT else psycopg2.extensions.cursor
+        cursor_name = f"iter_{uuid.uuid4().hex}"
+        try:
+            with self.connection.cursor(name=cursor_name, cursor_factory=cursor_factory) as cursor:
+                cursor.itersize = itersize
+                cursor.execute(query, params)
+                if row_format != ROW_FORMAT_COLUMNAR:
+                    yield from cursor
+                    return
+
+                columns: Optional[List[str]] = None
+                while True:
+                    rows = cursor.fetchmany(itersize)
+                    if not rows:
+                        break
+                    # 名前付きカーソルでは最初の取得後に description が設定される
+                    if columns is None:
+                        columns = [column[0] for column in cursor.description]
+                    yield {name: [row[i] for row in rows] for i, name in enumerate(columns)}
+        except psycopg2.Error as e:
+            # エラー情報をログに出力
+            logger.error("PostgreSQLエラーが発生しました:")
+            logger.error(f"エラー: {str(e)}")
+            logger.error(f"エラーコード: {e.pgcode}")
+            logger.error(f"エラーメッセージ: {e.pgerror}")
+            logger.error(f"クエリ: {query}")
+            if params:
+                logger.error(f"パラメータ: {params}")
+            # エラーをそのまま伝播
+            raise
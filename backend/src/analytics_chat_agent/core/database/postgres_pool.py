@@ -0,0 +1,260 @@
+"""
+PostgreSQLのコネクションプール
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator
+
+import psycopg2
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+from .postgres import PostgresConnection
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PoolStats:
+    """
+    コネクションプールの統計情報
+    """
+    max_size: int  # プールの最大接続数
+    in_use: int  # 使用中の接続数
+    peak_in_use: int  # 同時使用数の最大値
+    checkouts: int  # 取り出し回数
+    waits: int  # 空き接続を待った回数
+    total_wait_seconds: float  # 待ち時間の合計（秒）
+    max_wait_seconds: float  # 待ち時間の最大値（秒）
+    discarded: int  # ヘルスチェックで破棄した接続数
+
+
+class PooledPostgresConnection(PostgresConnection):
+    """
+    スレッドセーフなPostgreSQL接続管理クラス
+
+    ThreadedConnectionPool から接続を取り出し、スレッドごとに割り当てる。
+    `connection` はそのスレッドに割り当てられた接続を返すため、
+    `execute_query` などは PostgresConnection と同じように使用できる。
+    """
+
+    def __init__(self, settings: Dict[str, Any]):
+        """
+        Args:
+            settings: データベース接続設定（pool セクションでプールを設定）
+        """
+        super().__init__(settings)
+        pool_settings = settings.get("pool", {})
+        self.min_size = pool_settings.get("min_size", 1)
+        self.max_size = pool_settings.get("max_size", 8)
+        self.checkout_timeout = pool_settings.get("checkout_timeout_seconds", 30)
+        self.health_check_interval = pool_settings.get("health_check_interval_seconds", 30)
+
+        self._semaphore = threading.BoundedSemaphore(self.max_size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._last_used: Dict[int, float] = {}
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._total_wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._discarded = 0
+
+    def _connect(self) -> ThreadedConnectionPool:
+        """
+        コネクションプールを作成
+
+        Returns:
+            ThreadedConnectionPool: コネクションプール
+        """
+        return ThreadedConnectionPool(
+            self.min_size, self.max_size, **self._connection_params()
+        )
+
+    @property
+    def pool(self) -> ThreadedConnectionPool:
+        """コネクションプールを取得"""
+        if self._connection is None:
+            with self._lock:
+                if self._connection is None:
+                    self._connection = self._connect()
+        return self._connection
+
+    @property
+    def connection(self) -> psycopg2.extensions.connection:
+        """現在のスレッドに割り当てられた接続を取得（未割り当ての場合はプールから取り出す）"""
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            conn = self._acquire()
+            self._local.connection = conn
+        return conn
+
+    @contextmanager
+    def checkout(self) -> Iterator[psycopg2.extensions.connection]:
+        """
+        プールから接続を取り出し、ブロックを抜けたときに返却する
+
+        ブロック内では `execute_query` などもこの接続を使用する。
+        すでに現在のスレッドに接続が割り当てられている場合はその接続を使用する。
+
+        Yields:
+            psycopg2.extensions.connection: PostgreSQL接続
+        """
+        conn = getattr(self._local, "connection", None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self._acquire()
+        self._local.connection = conn
+        try:
+            yield conn
+        finally:
+            self._local.connection = None
+            self._release(conn)
+
+    def release(self) -> None:
+        """現在のスレッドに割り当てられた接続をプールに返却"""
+        conn = getattr(self._local, "connection", None)
+        if conn is not None:
+            self._local.connection = None
+            self._release(conn)
+
+    def close(self) -> None:
+        """プールのすべての接続を閉じる"""
+        self._local = threading.local()
+        if self._connection is not None:
+            self._connection.closeall()
+            self._connection = None
+
+    def stats(self) -> PoolStats:
+        """
+        コネクションプールの統計情報を取得
+
+        Returns:
+            PoolStats: 統計情報
+        """
+        with self._lock:
+            return PoolStats(
+                max_size=self.max_size,
+                in_use=self._in_use,
+                peak_in_use=self._peak_in_use,
+                checkouts=self._checkouts,
+                waits=self._waits,
+                total_wait_seconds=self._total_wait_seconds,
+                max_wait_seconds=self._max_wait_seconds,
+                discarded=self._discarded,
+            )
+
+    def _acquire(self) -> psycopg2.extensions.connection:
+        """
+        空き接続を待ってプールから取り出す
+
+        Returns:
+            psycopg2.extensions.connection: ヘルスチェック済みの接続
+
+        Raises:
+            PoolError: タイムアウトまでに空き接続がなかった場合
+        """
+        pool = self.pool
+        start = time.monotonic()
+        waited = not self._semaphore.acquire(blocking=False)
+        if waited and not self._semaphore.acquire(timeout=self.checkout_timeout):
+            raise PoolError(
+                f"{self.checkout_timeout}秒以内に空き接続を取得できませんでした"
+                f"（最大接続数: {self.max_size}）"
+            )
+        wait_seconds = time.monotonic() - start
+
+        try:
+            conn = self._get_healthy_connection(pool)
+        except Exception:
+            self._semaphore.release()
+            raise
+
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+            if waited:
+                self._waits += 1
+                self._total_wait_seconds += wait_seconds
+                self._max_wait_seconds = max(self._max_wait_seconds, wait_seconds)
+        return conn
+
+    def _get_healthy_connection(
+        self, pool: ThreadedConnectionPool
+    ) -> psycopg2.extensions.connection:
+        """
+        ヘルスチェックに通る接続をプールから取り出す
+
+        Args:
+            pool: コネクションプール
+
+        Returns:
+            psycopg2.extensions.connection: PostgreSQL接続
+
+        Raises:
+            psycopg2.OperationalError: 正常な接続を取得できなかった場合
+        """
+        for _ in range(self.max_size + 1):
+            conn = pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            logger.warning("ヘルスチェックに失敗した接続を破棄します")
+            pool.putconn(conn, close=True)
+            with self._lock:
+                self._discarded += 1
+                self._last_used.pop(id(conn), None)
+        raise psycopg2.OperationalError("正常なPostgreSQL接続を取得できませんでした")
+
+    def _is_healthy(self, conn: psycopg2.extensions.connection) -> bool:
+        """
+        接続が使用可能か確認する
+
+        直近に使用された接続はチェックを省略する。
+
+        Args:
+            conn: PostgreSQL接続
+
+        Returns:
+            bool: 使用可能な場合はTrue
+        """
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _release(self, conn: psycopg2.extensions.connection) -> None:
+        """
+        接続をプールに返却する
+
+        コミットされていないトランザクションはロールバックする。
+
+        Args:
+            conn: PostgreSQL接続
+        """
+        try:
+            if not conn.closed and conn.status != psycopg2.extensions.STATUS_READY:
+                conn.rollback()
+        except psycopg2.Error as e:
+            logger.warning(f"返却時のロールバックに失敗しました: {e}")
+        finally:
+            with self._lock:
+                self._last_used[id(conn)] = time.monotonic()
+                self._in_use -= 1
+            self.pool.putconn(conn, close=bool(conn.closed))
+            self._semaphore.release()
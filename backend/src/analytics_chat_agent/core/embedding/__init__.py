@@ -0,0 +1,91 @@
+"""
+テキストの埋め込み（ベクトル化）
+
+settings.json の model.backend でバックエンドを選択する。
+    sentence_transformers: sentence-transformers（PyTorch）
+    onnx: export-embedding-model で出力した ONNX モデルを ONNX Runtime で実行
+
+設定例:
+    "model": {
+        "name": "sentence-transformers/all-MiniLM-L6-v2",
+        "backend": "onnx",
+        "onnx": {"path": ".cache/onnx/all-MiniLM-L6-v2", "quantized": true, "intra_op_threads": 2}
+    }
+"""
+
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from ...config import get_settings
+from .base import EmbeddingBackend
+from .onnx_runtime import OnnxEmbeddingBackend
+from .sentence_transformer import SentenceTransformerBackend
+
+BACKEND_SENTENCE_TRANSFORMERS = "sentence_transformers"
+BACKEND_ONNX = "onnx"
+
+# sentence-transformers のモデルのキャッシュディレクトリ
+CACHE_DIR = Path(".cache/sentence_transformers")
+
+_backends: Dict[Tuple[str, str], EmbeddingBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def create_embedding_backend(model_settings: Dict[str, Any]) -> EmbeddingBackend:
+    """
+    設定から埋め込みバックエンドを作成する
+
+    Args:
+        model_settings: model セクションの設定
+
+    Returns:
+        EmbeddingBackend: 埋め込みバックエンド
+
+    Raises:
+        ValueError: 未知のバックエンドが指定された場合
+    """
+    backend = model_settings.get("backend", BACKEND_SENTENCE_TRANSFORMERS)
+    if backend == BACKEND_SENTENCE_TRANSFORMERS:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        return SentenceTransformerBackend(model_settings["name"], cache_folder=CACHE_DIR)
+    if backend == BACKEND_ONNX:
+        onnx_settings = model_settings.get("onnx", {})
+        return OnnxEmbeddingBackend(
+            Path(onnx_settings["path"]),
+            quantized=onnx_settings.get("quantized", True),
+            intra_op_threads=onnx_settings.get("intra_op_threads"),
+            max_length=onnx_settings.get("max_length"),
+        )
+    raise ValueError(f"未知の埋め込みバックエンドです: {backend}")
+
+
+def get_embedding_backend(model_settings: Optional[Dict[str, Any]] = None) -> EmbeddingBackend:
+    """
+    埋め込みバックエンドを取得する（同じ設定のバックエンドはプロセス内で使い回す）
+
+    Args:
+        model_settings: model セクションの設定（指定しない場合は設定ファイルの値）
+
+    Returns:
+        EmbeddingBackend: 埋め込みバックエンド
+    """
+    if model_settings is None:
+        model_settings = get_settings()["model"]
+    key = (model_settings.get("backend", BACKEND_SENTENCE_TRANSFORMERS), model_settings["name"])
+    if key not in _backends:
+        with _backends_lock:
+            if key not in _backends:
+                _backends[key] = create_embedding_backend(model_settings)
+    return _backends[key]
+
+
+__all__ = [
+    "EmbeddingBackend",
+    "SentenceTransformerBackend",
+    "OnnxEmbeddingBackend",
+    "BACKEND_SENTENCE_TRANSFORMERS",
+    "BACKEND_ONNX",
+    "create_embedding_backend",
+    "get_embedding_backend",
+]
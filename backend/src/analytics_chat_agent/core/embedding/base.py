@@ -0,0 +1,62 @@
+"""
+埋め込みバックエンドの基底クラス
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, List, Union
+
+import numpy as np
+
+
+class EmbeddingBackend(ABC):
+    """
+    テキストをベクトルに変換するバックエンドの基底クラス
+
+    SentenceTransformer と同じ `encode` / `get_sentence_embedding_dimension` を提供するため、
+    呼び出し側はバックエンドの種類を意識せずに使用できる。
+    """
+
+    model_name: str
+
+    @abstractmethod
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        テキストのバッチをベクトルに変換する
+
+        Args:
+            texts: テキストのリスト
+
+        Returns:
+            np.ndarray: (テキスト数, 次元数) の float32 配列
+        """
+        pass
+
+    @abstractmethod
+    def get_sentence_embedding_dimension(self) -> int:
+        """
+        ベクトルの次元数を取得する
+
+        Returns:
+            int: 次元数
+        """
+        pass
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs: Any) -> np.ndarray:
+        """
+        テキストをベクトルに変換する
+
+        Args:
+            sentences: テキストまたはテキストのリスト
+            batch_size: 1回に変換するテキスト数
+
+        Returns:
+            np.ndarray: テキストの場合は (次元数,)、リストの場合は (テキスト数, 次元数) の配列
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        embeddings = np.vstack([
+            self._encode_batch(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)
+        ])
+        return embeddings[0] if single else embeddings
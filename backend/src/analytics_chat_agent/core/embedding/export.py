@@ -0,0 +1,138 @@
+"""
+sentence-transformers のモデルを ONNX 形式にエクスポートする
+
+エクスポートには torch と sentence-transformers、量子化には onnxruntime（と onnx）が必要。
+"""
+
+import inspect
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .onnx_runtime import CONFIG_FILE, MODEL_FILE, QUANTIZED_MODEL_FILE, TOKENIZER_FILE
+
+logger = logging.getLogger(__name__)
+
+# エクスポートする ONNX の opset
+ONNX_OPSET = 14
+
+
+def _is_mean_pooling(pooling_config: Dict[str, Any]) -> bool:
+    """
+    プーリングの設定が平均プーリングのみか判定する
+
+    Args:
+        pooling_config: Pooling.get_config_dict() の値（sentence-transformers のバージョンにより形式が異なる）
+
+    Returns:
+        bool: 平均プーリングのみの場合はTrue
+    """
+    if "pooling_mode" in pooling_config:
+        return pooling_config["pooling_mode"] == "mean"
+    modes = [key for key, enabled in pooling_config.items() if key.startswith("pooling_mode_") and enabled]
+    return modes == ["pooling_mode_mean_tokens"]
+
+
+def export_onnx_model(
+    model_name: str,
+    output_dir: Path,
+    quantize: bool = True,
+    max_length: int = 256,
+    cache_folder: Optional[Path] = None,
+) -> List[Path]:
+    """
+    SentenceTransformer のモデルを ONNX にエクスポートし、必要に応じて int8 に量子化する
+
+    エクスポートするのはトランスフォーマー本体（最終層の出力まで）で、平均プーリングと正規化は
+    OnnxEmbeddingBackend が行う。
+
+    Args:
+        model_name: モデル名（例: sentence-transformers/all-MiniLM-L6-v2）
+        output_dir: 出力先ディレクトリ
+        quantize: 重みを int8 に量子化したモデルも出力する場合はTrue
+        max_length: 最大トークン数（モデルの上限を超える場合はモデルの上限）
+        cache_folder: モデルのキャッシュディレクトリ
+
+    Returns:
+        List[Path]: 出力したファイルのパス
+
+    Raises:
+        ValueError: 平均プーリング以外のモデルが指定された場合
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    model = SentenceTransformer(
+        model_name, cache_folder=str(cache_folder) if cache_folder else None, device="cpu"
+    )
+    transformer = model[0]
+    pooling = next((module for module in model if isinstance(module, Pooling)), None)
+    if pooling is None or not _is_mean_pooling(pooling.get_config_dict()):
+        raise ValueError(f"平均プーリング以外のモデルには対応していません: {model_name}")
+    normalize = any(isinstance(module, Normalize) for module in model)
+
+    tokenizer = transformer.tokenizer
+    auto_model = transformer.auto_model.eval()
+    sample = tokenizer(["ページビュー数"], return_tensors="pt", padding=True)
+    input_names = [
+        name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample
+    ]
+
+    class HiddenStateModel(torch.nn.Module):
+        """最終層の出力のみを返すラッパー"""
+
+        def __init__(self) -> None:
+            super().__init__()
+            self.model = auto_model
+
+        def forward(self, *inputs: torch.Tensor) -> torch.Tensor:
+            return self.model(**dict(zip(input_names, inputs)))[0]
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    model_path = output_dir / MODEL_FILE
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+    # torch 2.5 以降は dynamo による書き出しが選べるため、動的な軸を指定できる従来の方式を明示する
+    export_options = (
+        {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    )
+    with torch.no_grad():
+        torch.onnx.export(
+            HiddenStateModel(),
+            tuple(sample[name] for name in input_names),
+            str(model_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET,
+            do_constant_folding=True,
+            **export_options,
+        )
+    paths = [model_path]
+    logger.info(f"ONNXモデルを出力しました: {model_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = output_dir / QUANTIZED_MODEL_FILE
+        quantize_dynamic(str(model_path), str(quantized_path), weight_type=QuantType.QInt8)
+        paths.append(quantized_path)
+        logger.info(f"int8に量子化したモデルを出力しました: {quantized_path}")
+
+    tokenizer_path = output_dir / TOKENIZER_FILE
+    tokenizer.backend_tokenizer.save(str(tokenizer_path))
+    paths.append(tokenizer_path)
+
+    config_path = output_dir / CONFIG_FILE
+    config = {
+        "model_name": model_name,
+        "dimension": model.get_sentence_embedding_dimension(),
+        "max_length": min(max_length, model.max_seq_length),
+        "normalize": normalize,
+        "pad_token_id": tokenizer.pad_token_id,
+        "pad_token": tokenizer.pad_token,
+    }
+    config_path.write_text(json.dumps(config, ensure_ascii=False, indent=2), encoding="utf-8")
+    paths.append(config_path)
+    return paths
@@ -0,0 +1,151 @@
+"""
+ONNX Runtime による埋め込みバックエンド
+
+`export-embedding-model` で出力したモデル（int8 量子化済み）を CPU で実行する。
+torch を読み込まないため起動が速く、1件ずつのベクトル化も PyTorch より軽い。
+
+モデルディレクトリの構成:
+    model.onnx              エクスポートしたモデル（float32）
+    model_int8.onnx         重みを int8 に量子化したモデル
+    tokenizer.json          トークナイザー（tokenizers 形式）
+    embedding_config.json   モデル名・次元数・最大トークン数・正規化の有無
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .base import EmbeddingBackend
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+CONFIG_FILE = "embedding_config.json"
+
+
+def mean_pool(hidden_states: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """
+    パディングを除いたトークンの平均をとる（sentence-transformers の平均プーリングと同じ）
+
+    Args:
+        hidden_states: (バッチ, トークン数, 次元数) の最終層の出力
+        attention_mask: (バッチ, トークン数) のマスク
+
+    Returns:
+        np.ndarray: (バッチ, 次元数) の配列
+    """
+    mask = attention_mask[:, :, None].astype(hidden_states.dtype)
+    summed = (hidden_states * mask).sum(axis=1)
+    counts = np.clip(mask.sum(axis=1), 1e-9, None)
+    return summed / counts
+
+
+def l2_normalize(embeddings: np.ndarray) -> np.ndarray:
+    """
+    ベクトルを長さ1に正規化する
+
+    Args:
+        embeddings: (バッチ, 次元数) の配列
+
+    Returns:
+        np.ndarray: 正規化した配列
+    """
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.clip(norms, 1e-12, None)
+
+
+def load_embedding_config(model_dir: Path) -> Dict[str, Any]:
+    """
+    エクスポート時に保存したモデルの設定を読み込む
+
+    Args:
+        model_dir: モデルディレクトリ
+
+    Returns:
+        Dict[str, Any]: モデルの設定
+
+    Raises:
+        FileNotFoundError: モデルがエクスポートされていない場合
+    """
+    config_path = model_dir / CONFIG_FILE
+    if not config_path.exists():
+        raise FileNotFoundError(
+            f"ONNXモデルが見つかりません: {model_dir}（export-embedding-model で作成してください）"
+        )
+    return json.loads(config_path.read_text(encoding="utf-8"))
+
+
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """ONNX Runtime でベクトル化するバックエンド"""
+
+    def __init__(
+        self,
+        model_dir: Path,
+        quantized: bool = True,
+        intra_op_threads: Optional[int] = None,
+        max_length: Optional[int] = None,
+    ):
+        """
+        Args:
+            model_dir: エクスポートしたモデルのディレクトリ
+            quantized: int8 量子化したモデルを使用する場合はTrue
+            intra_op_threads: 1つの演算に使用するスレッド数（指定しない場合は ONNX Runtime の既定値）
+            max_length: 最大トークン数（指定しない場合はエクスポート時の値）
+
+        Raises:
+            ImportError: onnxruntime または tokenizers がインストールされていない場合
+            FileNotFoundError: モデルがエクスポートされていない場合
+        """
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("ONNXバックエンドには onnxruntime と tokenizers が必要です") from e
+
+        model_dir = Path(model_dir)
+        config = load_embedding_config(model_dir)
+        model_path = model_dir / (QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+        if not model_path.exists():
+            raise FileNotFoundError(f"ONNXモデルが見つかりません: {model_path}")
+
+        self.model_name = config["model_name"]
+        self.dimension = config["dimension"]
+        self.normalize = config.get("normalize", True)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(
+            str(model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length or config["max_length"])
+        self.tokenizer.enable_padding(
+            pad_id=config.get("pad_token_id", 0), pad_token=config.get("pad_token", "[PAD]")
+        )
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+        }
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        hidden_states = self.session.run(None, feeds)[0]
+        embeddings = mean_pool(hidden_states, attention_mask)
+        if self.normalize:
+            embeddings = l2_normalize(embeddings)
+        return embeddings.astype(np.float32)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
@@ -0,0 +1,39 @@
+"""
+sentence-transformers（PyTorch）による埋め込みバックエンド
+"""
+
+from pathlib import Path
+from typing import Any, List, Optional, Union
+
+import numpy as np
+
+from .base import EmbeddingBackend
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """SentenceTransformer でベクトル化するバックエンド"""
+
+    def __init__(self, model_name: str, cache_folder: Optional[Path] = None):
+        """
+        Args:
+            model_name: モデル名（例: sentence-transformers/all-MiniLM-L6-v2）
+            cache_folder: モデルのキャッシュディレクトリ
+        """
+        # torch の読み込みに時間がかかるため、このバックエンドを使う場合のみ読み込む
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(
+            model_name,
+            cache_folder=str(cache_folder) if cache_folder else None,
+            device="cpu",  # MPSデバイスでの問題を回避
+        )
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs: Any) -> np.ndarray:
+        return self.model.encode(sentences, batch_size=batch_size, **kwargs)
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
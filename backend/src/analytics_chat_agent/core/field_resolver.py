@@ -2,17 +2,20 @@
 
 import os
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
 import time
 from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
 import requests
 
 from qdrant_client import QdrantClient
-from qdrant_client.http import models
-from sentence_transformers import SentenceTransformer
 
 from ..config import get_settings
+from .embedding import EmbeddingBackend, get_embedding_backend
+from .qdrant_settings import SEARCH_PAYLOAD_FIELDS, build_search_params, build_source_filter
+from .lexical_index import LexicalFieldIndex, get_lexical_index, reciprocal_rank_fusion
+from .vector_snapshot import LocalVectorIndex, check_snapshot, load_snapshot
+from .tracing import trace_span
 from ..types import FieldMappingResult, Field
 
 # 設定の読み込み
@@ -20,13 +23,6 @@ settings = get_settings()
 GA4_SCHEMA_MODEL_NAME = settings["model"]["name"]
 GA4_SCHEMA_VECTOR_SIZE = 384  # all-MiniLM-L6-v2のベクトルサイズ
 
-# キャッシュディレクトリの設定
-CACHE_DIR = Path(".cache/sentence_transformers")
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
-
-# モデルのキャッシュ
-_model_cache = {}
-
 def _create_session_with_retry():
     """リトライ付きのセッションを作成する"""
     session = requests.Session()
@@ -40,18 +36,9 @@ def _create_session_with_retry():
     session.mount("https://", adapter)
     return session
 
-def get_cached_model():
-    """キャッシュされたモデルを取得する。キャッシュがない場合は新しくダウンロードする。"""
-    global _model_cache
-    if GA4_SCHEMA_MODEL_NAME not in _model_cache:
-        # カスタムセッションを使用してモデルを初期化
-        session = _create_session_with_retry()
-        _model_cache[GA4_SCHEMA_MODEL_NAME] = SentenceTransformer(
-            GA4_SCHEMA_MODEL_NAME,
-            cache_folder=str(CACHE_DIR),
-            device="cpu"  # MPSデバイスでの問題を回避
-        )
-    return _model_cache[GA4_SCHEMA_MODEL_NAME]
+def get_cached_model() -> EmbeddingBackend:
+    """設定ファイルで選択した埋め込みバックエンドを取得する（プロセス内で使い回す）。"""
+    return get_embedding_backend(settings["model"])
 
 class FieldResolver:
     """フィールド名の解決を行うクラス。"""
@@ -63,10 +50,18 @@ class FieldResolver:
             collection_name: Qdrantのコレクション名
         """
         self.collection_name = collection_name
-        self.client = QdrantClient(
-            url=settings["qdrant"]["url"],
-            api_key=settings["qdrant"]["api_key"],
-        )
+        snapshot_settings = settings.get("vector_snapshot", {})
+        if snapshot_settings.get("local_index", False):
+            # Qdrant を使わずにスナップショットをメモリ上で検索する
+            snapshot = load_snapshot(Path(snapshot_settings["path"]))
+            check_snapshot(snapshot, GA4_SCHEMA_MODEL_NAME)
+            self.client = LocalVectorIndex(snapshot)
+        else:
+            self.client = QdrantClient(
+                url=settings["qdrant"]["url"],
+                api_key=settings["qdrant"]["api_key"],
+            )
+        self.search_params = build_search_params(settings["qdrant"])
         
         # モデルの初期化（キャッシュを使用）
         self.model = get_cached_model()
@@ -75,43 +70,93 @@ class FieldResolver:
         if self.model.get_sentence_embedding_dimension() is None:
             raise ValueError("モデルのベクトルサイズが不正です")
 
-    def resolve_fields(self, query: str, limit: int = 5) -> FieldMappingResult:
+        # 字句インデックス（フィールド名の完全一致とBM25）
+        self.lexical_settings = settings.get("field_resolution", {}).get("lexical", {})
+        self.lexical_index: Optional[LexicalFieldIndex] = None
+        if self.lexical_settings.get("enabled", True):
+            self.lexical_index = get_lexical_index(settings["ga4_schema"])
+
+    def resolve_fields(
+        self,
+        query: str,
+        limit: int = 5,
+        source: Optional[str] = None,
+        query_vector: Optional[List[float]] = None,
+    ) -> FieldMappingResult:
         """自然言語のクエリからフィールド名を解決する。
 
         Args:
             query: 自然言語のクエリ
             limit: 取得するフィールドの最大数
+            source: 検索対象を schema（スキーマのフィールド）または virtual（パラメータキー）に絞る場合に指定
+            query_vector: ベクトル化済みのクエリ（指定した場合はベクトル化を省略する）
 
         Returns:
             FieldMappingResult: 解決されたフィールド情報
         """
+        # フィールド名がそのまま含まれる場合はベクトル化せずに解決する
+        if self.lexical_index is not None:
+            with trace_span("lexical_search") as span:
+                exact = self.lexical_index.exact_matches(query, source=source)
+                span.set_attribute("hits", len(exact))
+            if exact:
+                return FieldMappingResult(
+                    fields=[Field(name=entry.name, type="string") for entry in exact[:limit]],
+                    description=exact[0].description,
+                )
+
         # クエリをベクトル化
-        query_vector = self.model.encode(query).tolist()
-        
+        if query_vector is None:
+            with trace_span("embedding"):
+                query_vector = self.model.encode(query).tolist()
+
+        candidates = max(limit, self.lexical_settings.get("candidates", 20)) if self.lexical_index else limit
         # Qdrantで検索
-        search_result = self.client.search(
-            collection_name=self.collection_name,
-            query_vector=query_vector,  # Vectorクラスのインスタンス化を避け、直接ベクトルを渡す
-            limit=limit,
-            search_params=models.SearchParams(
-                hnsw_ef=128,  # HNSWインデックスの探索パラメータ
-                exact=False,  # 近似検索を使用
-            ),
-        )
-        
-        # 結果を整形
-        fields: List[Field] = []
-        description = ""
+        with trace_span("vector_search", limit=candidates) as span:
+            search_result = self.client.search(
+                collection_name=self.collection_name,
+                query_vector=query_vector,  # Vectorクラスのインスタンス化を避け、直接ベクトルを渡す
+                query_filter=build_source_filter(source),
+                limit=candidates,
+                search_params=self.search_params,
+                with_payload=SEARCH_PAYLOAD_FIELDS,  # 使用するペイロードのみ取得する
+            )
+            span.set_attribute("hits", len(search_result))
+
+        descriptions: Dict[str, str] = {}
+        vector_names: List[str] = []
         for result in search_result:
-            field = Field(
-                name=result.payload["name"],
-                type="string"  # 固定の文字列を使用
+            name = result.payload["name"]
+            if name not in descriptions:
+                descriptions[name] = result.payload["description"]
+                vector_names.append(name)
+
+        if self.lexical_index is None:
+            names = vector_names[:limit]
+        else:
+            # ベクトル検索とBM25の順位を統合する
+            with trace_span("lexical_search", limit=candidates) as span:
+                lexical_hits = self.lexical_index.search(query, limit=candidates, source=source)
+                span.set_attribute("hits", len(lexical_hits))
+            for entry, _ in lexical_hits:
+                descriptions.setdefault(entry.name, entry.description)
+            fused = reciprocal_rank_fusion(
+                [
+                    (vector_names, self.lexical_settings.get("vector_weight", 1.0)),
+                    ([entry.name for entry, _ in lexical_hits], self.lexical_settings.get("lexical_weight", 1.0)),
+                ],
+                k=self.lexical_settings.get("rrf_k", 60),
             )
-            fields.append(field)
-            if not description:
-                description = result.payload["description"]
-        
+            names = [name for name, _ in fused[:limit]]
+
+        # 結果を整形
+        fields: List[Field] = [
+            Field(name=name, type="string")  # 固定の文字列を使用
+            for name in names
+        ]
+        description = descriptions[names[0]] if names else ""
+
         return FieldMappingResult(
             fields=fields,
             description=description
-        ) 
\ No newline at end of file
+        )
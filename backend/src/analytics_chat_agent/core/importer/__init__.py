@@ -3,5 +3,6 @@
 """
 from .import_ga4_schema import SchemaImporter
 from .import_ga4_events import EventsImporter
+from .file_source import FileEventSource
 
-__all__ = ["SchemaImporter", "EventsImporter"] 
\ No newline at end of file
+__all__ = ["SchemaImporter", "EventsImporter", "FileEventSource"] 
\ No newline at end of file
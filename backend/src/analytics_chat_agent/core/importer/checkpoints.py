@@ -0,0 +1,207 @@
+"""
+インポートのチェックポイントとリトライ
+
+長時間のインポートが途中で失敗しても、次回の `--resume` で完了済みのチャンク
+（BigQuery のテーブルのサフィックス）を飛ばして続きから実行できるよう、
+実行ごとの状態と完了したチャンクを PostgreSQL の import_runs / import_checkpoints に記録する。
+"""
+
+import logging
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Callable, Optional, Set, Tuple, TypeVar
+
+import psycopg2
+from google.api_core import exceptions as google_exceptions
+
+from ..database import PostgresConnection
+
+logger = logging.getLogger(__name__)
+
+RUN_RUNNING = "running"
+RUN_COMPLETED = "completed"
+RUN_FAILED = "failed"
+
+# 再試行で回復する可能性のある一時的なエラー
+TRANSIENT_ERRORS = (
+    psycopg2.OperationalError,
+    psycopg2.extensions.TransactionRollbackError,
+    google_exceptions.ServerError,
+    google_exceptions.TooManyRequests,
+    FutureTimeoutError,
+    ConnectionError,
+    TimeoutError,
+)
+
+T = TypeVar("T")
+
+
+@dataclass
+class RetryPolicy:
+    """
+    一時的なエラーの再試行の設定
+    """
+    max_attempts: int = 3  # 最大試行回数（1回目を含む）
+    backoff_seconds: float = 5.0  # 1回目の再試行までの待ち時間（秒、以降は2倍ずつ増やす）
+    max_backoff_seconds: float = 60.0  # 待ち時間の上限（秒）
+
+
+def run_with_retry(
+    func: Callable[[], T],
+    policy: RetryPolicy,
+    description: str,
+    on_retry: Optional[Callable[[BaseException], None]] = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Tuple[T, int]:
+    """
+    一時的なエラーの場合は待ち時間を増やしながら再試行する
+
+    Args:
+        func: 実行する処理
+        policy: 再試行の設定
+        description: ログに出力する処理の説明
+        on_retry: 再試行の前に呼び出す処理（接続の復旧など）
+        sleep: 待機に使用する関数
+
+    Returns:
+        Tuple[T, int]: 処理の戻り値と試行回数
+
+    Raises:
+        Exception: 一時的でないエラー、または最大試行回数に達した場合は最後のエラー
+    """
+    attempt = 1
+    while True:
+        try:
+            return func(), attempt
+        except TRANSIENT_ERRORS as e:
+            if attempt >= policy.max_attempts:
+                logger.error(f"{description}: {attempt}回失敗したため中断します: {e}")
+                raise
+            wait = min(policy.backoff_seconds * (2 ** (attempt - 1)), policy.max_backoff_seconds)
+            logger.warning(f"{description}: 一時的なエラーのため{wait:.1f}秒後に再試行します（{attempt}回目）: {e}")
+            if on_retry is not None:
+                on_retry(e)
+            sleep(wait)
+            attempt += 1
+
+
+class CheckpointStore:
+    """インポートの実行状態と完了したチャンクを記録するクラス"""
+
+    def __init__(self, pg_conn: PostgresConnection):
+        """
+        Args:
+            pg_conn: PostgreSQL接続
+        """
+        self.pg_conn = pg_conn
+
+    def start_run(self, mode: str, source: str) -> int:
+        """
+        新しい実行を記録する
+
+        Args:
+            mode: インポートモード
+            source: 読み込み元
+
+        Returns:
+            int: 実行ID
+        """
+        query = """
+            INSERT INTO import_runs (mode, source, status)
+            VALUES (%(mode)s, %(source)s, %(status)s)
+            RETURNING id
+        """
+        with self.pg_conn.connection:
+            [row] = self.pg_conn.execute_query(
+                query, {"mode": mode, "source": source, "status": RUN_RUNNING}
+            )
+        return row["id"]
+
+    def find_resumable_run(self, mode: str, source: str) -> Optional[int]:
+        """
+        完了していない直近の実行を取得する
+
+        Args:
+            mode: インポートモード
+            source: 読み込み元
+
+        Returns:
+            Optional[int]: 実行ID（再開できる実行がない場合はNone）
+        """
+        query = """
+            SELECT id, status
+            FROM import_runs
+            WHERE mode = %(mode)s AND source = %(source)s
+            ORDER BY id DESC
+            LIMIT 1
+        """
+        rows = self.pg_conn.execute_query(query, {"mode": mode, "source": source})
+        if not rows or rows[0]["status"] == RUN_COMPLETED:
+            return None
+        return rows[0]["id"]
+
+    def reopen_run(self, run_id: int) -> None:
+        """
+        再開する実行の状態を実行中に戻す
+
+        Args:
+            run_id: 実行ID
+        """
+        query = """
+            UPDATE import_runs
+            SET status = %(status)s, error = NULL, finished_at = NULL
+            WHERE id = %(run_id)s
+        """
+        self.pg_conn.execute_query(query, {"status": RUN_RUNNING, "run_id": run_id})
+
+    def completed_chunks(self, run_id: int) -> Set[str]:
+        """
+        完了済みのチャンクを取得する
+
+        Args:
+            run_id: 実行ID
+
+        Returns:
+            Set[str]: チャンク（テーブルのサフィックス）
+        """
+        query = "SELECT chunk FROM import_checkpoints WHERE run_id = %(run_id)s"
+        return {row["chunk"] for row in self.pg_conn.execute_query(query, {"run_id": run_id})}
+
+    def mark_chunk_done(self, run_id: int, chunk: str, row_count: int, attempts: int) -> None:
+        """
+        チャンクの完了を記録する
+
+        Args:
+            run_id: 実行ID
+            chunk: チャンク（テーブルのサフィックス）
+            row_count: インポートしたレコード数
+            attempts: 完了までの試行回数
+        """
+        query = """
+            INSERT INTO import_checkpoints (run_id, chunk, row_count, attempts)
+            VALUES (%(run_id)s, %(chunk)s, %(row_count)s, %(attempts)s)
+            ON CONFLICT (run_id, chunk) DO UPDATE
+            SET row_count = EXCLUDED.row_count,
+                attempts = EXCLUDED.attempts,
+                completed_at = CURRENT_TIMESTAMP
+        """
+        self.pg_conn.execute_query(
+            query, {"run_id": run_id, "chunk": chunk, "row_count": row_count, "attempts": attempts}
+        )
+
+    def finish_run(self, run_id: int, status: str, error: Optional[str] = None) -> None:
+        """
+        実行の終了を記録する
+
+        Args:
+            run_id: 実行ID
+            status: completed または failed
+            error: failed の場合のエラー内容
+        """
+        query = """
+            UPDATE import_runs
+            SET status = %(status)s, error = %(error)s, finished_at = CURRENT_TIMESTAMP
+            WHERE id = %(run_id)s
+        """
+        self.pg_conn.execute_query(query, {"status": status, "error": error, "run_id": run_id})
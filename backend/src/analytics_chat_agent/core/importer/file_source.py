@@ -0,0 +1,301 @@
+"""
+GA4のエクスポートファイルからのイベントデータの読み込み
+
+BigQuery の events_YYYYMMDD テーブルをエクスポートしたファイル（Parquet / Avro / 改行区切りJSON）を
+ローカルのディレクトリから読み込み、BigQuery から取得した場合と同じパラメータ単位の行に変換する。
+ファイルの解析と正規化はプロセスプールで並列に実行し、キーの追加（DDL）と挿入は呼び出し元のプロセスで行う。
+
+ファイルのパス（ファイル名またはディレクトリ名）には events_YYYYMMDD の形式で日付を含める。
+    exports/events_20240101.parquet
+    exports/events_20240102/000000000000.avro
+    exports/events_20240103.ndjson.gz
+"""
+
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+import re
+from collections import deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from .row_layout import EventRowLayout, build_event_rows, extract_param_value
+
+logger = logging.getLogger(__name__)
+
+FORMAT_PARQUET = "parquet"
+FORMAT_AVRO = "avro"
+FORMAT_JSON = "json"
+
+# 拡張子 → ファイル形式（.gz で圧縮した JSON にも対応）
+SUPPORTED_SUFFIXES = {
+    ".parquet": FORMAT_PARQUET,
+    ".avro": FORMAT_AVRO,
+    ".ndjson": FORMAT_JSON,
+    ".jsonl": FORMAT_JSON,
+    ".json": FORMAT_JSON,
+}
+
+# Parquet から読み込むカラム
+EXPORT_COLUMNS = [
+    "event_date",
+    "event_timestamp",
+    "event_name",
+    "event_bundle_sequence_id",
+    "user_pseudo_id",
+    "batch_event_index",
+    "event_params",
+]
+
+_DATE_PATTERN = re.compile(r"events_(\d{8})")
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# BigQuery の LEFT JOIN UNNEST(event_params) の結果と同じ属性を持つ行
+ParamRow = namedtuple(
+    "ParamRow",
+    ["event_bundle_sequence_id", "event_date", "event_timestamp", "event_name",
+     "user_pseudo_id", "batch_event_index", "param_key", "param_value"],
+)
+
+
+@dataclass(frozen=True)
+class ExportFile:
+    """
+    エクスポートファイル1つ分の情報
+    """
+    path: Path  # ファイルのパス
+    event_date: date  # パスに含まれる日付
+    format: str  # ファイル形式（parquet / avro / json）
+    compressed: bool = False  # gzip で圧縮されている場合はTrue
+
+
+def discover_export_files(directory: Path, target_date: Optional[date] = None) -> List[ExportFile]:
+    """
+    ディレクトリ以下のエクスポートファイルを探す
+
+    Args:
+        directory: エクスポートファイルを置いたディレクトリ
+        target_date: 指定した場合はその日付のファイルのみ
+
+    Returns:
+        List[ExportFile]: 日付・パス順のファイル
+    """
+    files = []
+    for path in sorted(directory.rglob("*")):
+        if not path.is_file():
+            continue
+        suffixes = path.suffixes
+        compressed = bool(suffixes) and suffixes[-1] == ".gz"
+        suffix = suffixes[-2] if compressed and len(suffixes) >= 2 else (suffixes[-1] if suffixes else "")
+        file_format = SUPPORTED_SUFFIXES.get(suffix)
+        if file_format is None or (compressed and file_format != FORMAT_JSON):
+            continue
+        match = _DATE_PATTERN.search(str(path.relative_to(directory)))
+        if match is None:
+            logger.warning(f"日付を含まないファイルをスキップします: {path}")
+            continue
+        event_date = datetime.strptime(match.group(1), "%Y%m%d").date()
+        if target_date is not None and event_date != target_date:
+            continue
+        files.append(ExportFile(path, event_date, file_format, compressed))
+    return sorted(files, key=lambda f: (f.event_date, str(f.path)))
+
+
+def iter_export_records(export_file: ExportFile) -> Iterator[Dict[str, Any]]:
+    """
+    エクスポートファイルのイベントを1件ずつ読み込む
+
+    Args:
+        export_file: エクスポートファイル
+
+    Yields:
+        Dict[str, Any]: GA4 のエクスポートスキーマのイベント
+
+    Raises:
+        ImportError: Avro の読み込みに必要な fastavro がインストールされていない場合
+    """
+    if export_file.format == FORMAT_PARQUET:
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(export_file.path)
+        columns = [name for name in EXPORT_COLUMNS if name in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(columns=columns):
+            yield from batch.to_pylist()
+    elif export_file.format == FORMAT_AVRO:
+        try:
+            import fastavro
+        except ImportError as e:
+            raise ImportError("Avroファイルの読み込みには fastavro が必要です") from e
+
+        with open(export_file.path, "rb") as f:
+            yield from fastavro.reader(f)
+    else:
+        opener = gzip.open if export_file.compressed else open
+        with opener(export_file.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def iter_param_rows(export_file: ExportFile) -> Iterator[ParamRow]:
+    """
+    エクスポートファイルのイベントをパラメータ単位の行に展開する
+
+    BigQuery から取得する場合と同様に、event_date は日付に、event_timestamp（マイクロ秒）は
+    UTC の日時に変換する。パラメータのないイベントは param_key が None の1行になる。
+
+    Args:
+        export_file: エクスポートファイル
+
+    Yields:
+        ParamRow: パラメータ1つにつき1行
+    """
+    for record in iter_export_records(export_file):
+        raw_date = record.get("event_date")
+        event_date = (
+            datetime.strptime(raw_date, "%Y%m%d").date() if raw_date else export_file.event_date
+        )
+        raw_timestamp = record.get("event_timestamp")
+        event_timestamp = (
+            _EPOCH + timedelta(microseconds=int(raw_timestamp)) if raw_timestamp is not None else None
+        )
+        event = (
+            record.get("event_bundle_sequence_id"),
+            event_date,
+            event_timestamp,
+            record.get("event_name"),
+            record.get("user_pseudo_id"),
+            record.get("batch_event_index"),
+        )
+        params = record.get("event_params") or []
+        if not params:
+            yield ParamRow(*event, None, None)
+        for param in params:
+            yield ParamRow(*event, param["key"], param.get("value") or {})
+
+
+def scan_param_keys(export_file: ExportFile) -> Dict[str, Any]:
+    """
+    エクスポートファイルに含まれるパラメータキーとサンプルの値を取得する（ワーカープロセスで実行）
+
+    Args:
+        export_file: エクスポートファイル
+
+    Returns:
+        Dict[str, Any]: キー名 → 最初に見つかった NULL でない値
+    """
+    samples: Dict[str, Any] = {}
+    for row in iter_param_rows(export_file):
+        if row.param_key is not None and samples.get(row.param_key) is None:
+            samples[row.param_key] = extract_param_value(row.param_value)
+    return samples
+
+
+def normalize_export_file(export_file: ExportFile, layout: EventRowLayout) -> List[List[Any]]:
+    """
+    エクスポートファイルを挿入用のイベント行に変換する（ワーカープロセスで実行）
+
+    Args:
+        export_file: エクスポートファイル
+        layout: 挿入する行のレイアウト
+
+    Returns:
+        List[List[Any]]: layout.columns の並びのイベント行
+    """
+    return build_event_rows(iter_param_rows(export_file), layout)
+
+
+class FileEventSource:
+    """ローカルのエクスポートファイルからイベントデータを読み込むクラス"""
+
+    def __init__(self, directory: Path, workers: Optional[int] = None):
+        """
+        Args:
+            directory: エクスポートファイルを置いたディレクトリ
+            workers: 解析に使用するプロセス数（指定しない場合はCPU数、1の場合はプロセスプールを使用しない）
+        """
+        self.directory = Path(directory)
+        self.workers = workers or os.cpu_count() or 1
+
+    def discover(self, target_date: Optional[date] = None) -> List[ExportFile]:
+        """
+        読み込むエクスポートファイルを探す
+
+        Args:
+            target_date: 指定した場合はその日付のファイルのみ
+
+        Returns:
+            List[ExportFile]: 日付・パス順のファイル
+        """
+        return discover_export_files(self.directory, target_date)
+
+    def scan_keys(self, files: List[ExportFile]) -> Dict[str, Any]:
+        """
+        ファイルに含まれるパラメータキーを並列で収集する
+
+        Args:
+            files: エクスポートファイル
+
+        Returns:
+            Dict[str, Any]: キー名 → サンプルの値
+        """
+        samples: Dict[str, Any] = {}
+        for _, file_samples in self._map(scan_param_keys, files):
+            for key, value in file_samples.items():
+                if samples.get(key) is None:
+                    samples[key] = value
+        return samples
+
+    def normalize(
+        self, files: List[ExportFile], layout: EventRowLayout
+    ) -> Iterator[Tuple[ExportFile, List[List[Any]]]]:
+        """
+        ファイルを並列で解析・正規化し、ファイルの順に結果を返す
+
+        Args:
+            files: エクスポートファイル
+            layout: 挿入する行のレイアウト
+
+        Yields:
+            Tuple[ExportFile, List[List[Any]]]: ファイルとそのイベント行
+        """
+        yield from self._map(partial(normalize_export_file, layout=layout), files)
+
+    def _map(
+        self, func: Callable[[ExportFile], Any], files: List[ExportFile]
+    ) -> Iterator[Tuple[ExportFile, Any]]:
+        """
+        ファイルごとの処理をプロセスプールで実行する
+
+        処理中の結果がメモリに溜まらないよう、同時に投入するファイルはプロセス数の2倍までとする。
+
+        Args:
+            func: ファイルを受け取る関数（pickle できること）
+            files: エクスポートファイル
+
+        Yields:
+            Tuple[ExportFile, Any]: ファイルと処理結果（ファイルの順）
+        """
+        if self.workers <= 1 or len(files) <= 1:
+            for export_file in files:
+                yield export_file, func(export_file)
+            return
+
+        # 親プロセスのスレッドやロックを引き継がないよう spawn で起動する
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as executor:
+            pending: Deque[Tuple[ExportFile, Future]] = deque()
+            for export_file in files:
+                pending.append((export_file, executor.submit(func, export_file)))
+                if len(pending) >= self.workers * 2:
+                    done_file, future = pending.popleft()
+                    yield done_file, future.result()
+            while pending:
+                done_file, future = pending.popleft()
+                yield done_file, future.result()
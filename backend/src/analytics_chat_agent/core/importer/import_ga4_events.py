@@ -3,41 +3,112 @@ GA4イベントデータの移行処理
 """
 
 import logging
-from datetime import datetime
-from typing import Dict, List, Any, Optional
-from ..database import BigQueryConnection, PostgresConnection
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Dict, List, Any, Optional, Tuple
+import psycopg2
+from ..database import BigQueryConnection, PostgresConnection, PooledPostgresConnection
 from ..schema import SchemaManager
-import json
+from ..tracing import trace_span
+from ...config import get_settings
+from .checkpoints import CheckpointStore, RetryPolicy, RUN_COMPLETED, RUN_FAILED, run_with_retry
+from .file_source import FileEventSource
+from .rollups import RollupBuilder
+from .row_layout import EventRowLayout, EVENT_DATE, build_event_rows
 
 logger = logging.getLogger(__name__)
 
+# インポート元の BigQuery のデータセットとテーブル
+BQ_DATASET = "ungift.analytics_336047273"
+BQ_EVENTS_TABLE = f"{BQ_DATASET}.events_*"
+
 class EventsImporter:
     """GA4イベントデータの移行処理クラス"""
 
-    def __init__(self, bq_conn: BigQueryConnection, pg_conn: PostgresConnection):
+    def __init__(
+        self,
+        bq_conn: Optional[BigQueryConnection],
+        pg_conn: PostgresConnection,
+        param_storage: Optional[str] = None,
+    ):
         """
         Args:
-            bq_conn: BigQuery接続
+            bq_conn: BigQuery接続（エクスポートファイルからのみインポートする場合はNone）
             pg_conn: PostgreSQL接続
+            param_storage: 新しいパラメータキーの格納先（columns または jsonb、指定しない場合は設定ファイルの値）
         """
         self.bq_conn = bq_conn
         self.pg_conn = pg_conn
         self.schema_manager = SchemaManager(pg_conn)
-        self.virtual_keys = {vk["name"]: vk for vk in self.schema_manager.get_virtual_keys()}
-
-    def import_all_events(self) -> int:
+        self._load_virtual_keys()
+        importer_settings = get_settings().get("importer", {})
+        self.rollup_builder = (
+            RollupBuilder(pg_conn) if importer_settings.get("maintain_rollups", True) else None
+        )
+        self.insert_workers = importer_settings.get("insert_workers", 1)
+        self.insert_chunk_size = importer_settings.get("insert_chunk_size", 5000)
+        self.param_storage = param_storage or importer_settings.get("param_storage", "columns")
+        if self.param_storage not in ("columns", "jsonb"):
+            raise ValueError(f"未知のparam_storageです: {self.param_storage}")
+        self.checkpoints = CheckpointStore(pg_conn)
+        self.retry_policy = RetryPolicy(**importer_settings.get("retry", {}))
+
+    def import_all_events(self, resume: bool = False) -> int:
         """
         全期間のイベントデータをインポート
 
+        BigQuery のテーブル（日別のサフィックス）ごとにチャンクとして取得・挿入し、
+        完了したチャンクを import_checkpoints に記録する。resume を指定した場合は
+        前回の完了していない実行の続きから、完了済みのチャンクを飛ばして実行する。
+
+        Args:
+            resume: 前回の実行を再開する場合はTrue
+
         Returns:
-            int: インポートしたレコード数
-        """
-        # 全データを削除
-        self._delete_all_events()
-        
-        # 全期間のデータを取得してインポート
-        query = self._build_base_query()
-        return self._import_events(query)
+            int: インポートしたレコード数（再開した場合は今回の実行分のみ）
+        """
+        with trace_span("import", mode="all", resume=resume) as span:
+            run_id = self.checkpoints.find_resumable_run("full", BQ_EVENTS_TABLE) if resume else None
+            suffixes = self._list_table_suffixes()
+            if run_id is None:
+                if resume:
+                    logger.info("再開できる実行がないため最初からインポートします")
+                # 全データを削除
+                with trace_span("import.delete"):
+                    self._delete_all_events()
+                run_id = self.checkpoints.start_run("full", BQ_EVENTS_TABLE)
+                pending = suffixes
+            else:
+                self.checkpoints.reopen_run(run_id)
+                completed = self.checkpoints.completed_chunks(run_id)
+                pending = [suffix for suffix in suffixes if suffix not in completed]
+                logger.info(
+                    f"実行 {run_id} を再開します（完了済み {len(suffixes) - len(pending)}/{len(suffixes)} テーブル）"
+                )
+            span.set_attributes({"run_id": run_id, "chunks": len(pending)})
+
+            # 実行開始時点のキーで取得する（途中のチャンクで追加されたキーで絞り込まない）
+            keys = list(self.virtual_keys.keys())
+            count = 0
+            try:
+                for suffix in pending:
+                    target_date = f"{suffix[:4]}-{suffix[4:6]}-{suffix[6:]}"
+                    chunk_count, attempts = self._import_day(target_date, keys)
+                    self.checkpoints.mark_chunk_done(run_id, suffix, chunk_count, attempts)
+                    logger.info(f"events_{suffix}: {chunk_count}件（{attempts}回目で完了）")
+                    count += chunk_count
+            except Exception as e:
+                self._recover_connection()
+                self.checkpoints.finish_run(run_id, RUN_FAILED, str(e))
+                raise
+            self.checkpoints.finish_run(run_id, RUN_COMPLETED)
+
+            # 集計テーブルを再構築
+            if self.rollup_builder is not None:
+                with trace_span("import.rollup"):
+                    self.rollup_builder.rebuild_all()
+            span.set_attribute("events", count)
+        return count
 
     def import_events_by_date(self, target_date: str) -> int:
         """
@@ -49,37 +120,156 @@ class EventsImporter:
         Returns:
             int: インポートしたレコード数
         """
-        # 指定日付のデータを削除
-        self._delete_events_by_date(target_date)
-        
-        # 指定日付のデータを取得してインポート
-        query = self._build_base_query(target_date)
-        return self._import_events(query)
+        with trace_span("import", mode="date", target_date=target_date) as span:
+            # 指定日付のデータを削除して再取得（一時的なエラーは再試行）
+            count, _ = self._import_day(target_date)
+
+            # 指定日付の集計を更新
+            if self.rollup_builder is not None:
+                with trace_span("import.rollup"):
+                    self.rollup_builder.refresh([date.fromisoformat(target_date)])
+            span.set_attribute("events", count)
+        return count
+
+    def _import_day(self, target_date: str, keys: Optional[List[str]] = None) -> Tuple[int, int]:
+        """
+        指定日付のデータを削除してから取得・挿入する（一時的なエラーの場合は再試行する）
+
+        再試行の前にはその日のパーティションを削除し直すため、途中まで挿入された行は残らない。
+
+        Args:
+            target_date: 対象日付 (YYYY-MM-DD)
+            keys: 取得するパラメータキー（指定しない場合は現在の virtual_keys）
+
+        Returns:
+            Tuple[int, int]: インポートしたレコード数と試行回数
+        """
+        def attempt() -> int:
+            with trace_span("import.delete"):
+                self._delete_events_by_date(target_date)
+            return self._import_events(self._build_base_query(target_date, keys))
+
+        return run_with_retry(
+            attempt,
+            self.retry_policy,
+            description=f"{target_date} のインポート",
+            on_retry=lambda e: self._recover_connection(),
+        )
+
+    def _list_table_suffixes(self) -> List[str]:
+        """
+        BigQuery の日別テーブルのサフィックスを取得（メタデータのみ参照するためスキャン量は発生しない）
+
+        Returns:
+            List[str]: サフィックス（YYYYMMDD）の昇順のリスト
+        """
+        query = f"""
+            SELECT REGEXP_EXTRACT(table_name, r'^events_([0-9]{{8}})$') AS suffix
+            FROM `{BQ_DATASET}.INFORMATION_SCHEMA.TABLES`
+            WHERE REGEXP_CONTAINS(table_name, r'^events_[0-9]{{8}}$')
+            ORDER BY suffix
+        """
+        return [row.suffix for row in self.bq_conn.execute_query(query)]
+
+    def _recover_connection(self) -> None:
+        """エラー後のPostgreSQL接続を使える状態に戻す（切断されていた場合は次回の利用時に再接続する）"""
+        try:
+            if isinstance(self.pg_conn, PooledPostgresConnection):
+                # 現在のスレッドの接続をプールに返却（ロールバックまたは破棄される）
+                self.pg_conn.release()
+                return
+            connection = self.pg_conn.connection
+            if connection.closed:
+                self.pg_conn.close()
+            else:
+                connection.rollback()
+        except psycopg2.Error as e:
+            logger.warning(f"接続を作り直します: {e}")
+            self.pg_conn.close()
+
+    def import_events_from_files(self, source: FileEventSource, target_date: Optional[str] = None) -> int:
+        """
+        ローカルのエクスポートファイルからイベントデータをインポート
+
+        target_date を指定しない場合は全データを削除してディレクトリ内のすべてのファイルを、
+        指定した場合はその日付のデータのみを削除して該当するファイルをインポートする。
+        ファイルの解析と正規化はワーカープロセスで並列に行い、キーの追加と挿入はこのプロセスで行う。
+
+        Args:
+            source: エクスポートファイルの読み込み元
+            target_date: 対象日付 (YYYY-MM-DD)
+
+        Returns:
+            int: インポートしたレコード数
+        """
+        day = date.fromisoformat(target_date) if target_date else None
+        mode = "date" if day else "all"
+        with trace_span("import", mode=mode, source="files", target_date=target_date) as span:
+            files = source.discover(day)
+            span.set_attribute("files", len(files))
+            logger.info(f"{len(files)}件のエクスポートファイルを読み込みます: {source.directory}")
+
+            with trace_span("import.delete"):
+                if day:
+                    self._delete_events_by_date(target_date)
+                else:
+                    self._delete_all_events()
+
+            # 先にすべてのファイルのキーを収集し、新しいキーを追加してからレイアウトを確定する
+            with trace_span("import.scan", files=len(files)) as scan_span:
+                key_samples = source.scan_keys(files)
+                scan_span.set_attribute("keys", len(key_samples))
+            new_keys = {
+                key: value for key, value in key_samples.items()
+                if key not in self.virtual_keys and value is not None
+            }
+            if new_keys:
+                self._add_keys(new_keys)
+
+            # ファイルごとに正規化済みの行を受け取り、順に挿入する
+            count = 0
+            for export_file, events in source.normalize(files, self.layout):
+                with trace_span("import.write", file=export_file.path.name) as write_span:
+                    file_count = self._insert_events(events)
+                    write_span.set_attribute("rows", file_count)
+                logger.info(f"{export_file.path}: {file_count}件")
+                count += file_count
+
+            # 集計テーブルを更新
+            if self.rollup_builder is not None:
+                with trace_span("import.rollup"):
+                    if day:
+                        self.rollup_builder.refresh([day])
+                    else:
+                        self.rollup_builder.rebuild_all()
+            span.set_attribute("events", count)
+        return count
 
     def _delete_all_events(self) -> None:
-        """全イベントデータを削除"""
-        query = "TRUNCATE events CASCADE"
-        self.pg_conn.execute_query(query)
+        """全イベントデータを削除（すべての日別パーティションを削除）"""
+        self.schema_manager.drop_event_partitions()
 
     def _delete_events_by_date(self, target_date: str) -> None:
         """
-        指定日付のイベントデータを削除
+        指定日付のイベントデータを削除（その日のパーティションを切り離して削除）
 
         Args:
             target_date: 対象日付 (YYYY-MM-DD)
         """
-        query = """
-            DELETE FROM events
-            WHERE DATE(event_timestamp) = %(target_date)s
-        """
-        self.pg_conn.execute_query(query, {"target_date": target_date})
+        self.schema_manager.drop_event_partitions([date.fromisoformat(target_date)])
+
+    def _load_virtual_keys(self) -> None:
+        """virtual_keys を読み込み、挿入する行のレイアウトを作り直す"""
+        self.virtual_keys = {vk["name"]: vk for vk in self.schema_manager.iter_virtual_keys()}
+        self.layout = EventRowLayout(self.virtual_keys)
 
-    def _build_base_query(self, target_date: Optional[str] = None) -> str:
+    def _build_base_query(self, target_date: Optional[str] = None, keys: Optional[List[str]] = None) -> str:
         """
         基本クエリを構築
 
         Args:
             target_date: 対象日付 (YYYY-MM-DD)
+            keys: 取得するパラメータキー（指定しない場合は現在の virtual_keys、空の場合はすべてのキー）
 
         Returns:
             str: SQLクエリ
@@ -87,24 +277,31 @@ class EventsImporter:
         date_filter = f"AND _TABLE_SUFFIX = '{target_date.replace('-', '')}'" if target_date else ""
         
         # virtual_keysからキー名のリストを取得
-        keys = list(self.virtual_keys.keys())
+        if keys is None:
+            keys = list(self.virtual_keys.keys())
+        # パラメータのないイベントも1行として残すため LEFT JOIN で展開し、キーは展開前に絞り込む
         if keys:
             keys_str = ", ".join([f"'{key}'" for key in keys])
-            key_filter = f"AND param.key IN ({keys_str})"
+            params = (
+                "ARRAY(SELECT param FROM UNNEST(event_params) AS param "
+                f"WHERE param.key IN ({keys_str}))"
+            )
         else:
-            key_filter = ""
+            params = "event_params"
         
         return f"""
             SELECT 
                 event_bundle_sequence_id,
-                event_timestamp,
+                PARSE_DATE('%Y%m%d', event_date) as event_date,
+                TIMESTAMP_MICROS(event_timestamp) as event_timestamp,
                 event_name,
+                user_pseudo_id,
+                batch_event_index,
                 param.key as param_key,
                 param.value as param_value
-            FROM `ungift.analytics_336047273.events_*`,
-            UNNEST(event_params) as param
+            FROM `{BQ_EVENTS_TABLE}`
+            LEFT JOIN UNNEST({params}) as param
             WHERE 1=1 {date_filter}
-            {key_filter}
         """
 
     def _import_events(self, query: str) -> int:
@@ -118,7 +315,9 @@ class EventsImporter:
             int: インポートしたレコード数
         """
         # BigQueryからデータを取得
-        rows = list(self.bq_conn.execute_query(query))
+        with trace_span("import.fetch") as span:
+            rows = list(self.bq_conn.execute_query(query))
+            span.set_attribute("rows", len(rows))
         
         # デバッグ用：最初の数行のデータを出力
         logger.debug("BigQueryから取得したデータの最初の5行:")
@@ -126,12 +325,17 @@ class EventsImporter:
             logger.debug(f"行 {i+1}: {row}")
         
         # イベントデータを正規化
-        events = self._normalize_events(rows)
+        with trace_span("import.normalize") as span:
+            events = self._normalize_events(rows)
+            span.set_attribute("events", len(events))
         
         # PostgreSQLに挿入
-        return self._insert_events(events)
+        with trace_span("import.write") as span:
+            count = self._insert_events(events)
+            span.set_attribute("rows", count)
+        return count
 
-    def _normalize_events(self, rows: List[Any]) -> List[Dict[str, Any]]:
+    def _normalize_events(self, rows: List[Any]) -> List[List[Any]]:
         """
         イベントデータを正規化
 
@@ -139,14 +343,13 @@ class EventsImporter:
             rows: BigQueryから取得した行データ
 
         Returns:
-            List[Dict[str, Any]]: 正規化されたイベントデータ
+            List[List[Any]]: self.layout.columns の並びのイベント行
         """
-        events = {}
         new_keys = set()  # 新しいキーを記録
 
         # 最初のパス：新しいキーを検出
         for row in rows:
-            if row.param_key not in self.virtual_keys:
+            if row.param_key is not None and row.param_key not in self.virtual_keys:
                 new_keys.add(row.param_key)
 
         # 新しいキーを一括で追加
@@ -166,47 +369,34 @@ class EventsImporter:
                         elif param_value.get('double_value') is not None:
                             key_samples[key] = param_value['double_value']
                         break
+            self._add_keys(key_samples)
 
-            # カラムを一括で追加
-            try:
-                for key, sample_value in key_samples.items():
-                    self.schema_manager.add_virtual_column(key, sample_value)
-                    logger.info(f"新しいキー {key} を追加しました")
-            except Exception as e:
-                logger.error(f"キーの追加に失敗しました: {e}")
-                raise
+        # 2番目のパス：データを正規化（固定レイアウトの行に値を埋める）
+        return build_event_rows(rows, self.layout)
 
-            # virtual_keysを更新
-            self.virtual_keys = {vk['name']: vk for vk in self.schema_manager.get_virtual_keys()}
+    def _add_keys(self, key_samples: Dict[str, Any]) -> None:
+        """
+        新しいパラメータキーを追加し、virtual_keys と行のレイアウトを更新
 
-        # 2番目のパス：データを正規化
-        for row in rows:
-            event_id = row.event_bundle_sequence_id
-            if event_id not in events:
-                events[event_id] = {
-                    "event_bundle_sequence_id": event_id,
-                    "event_dimensions": json.dumps({
-                        "event_name": row.event_name
-                    })
-                }
-
-            # パラメータの値を取得
-            param_value = row.param_value
-            value = None
-            if param_value.get('string_value') is not None:
-                value = param_value['string_value']
-            elif param_value.get('int_value') is not None:
-                value = param_value['int_value']
-            elif param_value.get('float_value') is not None:
-                value = param_value['float_value']
-            elif param_value.get('double_value') is not None:
-                value = param_value['double_value']
-
-            # カラム名を生成
-            column_name = f"bq_column_{row.param_key}"
-            events[event_id][column_name] = value
-
-        return list(events.values())
+        Args:
+            key_samples: キー名 → サンプルの値（型の判定に使用）
+        """
+        # カラムを一括で追加（jsonb の場合はキーの登録のみでDDLは実行しない）
+        try:
+            with trace_span("import.ddl", keys=len(key_samples), storage=self.param_storage):
+                for key, sample_value in key_samples.items():
+                    if self.param_storage == "jsonb":
+                        storage = self.schema_manager.add_param_key(key, sample_value)
+                        logger.info(f"新しいキー {key} を追加しました（格納先: {storage}）")
+                    else:
+                        self.schema_manager.add_virtual_column(key, sample_value)
+                        logger.info(f"新しいキー {key} を追加しました")
+        except Exception as e:
+            logger.error(f"キーの追加に失敗しました: {e}")
+            raise
+
+        # virtual_keysと行のレイアウトを更新
+        self._load_virtual_keys()
 
     def _extract_param_value(self, value: Dict[str, Any]) -> Any:
         """
@@ -230,35 +420,50 @@ class EventsImporter:
             return value["bool_value"]
         return None
 
-    def _insert_events(self, events: List[Dict[str, Any]]) -> int:
+    def _insert_events(self, events: List[List[Any]]) -> int:
         """
         イベントデータをPostgreSQLに挿入
 
         Args:
-            events: 挿入するイベントデータ
+            events: self.layout.columns の並びのイベント行
 
         Returns:
             int: 挿入したレコード数
         """
         if not events:
             return 0
-        
-        # カラム名を取得
-        columns = list(events[0].keys())
-        
-        # プレースホルダーを生成
-        placeholders = ", ".join([f"%({col})s" for col in columns])
-        
-        # クエリを構築
-        query = f"""
-            INSERT INTO events ({", ".join(columns)})
-            VALUES ({placeholders})
-        """
-        
-        # データを挿入
-        self.pg_conn.execute_many(query, events)
+
+        # 挿入先の日別パーティションを作成
+        self.schema_manager.ensure_event_partitions({event[EVENT_DATE] for event in events})
+
+        # データを挿入（コネクションプール使用時はチャンクごとに並列で挿入）
+        columns = self.layout.columns
+        if (
+            isinstance(self.pg_conn, PooledPostgresConnection)
+            and self.insert_workers > 1
+            and len(events) > self.insert_chunk_size
+        ):
+            chunks = [
+                events[i:i + self.insert_chunk_size]
+                for i in range(0, len(events), self.insert_chunk_size)
+            ]
+            with ThreadPoolExecutor(max_workers=self.insert_workers) as executor:
+                list(executor.map(lambda chunk: self._insert_chunk(columns, chunk), chunks))
+        else:
+            self.pg_conn.insert_rows("events", columns, events)
         return len(events)
 
+    def _insert_chunk(self, columns: List[str], chunk: List[List[Any]]) -> None:
+        """
+        プールから取り出した接続でイベントデータのチャンクを挿入
+
+        Args:
+            columns: 挿入するカラム
+            chunk: 挿入するイベント行
+        """
+        with self.pg_conn.checkout():
+            self.pg_conn.insert_rows("events", columns, chunk)
+
     def _insert_app_infos(self, app_infos: List[Dict[str, Any]]) -> None:
         """
         app_infoデータをPostgreSQLに挿入
@@ -1,11 +1,20 @@
 import csv
 import logging
+import uuid
 from pathlib import Path
 from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 from ...config import get_settings
+from ..embedding import get_embedding_backend
+from ..intent_classifier import read_intent_examples
+from ..qdrant_settings import (
+    SOURCE_INTENT_EXAMPLE,
+    build_hnsw_config,
+    build_quantization_config,
+    build_vectors_config,
+    payload_index_fields,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +32,7 @@ class SchemaImporter:
         settings = get_settings()
 
         # モデルの初期化
-        self.model = SentenceTransformer(settings["model"]["name"])
+        self.model = get_embedding_backend(settings["model"])
 
         # Qdrantクライアントの初期化
         try:
@@ -35,8 +44,9 @@ class SchemaImporter:
             logger.error(f"Failed to initialize Qdrant client: {e}")
             raise RuntimeError("Failed to connect to Qdrant server.") from e
 
-        # コレクション名
+        # コレクション名と作成時の設定
         self.collection_name = settings["qdrant"]["collection_name"]
+        self.qdrant_settings = settings["qdrant"]
 
     def import_schema(self, csv_path: Path, source: str = None) -> int:
         """
@@ -65,9 +75,48 @@ class SchemaImporter:
             logger.error(f"スキーマインポートエラー: {e}")
             raise RuntimeError("スキーマのインポートに失敗しました。") from e
 
+    def import_intent_examples(self, csv_path: Path) -> int:
+        """
+        意図分類の例文をスキーマと同じコレクションにインポートする
+
+        Args:
+            csv_path: 例文CSVファイルのパス（question、key）
+
+        Returns:
+            int: インポートした例文数
+
+        Raises:
+            FileNotFoundError: CSVファイルが見つからない場合
+            RuntimeError: インポートに失敗した場合
+        """
+        if not csv_path.exists():
+            raise FileNotFoundError(f"CSVファイルが見つかりません: {csv_path}")
+
+        try:
+            self._create_collection_if_not_exists()
+            with csv_path.open("r", encoding="utf-8") as f:
+                examples = read_intent_examples(list(csv.DictReader(f)))
+            vectors = self.model.encode([example["question"] for example in examples])
+            points = [
+                models.PointStruct(
+                    # 再インポート時に同じ例文を上書きするよう質問文から決まるIDを使う
+                    id=str(uuid.uuid5(uuid.NAMESPACE_URL, f"{SOURCE_INTENT_EXAMPLE}|{example['question']}")),
+                    vector=vector.tolist(),
+                    payload={**example, "source": SOURCE_INTENT_EXAMPLE},
+                )
+                for example, vector in zip(examples, vectors)
+            ]
+            if points:
+                self.qdrant_client.upsert(collection_name=self.collection_name, points=points)
+            return len(points)
+        except Exception as e:
+            logger.error(f"意図の例文のインポートエラー: {e}")
+            raise RuntimeError("意図の例文のインポートに失敗しました。") from e
+
     def _create_collection_if_not_exists(self):
         """
-        コレクションが存在しない場合は作成する
+        コレクションが存在しない場合は設定（HNSW、量子化、ベクトルのディスク配置）に従って作成し、
+        検索の絞り込みに使うペイロードのインデックスを作成する
         """
         try:
             collections = self.qdrant_client.get_collections().collections
@@ -76,13 +125,22 @@ class SchemaImporter:
             if not exists:
                 self.qdrant_client.create_collection(
                     collection_name=self.collection_name,
-                    vectors_config=models.VectorParams(
-                        size=self.model.get_sentence_embedding_dimension(),
-                        distance=models.Distance.COSINE
-                    )
+                    vectors_config=build_vectors_config(
+                        self.model.get_sentence_embedding_dimension(), self.qdrant_settings
+                    ),
+                    hnsw_config=build_hnsw_config(self.qdrant_settings),
+                    quantization_config=build_quantization_config(self.qdrant_settings),
                 )
                 logger.info(f"コレクション '{self.collection_name}' を作成しました。")
 
+            # 作成済みのインデックスを指定しても変更はない
+            for field_name in payload_index_fields(self.qdrant_settings):
+                self.qdrant_client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=models.PayloadSchemaType.KEYWORD,
+                )
+
         except Exception as e:
             logger.error(f"コレクション作成エラー: {e}")
             raise RuntimeError("コレクションの作成に失敗しました。") from e
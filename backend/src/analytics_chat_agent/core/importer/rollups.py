@@ -0,0 +1,84 @@
+"""
+日次集計テーブル（ロールアップ）の更新処理
+"""
+
+import logging
+from datetime import date
+from typing import List
+
+from ..database import PostgresConnection
+
+logger = logging.getLogger(__name__)
+
+# 日付 × イベント名 × ページURL ごとのイベント数
+_EVENT_ROLLUP_SELECT = """
+    SELECT
+        event_date,
+        event_name,
+        COALESCE(bq_column_page_location, '') AS page_location,
+        COUNT(*) AS event_count
+    FROM events
+    WHERE event_date IS NOT NULL AND event_name IS NOT NULL {date_filter}
+    GROUP BY 1, 2, 3
+"""
+
+# 日付ごとのユーザー数・セッション数・イベント数
+_SESSION_ROLLUP_SELECT = """
+    SELECT
+        event_date,
+        COUNT(DISTINCT user_pseudo_id) AS user_count,
+        COUNT(DISTINCT (user_pseudo_id, bq_column_ga_session_id))
+            FILTER (WHERE bq_column_ga_session_id IS NOT NULL) AS session_count,
+        COUNT(*) AS event_count
+    FROM events
+    WHERE event_date IS NOT NULL {date_filter}
+    GROUP BY 1
+"""
+
+
+class RollupBuilder:
+    """日次集計テーブルの更新クラス"""
+
+    def __init__(self, pg_conn: PostgresConnection):
+        """
+        Args:
+            pg_conn: PostgreSQL接続
+        """
+        self.pg_conn = pg_conn
+
+    def refresh(self, dates: List[date]) -> None:
+        """
+        指定日付の集計を再計算する
+
+        対象日付の集計行を削除してから events テーブルから再集計する。
+        削除と再集計は1つのトランザクションで行う。
+
+        Args:
+            dates: 再計算する日付のリスト
+        """
+        if not dates:
+            return
+
+        date_filter = "AND event_date = ANY(%(dates)s)"
+        query = f"""
+            DELETE FROM daily_event_rollup WHERE event_date = ANY(%(dates)s);
+            INSERT INTO daily_event_rollup (event_date, event_name, page_location, event_count)
+            {_EVENT_ROLLUP_SELECT.format(date_filter=date_filter)};
+            DELETE FROM daily_session_rollup WHERE event_date = ANY(%(dates)s);
+            INSERT INTO daily_session_rollup (event_date, user_count, session_count, event_count)
+            {_SESSION_ROLLUP_SELECT.format(date_filter=date_filter)};
+        """
+        self.pg_conn.execute_query(query, {"dates": list(dates)})
+        logger.info(f"{len(dates)}日分の集計テーブルを更新しました")
+
+    def rebuild_all(self) -> None:
+        """全期間の集計を再計算する"""
+        query = f"""
+            TRUNCATE daily_event_rollup, daily_session_rollup;
+            INSERT INTO daily_event_rollup (event_date, event_name, page_location, event_count)
+            {_EVENT_ROLLUP_SELECT.format(date_filter="")};
+            INSERT INTO daily_session_rollup (event_date, user_count, session_count, event_count)
+            {_SESSION_ROLLUP_SELECT.format(date_filter="")};
+        """
+        self.pg_conn.execute_query(query)
+        logger.info("全期間の集計テーブルを再構築しました")
@@ -0,0 +1,166 @@
+"""
+events テーブルへ挿入する行の固定レイアウト
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, Tuple
+
+from ..schema import STORAGE_JSONB
+
+# すべての行が持つ基本カラム（この順で先頭に並ぶ）
+BASE_COLUMNS = (
+    "event_bundle_sequence_id",
+    "event_date",
+    "event_timestamp",
+    "event_name",
+    "user_pseudo_id",
+    "batch_event_index",
+    "event_dimensions",
+    "event_params",
+)
+
+# event_params.value の値を探すフィールド（先に見つかった値を使用）
+VALUE_FIELDS = ("string_value", "int_value", "float_value", "double_value")
+
+# 基本カラムの位置
+EVENT_ID = 0
+EVENT_DATE = 1
+EVENT_TIMESTAMP = 2
+EVENT_NAME = 3
+USER_PSEUDO_ID = 4
+BATCH_EVENT_INDEX = 5
+EVENT_DIMENSIONS = 6
+EVENT_PARAMS = 7
+
+
+class EventRowLayout:
+    """
+    virtual_keys から決めた events の挿入カラムの並び
+
+    行は固定長のリストで表し、値のないカラムは NULL（None）のまま挿入する。
+    イベントごとにキーの組み合わせが異なっても、すべての行が同じカラムの並びになる。
+    """
+
+    __slots__ = ("columns", "param_positions", "jsonb_keys", "_template")
+
+    def __init__(self, virtual_keys: Dict[str, Dict[str, Any]]):
+        """
+        Args:
+            virtual_keys: キー名 → virtual_keys の行
+        """
+        column_keys = sorted(
+            name for name, vk in virtual_keys.items() if vk.get("storage") != STORAGE_JSONB
+        )
+        self.columns: List[str] = list(BASE_COLUMNS) + [f"bq_column_{key}" for key in column_keys]
+        self.param_positions: Dict[str, int] = {
+            key: len(BASE_COLUMNS) + i for i, key in enumerate(column_keys)
+        }
+        self.jsonb_keys = frozenset(
+            name for name, vk in virtual_keys.items() if vk.get("storage") == STORAGE_JSONB
+        )
+        self._template: List[Any] = [None] * len(self.columns)
+
+    def new_row(self) -> List[Any]:
+        """
+        すべてのカラムが NULL の行を作成する
+
+        Returns:
+            List[Any]: カラム数と同じ長さのリスト
+        """
+        return self._template.copy()
+
+
+def extract_param_value(param_value: Dict[str, Any]) -> Any:
+    """
+    event_params.value から値を取り出す
+
+    Args:
+        param_value: string_value / int_value などを持つ辞書
+
+    Returns:
+        Any: 最初に見つかった値（すべて NULL の場合は None）
+    """
+    for value_field in VALUE_FIELDS:
+        value = param_value.get(value_field)
+        if value is not None:
+            return value
+    return None
+
+
+def event_key(row: Any) -> Tuple[Any, ...]:
+    """
+    パラメータ単位の行が属するイベントを識別するキーを返す
+
+    GA4 の event_bundle_sequence_id は同じバッチで送信されたイベントで共有されるため、
+    タイムスタンプ・イベント名・ユーザー・バッチ内の位置と組み合わせて1イベントを識別する。
+
+    Args:
+        row: build_event_rows に渡す行
+
+    Returns:
+        Tuple[Any, ...]: イベントのキー
+    """
+    return (
+        row.event_bundle_sequence_id,
+        row.event_timestamp,
+        row.event_name,
+        row.user_pseudo_id,
+        row.batch_event_index,
+    )
+
+
+def build_event_rows(rows: Iterable[Any], layout: EventRowLayout) -> List[List[Any]]:
+    """
+    パラメータ単位の行をイベント単位の固定レイアウトの行にまとめる
+
+    Args:
+        rows: event_bundle_sequence_id, event_date, event_timestamp, event_name, user_pseudo_id,
+            batch_event_index, param_key, param_value を属性に持つ行（パラメータ1つにつき1行、
+            パラメータのないイベントは param_key が None の1行）
+        layout: 挿入する行のレイアウト
+
+    Returns:
+        List[List[Any]]: layout.columns の並びのイベント行（レイアウトにないキーは捨てる）
+    """
+    param_positions = layout.param_positions
+    jsonb_keys = layout.jsonb_keys
+    dimensions_cache: Dict[str, str] = {}
+    events: Dict[Tuple[Any, ...], List[Any]] = {}
+    for row in rows:
+        key = event_key(row)
+        event_row = events.get(key)
+        if event_row is None:
+            event_row = layout.new_row()
+            event_row[:EVENT_DIMENSIONS] = (
+                row.event_bundle_sequence_id,
+                row.event_date,
+                row.event_timestamp,
+                row.event_name,
+                row.user_pseudo_id,
+                row.batch_event_index,
+            )
+            dimensions = dimensions_cache.get(row.event_name)
+            if dimensions is None:
+                dimensions = json.dumps({"event_name": row.event_name})
+                dimensions_cache[row.event_name] = dimensions
+            event_row[EVENT_DIMENSIONS] = dimensions
+            events[key] = event_row
+
+        if row.param_key is None:
+            continue
+        value = extract_param_value(row.param_value)
+
+        # カラムに格納するキーは対応する位置に、それ以外は event_params に格納
+        position = param_positions.get(row.param_key)
+        if position is not None:
+            event_row[position] = value
+        elif row.param_key in jsonb_keys:
+            if event_row[EVENT_PARAMS] is None:
+                event_row[EVENT_PARAMS] = {}
+            event_row[EVENT_PARAMS][row.param_key] = value
+
+    event_rows = list(events.values())
+    for event_row in event_rows:
+        if event_row[EVENT_PARAMS] is not None:
+            event_row[EVENT_PARAMS] = json.dumps(event_row[EVENT_PARAMS])
+    return event_rows
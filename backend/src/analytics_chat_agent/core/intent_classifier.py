@@ -0,0 +1,272 @@
+"""
+ローカルの意図分類
+
+スキーマと同じ Qdrant のコレクションに登録した例文（source=intent_example）から、
+質問の埋め込みに近い k 件の例文の意図のキーを類似度で重み付けして多数決をとる。
+時間範囲は「過去30日」「last 7 days」などの表現をルールで解釈する。
+確信度がしきい値に満たない質問は、従来どおり Gemini で意図を抽出する。
+
+絞り込み条件（「モバイルの」「/productページの」など）や集計軸（「デバイス別」など）は例文から
+分類できない。期間の表現以外に例文で説明できない語（近傍の例文に含まれない語・フィールド名・
+絞り込みや集計軸を表す表現）を含む質問は other_params に質問文を入れ、集計テーブルやSQLテンプレートで
+サイト全体の集計を回答しないようにする。
+
+設定例（settings.json）:
+    "intent_classifier": {
+        "enabled": true,
+        "k": 5,
+        "min_similarity": 0.75,
+        "confidence_threshold": 0.6
+    }
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from .lexical_index import LexicalFieldIndex, tokenize
+from .qdrant_settings import SOURCE_INTENT_EXAMPLE, build_source_filter
+from .sql_templates import requests_grouping
+from .time_range import parse_time_phrase, remove_time_phrases
+from ..types import Intent
+
+logger = logging.getLogger(__name__)
+
+# 意図のキーごとの説明（Gemini のプロンプトの分析タイプと同じ）
+INTENT_DESCRIPTIONS = {
+    "user_count": "ユーザー数分析",
+    "page_view": "ページビュー数分析",
+    "event_count": "イベント数分析",
+    "sales_trend": "売上推移分析",
+    "conversion_rate": "コンバージョン率分析",
+    "retention": "リテンション分析",
+    "custom": "その他の分析",
+}
+
+# 絞り込み条件を表す表現
+_FILTER_PATTERN = re.compile(
+    r"のみ|だけ|以外|除く|除外|限定|に限|で絞|絞り込|「|=|＝|\bonly\b|\bexclud|\bwhere\b|\bexcept\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class IntentPrediction:
+    """
+    ローカルの意図分類の結果
+    """
+    key: str  # 意図のキー
+    confidence: float  # 確信度（近傍の類似度の合計に占める割合）
+    similarity: float  # 最も近い例文の類似度
+    time_range: Optional[str]  # 時間範囲（例：7d、期間の表現がない場合はNone）
+    unexplained: bool = False  # 期間の表現以外に例文で説明できない語を含むかどうか
+
+    def to_intent(self, question: str) -> Intent:
+        """
+        分類結果を Intent に変換する
+
+        Args:
+            question: 質問
+
+        Returns:
+            Intent: 意図
+        """
+        return Intent(
+            key=self.key,
+            description=INTENT_DESCRIPTIONS.get(self.key, ""),
+            parameters={
+                "time_range": self.time_range or "",
+                "other_params": question if self.unexplained else "",
+            },
+        )
+
+
+class IntentClassifier:
+    """例文の近傍で分析意図を分類するクラス"""
+
+    def __init__(
+        self,
+        client: Any,
+        collection_name: str,
+        search_params: Any = None,
+        k: int = 5,
+        min_similarity: float = 0.75,
+        confidence_threshold: float = 0.6,
+        lexical_index: Optional[LexicalFieldIndex] = None,
+    ):
+        """
+        Args:
+            client: Qdrantクライアント（または LocalVectorIndex）
+            collection_name: 例文を登録したコレクション名
+            search_params: 検索のパラメータ
+            k: 多数決に使用する近傍の例文の数
+            min_similarity: 最も近い例文に必要な類似度
+            confidence_threshold: ローカルの分類結果を採用する確信度の下限
+            lexical_index: 質問中のフィールド名の検出に使用する字句インデックス
+        """
+        self.client = client
+        self.collection_name = collection_name
+        self.search_params = search_params
+        self.k = k
+        self.min_similarity = min_similarity
+        self.confidence_threshold = confidence_threshold
+        self.lexical_index = lexical_index
+        self.local_count = 0
+        self.fallback_count = 0
+
+    @classmethod
+    def from_settings(
+        cls,
+        classifier_settings: Dict[str, Any],
+        client: Any,
+        collection_name: str,
+        search_params: Any = None,
+        lexical_index: Optional[LexicalFieldIndex] = None,
+    ) -> "IntentClassifier":
+        """
+        設定から分類器を生成する
+
+        Args:
+            classifier_settings: settings.json の intent_classifier セクション
+            client: Qdrantクライアント（または LocalVectorIndex）
+            collection_name: 例文を登録したコレクション名
+            search_params: 検索のパラメータ
+            lexical_index: 質問中のフィールド名の検出に使用する字句インデックス
+
+        Returns:
+            IntentClassifier: 分類器
+        """
+        return cls(
+            client,
+            collection_name,
+            search_params=search_params,
+            k=int(classifier_settings.get("k", 5)),
+            min_similarity=float(classifier_settings.get("min_similarity", 0.75)),
+            confidence_threshold=float(classifier_settings.get("confidence_threshold", 0.6)),
+            lexical_index=lexical_index,
+        )
+
+    @property
+    def local_rate(self) -> float:
+        """このプロセスでローカルに分類できた質問の割合"""
+        total = self.local_count + self.fallback_count
+        return self.local_count / total if total else 0.0
+
+    def predict(self, question: str, query_vector: Sequence[float]) -> Optional[IntentPrediction]:
+        """
+        近傍の例文から意図を分類する
+
+        Args:
+            question: 質問
+            query_vector: 質問の埋め込み
+
+        Returns:
+            Optional[IntentPrediction]: 分類結果（例文が見つからない場合はNone）
+        """
+        hits = self.client.search(
+            collection_name=self.collection_name,
+            query_vector=list(query_vector),
+            query_filter=build_source_filter(SOURCE_INTENT_EXAMPLE),
+            limit=self.k,
+            search_params=self.search_params,
+            with_payload=["key", "question"],
+        )
+        votes: Dict[str, float] = {}
+        for hit in hits:
+            # 類似度が負の例文は投票に含めない
+            votes[hit.payload["key"]] = votes.get(hit.payload["key"], 0.0) + max(hit.score, 0.0)
+        total = sum(votes.values())
+        if not hits or total <= 0:
+            return None
+        key = max(votes, key=votes.get)
+        return IntentPrediction(
+            key=key,
+            confidence=votes[key] / total,
+            similarity=max(hit.score for hit in hits if hit.payload["key"] == key),
+            time_range=parse_time_phrase(question),
+            unexplained=self._has_unexplained_terms(question, [hit.payload.get("question", "") for hit in hits]),
+        )
+
+    def _has_unexplained_terms(self, question: str, examples: List[str]) -> bool:
+        """
+        期間の表現以外に例文で説明できない語を含むかどうか
+
+        絞り込みや集計軸を表す表現、フィールド名、近傍の例文に含まれない語（「モバイル」「/product」など）の
+        いずれかを含む場合は、例文の意図だけでは回答が決まらない。
+
+        Args:
+            question: 質問
+            examples: 近傍の例文
+
+        Returns:
+            bool: 説明できない語を含む場合はTrue
+        """
+        if _FILTER_PATTERN.search(question) or requests_grouping(question):
+            return True
+        if self.lexical_index is not None and self.lexical_index.exact_matches(question):
+            return True
+        # 期間の表現を除いた質問と字句の区切りが揃うよう、例文も期間の表現を除いて分割する
+        known = {
+            token
+            for example in examples
+            for text in (example, remove_time_phrases(example))
+            for token in tokenize(text)
+        }
+        return any(
+            token not in known and not token.isdigit()
+            for token in tokenize(remove_time_phrases(question))
+        )
+
+    def classify(self, question: str, query_vector: Sequence[float]) -> Optional[Intent]:
+        """
+        確信度が十分な場合はローカルで意図を分類する
+
+        Args:
+            question: 質問
+            query_vector: 質問の埋め込み
+
+        Returns:
+            Optional[Intent]: 意図（Gemini で抽出すべき場合はNone）
+        """
+        prediction = self.predict(question, query_vector)
+        if (
+            prediction is None
+            or prediction.similarity < self.min_similarity
+            or prediction.confidence < self.confidence_threshold
+        ):
+            self.fallback_count += 1
+            if prediction is not None:
+                logger.debug(
+                    f"意図の確信度が低いためGeminiで抽出します: {prediction.key}"
+                    f"（確信度 {prediction.confidence:.2f}、類似度 {prediction.similarity:.2f}）"
+                )
+            return None
+        self.local_count += 1
+        logger.info(
+            f"意図をローカルで分類: {prediction.key}（確信度 {prediction.confidence:.2f}、"
+            f"ローカル分類率 {self.local_rate:.0%}）"
+        )
+        return prediction.to_intent(question)
+
+
+def read_intent_examples(rows: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    例文のCSVの行から有効な例文を取り出す（未知のキーと重複は除く）
+
+    Args:
+        rows: CSVの行（question、key）
+
+    Returns:
+        List[Dict[str, str]]: 例文
+    """
+    examples = []
+    seen = set()
+    for row in rows:
+        question = (row.get("question") or "").strip()
+        key = (row.get("key") or "").strip()
+        if not question or key not in INTENT_DESCRIPTIONS or question in seen:
+            continue
+        seen.add(question)
+        examples.append({"question": question, "key": key})
+    return examples
@@ -1,24 +1,36 @@
-import ast
-from typing import Dict, List, Union, Any
+from typing import Dict, List, Optional, Sequence, Union, Any
 
+from .intent_classifier import IntentClassifier
 from .llm import call_gemini
+from .llm_response import intent_from_dict, parse_json_response
 from ..types import Intent
 
 
-def extract_intent(question: str) -> Intent:
+def extract_intent(
+    question: str,
+    classifier: Optional[IntentClassifier] = None,
+    query_vector: Optional[Sequence[float]] = None,
+) -> Intent:
     """
     自然言語の質問から意図を抽出する関数
 
     Args:
         question (str): 自然言語での質問文
+        classifier: ローカルの意図分類器（確信度が十分な場合は Gemini を呼び出さない）
+        query_vector: 質問の埋め込み（classifier を指定する場合に必要）
 
     Returns:
         Intent: 抽出された意図を含むオブジェクト
     """
+    if classifier is not None and query_vector is not None:
+        intent = classifier.classify(question, query_vector)
+        if intent is not None:
+            return intent
+
     prompt = f"""次の質問の意図を抽出してください：
 「{question}」
 
-出力形式（Pythonの辞書形式）：
+出力形式（JSON）：
 {{
   "key": "分析の種類（例：user_count, page_view, event_count等）",
   "description": "分析の目的の説明",
@@ -31,30 +43,8 @@ def extract_intent(question: str) -> Intent:
 
     try:
         response = call_gemini(prompt)
-        result = ast.literal_eval(response)
-
-        # 必要なキーが存在することを確認
-        if not all(key in result for key in ["key", "description", "parameters"]):
-            return Intent(
-                key="",
-                description="",
-                parameters={}
-            )
-
-        # parametersの型チェック
-        if not isinstance(result["parameters"], dict):
-            return Intent(
-                key="",
-                description="",
-                parameters={}
-            )
-
-        return Intent(
-            key=result["key"],
-            description=result["description"],
-            parameters=result["parameters"]
-        )
-    except (SyntaxError, ValueError, TypeError):
+        return intent_from_dict(parse_json_response(response))
+    except ValueError:
         # 不正な形式の場合は空テンプレートを返す
         return Intent(
             key="",
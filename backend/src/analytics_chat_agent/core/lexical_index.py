@@ -0,0 +1,363 @@
+"""
+GA4フィールド名のメモリ上の字句インデックス
+
+ga4_schema.csv と ga4_virtual_key.csv から、フィールド名の完全一致・前方一致を引くトライと、
+名前と説明文を対象にした BM25 の転置インデックスを作成する。
+質問に `page_location` や `device.category` のようなフィールド名がそのまま含まれる場合は
+ベクトル検索を使わずに解決でき、それ以外の質問ではベクトル検索の結果と順位を融合する。
+
+日本語の説明文は形態素解析を使わず、かな・漢字の連続を文字の2-gramに分割して索引する。
+"""
+
+import csv
+import logging
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+SOURCE_SCHEMA = "schema"
+SOURCE_VIRTUAL = "virtual"
+
+# 質問中のフィールド名らしい字句（英数字・アンダースコア・ドット）
+_IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*")
+# 英数字の単語
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+# かな・カタカナ・漢字（長音記号を含む）の連続
+_CJK_PATTERN = re.compile(r"[぀-ヿ㐀-䶿一-鿿ｦ-ﾟ]+")
+
+# 前方一致の候補とする字句の最小文字数
+_MIN_PREFIX_LENGTH = 4
+
+
+@dataclass(frozen=True)
+class FieldEntry:
+    """
+    インデックスに登録したフィールド
+    """
+    name: str  # フィールド名（例: device.category、page_location）
+    description: str  # 説明
+    field_type: str  # 型（STRING、INTEGER など）
+    source: str  # schema または virtual
+    mode: str = "NULLABLE"  # NULLABLE または REPEATED
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    BM25 用に文字列を字句に分割する
+
+    英数字は単語単位（`device.category` は device と category）、日本語は文字の2-gramに分割する。
+
+    Args:
+        text: 文字列
+
+    Returns:
+        List[str]: 字句
+    """
+    lowered = text.lower()
+    tokens = _WORD_PATTERN.findall(lowered)
+    for run in _CJK_PATTERN.findall(lowered):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class NameTrie:
+    """フィールド名の完全一致・前方一致を引くトライ"""
+
+    def __init__(self):
+        self._root: Dict[str, dict] = {}
+
+    def insert(self, name: str, entry_id: int) -> None:
+        """
+        フィールド名を登録する
+
+        Args:
+            name: フィールド名（小文字で比較する）
+            entry_id: フィールドの番号
+        """
+        node = self._root
+        for char in name.lower():
+            node = node.setdefault(char, {})
+        node.setdefault("", []).append(entry_id)
+
+    def _find_node(self, text: str) -> Optional[dict]:
+        node = self._root
+        for char in text.lower():
+            node = node.get(char)
+            if node is None:
+                return None
+        return node
+
+    def exact(self, name: str) -> List[int]:
+        """
+        完全一致するフィールドを取得する
+
+        Args:
+            name: フィールド名
+
+        Returns:
+            List[int]: フィールドの番号
+        """
+        node = self._find_node(name)
+        return list(node.get("", [])) if node else []
+
+    def prefix(self, prefix: str, limit: int = 10) -> List[int]:
+        """
+        前方一致するフィールドを名前の短い順に取得する
+
+        Args:
+            prefix: 前方一致させる文字列
+            limit: 最大件数
+
+        Returns:
+            List[int]: フィールドの番号
+        """
+        node = self._find_node(prefix)
+        if node is None:
+            return []
+        found: List[int] = []
+        level = [node]
+        while level and len(found) < limit:
+            next_level = []
+            for current in level:
+                for char, child in sorted(current.items()):
+                    if char == "":
+                        found.extend(child)
+                    else:
+                        next_level.append(child)
+            level = next_level
+        return found[:limit]
+
+
+class BM25Index:
+    """BM25 による文書の検索"""
+
+    def __init__(self, documents: Sequence[Sequence[str]], k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            documents: 字句に分割した文書
+            k1: 語の出現回数の飽和を調整する係数
+            b: 文書長による補正の強さ
+        """
+        self.k1 = k1
+        self.b = b
+        self._term_freqs = [Counter(document) for document in documents]
+        self._lengths = [len(document) for document in documents]
+        self._average_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        document_freqs: Counter = Counter()
+        for term_freq in self._term_freqs:
+            document_freqs.update(term_freq.keys())
+        total = len(documents)
+        self._idf = {
+            term: math.log(1 + (total - freq + 0.5) / (freq + 0.5))
+            for term, freq in document_freqs.items()
+        }
+        self._postings: Dict[str, List[int]] = {}
+        for doc_id, term_freq in enumerate(self._term_freqs):
+            for term in term_freq:
+                self._postings.setdefault(term, []).append(doc_id)
+
+    def search(self, tokens: Iterable[str], limit: int = 10) -> List[Tuple[int, float]]:
+        """
+        字句に一致する文書をスコア順に取得する
+
+        Args:
+            tokens: 検索する字句
+            limit: 最大件数
+
+        Returns:
+            List[Tuple[int, float]]: 文書の番号とスコア
+        """
+        scores: Dict[int, float] = {}
+        for term in set(tokens):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc_id in self._postings[term]:
+                freq = self._term_freqs[doc_id][term]
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / self._average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+class LexicalFieldIndex:
+    """フィールド名のトライと説明文の BM25 をまとめた字句インデックス"""
+
+    def __init__(self, entries: List[FieldEntry]):
+        """
+        Args:
+            entries: 登録するフィールド
+        """
+        self.entries = entries
+        self.trie = NameTrie()
+        for entry_id, entry in enumerate(entries):
+            self.trie.insert(entry.name, entry_id)
+        # フィールド名は説明文より重視するため2回含める
+        self.bm25 = BM25Index([
+            tokenize(entry.name) * 2 + tokenize(entry.description) for entry in entries
+        ])
+
+    @classmethod
+    def from_csv(cls, schema_csv: Path, virtual_csv: Optional[Path] = None) -> "LexicalFieldIndex":
+        """
+        スキーマのCSVからインデックスを作成する
+
+        Args:
+            schema_csv: ga4_schema.csv のパス
+            virtual_csv: ga4_virtual_key.csv のパス
+
+        Returns:
+            LexicalFieldIndex: 字句インデックス
+        """
+        entries: List[FieldEntry] = []
+        seen = set()
+        sources = [(schema_csv, SOURCE_SCHEMA), (virtual_csv, SOURCE_VIRTUAL)]
+        for csv_path, source in sources:
+            if csv_path is None or not csv_path.exists():
+                continue
+            with csv_path.open("r", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    name = row["name"].strip()
+                    if not name or name in seen:
+                        continue
+                    seen.add(name)
+                    entries.append(FieldEntry(
+                        name=name,
+                        description=(row.get("description") or "").strip(),
+                        field_type=(row.get("field_type") or "STRING").strip(),
+                        source=source,
+                        mode=(row.get("mode") or "NULLABLE").strip(),
+                    ))
+        return cls(entries)
+
+    def get(self, name: str) -> Optional[FieldEntry]:
+        """
+        名前が完全一致するフィールドを取得する
+
+        Args:
+            name: フィールド名
+
+        Returns:
+            Optional[FieldEntry]: フィールド（登録されていない場合はNone）
+        """
+        entry_ids = self.trie.exact(name)
+        return self.entries[entry_ids[0]] if entry_ids else None
+
+    def exact_matches(self, query: str, source: Optional[str] = None) -> List[FieldEntry]:
+        """
+        質問に含まれるフィールド名と完全一致するフィールドを出現順に取得する
+
+        `event_params.page_location` のようにパラメータキーを親フィールド付きで書いた場合も
+        キー名として一致させる。RECORD 型（`device` など）はそのまま集計に使えないため除く。
+
+        Args:
+            query: 自然言語の質問
+            source: schema または virtual のフィールドに絞る場合に指定
+
+        Returns:
+            List[FieldEntry]: 一致したフィールド
+        """
+        matches: List[FieldEntry] = []
+        for identifier in _IDENTIFIER_PATTERN.findall(query):
+            candidates = [identifier]
+            if identifier.startswith("event_params."):
+                candidates.append(identifier[len("event_params."):])
+            for candidate in candidates:
+                entry = self.get(candidate)
+                if entry is None or entry.field_type == "RECORD" or entry in matches:
+                    continue
+                if source is None or entry.source == source:
+                    matches.append(entry)
+                    break
+        return matches
+
+    def search(
+        self, query: str, limit: int = 10, source: Optional[str] = None
+    ) -> List[Tuple[FieldEntry, float]]:
+        """
+        質問に近いフィールドを字句の一致で検索する
+
+        BM25 のスコアに加え、フィールド名の一部（4文字以上）を前方一致で含むフィールドを上位に加える。
+
+        Args:
+            query: 自然言語の質問
+            limit: 最大件数
+            source: schema または virtual のフィールドに絞る場合に指定
+
+        Returns:
+            List[Tuple[FieldEntry, float]]: フィールドとスコア（スコアの高い順）
+        """
+        # 絞り込みで件数が減らないよう全件をスコアリングしてから上位を選ぶ
+        scores: Dict[int, float] = {
+            entry_id: score
+            for entry_id, score in self.bm25.search(tokenize(query), limit=len(self.entries))
+            if source is None or self.entries[entry_id].source == source
+        }
+        top_score = max(scores.values(), default=1.0)
+        for identifier in _IDENTIFIER_PATTERN.findall(query):
+            if len(identifier) < _MIN_PREFIX_LENGTH:
+                continue
+            for entry_id in self.trie.prefix(identifier, limit=limit):
+                if source is None or self.entries[entry_id].source == source:
+                    scores[entry_id] = max(scores.get(entry_id, 0.0), top_score)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(self.entries[entry_id], score) for entry_id, score in ranked]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Tuple[Sequence[str], float]], k: int = 60
+) -> List[Tuple[str, float]]:
+    """
+    複数の検索結果の順位を重み付きの Reciprocal Rank Fusion で統合する
+
+    スコアの尺度が異なる検索（BM25 とコサイン類似度）を順位だけで統合する。
+
+    Args:
+        rankings: (順位順のフィールド名, 重み) のリスト
+        k: 下位の順位の影響を抑える定数
+
+    Returns:
+        List[Tuple[str, float]]: フィールド名と統合スコア（スコアの高い順）
+    """
+    fused: Dict[str, float] = {}
+    first_seen: Dict[str, int] = {}
+    for names, weight in rankings:
+        for rank, name in enumerate(names, start=1):
+            fused[name] = fused.get(name, 0.0) + weight / (k + rank)
+            first_seen.setdefault(name, len(first_seen))
+    return sorted(fused.items(), key=lambda item: (-item[1], first_seen[item[0]]))
+
+
+_cached_index: Optional[LexicalFieldIndex] = None
+_cached_paths: Optional[Tuple[Path, Path]] = None
+
+
+def get_lexical_index(schema_settings: Dict[str, str]) -> Optional[LexicalFieldIndex]:
+    """
+    設定のCSVから字句インデックスを取得する（同じCSVのインデックスはプロセス内で使い回す）
+
+    Args:
+        schema_settings: ga4_schema セクションの設定
+
+    Returns:
+        Optional[LexicalFieldIndex]: 字句インデックス（スキーマのCSVが見つからない場合はNone）
+    """
+    global _cached_index, _cached_paths
+    paths = (Path(schema_settings["csv_path"]), Path(schema_settings["virtual_csv_path"]))
+    if _cached_paths == paths:
+        return _cached_index
+    if not paths[0].exists():
+        logger.warning(f"スキーマのCSVが見つからないため字句インデックスを使用しません: {paths[0]}")
+        index = None
+    else:
+        index = LexicalFieldIndex.from_csv(*paths)
+        logger.info(f"字句インデックスを作成しました: {len(index.entries)}件")
+    _cached_index, _cached_paths = index, paths
+    return index
@@ -2,6 +2,7 @@ import logging
 import os
 import google.generativeai as genai
 from ...config import get_settings
+from ..tracing import trace_span
 
 logger = logging.getLogger(__name__)
 
@@ -41,14 +42,22 @@ def call_gemini(prompt: str) -> str:
         )
         
         # プロンプトの送信と応答の取得
-        response = model.generate_content(
-            prompt,
-            generation_config={
-                "temperature": 0.0,
-                "top_p": 1.0,
-                "top_k": 1,
-            }
-        )
+        with trace_span("llm.gemini", model=model_name) as span:
+            response = model.generate_content(
+                prompt,
+                generation_config={
+                    "temperature": 0.0,
+                    "top_p": 1.0,
+                    "top_k": 1,
+                }
+            )
+            usage = getattr(response, "usage_metadata", None)
+            if usage is not None:
+                span.set_attributes({
+                    "prompt_tokens": usage.prompt_token_count,
+                    "completion_tokens": usage.candidates_token_count,
+                    "total_tokens": usage.total_token_count,
+                })
         
         if not response.text:
             raise RuntimeError("Gemini APIからの応答が空です。")
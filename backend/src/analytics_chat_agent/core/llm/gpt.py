@@ -4,20 +4,26 @@ GPTの呼び出し機能を提供するモジュール
 
 import logging
 import os
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from openai import OpenAI
 from ...config import get_settings
+from ..tracing import trace_span
 
 logger = logging.getLogger(__name__)
 
-def call_gpt(prompt: str, model: Optional[str] = None) -> str:
+def call_gpt(
+    prompt: str,
+    model: Optional[str] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> str:
     """
     GPTを呼び出して応答を取得する
 
     Args:
         prompt: プロンプト
         model: モデル名（指定しない場合は設定ファイルの値を使用）
+        response_format: 応答の形式（例：{"type": "json_object"}、指定しない場合はテキスト）
 
     Returns:
         str: GPTの応答
@@ -34,16 +40,28 @@ def call_gpt(prompt: str, model: Optional[str] = None) -> str:
     if model is None:
         model = settings["openai"]["model_name"]
 
+    options: Dict[str, Any] = {}
+    if response_format is not None:
+        options["response_format"] = response_format
+
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "あなたは有能なAIアシスタントです。"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1,  # より決定論的な出力を得るため
-        )
-        return response.choices[0].message.content
+        with trace_span("llm.gpt", model=model) as span:
+            response = client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": "あなたは有能なAIアシスタントです。"},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.1,  # より決定論的な出力を得るため
+                **options,
+            )
+            if response.usage is not None:
+                span.set_attributes({
+                    "prompt_tokens": response.usage.prompt_tokens,
+                    "completion_tokens": response.usage.completion_tokens,
+                    "total_tokens": response.usage.total_tokens,
+                })
+            return response.choices[0].message.content
 
     except Exception as e:
         logger.error(f"GPTの呼び出し中にエラーが発生: {str(e)}")
@@ -0,0 +1,86 @@
+"""
+LLMの応答の解析
+
+Gemini・GPT の応答は JSON を指示しても、コードブロック（```json）で囲まれたり、
+Pythonの辞書形式（シングルクォート）で返されたりすることがあるため、ここで共通に解析する。
+"""
+
+import ast
+import json
+import re
+from typing import Any, Dict
+
+from ..types import Intent
+
+# 応答全体を囲むコードブロック（```json ... ``` など）
+_CODE_FENCE_PATTERN = re.compile(r"^```[a-zA-Z]*\s*\n?(.*?)\n?```$", re.DOTALL)
+
+
+def strip_code_fence(text: str) -> str:
+    """
+    応答全体を囲むコードブロックの記法を取り除く
+
+    Args:
+        text: LLMの応答
+
+    Returns:
+        str: コードブロックの中身（囲まれていない場合は前後の空白を除いた応答）
+    """
+    text = text.strip()
+    match = _CODE_FENCE_PATTERN.match(text)
+    return match.group(1).strip() if match else text
+
+
+def parse_json_response(response: str) -> Dict[str, Any]:
+    """
+    LLMの応答をJSONオブジェクトとして解析する
+
+    JSONとして解析できない場合は Python の辞書形式として解析する。
+
+    Args:
+        response: LLMの応答
+
+    Returns:
+        Dict[str, Any]: 解析結果
+
+    Raises:
+        ValueError: 辞書として解析できない場合
+    """
+    text = strip_code_fence(response or "")
+    try:
+        result = json.loads(text)
+    except json.JSONDecodeError:
+        try:
+            result = ast.literal_eval(text)
+        except (SyntaxError, ValueError, TypeError, MemoryError, RecursionError) as e:
+            raise ValueError(f"応答をJSONとして解析できません: {e}") from e
+    if not isinstance(result, dict):
+        raise ValueError(f"応答がJSONオブジェクトではありません: {type(result).__name__}")
+    return result
+
+
+def intent_from_dict(data: Dict[str, Any]) -> Intent:
+    """
+    解析した応答を Intent に変換する
+
+    Args:
+        data: key・description・parameters を含む辞書
+
+    Returns:
+        Intent: 意図
+
+    Raises:
+        ValueError: 必要なキーがない、または型が不正な場合
+    """
+    missing = [key for key in ("key", "description", "parameters") if key not in data]
+    if missing:
+        raise ValueError(f"意図に必要なキーがありません: {', '.join(missing)}")
+    if not isinstance(data["key"], str) or not isinstance(data["description"], str):
+        raise ValueError("意図の key と description は文字列である必要があります")
+    if not isinstance(data["parameters"], dict):
+        raise ValueError("意図の parameters はオブジェクトである必要があります")
+    return Intent(
+        key=data["key"],
+        description=data["description"],
+        parameters=data["parameters"],
+    )
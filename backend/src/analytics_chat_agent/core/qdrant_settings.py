@@ -0,0 +1,147 @@
+"""
+Qdrant のコレクションと検索の設定
+
+settings.json の qdrant.collection / qdrant.search から、コレクション作成時のパラメータ
+（HNSW、ベクトルのディスク配置、スカラー量子化、ペイロードインデックス）と検索時のパラメータを作成する。
+
+設定例:
+    "qdrant": {
+        "collection": {
+            "on_disk": false,
+            "hnsw": {"m": 16, "ef_construct": 100},
+            "quantization": {"enabled": true, "quantile": 0.99, "always_ram": true},
+            "payload_indexes": ["source"]
+        },
+        "search": {"hnsw_ef": 128, "rescore": true, "oversampling": 2.0}
+    }
+"""
+
+from typing import Any, Dict, List, Optional
+
+from qdrant_client.http import models
+
+# 検索結果で使用するペイロードのフィールド
+SEARCH_PAYLOAD_FIELDS = ["name", "description"]
+
+# スキーマと同じコレクションに登録する意図分類の例文の source
+SOURCE_INTENT_EXAMPLE = "intent_example"
+
+
+def build_vectors_config(vector_size: int, qdrant_settings: Dict[str, Any]) -> models.VectorParams:
+    """
+    コレクションのベクトルの設定を作成する
+
+    Args:
+        vector_size: ベクトルの次元数
+        qdrant_settings: qdrant セクションの設定
+
+    Returns:
+        models.VectorParams: ベクトルの設定
+    """
+    collection_settings = qdrant_settings.get("collection", {})
+    return models.VectorParams(
+        size=vector_size,
+        distance=models.Distance.COSINE,
+        on_disk=collection_settings.get("on_disk", False),
+    )
+
+
+def build_hnsw_config(qdrant_settings: Dict[str, Any]) -> Optional[models.HnswConfigDiff]:
+    """
+    HNSW インデックスの設定を作成する
+
+    Args:
+        qdrant_settings: qdrant セクションの設定
+
+    Returns:
+        Optional[models.HnswConfigDiff]: HNSW の設定（指定がない場合はNone）
+    """
+    hnsw_settings = qdrant_settings.get("collection", {}).get("hnsw")
+    if not hnsw_settings:
+        return None
+    return models.HnswConfigDiff(
+        m=hnsw_settings.get("m"),
+        ef_construct=hnsw_settings.get("ef_construct"),
+        on_disk=hnsw_settings.get("on_disk"),
+    )
+
+
+def build_quantization_config(qdrant_settings: Dict[str, Any]) -> Optional[models.ScalarQuantization]:
+    """
+    スカラー量子化（int8）の設定を作成する
+
+    Args:
+        qdrant_settings: qdrant セクションの設定
+
+    Returns:
+        Optional[models.ScalarQuantization]: 量子化の設定（無効な場合はNone）
+    """
+    quantization_settings = qdrant_settings.get("collection", {}).get("quantization", {})
+    if not quantization_settings.get("enabled", False):
+        return None
+    return models.ScalarQuantization(
+        scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8,
+            quantile=quantization_settings.get("quantile"),
+            always_ram=quantization_settings.get("always_ram", True),
+        )
+    )
+
+
+def payload_index_fields(qdrant_settings: Dict[str, Any]) -> List[str]:
+    """
+    keyword のペイロードインデックスを作成するフィールドを取得する
+
+    Args:
+        qdrant_settings: qdrant セクションの設定
+
+    Returns:
+        List[str]: フィールド名
+    """
+    return list(qdrant_settings.get("collection", {}).get("payload_indexes", ["source"]))
+
+
+def build_search_params(qdrant_settings: Dict[str, Any]) -> models.SearchParams:
+    """
+    検索時のパラメータを作成する
+
+    量子化したコレクションでは量子化したベクトルで候補を多めに取得し、元のベクトルで再スコアリングする。
+
+    Args:
+        qdrant_settings: qdrant セクションの設定
+
+    Returns:
+        models.SearchParams: 検索のパラメータ
+    """
+    search_settings = qdrant_settings.get("search", {})
+    quantization = None
+    if qdrant_settings.get("collection", {}).get("quantization", {}).get("enabled", False):
+        quantization = models.QuantizationSearchParams(
+            rescore=search_settings.get("rescore", True),
+            oversampling=search_settings.get("oversampling"),
+        )
+    return models.SearchParams(
+        hnsw_ef=search_settings.get("hnsw_ef", 128),  # HNSWインデックスの探索パラメータ
+        exact=False,  # 近似検索を使用
+        quantization=quantization,
+    )
+
+
+def build_source_filter(source: Optional[str]) -> models.Filter:
+    """
+    ペイロードの source で絞り込む条件を作成する
+
+    Args:
+        source: schema、virtual、intent_example のいずれか
+            （指定しない場合は意図分類の例文を除くフィールド全体を対象にする）
+
+    Returns:
+        models.Filter: 検索の条件
+    """
+    if source is None:
+        return models.Filter(
+            must_not=[models.FieldCondition(key="source", match=models.MatchValue(value=SOURCE_INTENT_EXAMPLE))]
+        )
+    return models.Filter(
+        must=[models.FieldCondition(key="source", match=models.MatchValue(value=source))]
+    )
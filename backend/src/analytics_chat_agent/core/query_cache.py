@@ -0,0 +1,322 @@
+"""
+BigQueryクエリ結果のローカルキャッシュ
+
+正規化したSQLと events_* テーブルのスナップショット（最新のテーブルサフィックスと
+最終更新時刻）をキーに、クエリ結果をParquet形式でディスクに保存する。
+新しい日次エクスポートが到着するとスナップショットが変わるため、古いエントリは
+自動的に参照されなくなり、LRUで削除される。
+
+CURRENT_DATE() などの現在日時を参照するSQLは日付が変わると対象期間が変わるため、
+BigQuery が現在日時を評価するタイムゾーン（既定は UTC）での当日の日付もキーに含める。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from google.api_core.exceptions import GoogleAPIError
+from google.cloud import bigquery
+
+logger = logging.getLogger(__name__)
+
+# SQLの字句（文字列リテラル・識別子・コメント・空白・その他）
+_SQL_TOKEN_PATTERN = re.compile(
+    r"(?P<string>'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")"
+    r"|(?P<identifier>`[^`]*`)"
+    r"|(?P<comment>(?:--|#)[^\n]*|/\*.*?\*/)"
+    r"|(?P<space>\s+)"
+    r"|(?P<other>[^'\"`\s\-/#]+|[\-/#])",
+    re.S,
+)
+
+# 現在日時を参照する関数（正規化したSQLは小文字）
+_CURRENT_TIME_PATTERN = re.compile(r"\bcurrent_(?:date|timestamp|datetime)\b")
+
+_SNAPSHOT_FILE_NAME = "snapshot.json"
+_ENTRY_SUFFIX = ".parquet"
+
+
+@dataclass
+class TableSnapshot:
+    """
+    events_* テーブルのスナップショット情報
+    """
+    table_suffix: str  # 最新の日次テーブルのサフィックス（例: 20240101）
+    last_modified: int  # events_* テーブル全体の最終更新時刻（エポックミリ秒）
+
+    def tag(self) -> str:
+        """キャッシュキーに含める文字列を返す"""
+        return f"{self.table_suffix}:{self.last_modified}"
+
+
+def normalize_sql(query: str) -> str:
+    """
+    キャッシュキー用にSQLを正規化する
+
+    コメントを除去し、連続する空白を1つにまとめ、文字列リテラルと
+    バッククォート識別子以外を小文字化する。末尾のセミコロンも除去する。
+
+    Args:
+        query: SQL文字列
+
+    Returns:
+        str: 正規化されたSQL
+    """
+    parts: List[str] = []
+    for match in _SQL_TOKEN_PATTERN.finditer(query):
+        kind = match.lastgroup
+        token = match.group()
+        if kind in ("string", "identifier"):
+            parts.append(token)
+        elif kind in ("comment", "space"):
+            if parts and parts[-1] != " ":
+                parts.append(" ")
+        else:
+            parts.append(token.lower())
+    normalized = "".join(parts).strip()
+    return normalized.rstrip(";").rstrip()
+
+
+def fetch_table_snapshot(
+    client: bigquery.Client, project_id: str, dataset_id: str
+) -> Optional[TableSnapshot]:
+    """
+    データセットのメタデータから events_* テーブルのスナップショットを取得する
+
+    日次テーブルは72時間以内に再エクスポートされることがあり、intradayテーブルは
+    随時更新されるため、最終更新時刻は全 events_* テーブルの最大値を使う。
+
+    Args:
+        client: BigQueryクライアント
+        project_id: プロジェクトID
+        dataset_id: データセットID
+
+    Returns:
+        Optional[TableSnapshot]: スナップショット（テーブルが存在しない場合はNone）
+    """
+    query = f"""
+        SELECT
+            MAX(IF(REGEXP_CONTAINS(table_id, r'^events_[0-9]{{8}}$'), table_id, NULL)) AS latest_table,
+            MAX(last_modified_time) AS last_modified_time
+        FROM `{project_id}.{dataset_id}.__TABLES__`
+        WHERE REGEXP_CONTAINS(table_id, r'^events_(intraday_)?[0-9]{{8}}$')
+    """
+    rows = list(client.query(query).result())
+    if not rows or rows[0]["latest_table"] is None:
+        return None
+    return TableSnapshot(
+        table_suffix=rows[0]["latest_table"][len("events_"):],
+        last_modified=int(rows[0]["last_modified_time"]),
+    )
+
+
+class QueryResultCache:
+    """
+    クエリ結果をParquetファイルとして保存するLRUキャッシュ
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_size_bytes: int,
+        snapshot_ttl_seconds: int = 60,
+        timezone: str = "UTC",
+    ):
+        """
+        Args:
+            cache_dir: キャッシュファイルの保存先ディレクトリ
+            max_size_bytes: キャッシュ全体の最大サイズ（バイト）
+            snapshot_ttl_seconds: テーブルスナップショットを再利用する秒数
+            timezone: BigQuery が CURRENT_DATE() などを評価するタイムゾーン
+        """
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.snapshot_ttl_seconds = snapshot_ttl_seconds
+        self.timezone = ZoneInfo(timezone)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_settings(cls, cache_settings: Dict[str, Any]) -> "QueryResultCache":
+        """
+        設定からキャッシュを生成する
+
+        Args:
+            cache_settings: settings.json の query_cache セクション
+
+        Returns:
+            QueryResultCache: キャッシュ
+        """
+        return cls(
+            cache_dir=Path(cache_settings["cache_dir"]),
+            max_size_bytes=int(cache_settings["max_size_mb"]) * 1024 * 1024,
+            snapshot_ttl_seconds=int(cache_settings.get("snapshot_ttl_seconds", 60)),
+            timezone=cache_settings.get("timezone", "UTC"),
+        )
+
+    def make_key(self, query: str, snapshot: TableSnapshot, now: Optional[datetime] = None) -> str:
+        """
+        キャッシュキーを生成する
+
+        Args:
+            query: SQL文字列
+            snapshot: テーブルスナップショット
+            now: 現在日時（省略時は現在時刻。CURRENT_DATE() などを参照するSQLの日付の判定に使用）
+
+        Returns:
+            str: キャッシュキー
+        """
+        normalized = normalize_sql(query)
+        material = f"{snapshot.tag()}\n{normalized}"
+        if _CURRENT_TIME_PATTERN.search(normalized):
+            today = (now or datetime.now(self.timezone)).astimezone(self.timezone).date()
+            material = f"{today.isoformat()}\n{material}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get_snapshot(
+        self, client: bigquery.Client, project_id: str, dataset_id: str
+    ) -> Optional[TableSnapshot]:
+        """
+        テーブルスナップショットを取得する
+
+        TTL内であればローカルに保存した値を返し、BigQueryへの問い合わせを省略する。
+
+        Args:
+            client: BigQueryクライアント
+            project_id: プロジェクトID
+            dataset_id: データセットID
+
+        Returns:
+            Optional[TableSnapshot]: スナップショット（取得できない場合はNone）
+        """
+        snapshot_path = self.cache_dir / _SNAPSHOT_FILE_NAME
+        scope = f"{project_id}.{dataset_id}"
+        try:
+            with open(snapshot_path) as f:
+                stored = json.load(f)
+            if (
+                stored["scope"] == scope
+                and time.time() - stored["fetched_at"] < self.snapshot_ttl_seconds
+            ):
+                return TableSnapshot(
+                    table_suffix=stored["table_suffix"],
+                    last_modified=stored["last_modified"],
+                )
+        except (OSError, ValueError, KeyError):
+            pass
+
+        try:
+            snapshot = fetch_table_snapshot(client, project_id, dataset_id)
+        except GoogleAPIError as e:
+            logger.warning(f"テーブルスナップショットの取得に失敗しました: {e}")
+            return None
+        if snapshot is None:
+            return None
+
+        self._write_atomic(
+            snapshot_path,
+            json.dumps({
+                "scope": scope,
+                "fetched_at": time.time(),
+                "table_suffix": snapshot.table_suffix,
+                "last_modified": snapshot.last_modified,
+            }).encode("utf-8"),
+        )
+        return snapshot
+
+    def get(
+        self, query: str, snapshot: TableSnapshot
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        キャッシュされたクエリ結果を取得する
+
+        Args:
+            query: SQL文字列
+            snapshot: テーブルスナップショット
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: クエリ結果（キャッシュがない場合はNone）
+        """
+        path = self._entry_path(self.make_key(query, snapshot))
+        try:
+            table = pq.read_table(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, pa.ArrowException) as e:
+            logger.warning(f"キャッシュの読み込みに失敗しました: {path}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+
+        # 参照されたエントリを最新として扱う
+        os.utime(path, None)
+        return table.to_pylist()
+
+    def put(
+        self, query: str, snapshot: TableSnapshot, rows: List[Dict[str, Any]]
+    ) -> None:
+        """
+        クエリ結果をキャッシュに保存する
+
+        Args:
+            query: SQL文字列
+            snapshot: テーブルスナップショット
+            rows: クエリ結果
+        """
+        path = self._entry_path(self.make_key(query, snapshot))
+        try:
+            table = pa.Table.from_pylist(rows)
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            logger.warning(f"クエリ結果をキャッシュ可能な形式に変換できませんでした: {e}")
+            return
+
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            pq.write_table(table, tmp_path, compression="zstd")
+            os.replace(tmp_path, path)
+        except (OSError, pa.ArrowException) as e:
+            logger.warning(f"キャッシュの書き込みに失敗しました: {path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        self._evict()
+
+    def _entry_path(self, key: str) -> Path:
+        """キャッシュキーに対応するファイルパスを返す"""
+        return self.cache_dir / f"{key}{_ENTRY_SUFFIX}"
+
+    def _evict(self) -> None:
+        """最大サイズを超えた分を最終参照時刻の古い順に削除する"""
+        entries = []
+        for path in self.cache_dir.glob(f"*{_ENTRY_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total_size <= self.max_size_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
+            logger.debug(f"キャッシュエントリを削除しました: {path.name}")
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        """一時ファイル経由でファイルを書き込む"""
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"キャッシュの書き込みに失敗しました: {path}: {e}")
+            tmp_path.unlink(missing_ok=True)
@@ -0,0 +1,221 @@
+"""
+分析クエリの実行先を振り分けるモジュール
+
+解決されたフィールドがPostgreSQLのミラーに存在し、対象期間のデータが
+インポート済みであれば、BigQueryではなくローカルのPostgreSQLで実行する。
+"""
+
+import logging
+from contextlib import closing
+from dataclasses import dataclass, field
+from datetime import date
+from itertools import islice
+from typing import Any, Dict, List, Optional, Set
+
+from .database import PostgresConnection
+from .schema import SchemaManager, PG_TYPES, STORAGE_JSONB, param_expression
+from .time_range import parse_time_range
+from ..types import FieldMappingResult, Intent
+
+logger = logging.getLogger(__name__)
+
+ENGINE_POSTGRES = "postgres"
+ENGINE_BIGQUERY = "bigquery"
+
+# インポーターが値を投入する events テーブルの基本カラムとその型
+_BASE_COLUMNS = {
+    "event_date": "DATE",
+    "event_timestamp": "TIMESTAMPTZ",
+    "event_name": "TEXT",
+    "event_bundle_sequence_id": "BIGINT",
+}
+
+# ミラーでは bq_column_* に展開済みのため、判定対象から除くフィールド
+_PIVOTED_FIELD_PREFIX = "event_params"
+
+
+@dataclass
+class RouteDecision:
+    """
+    クエリの実行先の判定結果
+    """
+    engine: str  # postgres または bigquery
+    reason: str  # 判定理由
+    columns: Dict[str, str] = field(default_factory=dict)  # ローカルのカラム名（またはJSONBの参照式） → 型
+    start_date: Optional[date] = None  # 対象期間の開始日
+    end_date: Optional[date] = None  # 対象期間の終了日
+
+
+class QueryRouter:
+    """分析クエリの実行先を振り分けるクラス"""
+
+    def __init__(
+        self,
+        pg_conn: PostgresConnection,
+        statement_timeout_ms: int = 10000,
+        max_rows: int = 100000,
+        itersize: int = 2000,
+    ):
+        """
+        Args:
+            pg_conn: PostgreSQL接続
+            statement_timeout_ms: ローカル実行時のステートメントタイムアウト（ミリ秒）
+            max_rows: ローカル実行時に取得する最大行数（超えた分は切り捨てる）
+            itersize: ローカル実行時に1回のラウンドトリップで取得する行数
+        """
+        self.pg_conn = pg_conn
+        self.schema_manager = SchemaManager(pg_conn)
+        self.statement_timeout_ms = statement_timeout_ms
+        self.max_rows = max_rows
+        self.itersize = itersize
+        self._field_columns: Optional[Dict[str, str]] = None
+        self._column_types: Dict[str, str] = {}
+        self._virtual_key_names: Set[str] = set()
+
+    def route(self, intent: Intent, field_mapping: FieldMappingResult) -> RouteDecision:
+        """
+        クエリの実行先を判定する
+
+        Args:
+            intent: 抽出された意図
+            field_mapping: フィールドマッピング結果
+
+        Returns:
+            RouteDecision: 判定結果
+        """
+        field_columns = self._load_field_columns()
+
+        # パラメータキーの参照回数を記録（参照の多いキーはカラムに昇格される）
+        self.schema_manager.record_key_usage(
+            [f.name for f in field_mapping.fields if f.name in self._virtual_key_names]
+        )
+
+        missing = [
+            f.name for f in field_mapping.fields
+            if not f.name.startswith(_PIVOTED_FIELD_PREFIX) and f.name not in field_columns
+        ]
+        if missing:
+            return RouteDecision(
+                engine=ENGINE_BIGQUERY,
+                reason=f"ローカルに存在しないフィールドがあります: {', '.join(missing)}",
+            )
+
+        date_range = parse_time_range(intent.parameters.get("time_range"))
+        if date_range is None:
+            return RouteDecision(
+                engine=ENGINE_BIGQUERY,
+                reason=f"対象期間を特定できません: {intent.parameters.get('time_range')}",
+            )
+
+        start_date, end_date = date_range
+        expected_days = (end_date - start_date).days + 1
+        covered_days = self._count_imported_days(start_date, end_date)
+        if covered_days < expected_days:
+            return RouteDecision(
+                engine=ENGINE_BIGQUERY,
+                reason=(
+                    f"{start_date}〜{end_date} のうち {covered_days}/{expected_days} 日分しか"
+                    "インポートされていません"
+                ),
+            )
+
+        return RouteDecision(
+            engine=ENGINE_POSTGRES,
+            reason=f"{start_date}〜{end_date} のデータがローカルに揃っています",
+            columns=dict(self._column_types),
+            start_date=start_date,
+            end_date=end_date,
+        )
+
+    def run_local(self, sql: str) -> List[Dict[str, Any]]:
+        """
+        生成されたSQLをローカルのPostgreSQLで読み取り専用で実行する
+
+        Args:
+            sql: PostgreSQL方言のSQL
+
+        結果はサーバーサイドカーソルで itersize 行ずつ取得し、max_rows 行で打ち切る。
+
+        Returns:
+            List[Dict[str, Any]]: クエリ結果
+
+        Raises:
+            RuntimeError: SELECT文でない場合
+            psycopg2.Error: PostgreSQLエラーが発生した場合
+        """
+        head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+        if head not in ("SELECT", "WITH"):
+            raise RuntimeError("クエリはSELECT文で始まる必要があります。")
+
+        connection = self.pg_conn.connection
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION READ ONLY")
+                cursor.execute(
+                    "SET LOCAL statement_timeout = %(timeout)s",
+                    {"timeout": self.statement_timeout_ms},
+                )
+            # 同じトランザクション内でカーソルを宣言するため、上記の設定が適用される
+            with closing(self.pg_conn.iter_query(sql, itersize=self.itersize)) as rows:
+                results = [dict(row) for row in islice(rows, self.max_rows + 1)]
+            if len(results) > self.max_rows:
+                logger.warning(f"ローカル実行の結果が{self.max_rows}行を超えたため切り捨てます")
+                del results[self.max_rows:]
+            return results
+        finally:
+            connection.rollback()
+
+    def _load_field_columns(self) -> Dict[str, str]:
+        """
+        GA4のフィールド名とローカルのカラム名の対応を取得する
+
+        Returns:
+            Dict[str, str]: フィールド名 → eventsテーブルのカラム名（JSONBに格納したキーは参照式）
+        """
+        if self._field_columns is not None:
+            return self._field_columns
+
+        table_columns = set(self.schema_manager.get_table_columns("events"))
+        field_columns: Dict[str, str] = {}
+        column_types: Dict[str, str] = {}
+        for column_name, pg_type in _BASE_COLUMNS.items():
+            if column_name in table_columns:
+                field_columns[column_name] = column_name
+                column_types[column_name] = pg_type
+
+        for virtual_key in self.schema_manager.iter_virtual_keys():
+            name, field_type = virtual_key["name"], virtual_key["field_type"]
+            self._virtual_key_names.add(name)
+            if virtual_key.get("storage") == STORAGE_JSONB and "event_params" in table_columns:
+                column_name = param_expression(name, field_type)
+            else:
+                column_name = f"bq_column_{name}"
+                if column_name not in table_columns:
+                    continue
+            field_columns[name] = column_name
+            column_types[column_name] = PG_TYPES.get(field_type, "TEXT")
+
+        self._field_columns = field_columns
+        self._column_types = column_types
+        return field_columns
+
+    def _count_imported_days(self, start_date: date, end_date: date) -> int:
+        """
+        期間内でインポート済みの日数を数える
+
+        Args:
+            start_date: 開始日
+            end_date: 終了日
+
+        Returns:
+            int: イベントが存在する日数
+        """
+        query = """
+            SELECT COUNT(DISTINCT event_date) AS days
+            FROM events
+            WHERE event_date BETWEEN %(start_date)s AND %(end_date)s
+        """
+        result = self.pg_conn.execute_query(
+            query, {"start_date": start_date, "end_date": end_date}
+        )
+        return result[0]["days"] if result else 0
@@ -2,6 +2,22 @@
 スキーマ管理
 """
 
-from .manager import SchemaManager
+from .manager import (
+    SchemaManager,
+    EVENT_PARTITIONED_TABLES,
+    PG_TYPES,
+    STORAGE_COLUMN,
+    STORAGE_JSONB,
+    param_expression,
+    partition_name,
+)
 
-__all__ = ["SchemaManager"] 
\ No newline at end of file
+__all__ = [
+    "SchemaManager",
+    "EVENT_PARTITIONED_TABLES",
+    "PG_TYPES",
+    "STORAGE_COLUMN",
+    "STORAGE_JSONB",
+    "param_expression",
+    "partition_name",
+] 
\ No newline at end of file
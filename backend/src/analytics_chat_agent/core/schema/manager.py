@@ -3,11 +3,151 @@
 """
 
 import logging
-from typing import Dict, List, Optional, Tuple, Any
+from datetime import date, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Any
+from psycopg2 import sql
 from ..database import PostgresConnection
 
 logger = logging.getLogger(__name__)
 
+# event_date で日別にパーティション化するテーブル（親テーブルが先）
+EVENT_PARTITIONED_TABLES = [
+    "events",
+    "app_info",
+    "collected_traffic_source",
+    "device",
+    "web_info",
+    "ecommerce",
+    "event_dimensions",
+    "items",
+    "item_params",
+    "value",
+    "privacy_info",
+    "publisher",
+    "session_traffic_source_last_click",
+    "cm360_campaign",
+    "cross_channel_campaign",
+    "dv360_campaign",
+    "google_ads_campaign",
+    "manual_campaign",
+    "sa360_campaign",
+    "traffic_source",
+    "user_ltv",
+]
+
+# 子テーブル → 外部キーで参照する親テーブル（パーティション化への移行時に親の event_date を引き継ぐ）
+EVENT_PARENT_TABLES = {
+    "app_info": "events",
+    "collected_traffic_source": "events",
+    "device": "events",
+    "web_info": "device",
+    "ecommerce": "events",
+    "event_dimensions": "events",
+    "items": "events",
+    "item_params": "items",
+    "value": "item_params",
+    "privacy_info": "events",
+    "publisher": "events",
+    "session_traffic_source_last_click": "events",
+    "cm360_campaign": "session_traffic_source_last_click",
+    "cross_channel_campaign": "session_traffic_source_last_click",
+    "dv360_campaign": "session_traffic_source_last_click",
+    "google_ads_campaign": "session_traffic_source_last_click",
+    "manual_campaign": "session_traffic_source_last_click",
+    "sa360_campaign": "session_traffic_source_last_click",
+    "traffic_source": "events",
+    "user_ltv": "events",
+}
+
+# パーティション化への移行中にパーティション化前のテーブルを置くスキーマ
+LEGACY_SCHEMA = "ga4_legacy"
+
+# パーティション化前の events の行の日付（event_date がない行は event_timestamp の日付）
+_LEGACY_EVENT_DAY = "COALESCE(event_date, event_timestamp::date)"
+
+
+# virtual_keys.storage の値
+STORAGE_COLUMN = "column"  # events の bq_column_<key> カラムに格納
+STORAGE_JSONB = "jsonb"  # events.event_params（JSONB）に格納
+
+# virtual_keys の型とPostgreSQLの型の対応
+PG_TYPES = {
+    "STRING": "TEXT",
+    "INTEGER": "INTEGER",
+    "BIGINT": "BIGINT",
+    "FLOAT": "FLOAT",
+    "BOOLEAN": "BOOLEAN",
+}
+
+
+def param_expression(key: str, field_type: str) -> str:
+    """
+    event_params（JSONB）に格納したパラメータを参照するSQL式を返す
+
+    Args:
+        key: パラメータキー
+        field_type: virtual_keys の型
+
+    Returns:
+        str: SQL式（例: (event_params->>'page_location')::TEXT）
+    """
+    escaped = key.replace("'", "''")
+    return f"(event_params->>'{escaped}')::{PG_TYPES.get(field_type, 'TEXT')}"
+
+
+def _param_guard(key: sql.Composable, field_type: str) -> sql.Composable:
+    """
+    event_params の値を field_type に変換できるかを判定するSQL式を返す
+
+    値の型を CASE で確認してから数値として比較するため、変換できない値でもエラーにならない。
+
+    Args:
+        key: パラメータキー（sql.Literal）
+        field_type: virtual_keys の型
+
+    Returns:
+        sql.Composable: 判定のSQL式（NULL の値は偽）
+    """
+    value = sql.SQL("event_params->{}").format(key)
+    number = sql.SQL("(event_params->>{})::NUMERIC").format(key)
+    if field_type == "BOOLEAN":
+        return sql.SQL("jsonb_typeof({}) = 'boolean'").format(value)
+    if field_type in ("INTEGER", "BIGINT"):
+        bits = 31 if field_type == "INTEGER" else 63
+        check = sql.SQL("{number} = trunc({number}) AND {number} BETWEEN {low} AND {high}").format(
+            number=number, low=sql.Literal(-2 ** bits), high=sql.Literal(2 ** bits - 1)
+        )
+    elif field_type == "FLOAT":
+        check = sql.SQL("abs({}) < 1e308").format(number)
+    else:
+        return sql.SQL("jsonb_typeof({}) <> 'null'").format(value)
+    return sql.SQL("CASE WHEN jsonb_typeof({value}) = 'number' THEN {check} ELSE FALSE END").format(
+        value=value, check=check
+    )
+
+
+def partition_name(table_name: str, day: date) -> str:
+    """
+    日別パーティションのテーブル名を返す
+
+    Args:
+        table_name: 親テーブル名
+        day: 日付
+
+    Returns:
+        str: パーティション名（例: events_p20240101）
+    """
+    return f"{table_name}_p{day.strftime('%Y%m%d')}"
+
+def _create_partition_statement(table_name: str, day: date) -> str:
+    """日別パーティションを作成するSQLを返す"""
+    return f"""
+                    CREATE TABLE {partition_name(table_name, day)}
+                    PARTITION OF {table_name}
+                    FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')
+                """
+
+
 class SchemaManager:
     """スキーマ管理クラス"""
 
@@ -43,8 +183,406 @@ class SchemaManager:
         Returns:
             List[Dict[str, Any]]: 仮想キーのリスト
         """
+        return list(self.iter_virtual_keys())
+
+    def iter_virtual_keys(self) -> Iterator[Dict[str, Any]]:
+        """
+        仮想キーをサーバーサイドカーソルで1件ずつ取得
+
+        Yields:
+            Dict[str, Any]: 仮想キー
+        """
         query = "SELECT * FROM virtual_keys"
-        return self.pg_conn.execute_query(query)
+        yield from self.pg_conn.iter_query(query)
+
+    def get_event_partition_dates(self) -> List[date]:
+        """
+        events テーブルのパーティションが存在する日付の一覧を取得
+
+        Returns:
+            List[date]: 日付のリスト（昇順）
+        """
+        return sorted(self._get_partitions().get("events", {}))
+
+    def ensure_event_partitions(self, dates: Iterable[date]) -> List[date]:
+        """
+        指定日付のパーティションを events と子テーブルに作成（存在する場合は何もしない）
+
+        Args:
+            dates: パーティションが必要な日付
+
+        Returns:
+            List[date]: 新たにパーティションを作成した日付
+        """
+        existing = self._get_partitions()
+        created = []
+        for day in sorted(set(dates)):
+            statements = [
+                _create_partition_statement(table, day)
+                for table in EVENT_PARTITIONED_TABLES
+                if day not in existing.get(table, {})
+            ]
+            if not statements:
+                continue
+            # 1日分のパーティションは1つのトランザクションで作成する
+            self.pg_conn.execute_query(";".join(statements))
+            created.append(day)
+
+        if created:
+            logger.info(f"{len(created)}日分のパーティションを作成しました")
+        return created
+
+    def drop_event_partitions(self, dates: Optional[Iterable[date]] = None) -> List[date]:
+        """
+        指定日付のパーティションを events と子テーブルから切り離して削除
+
+        外部キーで参照されているパーティションは切り離せないため、子テーブルから順に削除する。
+
+        Args:
+            dates: 削除する日付（指定しない場合はすべてのパーティション）
+
+        Returns:
+            List[date]: パーティションを削除した日付
+        """
+        existing = self._get_partitions()
+        if dates is None:
+            targets = {day for partitions in existing.values() for day in partitions}
+        else:
+            targets = set(dates)
+
+        dropped = []
+        for day in sorted(targets):
+            statements = []
+            for table in reversed(EVENT_PARTITIONED_TABLES):
+                name = existing.get(table, {}).get(day)
+                if name is not None:
+                    statements.append(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                    statements.append(f"DROP TABLE {name}")
+            if not statements:
+                continue
+            # 1日分の切り離しと削除は1つのトランザクションで行う
+            self.pg_conn.execute_query(";".join(statements))
+            dropped.append(day)
+
+        if dropped:
+            logger.info(f"{len(dropped)}日分のパーティションを削除しました")
+        return dropped
+
+    def is_events_partitioned(self) -> bool:
+        """
+        events テーブルがパーティション化されているか確認
+
+        Returns:
+            bool: event_date で範囲パーティション化されている場合はTrue（events がない場合はFalse）
+        """
+        result = self.pg_conn.execute_query(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass('public.events')"
+        )
+        return bool(result) and result[0]["relkind"] == "p"
+
+    def migrate_to_partitioned(self, schema_sql: str, copy_rows: bool = True) -> int:
+        """
+        パーティション化前の events と子テーブルを、パーティション化したテーブルに移行
+
+        既存のテーブルを一時スキーマに移してから schema_sql でテーブルを作り直し、
+        日別パーティションを作成して INSERT ... SELECT で行を移す。
+        events の event_date が NULL の行は event_timestamp の日付を使い、どちらもない行は移行しない。
+        子テーブルの event_date は親テーブルの行から引き継ぐ（親のない行は移行しない）。
+        インポート時に追加したカラム（bq_column_<key> など）は移行先にも追加する。
+        すべての処理を1つのトランザクションで行い、最後に一時スキーマを削除する。
+
+        Args:
+            schema_sql: data/sql/schema.sql の内容
+            copy_rows: False の場合は行を移さずにテーブルを作り直す（再インポートが必要）
+
+        Returns:
+            int: 移行した events の行数
+
+        Raises:
+            RuntimeError: events がない、すでにパーティション化されている、または
+                event_date カラムがなく行を移せない場合
+        """
+        if self.is_events_partitioned():
+            raise RuntimeError("events テーブルはすでにパーティション化されています")
+
+        legacy_columns = self._get_legacy_columns()
+        if "events" not in legacy_columns:
+            raise RuntimeError("移行する events テーブルがありません")
+        if copy_rows and "event_date" not in legacy_columns["events"]:
+            raise RuntimeError(
+                "events テーブルに event_date カラムがないため行を移行できません。"
+                "テーブルを作り直してから全期間を再インポートしてください"
+            )
+
+        legacy = sql.Identifier(LEGACY_SCHEMA)
+        statements: List[sql.Composable] = [sql.SQL("CREATE SCHEMA {}").format(legacy)]
+        # 外部キー・インデックス・シーケンスもテーブルと一緒に一時スキーマに移る
+        statements += [
+            sql.SQL("ALTER TABLE {} SET SCHEMA {}").format(sql.Identifier(table), legacy)
+            for table in EVENT_PARTITIONED_TABLES
+            if table in legacy_columns
+        ]
+        statements.append(sql.SQL(schema_sql.strip().rstrip(";")))
+
+        moved = 0
+        if copy_rows:
+            counts = self.pg_conn.execute_query(
+                f"SELECT {_LEGACY_EVENT_DAY} AS day, COUNT(*) AS count FROM events GROUP BY 1"
+            )
+            days = sorted(row["day"] for row in counts if row["day"] is not None)
+            moved = sum(row["count"] for row in counts if row["day"] is not None)
+            skipped = sum(row["count"] for row in counts if row["day"] is None)
+            if skipped:
+                logger.warning(f"日付のない {skipped}件のイベントは移行しません")
+
+            statements += [
+                sql.SQL(_create_partition_statement(table, partition_day))
+                for partition_day in days
+                for table in EVENT_PARTITIONED_TABLES
+            ]
+            for table in EVENT_PARTITIONED_TABLES:
+                columns = legacy_columns.get(table)
+                if columns is None:
+                    continue
+                statements += self._copy_legacy_rows(table, columns)
+        statements.append(sql.SQL("DROP SCHEMA {} CASCADE").format(legacy))
+
+        # 複数の文は1つのトランザクションで実行される
+        self.pg_conn.execute_query(sql.SQL(";\n").join(statements))
+        logger.info(f"events と子テーブルをパーティション化しました（{moved}件のイベントを移行）")
+        return moved
+
+    def _get_legacy_columns(self) -> Dict[str, Dict[str, str]]:
+        """
+        パーティション化前のテーブルごとのカラムと型を取得
+
+        Returns:
+            Dict[str, Dict[str, str]]: テーブル名 → カラム名 → 型（カラムの定義順）
+        """
+        query = """
+            SELECT c.relname AS table_name, a.attname AS column_name,
+                format_type(a.atttypid, a.atttypmod) AS column_type
+            FROM pg_attribute a
+            JOIN pg_class c ON c.oid = a.attrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'public' AND c.relname = ANY(%(tables)s)
+                AND a.attnum > 0 AND NOT a.attisdropped
+            ORDER BY c.relname, a.attnum
+        """
+        columns: Dict[str, Dict[str, str]] = {}
+        for row in self.pg_conn.execute_query(query, {"tables": EVENT_PARTITIONED_TABLES}):
+            columns.setdefault(row["table_name"], {})[row["column_name"]] = row["column_type"]
+        return columns
+
+    def _copy_legacy_rows(self, table: str, columns: Dict[str, str]) -> List[sql.Composable]:
+        """
+        一時スキーマのテーブルから作り直したテーブルに行を移すSQLを返す
+
+        Args:
+            table: テーブル名
+            columns: パーティション化前のカラム名 → 型
+
+        Returns:
+            List[sql.Composable]: カラムの追加・行の挿入・シーケンスの更新のSQL
+        """
+        target = sql.Identifier(table)
+        source = sql.Identifier(LEGACY_SCHEMA, table)
+        copied = [name for name in columns if name != "event_date"]
+        # スキーマにないカラムを追加（スキーマ定義済みのカラムはそのまま）
+        statements: List[sql.Composable] = [
+            sql.SQL("ALTER TABLE {} ADD COLUMN IF NOT EXISTS {} {}").format(
+                target, sql.Identifier(name), sql.SQL(columns[name])
+            )
+            for name in copied
+        ]
+
+        column_list = sql.SQL(", ").join(sql.Identifier(name) for name in copied + ["event_date"])
+        source_columns = sql.SQL(", ").join(sql.Identifier("src", name) for name in copied)
+        parent = EVENT_PARENT_TABLES.get(table)
+        if parent is None:
+            statements.append(sql.SQL(
+                "INSERT INTO {target} ({columns}) SELECT {source_columns}, {day} FROM {source} AS src "
+                "WHERE {day} IS NOT NULL"
+            ).format(target=target, columns=column_list, source_columns=source_columns,
+                     day=sql.SQL(_LEGACY_EVENT_DAY), source=source))
+        else:
+            statements.append(sql.SQL(
+                "INSERT INTO {target} ({columns}) SELECT {source_columns}, parent.event_date "
+                "FROM {source} AS src JOIN {parent} AS parent ON parent.id = src.parent_id"
+            ).format(target=target, columns=column_list, source_columns=source_columns,
+                     source=source, parent=sql.Identifier(parent)))
+        if "id" in columns:
+            statements.append(sql.SQL(
+                "SELECT setval(pg_get_serial_sequence({name}, 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {target}"
+            ).format(name=sql.Literal(table), target=target))
+        return statements
+
+    def _get_partitions(self) -> Dict[str, Dict[date, str]]:
+        """
+        パーティション化したテーブルごとの日別パーティションを取得
+
+        Returns:
+            Dict[str, Dict[date, str]]: 親テーブル名 → 日付 → パーティション名
+        """
+        query = """
+            SELECT parent.relname AS table_name, child.relname AS partition_name
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = ANY(%(tables)s)
+        """
+        rows = self.pg_conn.execute_query(query, {"tables": EVENT_PARTITIONED_TABLES})
+        partitions: Dict[str, Dict[date, str]] = {}
+        for row in rows:
+            table_name, name = row["table_name"], row["partition_name"]
+            suffix = name[len(table_name) + 2:]
+            if not name.startswith(f"{table_name}_p") or len(suffix) != 8 or not suffix.isdigit():
+                continue
+            day = date(int(suffix[:4]), int(suffix[4:6]), int(suffix[6:]))
+            partitions.setdefault(table_name, {})[day] = name
+        return partitions
+
+    def add_param_key(self, key: str, value: Any) -> str:
+        """
+        パラメータキーを virtual_keys に登録（events へのカラム追加は行わない）
+
+        events に bq_column_<key> カラムがすでにある場合はカラムに、
+        ない場合は event_params（JSONB）に格納するキーとして登録する。
+
+        Args:
+            key: パラメータキー
+            value: 値（型推定に使用）
+
+        Returns:
+            str: 格納先（column または jsonb）
+        """
+        column_name = f"bq_column_{key}"
+        storage = (
+            STORAGE_COLUMN if column_name in self.get_table_columns("events") else STORAGE_JSONB
+        )
+        self._add_virtual_key(key, self._infer_field_type(value), storage)
+        return storage
+
+    def record_key_usage(self, keys: List[str]) -> None:
+        """
+        分析クエリで参照されたパラメータキーの参照回数を加算
+
+        Args:
+            keys: 参照されたキー
+        """
+        if not keys:
+            return
+        query = """
+            UPDATE virtual_keys
+            SET query_count = query_count + 1, last_queried_at = CURRENT_TIMESTAMP
+            WHERE name = ANY(%(keys)s)
+        """
+        self.pg_conn.execute_query(query, {"keys": list(keys)})
+
+    def promote_hot_keys(self, min_query_count: int) -> List[str]:
+        """
+        参照回数の多い event_params（JSONB）のキーを bq_column_<key> カラムに昇格
+
+        インポートとは別のジョブ（promote-param-keys コマンド）として実行する。キーごとに
+        1. すべての値を変換できる型を決め（変換できない値がある場合は STRING）、カラムを追加
+        2. 日別パーティションごとに値をカラムにコピー
+        3. virtual_keys の格納先をカラムに切り替え
+        4. 日別パーティションごとに event_params からキーを削除
+        の順に、パーティション単位の短いトランザクションで行う。
+        切り替えまでは event_params の値が残るため、移行中の分析クエリにも同じ値が返る。
+
+        Args:
+            min_query_count: 昇格させる参照回数の下限
+
+        Returns:
+            List[str]: 昇格したキー
+        """
+        query = """
+            SELECT name, field_type
+            FROM virtual_keys
+            WHERE storage = %(storage)s AND query_count >= %(min_query_count)s
+            ORDER BY query_count DESC
+        """
+        hot_keys = self.pg_conn.execute_query(
+            query, {"storage": STORAGE_JSONB, "min_query_count": min_query_count}
+        )
+
+        promoted = []
+        for virtual_key in hot_keys:
+            key = virtual_key["name"]
+            field_type = self._promotion_type(key, virtual_key["field_type"])
+            # 引用符なしで参照する他の処理と同じ名前（小文字）にする
+            column = sql.Identifier(f"bq_column_{key}".lower())
+            key_literal = sql.Literal(key)
+            guard = _param_guard(key_literal, field_type)
+            value = sql.SQL("CASE WHEN {guard} THEN (event_params->>{key})::{pg_type} END").format(
+                guard=guard, key=key_literal, pg_type=sql.SQL(PG_TYPES[field_type])
+            )
+
+            self.pg_conn.execute_query(
+                sql.SQL("ALTER TABLE events ADD COLUMN IF NOT EXISTS {} {} DEFAULT NULL").format(
+                    column, sql.SQL(PG_TYPES[field_type])
+                )
+            )
+            self._update_partitions(
+                "UPDATE {partition} SET {column} = {value} WHERE event_params ? {key}",
+                column=column, value=value, key=key_literal,
+            )
+            self.pg_conn.execute_query(
+                sql.SQL("UPDATE virtual_keys SET storage = {}, field_type = {} WHERE name = {}").format(
+                    sql.Literal(STORAGE_COLUMN), sql.Literal(field_type), key_literal
+                )
+            )
+            # 切り替え前後に挿入された行の値もコピーしてから削除する（変換できない値は残す）
+            self._update_partitions(
+                "UPDATE {partition} SET {column} = COALESCE({column}, {value}), "
+                "event_params = event_params - {key} "
+                "WHERE event_params ? {key} AND ({guard} OR jsonb_typeof(event_params->{key}) = 'null')",
+                column=column, value=value, key=key_literal, guard=guard,
+            )
+            logger.info(f"キー {key} をカラム bq_column_{key}（{field_type}）に昇格しました")
+            promoted.append(key)
+        return promoted
+
+    def _promotion_type(self, key: str, field_type: str) -> str:
+        """
+        event_params のすべての値を変換できる型を返す
+
+        virtual_keys の型はキーを追加したときのサンプルの値1つから推定しているため、
+        変換できない値が1つでもある場合は STRING にする。
+
+        Args:
+            key: パラメータキー
+            field_type: virtual_keys の型
+
+        Returns:
+            str: カラムの型
+        """
+        if field_type == "STRING":
+            return field_type
+        key_literal = sql.Literal(key)
+        query = sql.SQL(
+            "SELECT COUNT(*) AS invalid FROM events "
+            "WHERE event_params ? {key} AND jsonb_typeof(event_params->{key}) <> 'null' AND NOT {guard}"
+        ).format(key=key_literal, guard=_param_guard(key_literal, field_type))
+        invalid = self.pg_conn.execute_query(query)[0]["invalid"]
+        if invalid:
+            logger.warning(f"キー {key} に {field_type} に変換できない値が{invalid}件あるため STRING で昇格します")
+            return "STRING"
+        return field_type
+
+    def _update_partitions(self, template: str, **params: sql.Composable) -> None:
+        """
+        events の日別パーティションごとに UPDATE を実行（パーティションごとにコミット）
+
+        Args:
+            template: {partition} に更新対象のパーティションが入る UPDATE 文
+            **params: template のその他の置き換え
+        """
+        for _, name in sorted(self._get_partitions().get("events", {}).items()):
+            self.pg_conn.execute_query(
+                sql.SQL(template).format(partition=sql.Identifier(name), **params)
+            )
 
     def add_virtual_column(self, key: str, value: Any) -> None:
         """
@@ -70,7 +608,9 @@ class SchemaManager:
                 """
                 result = self.pg_conn.execute_query(query, {"column_name": column_name})
                 if result:
+                    # スキーマ定義済みのカラムもレイアウトに含まれるよう virtual_keys には登録する
                     logger.info(f"カラム {column_name} はすでに存在します")
+                    self._add_virtual_key(key, field_type)
                     return
 
                 # virtual_keys テーブルに追加
@@ -114,22 +654,24 @@ class SchemaManager:
         else:
             return "STRING"
 
-    def _add_virtual_key(self, key: str, field_type: str) -> None:
+    def _add_virtual_key(self, key: str, field_type: str, storage: str = STORAGE_COLUMN) -> None:
         """
         virtual_keys テーブルにキーを追加
 
         Args:
             key: キー名
             field_type: フィールド型
+            storage: 格納先（column または jsonb）
         """
         query = """
-            INSERT INTO virtual_keys (name, parent_field, field_type)
-            VALUES (%(name)s, 'event_params.key', %(field_type)s)
+            INSERT INTO virtual_keys (name, parent_field, field_type, storage)
+            VALUES (%(name)s, 'event_params.key', %(field_type)s, %(storage)s)
             ON CONFLICT (name) DO NOTHING
         """
         self.pg_conn.execute_query(query, {
             "name": key,
-            "field_type": field_type
+            "field_type": field_type,
+            "storage": storage,
         })
 
     def _add_column_to_events(self, column_name: str, field_type: str) -> None:
@@ -141,22 +683,16 @@ class SchemaManager:
             field_type: フィールド型
         """
         # PostgreSQLの型に変換
-        pg_type = {
-            "STRING": "TEXT",
-            "INTEGER": "INTEGER",
-            "BIGINT": "BIGINT",
-            "FLOAT": "FLOAT",
-            "BOOLEAN": "BOOLEAN"
-        }[field_type]
+        pg_type = PG_TYPES[field_type]
 
         # カラムが存在するか確認
-        query = """
+        check_query = """
             SELECT column_name
             FROM information_schema.columns
             WHERE table_name = 'events'
             AND column_name = %(column_name)s
         """
-        result = self.pg_conn.execute_query(query, {"column_name": column_name})
+        result = self.pg_conn.execute_query(check_query, {"column_name": column_name})
         
         # カラムが存在しない場合のみ追加
         if not result:
@@ -168,6 +704,6 @@ class SchemaManager:
             logger.info(f"カラム {column_name} を追加しました")
 
             # カラムが追加されたことを確認
-            result = self.pg_conn.execute_query(query, {"column_name": column_name})
+            result = self.pg_conn.execute_query(check_query, {"column_name": column_name})
             if not result:
                 raise Exception(f"カラム {column_name} の追加に失敗しました") 
\ No newline at end of file
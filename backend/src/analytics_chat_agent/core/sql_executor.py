@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 import os
 import json
 import logging
@@ -6,6 +6,8 @@ from pathlib import Path
 from google.cloud import bigquery
 from google.api_core.exceptions import GoogleAPIError
 
+from .query_cache import QueryResultCache
+from .tracing import trace_span
 from ..types import QueryResult
 
 logger = logging.getLogger(__name__)
@@ -16,17 +18,97 @@ def get_settings():
     with open(settings_path) as f:
         return json.load(f)
 
-def run_bigquery_query(query: str) -> List[QueryResult]:
+class QueryBudgetExceededError(RuntimeError):
+    """
+    ドライランの推定スキャン量が上限を超えたクエリを拒否したときの例外
+    """
+
+    def __init__(self, total_bytes_processed: int, max_bytes_billed: int):
+        """
+        Args:
+            total_bytes_processed: ドライランで推定されたスキャン量（バイト）
+            max_bytes_billed: 1クエリあたりのスキャン量の上限（バイト）
+        """
+        self.total_bytes_processed = total_bytes_processed
+        self.max_bytes_billed = max_bytes_billed
+        super().__init__(
+            f"クエリの推定スキャン量 {format_bytes(total_bytes_processed)} が"
+            f"上限 {format_bytes(max_bytes_billed)} を超えています。"
+        )
+
+def format_bytes(num_bytes: int) -> str:
+    """バイト数を読みやすい単位の文字列に変換する"""
+    size = float(num_bytes)
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+def estimate_query_bytes(client: bigquery.Client, query: str) -> int:
+    """
+    ドライランでクエリのスキャン量を推定する
+
+    Args:
+        client: BigQueryクライアント
+        query: SQL文字列
+
+    Returns:
+        int: 推定スキャン量（バイト）
+    """
+    job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+    query_job = client.query(query, job_config=job_config)
+    return query_job.total_bytes_processed or 0
+
+def estimate_bytes_saved(original: str, rewritten: str) -> int:
+    """
+    ドライランで書き換え前後のSQLのスキャン量の差を推定する
+
+    Args:
+        original: 書き換え前のSQL
+        rewritten: 書き換え後のSQL
+
+    Returns:
+        int: 削減される推定スキャン量（バイト）
+
+    Raises:
+        RuntimeError: クレデンシャルが未設定、またはドライランに失敗した場合
+    """
+    settings = get_settings()
+    credentials_path = settings["bigquery"]["credentials_path"]
+    if not credentials_path or not os.path.exists(credentials_path):
+        raise RuntimeError("BigQueryのクレデンシャルが未設定または存在しません。")
+
+    try:
+        client = bigquery.Client(project=settings["bigquery"]["project_id"])
+        return estimate_query_bytes(client, original) - estimate_query_bytes(client, rewritten)
+    except GoogleAPIError as e:
+        logger.error(f"BigQueryドライランエラー: {e}")
+        raise RuntimeError("ドライランによるスキャン量の推定に失敗しました。") from e
+
+def _get_query_cache(settings: dict) -> Optional[QueryResultCache]:
+    """設定で有効化されている場合にクエリ結果キャッシュを返す"""
+    cache_settings = settings.get("query_cache", {})
+    if not cache_settings.get("enabled", False):
+        return None
+    return QueryResultCache.from_settings(cache_settings)
+
+def run_bigquery_query(query: str, use_cache: bool = True) -> List[QueryResult]:
     """
     指定されたSQLクエリをBigQueryに投げ、結果を返す
 
+    同一のSQL（正規化後）が events_* テーブルの更新前に実行済みであれば、
+    BigQueryを実行せずにローカルキャッシュから結果を返す。
+
     Args:
         query: 実行するSQL文字列（フルパスでテーブルが指定されている前提）
+        use_cache: クエリ結果キャッシュを使用するかどうか
 
     Returns:
         クエリ結果のリスト（QueryResultオブジェクトのリスト）
 
     Raises:
+        QueryBudgetExceededError: 推定スキャン量が上限を超えた場合
         RuntimeError: 実行に失敗した場合
     """
     settings = get_settings()
@@ -39,26 +121,59 @@ def run_bigquery_query(query: str) -> List[QueryResult]:
     if not credentials_path or not os.path.exists(credentials_path):
         raise RuntimeError("BigQueryのクレデンシャルが未設定または存在しません。")
 
-    try:
-        # SQL文の先頭が SELECT であるかチェック
-        cleaned_query = query.lstrip().splitlines()[0]
-        if not cleaned_query.upper().startswith("SELECT"):
-            logger.error(f"SQLヘッダの内容: {repr(cleaned_query)}")
-            raise RuntimeError("クエリはSELECT文で始まる必要があります。")
+    with trace_span("bigquery.query", cache_hit=False) as span:
+        try:
+            # SQL文の先頭が SELECT であるかチェック
+            cleaned_query = query.lstrip().splitlines()[0]
+            if not cleaned_query.upper().startswith("SELECT"):
+                logger.error(f"SQLヘッダの内容: {repr(cleaned_query)}")
+                raise RuntimeError("クエリはSELECT文で始まる必要があります。")
 
-        client = bigquery.Client(project=project_id)
-        query_job = client.query(query)
-        results = query_job.result()
+            client = bigquery.Client(project=project_id)
 
-        # 結果をQueryResultオブジェクトに変換
-        query_results = []
-        for row in results:
-            row_dict = dict(row.items())
-            query_result = QueryResult(values=row_dict)
-            query_results.append(query_result)
+            # キャッシュの確認
+            cache = _get_query_cache(settings) if use_cache else None
+            snapshot = None
+            if cache is not None:
+                snapshot = cache.get_snapshot(
+                    client, project_id, settings["bigquery"]["dataset_id"]
+                )
+                cached_rows = cache.get(query, snapshot) if snapshot else None
+                if cached_rows is not None:
+                    logger.info(f"キャッシュからクエリ結果を取得: {len(cached_rows)}件")
+                    span.set_attributes({"cache_hit": True, "rows": len(cached_rows)})
+                    return [QueryResult(values=row) for row in cached_rows]
 
-        return query_results
+            # ドライランでスキャン量を確認し、上限を超えるクエリは実行しない
+            max_bytes_billed = settings["bigquery"].get("max_bytes_billed")
+            if settings["bigquery"].get("dry_run", True):
+                total_bytes = estimate_query_bytes(client, query)
+                logger.info(f"推定スキャン量: {format_bytes(total_bytes)}")
+                span.set_attribute("estimated_bytes", total_bytes)
+                if max_bytes_billed and total_bytes > max_bytes_billed:
+                    raise QueryBudgetExceededError(total_bytes, max_bytes_billed)
 
-    except GoogleAPIError as e:
-        logger.error(f"BigQuery実行エラー: {e}")
-        raise RuntimeError("BigQueryクエリの実行に失敗しました。") from e
+            job_config = bigquery.QueryJobConfig(maximum_bytes_billed=max_bytes_billed)
+            query_job = client.query(query, job_config=job_config)
+            results = query_job.result()
+            span.set_attributes({
+                "bytes_processed": query_job.total_bytes_processed or 0,
+                "bytes_billed": query_job.total_bytes_billed or 0,
+            })
+
+            # 結果をQueryResultオブジェクトに変換
+            query_results = []
+            for row in results:
+                row_dict = dict(row.items())
+                query_result = QueryResult(values=row_dict)
+                query_results.append(query_result)
+            span.set_attribute("rows", len(query_results))
+
+            if cache is not None and snapshot is not None:
+                cache.put(query, snapshot, [r.values for r in query_results])
+
+            return query_results
+
+        except GoogleAPIError as e:
+            logger.error(f"BigQuery実行エラー: {e}")
+            raise RuntimeError("BigQueryクエリの実行に失敗しました。") from e
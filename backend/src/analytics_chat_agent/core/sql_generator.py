@@ -3,34 +3,16 @@ SQL生成モジュール
 """
 
 import logging
-from typing import List
+from datetime import date
+from typing import Dict, List, Optional
 
 from .llm import call_gpt
 from ..types import FieldMappingResult
 
 logger = logging.getLogger(__name__)
 
-def generate_sql(field_mapping: FieldMappingResult) -> str:
-    """
-    フィールドマッピング結果からSQLを生成する
-
-    Args:
-        field_mapping: フィールドマッピング結果（fieldsとdescriptionを含む）
-
-    Returns:
-        str: 生成されたSQL
-    """
-    # フィールド情報を文字列に変換
-    fields_info = "\n".join([
-        f"- {field.name} ({field.type}): {field_mapping.description}"
-        for field in field_mapping.fields
-    ])
-
-    prompt = f"""あなたはBigQueryとGA4構造に精通したSQLエキスパートです。
-
-        以下のフィールド情報をもとに、Google Analytics 4（GA4）のBigQuery連携テーブルから目的に沿ったSQLクエリを正確に生成してください。
-
-        # 要件（必ず厳守）
+# GA4のBigQuery連携テーブル向けSQLの要件（GPTによるSQL生成の各プロンプトで共通）
+BIGQUERY_SQL_RULES = """# 要件（必ず厳守）
         1. 使用テーブルは `events_*`
         2. クエリは **必ず `SELECT` 文から開始**
         3. 日付フィルターは `_TABLE_SUFFIX` を使うこと
@@ -53,7 +35,31 @@ def generate_sql(field_mapping: FieldMappingResult) -> str:
 
         - `geo`, `app_info`, `device` などのサブフィールド（例：`geo.city`）は RECORD型です。
             - フラットに `geo.city`, `app_info.version` のようにアクセスしてください
-            - 不要な `UNNEST()` や `SELECT ... FROM ... WHERE` のネスト構造は使わないでください
+            - 不要な `UNNEST()` や `SELECT ... FROM ... WHERE` のネスト構造は使わないでください"""
+
+
+def generate_sql(field_mapping: FieldMappingResult, feedback: Optional[str] = None) -> str:
+    """
+    フィールドマッピング結果からSQLを生成する
+
+    Args:
+        field_mapping: フィールドマッピング結果（fieldsとdescriptionを含む）
+        feedback: 前回生成したSQLの問題点（再生成時のみ指定）
+
+    Returns:
+        str: 生成されたSQL
+    """
+    # フィールド情報を文字列に変換
+    fields_info = "\n".join([
+        f"- {field.name} ({field.type}): {field_mapping.description}"
+        for field in field_mapping.fields
+    ])
+
+    prompt = f"""あなたはBigQueryとGA4構造に精通したSQLエキスパートです。
+
+        以下のフィールド情報をもとに、Google Analytics 4（GA4）のBigQuery連携テーブルから目的に沿ったSQLクエリを正確に生成してください。
+
+        {BIGQUERY_SQL_RULES}
 
         【重要】SQL文のみを返してください。説明やコメント、コードブロック（```sql など）は不要です。
 
@@ -61,6 +67,64 @@ def generate_sql(field_mapping: FieldMappingResult) -> str:
         {fields_info}
         """
 
+    if feedback:
+        prompt += f"""
+        # 前回生成したSQLの問題点（必ず修正すること）
+        {feedback}
+        """
+
+    response = call_gpt(prompt)
+
+    return response
+
+def generate_postgres_sql(
+    field_mapping: FieldMappingResult,
+    columns: Dict[str, str],
+    start_date: date,
+    end_date: date,
+) -> str:
+    """
+    ローカルのPostgreSQLミラー（eventsテーブル）向けのSQLを生成する
+
+    Args:
+        field_mapping: フィールドマッピング結果（fieldsとdescriptionを含む）
+        columns: eventsテーブルで参照可能なカラム名と型
+        start_date: 対象期間の開始日
+        end_date: 対象期間の終了日
+
+    Returns:
+        str: 生成されたSQL
+    """
+    fields_info = "\n".join([
+        f"- {field.name} ({field.type}): {field_mapping.description}"
+        for field in field_mapping.fields
+    ])
+    columns_info = "\n".join([
+        f"- {column_name} {column_type}"
+        for column_name, column_type in columns.items()
+    ])
+
+    prompt = f"""あなたはPostgreSQLとGA4データに精通したSQLエキスパートです。
+
+        GA4のイベントデータをPostgreSQLに取り込んだ `events` テーブルから、目的に沿ったSQLクエリを正確に生成してください。
+
+        # 要件（必ず厳守）
+        1. 使用テーブルは `events` のみ
+        2. クエリは **必ず `SELECT` 文から開始**（PostgreSQLの方言を使用すること）
+        3. 日付フィルターは `event_date BETWEEN '{start_date.isoformat()}' AND '{end_date.isoformat()}'` を必ず含めること
+        4. 結果は **時系列（例：`event_date`昇順）でソート**
+        5. 以下のカラム一覧にあるカラムのみ使用すること。`event_params` などのネスト構造は存在しない
+        6. GA4のイベントパラメータ（例：page_location）は `bq_column_` を付けたカラム（例：`bq_column_page_location`）に展開済み。
+           ただしカラム一覧に `(event_params->>'キー')::型` の形式で示されたパラメータは、その式をそのまま使って参照すること
+        7. **SQL文のみを出力。解説・コメント・装飾（コードブロックなど）一切不要**
+
+        # eventsテーブルのカラム一覧:
+        {columns_info}
+
+        # フィールド情報:
+        {fields_info}
+        """
+
     response = call_gpt(prompt)
 
-    return response 
\ No newline at end of file
+    return response
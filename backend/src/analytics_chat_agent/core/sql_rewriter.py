@@ -0,0 +1,434 @@
+"""
+生成したSQLのスキャン量を抑える書き換え
+
+GPT が生成したSQLを検証後・実行前に sqlglot で書き換える。
+
+- パーティションの絞り込み: _TABLE_SUFFIX の期間の開始日が意図の時間範囲より前の場合、
+  時間範囲に合わせて現在日付からの相対指定の条件に置き換える。ただし、_TABLE_SUFFIX を WHERE 句以外
+  （前週比の CASE など）で参照している場合、期間が日付で指定された閉じた期間の場合、質問の期間が
+  「先月」などのカレンダー上の期間（時間範囲は日数での近似）の場合は、回答が変わるため絞り込まない
+- カラムの絞り込み: events_* テーブルの SELECT * を、クエリで参照しているカラムと
+  解決したフィールドのカラムに置き換える
+- 行数の上限: 集計していないクエリに LIMIT を追加する
+
+期間やカラムを特定できない場合は書き換えない。期間は意図の時間範囲と同じく、月を30日・年を365日として扱う。
+
+設定例（settings.json）:
+    "sql_rewrite": {
+        "enabled": true,
+        "max_rows": 1000,
+        "estimate_savings": true
+    }
+"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import sqlglot
+from sqlglot import exp
+
+from .lexical_index import SOURCE_VIRTUAL, FieldEntry, LexicalFieldIndex
+from .sql_templates import suffix_filter
+from .sql_validator import GA4_BASE_COLUMNS
+from .time_range import is_calendar_phrase, parse_time_range
+from ..types import FieldMappingResult, Intent
+
+logger = logging.getLogger(__name__)
+
+# DATE_SUB・DATE_ADD の単位ごとの日数（月・年は time_range と同じく概算）
+_INTERVAL_DAYS = {"DAY": 1, "WEEK": 7, "MONTH": 30, "QUARTER": 90, "YEAR": 365}
+
+# _TABLE_SUFFIX の日付の形式
+_SUFFIX_FORMAT = "%Y%m%d"
+_SUFFIX_PATTERN = re.compile(r"^\d{8}$")
+
+_TABLE_SUFFIX = "_table_suffix"
+
+# INTERVAL を引数にとる日付の関数
+_INTERVAL_FUNCTIONS = (
+    exp.DateAdd, exp.DateSub, exp.DatetimeAdd, exp.DatetimeSub, exp.TimestampAdd, exp.TimestampSub,
+)
+
+
+@dataclass
+class RewriteResult:
+    """
+    書き換えの結果
+    """
+    sql: str  # 書き換え後のSQL（書き換えがない場合は元のSQL）
+    changes: List[str] = field(default_factory=list)  # 書き換えの内容
+    reduces_scan: bool = False  # スキャン量が減る書き換え（期間・カラムの絞り込み）を含むかどうか
+
+
+def _evaluate_date(node: Optional[exp.Expression], today: date) -> Optional[date]:
+    """
+    _TABLE_SUFFIX と比較している式を日付として評価する
+
+    '20240101' のような文字列と、FORMAT_DATE('%Y%m%d', DATE_SUB(CURRENT_DATE(), INTERVAL n DAY))
+    の形式の式に対応する。
+
+    Args:
+        node: 式
+        today: 基準日
+
+    Returns:
+        Optional[date]: 日付（評価できない場合はNone）
+    """
+    if isinstance(node, exp.Paren):
+        return _evaluate_date(node.this, today)
+    if isinstance(node, exp.Literal):
+        if node.is_string and _SUFFIX_PATTERN.match(node.this):
+            return datetime.strptime(node.this, _SUFFIX_FORMAT).date()
+        return None
+    if isinstance(node, exp.TimeToStr):
+        time_format = node.args.get("format")
+        if not isinstance(time_format, exp.Literal) or time_format.this != _SUFFIX_FORMAT:
+            return None
+        return _evaluate_date(node.this, today)
+    if isinstance(node, exp.TsOrDsToDate):
+        return _evaluate_date(node.this, today)
+    if isinstance(node, exp.CurrentDate):
+        return today
+    if isinstance(node, (exp.DateSub, exp.DateAdd)):
+        base = _evaluate_date(node.this, today)
+        amount = node.expression
+        unit = node.args.get("unit")
+        unit_days = _INTERVAL_DAYS.get(unit.name.upper() if unit is not None else "DAY")
+        if base is None or unit_days is None or not isinstance(amount, exp.Literal):
+            return None
+        try:
+            days = int(amount.this) * unit_days
+        except ValueError:
+            return None
+        return base - timedelta(days=days) if isinstance(node, exp.DateSub) else base + timedelta(days=days)
+    return None
+
+
+def _conjuncts(condition: exp.Expression) -> List[exp.Expression]:
+    """AND で結合された条件を分解する"""
+    if isinstance(condition, exp.And):
+        return _conjuncts(condition.this) + _conjuncts(condition.expression)
+    return [condition]
+
+
+def _is_suffix(node: exp.Expression) -> bool:
+    return isinstance(node, exp.Column) and node.name.lower() == _TABLE_SUFFIX
+
+
+def _star_projections(select: exp.Select) -> List[exp.Expression]:
+    """SELECT の * または テーブル名.* の式を返す"""
+    return [
+        projection for projection in select.expressions
+        if isinstance(projection, exp.Star)
+        or (isinstance(projection, exp.Column) and isinstance(projection.this, exp.Star))
+    ]
+
+
+def _suffix_outside_where(tree: exp.Expression) -> bool:
+    """_TABLE_SUFFIX を WHERE 句以外（SELECT の式や GROUP BY など）で参照しているかどうか"""
+    return any(
+        not isinstance(column.find_ancestor(exp.Where, exp.Select), exp.Where)
+        for column in tree.find_all(exp.Column)
+        if _is_suffix(column)
+    )
+
+
+def _has_fixed_date(condition: exp.Expression) -> bool:
+    """条件に '20240101' のような日付の文字列が含まれるかどうか"""
+    return any(
+        literal.is_string and _SUFFIX_PATTERN.match(literal.this)
+        for literal in condition.find_all(exp.Literal)
+    )
+
+
+def _unquote_intervals(tree: exp.Expression) -> None:
+    """
+    sqlglot が文字列にした INTERVAL の値を数値に戻す
+
+    sqlglot は INTERVAL 7 DAY を INTERVAL '7' DAY として出力するため、
+    DATE_SUB などの引数として BigQuery でそのまま解釈される形式に戻す。
+    """
+    for node in tree.find_all(exp.Interval, *_INTERVAL_FUNCTIONS):
+        key = "this" if isinstance(node, exp.Interval) else "expression"
+        value = node.args.get(key)
+        if isinstance(value, exp.Literal) and value.is_string and re.fullmatch(r"-?\d+", value.this):
+            node.set(key, exp.Literal.number(value.this))
+
+
+class SqlRewriter:
+    """生成したSQLをスキャン量が少なくなるよう書き換えるクラス"""
+
+    def __init__(self, table: str, entries: Iterable[FieldEntry], max_rows: Optional[int] = 1000):
+        """
+        Args:
+            table: 書き換え対象のテーブル（project.dataset.events_*）
+            entries: ga4_schema.csv と ga4_virtual_key.csv のフィールド
+            max_rows: 集計していないクエリに追加する LIMIT（None または 0 の場合は追加しない）
+        """
+        self.table = table.lower()
+        self.max_rows = max_rows
+        self.columns: Set[str] = set(GA4_BASE_COLUMNS)
+        self.param_keys: Set[str] = set()
+        for entry in entries:
+            if entry.source == SOURCE_VIRTUAL:
+                self.param_keys.add(entry.name)
+            else:
+                self.columns.add(entry.name.split(".")[0].lower())
+
+    @classmethod
+    def from_settings(
+        cls,
+        rewrite_settings: Dict[str, Any],
+        bigquery_settings: Dict[str, Any],
+        lexical_index: LexicalFieldIndex,
+    ) -> "SqlRewriter":
+        """
+        設定と字句インデックスから書き換えを作成する
+
+        Args:
+            rewrite_settings: settings.json の sql_rewrite セクション
+            bigquery_settings: settings.json の bigquery セクション
+            lexical_index: スキーマのCSVから作成した字句インデックス
+
+        Returns:
+            SqlRewriter: 書き換え
+        """
+        table = f"{bigquery_settings['project_id']}.{bigquery_settings['dataset_id']}.events_*"
+        return cls(table, lexical_index.entries, max_rows=rewrite_settings.get("max_rows", 1000))
+
+    def rewrite(
+        self,
+        sql: str,
+        intent: Optional[Intent] = None,
+        field_mapping: Optional[FieldMappingResult] = None,
+        today: Optional[date] = None,
+        query: Optional[str] = None,
+    ) -> RewriteResult:
+        """
+        SQLを書き換える
+
+        Args:
+            sql: 検証済みのSQL
+            intent: 抽出された意図（time_range による期間の絞り込みに使用）
+            field_mapping: フィールドマッピング結果（SELECT * の置き換えに使用）
+            today: 基準日（省略時は本日）
+            query: 自然言語の質問（カレンダー上の期間を指している場合は期間を絞り込まない）
+
+        Returns:
+            RewriteResult: 書き換えの結果（解析できない場合は元のSQL）
+        """
+        try:
+            tree = sqlglot.parse_one(sql, read="bigquery")
+        except sqlglot.errors.ParseError as e:
+            logger.debug(f"SQLを解析できないため書き換えません: {e}")
+            return RewriteResult(sql=sql)
+        if not isinstance(tree, exp.Query):
+            return RewriteResult(sql=sql)
+
+        today = today or date.today()
+        changes: List[str] = []
+        event_selects = [select for select in tree.find_all(exp.Select) if self._event_alias(select) is not None]
+
+        date_range = parse_time_range((intent.parameters if intent else {}).get("time_range"), today=today)
+        if date_range is not None:
+            skip_reason = None
+            if _suffix_outside_where(tree):
+                skip_reason = "_TABLE_SUFFIX を WHERE 句以外でも参照している"
+            elif query and is_calendar_phrase(query):
+                skip_reason = "質問の期間がカレンダー上の期間で、意図の時間範囲は日数での近似である"
+            for select in event_selects:
+                change = self._narrow_suffix(select, date_range, today, skip_reason)
+                if change:
+                    changes.append(change)
+
+        columns = self._referenced_columns(tree, field_mapping)
+        # CTE やサブクエリの全カラムを外側で SELECT * している場合は、参照するカラムを特定できない
+        outer_star = any(
+            _star_projections(select)
+            for select in tree.find_all(exp.Select)
+            if select not in event_selects
+        )
+        for select in event_selects if not outer_star else []:
+            change = self._prune_star(select, columns)
+            if change:
+                changes.append(change)
+        reduces_scan = bool(changes)
+
+        if (
+            self.max_rows
+            and isinstance(tree, exp.Select)
+            and not tree.args.get("limit")
+            and not self._aggregates(tree)
+        ):
+            tree.limit(self.max_rows, copy=False)
+            changes.append(f"集計していないため LIMIT {self.max_rows} を追加")
+
+        if not changes:
+            return RewriteResult(sql=sql)
+        _unquote_intervals(tree)
+        return RewriteResult(sql=tree.sql(dialect="bigquery", pretty=True), changes=changes, reduces_scan=reduces_scan)
+
+    def _event_alias(self, select: exp.Select) -> Optional[str]:
+        """SELECT が FROM で直接 events_* テーブルを読む場合はその別名（または名前）を返す"""
+        source = select.args.get("from_") or select.args.get("from")
+        table = source.this if source is not None else None
+        if not isinstance(table, exp.Table):
+            return None
+        full_name = ".".join(part for part in (table.catalog, table.db, table.name) if part).lower()
+        if full_name != self.table:
+            return None
+        return (table.alias or table.name).lower()
+
+    def _narrow_suffix(
+        self, select: exp.Select, date_range: Tuple[date, date], today: date, skip_reason: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        _TABLE_SUFFIX の期間が意図の時間範囲より広い場合に絞り込む
+
+        WHERE 句の AND で結合された _TABLE_SUFFIX の条件をすべて評価できる場合のみ書き換える。
+        期間が日付で指定されている場合や意図の時間範囲の終了日より前に終わる場合は、カレンダー上の期間
+        （「9月」など）を指定したものとして絞り込まない。
+
+        Args:
+            select: events_* テーブルを読む SELECT
+            date_range: 意図の時間範囲の開始日と終了日
+            today: 基準日
+            skip_reason: 絞り込むと回答が変わる理由（指定した場合は絞り込まずに警告する）
+
+        Returns:
+            Optional[str]: 書き換えの内容（書き換えない場合はNone）
+        """
+        where = select.args.get("where")
+        if where is None:
+            return None
+        conditions = _conjuncts(where.this)
+        suffix_conditions = [
+            condition for condition in conditions
+            if any(_is_suffix(column) for column in condition.find_all(exp.Column))
+        ]
+        if not suffix_conditions:
+            return None
+
+        low, high = date.min, date.max
+        for condition in suffix_conditions:
+            bounds = self._bounds(condition, today)
+            if bounds is None:
+                return None
+            low, high = max(low, bounds[0]), min(high, bounds[1])
+
+        start, end = date_range
+        if low >= start:
+            return None
+        original = low.isoformat() if low != date.min else "指定なし"
+        fixed = any(_has_fixed_date(condition) for condition in suffix_conditions)
+        if skip_reason is None and (fixed or high < end):
+            closing = high.isoformat() if high != date.max else "指定なし"
+            skip_reason = f"SQLの期間（{original}〜{closing}）がカレンダー上の期間である"
+        if skip_reason is not None:
+            logger.warning(f"{skip_reason}ため _TABLE_SUFFIX の期間は絞り込みません（意図の時間範囲: {start}〜{end}）")
+            return None
+        new_low, new_high = start, min(high, end)
+        if new_low > new_high:
+            logger.debug(f"SQLの期間（{low}〜{high}）が意図の時間範囲と重ならないため書き換えません")
+            return None
+
+        narrowed = sqlglot.condition(suffix_filter(new_low, new_high, today=today), dialect="bigquery")
+        remaining = [condition for condition in conditions if condition not in suffix_conditions]
+        where.set("this", exp.and_(*remaining, narrowed, copy=False) if remaining else narrowed)
+        return f"_TABLE_SUFFIX を {new_low.isoformat()}〜{new_high.isoformat()} に絞り込み（元の開始日: {original}）"
+
+    @staticmethod
+    def _bounds(condition: exp.Expression, today: date) -> Optional[Tuple[date, date]]:
+        """_TABLE_SUFFIX の条件を日付の範囲に変換する（評価できない場合はNone）"""
+        if isinstance(condition, exp.Between) and _is_suffix(condition.this):
+            low = _evaluate_date(condition.args.get("low"), today)
+            high = _evaluate_date(condition.args.get("high"), today)
+            return (low, high) if low is not None and high is not None else None
+        if not isinstance(condition, (exp.GTE, exp.GT, exp.LTE, exp.LT, exp.EQ)):
+            return None
+        if _is_suffix(condition.this):
+            operator, value = type(condition), _evaluate_date(condition.expression, today)
+        elif _is_suffix(condition.expression):
+            # 'YYYYMMDD' <= _TABLE_SUFFIX は _TABLE_SUFFIX >= 'YYYYMMDD' として扱う
+            flipped = {exp.GTE: exp.LTE, exp.GT: exp.LT, exp.LTE: exp.GTE, exp.LT: exp.GT, exp.EQ: exp.EQ}
+            operator, value = flipped[type(condition)], _evaluate_date(condition.this, today)
+        else:
+            return None
+        if value is None:
+            return None
+        one_day = timedelta(days=1)
+        return {
+            exp.GTE: (value, date.max),
+            exp.GT: (value + one_day, date.max),
+            exp.LTE: (date.min, value),
+            exp.LT: (date.min, value - one_day),
+            exp.EQ: (value, value),
+        }[operator]
+
+    def _referenced_columns(self, tree: exp.Expression, field_mapping: Optional[FieldMappingResult]) -> List[str]:
+        """
+        クエリで参照している events_* テーブルのカラムと、解決したフィールドのカラムを出現順に返す
+
+        `s.user_pseudo_id` のように CTE やサブクエリの別名で修飾したカラムも、events_* テーブルの
+        SELECT * から引き継いだカラムとして収集する。
+        """
+        columns: List[str] = []
+        aliases = {
+            (table.alias or table.name).lower()
+            for table in tree.find_all(exp.Table)
+            if ".".join(part for part in (table.catalog, table.db, table.name) if part).lower() == self.table
+        }
+        for column in tree.find_all(exp.Column):
+            if isinstance(column.this, exp.Star):
+                continue
+            path = [part.name.lower() for part in column.parts]
+            if len(path) > 1 and (path[0] in aliases or path[0] not in self.columns):
+                path = path[1:]
+            if path[0] in self.columns and path[0] not in columns:
+                columns.append(path[0])
+        for resolved in field_mapping.fields if field_mapping else []:
+            name = "event_params" if resolved.name in self.param_keys else resolved.name.split(".")[0].lower()
+            if name in self.columns and name not in columns:
+                columns.append(name)
+        return columns
+
+    def _prune_star(self, select: exp.Select, columns: List[str]) -> Optional[str]:
+        """
+        SELECT * を参照しているカラムに置き換える
+
+        Returns:
+            Optional[str]: 書き換えの内容（書き換えない場合はNone）
+        """
+        projections = select.expressions
+        stars = _star_projections(select)
+        if not stars or not columns:
+            return None
+        star = stars[0] if isinstance(stars[0], exp.Star) else stars[0].this
+        if any(star.args.get(modifier) for modifier in ("except", "except_", "replace", "rename")):
+            return None
+
+        qualifier = None
+        if isinstance(stars[0], exp.Column) and stars[0].table:
+            qualifier = stars[0].table
+        pruned: List[exp.Expression] = []
+        for projection in projections:
+            if projection in stars:
+                pruned.extend(exp.column(name, table=qualifier) for name in columns)
+            else:
+                pruned.append(projection)
+        select.set("expressions", pruned)
+        return f"SELECT * を {', '.join(columns)} に限定"
+
+    @staticmethod
+    def _aggregates(select: exp.Select) -> bool:
+        """最上位の SELECT が集計しているかどうか（GROUP BY または集計関数）"""
+        if select.args.get("group"):
+            return True
+        for projection in select.expressions:
+            for function in projection.find_all(exp.AggFunc):
+                if function.find_ancestor(exp.Window, exp.Select) is select:
+                    return True
+        return False
@@ -0,0 +1,253 @@
+"""
+分析意図ごとのBigQuery SQLテンプレート
+
+意図のキー（user_count、page_view など）ごとに検証済みのSQLを用意し、時間範囲を
+_TABLE_SUFFIX の条件に、質問で指定された集計軸（「device.category 別」など）を GROUP BY に埋め込む。
+テンプレートで回答できる質問は GPT によるSQL生成を省略する。
+
+集計軸はフィールド名が明示されている場合のみ解決する。絞り込み条件がある質問、集計軸が解決できない
+質問（「デバイス別」「週ごと」「特別セール」など）、テンプレートのない意図（retention、custom）は
+テンプレートを使用せず、従来どおり GPT でSQLを生成する。
+"""
+
+import logging
+import re
+import textwrap
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, Optional
+
+from .lexical_index import SOURCE_SCHEMA, SOURCE_VIRTUAL, FieldEntry, LexicalFieldIndex
+from .time_range import parse_time_range, remove_daily_phrases
+from ..types import FieldMappingResult, Intent
+
+logger = logging.getLogger(__name__)
+
+# 意図のキーごとのテンプレート
+# {table}: テーブル名、{suffix_filter}: _TABLE_SUFFIX の条件、
+# {dimension_select} / {dimension_group}: 集計軸（指定がない場合は空文字）
+_SQL_TEMPLATES = {
+    "user_count": """
+        SELECT PARSE_DATE('%Y%m%d', event_date) AS date{dimension_select},
+            COUNT(DISTINCT user_pseudo_id) AS user_count
+        FROM `{table}`
+        WHERE {suffix_filter}
+        GROUP BY date{dimension_group}
+        ORDER BY date{dimension_group}
+    """,
+    "page_view": """
+        SELECT PARSE_DATE('%Y%m%d', event_date) AS date{dimension_select},
+            COUNT(*) AS page_view_count
+        FROM `{table}`
+        WHERE {suffix_filter}
+        AND event_name = 'page_view'
+        GROUP BY date{dimension_group}
+        ORDER BY date{dimension_group}
+    """,
+    "event_count": """
+        SELECT PARSE_DATE('%Y%m%d', event_date) AS date, event_name{dimension_select},
+            COUNT(*) AS event_count
+        FROM `{table}`
+        WHERE {suffix_filter}
+        GROUP BY date, event_name{dimension_group}
+        ORDER BY date, event_name{dimension_group}
+    """,
+    "sales_trend": """
+        SELECT PARSE_DATE('%Y%m%d', event_date) AS date{dimension_select},
+            SUM(ecommerce.purchase_revenue) AS revenue,
+            COUNT(DISTINCT ecommerce.transaction_id) AS transaction_count
+        FROM `{table}`
+        WHERE {suffix_filter}
+        AND event_name = 'purchase'
+        GROUP BY date{dimension_group}
+        ORDER BY date{dimension_group}
+    """,
+    "conversion_rate": """
+        SELECT PARSE_DATE('%Y%m%d', event_date) AS date{dimension_select},
+            COUNT(DISTINCT IF(event_name = 'purchase', user_pseudo_id, NULL)) AS converted_user_count,
+            COUNT(DISTINCT user_pseudo_id) AS user_count,
+            SAFE_DIVIDE(
+                COUNT(DISTINCT IF(event_name = 'purchase', user_pseudo_id, NULL)),
+                COUNT(DISTINCT user_pseudo_id)
+            ) AS conversion_rate
+        FROM `{table}`
+        WHERE {suffix_filter}
+        GROUP BY date{dimension_group}
+        ORDER BY date{dimension_group}
+    """,
+}
+
+# 絞り込み条件を表すパラメータ（いずれかが指定されていればテンプレートは使用しない）
+_FILTER_PARAMETERS = ("conditions", "other_params")
+
+# 集計軸の指定を表す可能性のある表現（「特別」「週ごと」なども含む）
+_GROUP_BY_PATTERN = re.compile(r"別|ごと|毎|内訳|\bby\b|\bper\b", re.IGNORECASE)
+
+# フィールド名を明示した集計軸の指定（「device.category 別」「page_location ごと」「by geo.country」など）
+_DIMENSION_PATTERN = re.compile(
+    r"(?P<before>[A-Za-z_][A-Za-z0-9_.]*)\s*(?:の\s*)?(?:別|ごと|毎|内訳)"
+    r"|\b(?:by|per)\s+(?P<after>[A-Za-z_][A-Za-z0-9_.]*)",
+    re.IGNORECASE,
+)
+
+# 繰り返しフィールド（UNNEST が必要なため集計軸には使用しない）
+_REPEATED_PREFIXES = ("event_params.", "user_properties.", "items.")
+
+# 仮想キーの型ごとの値のカラム
+_VALUE_COLUMNS = {"STRING": "string_value", "INTEGER": "int_value"}
+
+
+@dataclass
+class TemplateQuery:
+    """
+    テンプレートから作成したSQL
+    """
+    intent_key: str  # 対応する意図のキー
+    sql: str  # SQL
+    dimension: Optional[str] = None  # 集計軸のフィールド名
+
+
+def suffix_filter(start_date: date, end_date: date, today: Optional[date] = None) -> str:
+    """
+    期間を現在日付からの相対指定の _TABLE_SUFFIX の条件に変換する
+
+    生成したSQLを後日再利用しても同じ相対期間になるよう、日付は固定値にしない。
+
+    Args:
+        start_date: 開始日
+        end_date: 終了日
+        today: 基準日（省略時は本日）
+
+    Returns:
+        str: _TABLE_SUFFIX の条件
+    """
+    today = today or date.today()
+    start_days = (today - start_date).days
+    end_days = (today - end_date).days
+    return (
+        f"_TABLE_SUFFIX BETWEEN FORMAT_DATE('%Y%m%d', DATE_SUB(CURRENT_DATE(), INTERVAL {start_days} DAY)) "
+        f"AND FORMAT_DATE('%Y%m%d', DATE_SUB(CURRENT_DATE(), INTERVAL {end_days} DAY))"
+    )
+
+
+def requests_grouping(query: str) -> bool:
+    """
+    質問が集計軸の指定（「デバイス別」「ページごと」「by country」など）を含むかどうか
+
+    テンプレートは常に日付で集計するため、日単位の集計（「日別」「毎日」など）は集計軸として扱わない。
+
+    Args:
+        query: 自然言語の質問
+
+    Returns:
+        bool: 集計軸の指定を含む場合はTrue
+    """
+    return bool(_GROUP_BY_PATTERN.search(remove_daily_phrases(query)))
+
+
+def dimension_expression(entry: FieldEntry) -> Optional[str]:
+    """
+    フィールドを集計軸のSQL式に変換する
+
+    Args:
+        entry: フィールド
+
+    Returns:
+        Optional[str]: SQL式（集計軸に使用できないフィールドの場合はNone）
+    """
+    if entry.source == SOURCE_SCHEMA:
+        if entry.field_type != "STRING" or entry.name.startswith(_REPEATED_PREFIXES):
+            return None
+        return entry.name
+    if entry.source == SOURCE_VIRTUAL:
+        value_column = _VALUE_COLUMNS.get(entry.field_type)
+        if value_column is None:
+            return None
+        return f"(SELECT value.{value_column} FROM UNNEST(event_params) WHERE key = '{entry.name}')"
+    return None
+
+
+class SqlTemplateMatcher:
+    """分析意図をSQLテンプレートに対応付けるクラス"""
+
+    def __init__(self, bigquery_settings: Dict[str, Any], lexical_index: Optional[LexicalFieldIndex]):
+        """
+        Args:
+            bigquery_settings: settings.json の bigquery セクション
+            lexical_index: フィールドの型と種類の参照に使用する字句インデックス
+                （Noneの場合は集計軸のない質問のみテンプレートで回答する）
+        """
+        self.table = f"{bigquery_settings['project_id']}.{bigquery_settings['dataset_id']}.events_*"
+        self.lexical_index = lexical_index
+
+    def _resolve_dimension(self, query: str) -> Optional[FieldEntry]:
+        """
+        質問で指定された集計軸を解決する
+
+        「別」「ごと」「by」などの直前（by / per は直後）にフィールド名が書かれている場合のみ
+        そのフィールドを集計軸とする。解決したフィールドから推測はしない。
+
+        Args:
+            query: 自然言語の質問（日単位の集計を表す表現は除いたもの）
+
+        Returns:
+            Optional[FieldEntry]: 集計軸のフィールド（集計軸に使用できない場合はNone）
+        """
+        if self.lexical_index is None:
+            return None
+        for found in _DIMENSION_PATTERN.finditer(query):
+            name = (found.group("before") or found.group("after")).rstrip(".")
+            for entry in self.lexical_index.exact_matches(name):
+                if dimension_expression(entry) is not None:
+                    return entry
+        return None
+
+    def match(
+        self, query: str, intent: Intent, field_mapping: FieldMappingResult, today: Optional[date] = None
+    ) -> Optional[TemplateQuery]:
+        """
+        テンプレートで回答できる場合はSQLを作成する
+
+        Args:
+            query: 自然言語の質問
+            intent: 抽出された意図
+            field_mapping: フィールドマッピング結果
+            today: 基準日（省略時は本日）
+
+        Returns:
+            Optional[TemplateQuery]: テンプレートから作成したSQL（回答できない場合はNone）
+        """
+        template = _SQL_TEMPLATES.get(intent.key)
+        if template is None:
+            return None
+
+        if any(intent.parameters.get(name) for name in _FILTER_PARAMETERS):
+            logger.debug(f"絞り込み条件があるためテンプレートは使用しません: {intent.parameters}")
+            return None
+
+        date_range = parse_time_range(intent.parameters.get("time_range"), today=today)
+        if date_range is None:
+            return None
+
+        dimension = None
+        dimension_select = dimension_group = ""
+        if requests_grouping(query):
+            dimension = self._resolve_dimension(remove_daily_phrases(query))
+            if dimension is None:
+                logger.debug(f"集計軸を解決できないためテンプレートは使用しません: {query}")
+                return None
+            alias = dimension.name.replace(".", "_")
+            dimension_select = f", {dimension_expression(dimension)} AS {alias}"
+            dimension_group = f", {alias}"
+
+        sql = template.format(
+            table=self.table,
+            suffix_filter=suffix_filter(*date_range, today=today),
+            dimension_select=dimension_select,
+            dimension_group=dimension_group,
+        )
+        return TemplateQuery(
+            intent_key=intent.key,
+            sql=textwrap.dedent(sql).strip(),
+            dimension=dimension.name if dimension else None,
+        )
@@ -0,0 +1,328 @@
+"""
+生成したSQLのローカル検証
+
+GPT が生成したSQLを sqlglot で構文解析し、BigQuery に送る前に以下を確認する。
+
+- 1つの SELECT 文であること
+- テーブルが `project.dataset.events_*` のフルパスで指定されていること
+- WHERE 句に _TABLE_SUFFIX の条件があること
+- 参照しているフィールドが ga4_schema.csv に存在すること
+- REPEATED のフィールド（event_params、user_properties、items など）を UNNEST して参照していること
+- event_params の key の比較に ga4_virtual_key.csv のキーを使用していること
+
+問題点は日本語の文で返し、SQLの再生成時にそのままプロンプトに含める。
+CTE・サブクエリ・SELECT の別名や、JSON から展開した値のように参照先を特定できない列は検証しない。
+ga4_schema.csv にサブフィールドが記載されていない RECORD（geo など）は、サブフィールドを検証しない。
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional, Set
+
+import sqlglot
+from sqlglot import exp
+
+from .lexical_index import SOURCE_VIRTUAL, FieldEntry, LexicalFieldIndex
+
+logger = logging.getLogger(__name__)
+
+# ga4_schema.csv に含まれない GA4 エクスポートの最上位のカラム
+GA4_BASE_COLUMNS = (
+    "event_date",
+    "event_timestamp",
+    "event_name",
+    "event_params",
+    "user_id",
+    "user_pseudo_id",
+    "user_first_touch_timestamp",
+    "user_properties",
+    "stream_id",
+    "platform",
+)
+
+# event_params・user_properties の要素のフィールド
+_PARAM_SUBFIELDS = (
+    "key",
+    "value",
+    "value.string_value",
+    "value.int_value",
+    "value.float_value",
+    "value.double_value",
+)
+_BASE_REPEATED_FIELDS = {
+    "event_params": _PARAM_SUBFIELDS,
+    "user_properties": _PARAM_SUBFIELDS + ("value.set_timestamp_micros",),
+}
+
+# ワイルドカードテーブルの疑似カラム
+_TABLE_SUFFIX = "_table_suffix"
+
+# 仮想キーを登録している REPEATED のフィールド
+_PARAM_FIELD = "event_params"
+
+# ga4_virtual_key.csv 以外に使用を許可する event_params のキー
+# （items は SQL生成のプロンプトで event_params のキーとして参照するよう指示している）
+_EXTRA_PARAM_KEYS = ("items",)
+
+
+class SqlValidationError(ValueError):
+    """SQLの検証で問題が見つかった場合のエラー"""
+
+    def __init__(self, problems: List[str]):
+        """
+        Args:
+            problems: 問題点
+        """
+        self.problems = problems
+        super().__init__("SQLの検証に失敗しました:\n" + "\n".join(f"- {problem}" for problem in problems))
+
+
+def _column_path(column: exp.Column) -> List[str]:
+    """列の参照を小文字の名前の並びに変換する（例：e.device.category は [e, device, category]）"""
+    return [part.name.lower() for part in column.parts]
+
+
+class SqlValidator:
+    """生成したSQLをGA4のスキーマで検証するクラス"""
+
+    def __init__(self, table: str, entries: Iterable[FieldEntry]):
+        """
+        Args:
+            table: 参照を許可するテーブル（project.dataset.events_*）
+            entries: ga4_schema.csv と ga4_virtual_key.csv のフィールド
+        """
+        self.table = table.lower()
+        self.fields: Set[str] = set(GA4_BASE_COLUMNS)
+        self.param_keys: Set[str] = set()
+        repeated = set(_BASE_REPEATED_FIELDS)
+        for entry in entries:
+            if entry.source == SOURCE_VIRTUAL:
+                self.param_keys.add(entry.name)
+                continue
+            self.fields.add(entry.name.lower())
+            if entry.mode == "REPEATED":
+                repeated.add(entry.name.lower())
+
+        # サブフィールドが記載されているフィールド
+        self.parents: Set[str] = {field.rsplit(".", 1)[0] for field in self.fields if "." in field}
+
+        # REPEATED のフィールドごとの、UNNEST した要素から参照できるフィールド
+        self.repeated: Dict[str, Set[str]] = {}
+        for name in repeated:
+            prefix = f"{name}."
+            self.repeated[name] = set(_BASE_REPEATED_FIELDS.get(name, ())) | {
+                field[len(prefix):] for field in self.fields if field.startswith(prefix)
+            }
+
+    @classmethod
+    def from_settings(
+        cls, bigquery_settings: Dict[str, str], lexical_index: LexicalFieldIndex
+    ) -> "SqlValidator":
+        """
+        設定と字句インデックスから検証器を作成する
+
+        Args:
+            bigquery_settings: settings.json の bigquery セクション
+            lexical_index: スキーマのCSVから作成した字句インデックス
+
+        Returns:
+            SqlValidator: 検証器
+        """
+        table = f"{bigquery_settings['project_id']}.{bigquery_settings['dataset_id']}.events_*"
+        return cls(table, lexical_index.entries)
+
+    def validate(self, sql: str) -> List[str]:
+        """
+        SQLを検証する
+
+        Args:
+            sql: 生成したSQL
+
+        Returns:
+            List[str]: 問題点（問題がない場合は空）
+        """
+        try:
+            statements = [statement for statement in sqlglot.parse(sql, read="bigquery") if statement is not None]
+        except sqlglot.errors.ParseError as e:
+            return [f"SQLを構文解析できません: {str(e).splitlines()[0]}"]
+        if len(statements) != 1:
+            return ["SQLは1つのSELECT文にしてください"]
+        tree = statements[0]
+        if not isinstance(tree, exp.Query):
+            return ["SELECT文ではありません"]
+
+        event_aliases = set()
+        problems = self._check_tables(tree, event_aliases)
+        if not any(
+            column.name.lower() == _TABLE_SUFFIX and column.find_ancestor(exp.Where) is not None
+            for column in tree.find_all(exp.Column)
+        ):
+            problems.append("WHERE句に _TABLE_SUFFIX による日付の条件がありません")
+        problems.extend(self._check_columns(tree, event_aliases))
+        # 同じ問題は1回だけ報告する
+        return list(dict.fromkeys(problems))
+
+    def check(self, sql: str) -> None:
+        """
+        SQLを検証し、問題があれば例外を送出する
+
+        Args:
+            sql: 生成したSQL
+
+        Raises:
+            SqlValidationError: 問題が見つかった場合
+        """
+        problems = self.validate(sql)
+        if problems:
+            raise SqlValidationError(problems)
+
+    def _check_tables(self, tree: exp.Expression, event_aliases: Set[str]) -> List[str]:
+        """参照しているテーブルを確認し、events_* テーブルの別名を event_aliases に加える"""
+        problems = []
+        cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+        found = False
+        for table in tree.find_all(exp.Table):
+            if not table.db and table.name.lower() in cte_names:
+                continue
+            full_name = ".".join(part for part in (table.catalog, table.db, table.name) if part).lower()
+            if full_name != self.table:
+                problems.append(f"テーブル {full_name} は使用できません（{self.table} をフルパスで指定してください）")
+                continue
+            found = True
+            event_aliases.add(table.name.lower())
+            if table.alias:
+                event_aliases.add(table.alias.lower())
+        if not found and not problems:
+            problems.append(f"テーブル {self.table} を参照していません")
+        return problems
+
+    def _strip_alias(self, path: List[str], event_aliases: Set[str]) -> List[str]:
+        """events_* テーブルの別名による修飾を取り除く"""
+        if len(path) > 1 and path[0] in event_aliases:
+            return path[1:]
+        return path
+
+    def _unnest_source(self, unnest: exp.Unnest, event_aliases: Set[str]) -> Optional[str]:
+        """UNNEST したフィールド名を返す（フィールド以外を UNNEST した場合はNone）"""
+        target = unnest.expressions[0] if unnest.expressions else None
+        if not isinstance(target, exp.Column):
+            return None
+        return ".".join(self._strip_alias(_column_path(target), event_aliases))
+
+    def _repeated_prefix(self, path: List[str], start: int = 1) -> Optional[str]:
+        """path の途中にある REPEATED のフィールドを返す（ない場合はNone）"""
+        for end in range(start, len(path)):
+            prefix = ".".join(path[:end])
+            if prefix in self.repeated:
+                return prefix
+        return None
+
+    def _in_open_record(self, path: List[str]) -> bool:
+        """サブフィールドが記載されていない RECORD の下のフィールドかどうか"""
+        for end in range(len(path) - 1, 0, -1):
+            prefix = ".".join(path[:end])
+            if prefix in self.fields:
+                return prefix not in self.parents
+        return False
+
+    def _check_columns(self, tree: exp.Expression, event_aliases: Set[str]) -> List[str]:
+        """参照しているフィールドと event_params のキーを確認する"""
+        problems = []
+
+        # UNNEST の別名と展開したフィールド
+        unnest_aliases: Dict[str, Optional[str]] = {}
+        unnest_sources: Dict[int, List[Optional[str]]] = {}
+        for unnest in tree.find_all(exp.Unnest):
+            source = self._unnest_source(unnest, event_aliases)
+            select = unnest.find_ancestor(exp.Select)
+            unnest_sources.setdefault(id(select), []).append(source)
+            alias = unnest.args.get("alias")
+            if alias is not None:
+                for identifier in [alias.this, *alias.columns]:
+                    if identifier is not None and identifier.name:
+                        unnest_aliases[identifier.name.lower()] = source
+
+        # CTE・サブクエリ・SELECT の別名（参照先を特定できないため検証しない）
+        cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+        aliases = cte_names | {subquery.alias.lower() for subquery in tree.find_all(exp.Subquery) if subquery.alias}
+        aliases |= {alias.alias.lower() for alias in tree.find_all(exp.Alias)}
+        # CTE・サブクエリが出力する列名（CTE・サブクエリから読む SELECT でのみ参照できる）
+        derived_outputs = {
+            projection.alias_or_name.lower()
+            for select in tree.find_all(exp.Select)
+            if select.find_ancestor(exp.CTE, exp.Subquery) is not None
+            for projection in select.expressions
+        }
+
+        for column in tree.find_all(exp.Column):
+            path = self._strip_alias(_column_path(column), event_aliases)
+            if path == [_TABLE_SUFFIX]:
+                continue
+
+            if path[0] in unnest_aliases:
+                source = unnest_aliases[path[0]]
+                if source is None or source not in self.repeated:
+                    continue
+                element = ".".join(path[1:])
+                if element and element not in self.repeated[source]:
+                    problems.append(f"{source} の要素に {element} はありません")
+                self._check_param_key(column, source, problems)
+                continue
+
+            name = ".".join(path)
+            repeated = self._repeated_prefix(path)
+            if repeated is not None and path[0] not in aliases:
+                problems.append(f"REPEATED の {repeated} は UNNEST してから参照してください（{name}）")
+                continue
+            if name in self.fields or self._in_open_record(path):
+                continue
+
+            # UNNEST した要素を修飾なしで参照している場合（SELECT value.int_value FROM UNNEST(event_params) など）
+            sources = unnest_sources.get(id(column.find_ancestor(exp.Select)), [])
+            element_sources = [
+                source for source in sources if source in self.repeated and name in self.repeated[source]
+            ]
+            if element_sources:
+                self._check_param_key(column, element_sources[0], problems)
+                continue
+            if path[0] in aliases or any(source is None for source in sources):
+                continue
+            if path[0] in derived_outputs and self._reads_derived(column.find_ancestor(exp.Select), cte_names):
+                continue
+            problems.append(f"スキーマに存在しないフィールドです: {name}")
+        return problems
+
+    @staticmethod
+    def _reads_derived(select: Optional[exp.Select], cte_names: Set[str]) -> bool:
+        """SELECT が CTE またはサブクエリから読み出しているかどうか"""
+        if select is None:
+            return False
+        sources = [select.args.get("from_") or select.args.get("from"), *(select.args.get("joins") or [])]
+        for source in sources:
+            target = source.this if source is not None else None
+            if isinstance(target, exp.Subquery):
+                return True
+            if isinstance(target, exp.Table) and not target.db and target.name.lower() in cte_names:
+                return True
+        return False
+
+    def _check_param_key(self, column: exp.Column, source: str, problems: List[str]) -> None:
+        """event_params の key と比較している文字列が仮想キーに登録されているか確認する"""
+        if source != _PARAM_FIELD or column.name.lower() != "key" or not self.param_keys:
+            return
+        parent = column.parent
+        if isinstance(parent, exp.EQ):
+            values = [parent.right if parent.left is column else parent.left]
+        elif isinstance(parent, exp.In) and parent.this is column:
+            values = parent.expressions
+        else:
+            return
+        for value in values:
+            if (
+                isinstance(value, exp.Literal)
+                and value.is_string
+                and value.this not in self.param_keys
+                and value.this not in _EXTRA_PARAM_KEYS
+            ):
+                problems.append(
+                    f"event_params に存在しないキーです: {value.this}（ga4_virtual_key.csv のキーを使用してください）"
+                )
@@ -0,0 +1,162 @@
+"""
+分析意図の時間範囲を日付範囲に変換するモジュール
+"""
+
+import re
+import unicodedata
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+# 7d, 4w, 3m, 1y 形式の時間範囲
+_TIME_RANGE_PATTERN = re.compile(r"^\s*(\d+)\s*([dwmy])\s*$", re.IGNORECASE)
+
+# 単位ごとの日数（月・年は概算）
+_UNIT_DAYS = {"d": 1, "w": 7, "m": 30, "y": 365}
+
+
+def parse_time_range(
+    time_range: Optional[str], today: Optional[date] = None
+) -> Optional[Tuple[date, date]]:
+    """
+    "7d" や "30d" 形式の時間範囲を日付範囲に変換する
+
+    GA4の日次エクスポートは当日分が確定していないため、終了日は前日とする。
+
+    Args:
+        time_range: 時間範囲（例：7d, 4w, 3m, 1y）
+        today: 基準日（省略時は本日）
+
+    Returns:
+        Optional[Tuple[date, date]]: 開始日と終了日（解釈できない場合はNone）
+    """
+    if not time_range or not isinstance(time_range, str):
+        return None
+    match = _TIME_RANGE_PATTERN.match(time_range)
+    if not match:
+        return None
+
+    days = int(match.group(1)) * _UNIT_DAYS[match.group(2).lower()]
+    if days <= 0:
+        return None
+
+    today = today or date.today()
+    end_date = today - timedelta(days=1)
+    start_date = today - timedelta(days=days)
+    return start_date, end_date
+
+
+# 質問文中の「過去30日」「直近2週間」「last 7 days」などの相対期間
+_RELATIVE_PHRASE_PATTERNS = [
+    re.compile(r"(?:過去|直近|最近|ここ)\s*(\d+)\s*(日|週|ヶ月|ケ月|カ月|か月|ヵ月|箇月|年)"),
+    re.compile(r"(?:last|past|previous)\s+(\d+)\s*(days?|weeks?|months?|years?)", re.IGNORECASE),
+]
+
+# 単位の表記と時間範囲の単位の対応
+_PHRASE_UNITS = {
+    "日": "d", "週": "w", "ヶ月": "m", "ケ月": "m", "カ月": "m", "か月": "m", "ヵ月": "m", "箇月": "m", "年": "y",
+    "day": "d", "week": "w", "month": "m", "year": "y",
+}
+
+# 数値を含まない期間の表現（カレンダー上の期間は日数で近似する）
+_FIXED_PHRASES = [
+    (re.compile(r"昨日|yesterday", re.IGNORECASE), "1d"),
+    (re.compile(r"先週|前週|last\s+week|past\s+week", re.IGNORECASE), "7d"),
+    (re.compile(r"先月|前月|last\s+month|past\s+month", re.IGNORECASE), "30d"),
+    (re.compile(r"昨年|去年|前年|last\s+year|past\s+year", re.IGNORECASE), "1y"),
+]
+
+
+def parse_time_phrase(text: str) -> Optional[str]:
+    """
+    質問文中の期間の表現を "7d" 形式の時間範囲に変換する
+
+    「先週」「先月」などのカレンダー上の期間は、直近の7日・30日として扱う。
+
+    Args:
+        text: 質問文
+
+    Returns:
+        Optional[str]: 時間範囲（例：30d, 2w, 3m, 1y。期間の表現がない場合はNone）
+    """
+    text = unicodedata.normalize("NFKC", text)
+    for pattern in _RELATIVE_PHRASE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            unit = match.group(2).lower().rstrip("s")
+            return f"{int(match.group(1))}{_PHRASE_UNITS[unit]}"
+    for pattern, time_range in _FIXED_PHRASES:
+        if pattern.search(text):
+            return time_range
+    return None
+
+
+# カレンダー上の期間の表現（時間範囲にすると直近の日数で近似される）
+_CALENDAR_PHRASE_PATTERN = re.compile(
+    r"先週|前週|今週|先月|前月|今月|昨年|去年|前年|今年|(?:last|this)\s+(?:week|month|year)",
+    re.IGNORECASE,
+)
+
+
+def is_calendar_phrase(text: str) -> bool:
+    """
+    質問文がカレンダー上の期間（「先月」「今週」など）を指しているかどうか
+
+    これらの期間は時間範囲に変換すると直近の日数で近似されるため、時間範囲から正確な日付範囲は求められない。
+
+    Args:
+        text: 質問文
+
+    Returns:
+        bool: カレンダー上の期間の表現を含む場合はTrue
+    """
+    return bool(calendar_phrases(text))
+
+
+def calendar_phrases(text: str) -> List[str]:
+    """
+    質問文中のカレンダー上の期間の表現を出現順に返す
+
+    Args:
+        text: 質問文
+
+    Returns:
+        List[str]: 期間の表現（小文字・空白を1つにまとめたもの。例：先月、this month）
+    """
+    return [
+        " ".join(phrase.lower().split())
+        for phrase in _CALENDAR_PHRASE_PATTERN.findall(unicodedata.normalize("NFKC", text))
+    ]
+
+
+# 日単位の集計を表す表現（「日別」「毎日」など）
+_DAILY_PATTERN = re.compile(r"日別|日ごと|日毎|毎日|日次|\bdaily\b|\bper\s+day\b", re.IGNORECASE)
+
+
+def remove_daily_phrases(text: str) -> str:
+    """
+    質問文から日単位の集計を表す表現（「日別」「毎日」など）を取り除く
+
+    Args:
+        text: 質問文
+
+    Returns:
+        str: 日単位の集計の表現を空白に置き換えた質問文
+    """
+    return _DAILY_PATTERN.sub(" ", unicodedata.normalize("NFKC", text))
+
+
+def remove_time_phrases(text: str) -> str:
+    """
+    質問文から期間と日単位の集計を表す表現を取り除く
+
+    Args:
+        text: 質問文
+
+    Returns:
+        str: 期間の表現（「過去30日」「先週」など）と日単位の集計の表現を空白に置き換えた質問文
+    """
+    text = remove_daily_phrases(text)
+    patterns = _RELATIVE_PHRASE_PATTERNS + [pattern for pattern, _ in _FIXED_PHRASES] + [_CALENDAR_PHRASE_PATTERN]
+    for pattern in patterns:
+        text = pattern.sub(" ", text)
+    return text
@@ -0,0 +1,407 @@
+"""
+処理ステージごとの計測（トレース）
+
+`trace_span` で囲んだ処理の経過時間と属性（スキャン量、行数、トークン数、キャッシュヒットなど）を
+スパンとして記録し、設定したエクスポーターに出力する。
+
+設定例（settings.json）:
+    "tracing": {
+        "enabled": true,
+        "exporters": ["json_log", "prometheus"],
+        "prometheus_port": 9464
+    }
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Prometheus のヒストグラムのバケット（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+@dataclass
+class Span:
+    """
+    計測対象の処理1回分の記録
+    """
+    name: str  # スパン名（例: bigquery.query）
+    trace_id: str  # 同じリクエスト内のスパンで共通のID
+    span_id: str  # スパンのID
+    parent_id: Optional[str] = None  # 親スパンのID
+    start_time: float = 0.0  # 開始時刻（UNIX時間）
+    duration_seconds: float = 0.0  # 経過時間（秒）
+    attributes: Dict[str, Any] = field(default_factory=dict)  # 属性
+    error: Optional[str] = None  # 例外が発生した場合のエラー内容
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """
+        属性を設定する
+
+        Args:
+            key: 属性名
+            value: 属性値
+        """
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        """
+        複数の属性を設定する
+
+        Args:
+            attributes: 属性名と値の辞書
+        """
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        出力用の辞書に変換する
+
+        Returns:
+            Dict[str, Any]: スパンの内容
+        """
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration_seconds * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class SpanExporter(ABC):
+    """スパンの出力先の基底クラス"""
+
+    @abstractmethod
+    def export(self, span: Span) -> None:
+        """
+        終了したスパンを出力する
+
+        Args:
+            span: 終了したスパン
+        """
+        pass
+
+
+class JsonLogExporter(SpanExporter):
+    """スパンを1行のJSONとしてログに出力するエクスポーター"""
+
+    def __init__(self, logger_name: str = "analytics_chat_agent.tracing.spans"):
+        """
+        Args:
+            logger_name: 出力先のロガー名
+        """
+        self.logger = logging.getLogger(logger_name)
+
+    def export(self, span: Span) -> None:
+        self.logger.info(json.dumps(span.to_dict(), ensure_ascii=False, default=str))
+
+
+class InMemoryExporter(SpanExporter):
+    """スパンをメモリに保持するエクスポーター（テスト用）"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def get(self, name: str) -> List[Span]:
+        """
+        指定した名前のスパンを取得する
+
+        Args:
+            name: スパン名
+
+        Returns:
+            List[Span]: 終了順のスパン
+        """
+        with self._lock:
+            return [span for span in self.spans if span.name == name]
+
+    def clear(self) -> None:
+        """保持しているスパンを削除する"""
+        with self._lock:
+            self.spans = []
+
+
+class PrometheusExporter(SpanExporter):
+    """
+    スパンを Prometheus のテキスト形式で集計するエクスポーター
+
+    スパン名ごとに経過時間のヒストグラムとエラー数を、数値の属性ごとに合計値を集計する。
+    """
+
+    def __init__(self, namespace: str = "analytics_chat_agent", buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Args:
+            namespace: メトリクス名の接頭辞
+            buckets: ヒストグラムのバケット（秒）
+        """
+        self.namespace = namespace
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._bucket_counts: Dict[str, List[int]] = {}
+        self._counts: Dict[str, int] = {}
+        self._sums: Dict[str, float] = {}
+        self._errors: Dict[str, int] = {}
+        self._attribute_sums: Dict[Tuple[str, str], float] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            counts = self._bucket_counts.setdefault(span.name, [0] * len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if span.duration_seconds <= bound:
+                    counts[i] += 1
+            self._counts[span.name] = self._counts.get(span.name, 0) + 1
+            self._sums[span.name] = self._sums.get(span.name, 0.0) + span.duration_seconds
+            if span.error is not None:
+                self._errors[span.name] = self._errors.get(span.name, 0) + 1
+            for key, value in span.attributes.items():
+                # bool は int のサブクラスのため、キャッシュヒットなどは件数として集計される
+                if isinstance(value, (int, float)):
+                    self._attribute_sums[(span.name, key)] = (
+                        self._attribute_sums.get((span.name, key), 0.0) + float(value)
+                    )
+
+    def render(self) -> str:
+        """
+        集計結果を Prometheus のテキスト形式で返す
+
+        Returns:
+            str: メトリクス
+        """
+        duration = f"{self.namespace}_span_duration_seconds"
+        errors = f"{self.namespace}_span_errors_total"
+        attributes = f"{self.namespace}_span_attribute_total"
+        lines = [
+            f"# HELP {duration} 処理ステージごとの経過時間",
+            f"# TYPE {duration} histogram",
+        ]
+        with self._lock:
+            for name in sorted(self._counts):
+                for bound, count in zip(self.buckets, self._bucket_counts[name]):
+                    lines.append(f'{duration}_bucket{{span="{name}",le="{bound}"}} {count}')
+                lines.append(f'{duration}_bucket{{span="{name}",le="+Inf"}} {self._counts[name]}')
+                lines.append(f'{duration}_sum{{span="{name}"}} {self._sums[name]}')
+                lines.append(f'{duration}_count{{span="{name}"}} {self._counts[name]}')
+
+            lines.append(f"# HELP {errors} 処理ステージごとのエラー数")
+            lines.append(f"# TYPE {errors} counter")
+            for name in sorted(self._counts):
+                lines.append(f'{errors}{{span="{name}"}} {self._errors.get(name, 0)}')
+
+            lines.append(f"# HELP {attributes} 処理ステージごとの数値属性の合計")
+            lines.append(f"# TYPE {attributes} counter")
+            for (name, key), value in sorted(self._attribute_sums.items()):
+                lines.append(f'{attributes}{{span="{name}",attribute="{key}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "0.0.0.0") -> None:
+        """
+        /metrics でメトリクスを返すHTTPサーバーをバックグラウンドで起動する
+
+        Args:
+            port: 待ち受けポート
+            host: 待ち受けアドレス
+        """
+        exporter = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logger.info(f"メトリクスを公開しました: http://{host}:{port}/metrics")
+
+    def shutdown(self) -> None:
+        """HTTPサーバーを停止する"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+
+class Tracer:
+    """スパンを作成してエクスポーターに出力するクラス"""
+
+    def __init__(self, exporters: Optional[List[SpanExporter]] = None):
+        """
+        Args:
+            exporters: スパンの出力先（指定しない場合は出力しない）
+        """
+        self.exporters = exporters or []
+
+    @classmethod
+    def from_settings(cls, tracing_settings: Dict[str, Any]) -> "Tracer":
+        """
+        設定からトレーサーを作成する
+
+        Args:
+            tracing_settings: tracing セクションの設定
+
+        Returns:
+            Tracer: トレーサー
+
+        Raises:
+            ValueError: 未知のエクスポーターが指定された場合
+        """
+        if not tracing_settings.get("enabled", False):
+            return cls()
+
+        exporters: List[SpanExporter] = []
+        for name in tracing_settings.get("exporters", ["json_log"]):
+            if name == "json_log":
+                exporters.append(JsonLogExporter())
+            elif name == "prometheus":
+                exporter = PrometheusExporter()
+                port = tracing_settings.get("prometheus_port")
+                if port:
+                    exporter.serve(port)
+                exporters.append(exporter)
+            elif name == "memory":
+                exporters.append(InMemoryExporter())
+            else:
+                raise ValueError(f"未知のエクスポーターです: {name}")
+        return cls(exporters)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """
+        ブロック内の処理をスパンとして計測する
+
+        現在のスパンがある場合はその子スパンになる。ブロック内で例外が発生した場合は
+        エラーを記録して例外をそのまま送出する。
+
+        Args:
+            name: スパン名
+            **attributes: 初期属性
+
+        Yields:
+            Span: 作成したスパン
+        """
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            start_time=time.time(),
+            attributes=dict(attributes),
+        )
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration_seconds = time.perf_counter() - start
+            _current_span.reset(token)
+            for exporter in self.exporters:
+                try:
+                    exporter.export(span)
+                except Exception as e:
+                    logger.warning(f"スパンの出力に失敗しました: {e}")
+
+    def find_exporter(self, exporter_type: type) -> Optional[SpanExporter]:
+        """
+        指定した型のエクスポーターを取得する
+
+        Args:
+            exporter_type: エクスポーターの型
+
+        Returns:
+            Optional[SpanExporter]: 見つかったエクスポーター
+        """
+        for exporter in self.exporters:
+            if isinstance(exporter, exporter_type):
+                return exporter
+        return None
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """
+    設定ファイルから作成したトレーサーを取得する（初回のみ作成）
+
+    Returns:
+        Tracer: トレーサー
+    """
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer.from_settings(get_settings().get("tracing", {}))
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    """
+    使用するトレーサーを差し替える（None を指定すると次回の取得時に設定から作り直す）
+
+    Args:
+        tracer: トレーサー
+    """
+    global _tracer
+    with _tracer_lock:
+        _tracer = tracer
+
+
+def trace_span(name: str, **attributes: Any):
+    """
+    現在のトレーサーでスパンを作成する
+
+    Args:
+        name: スパン名
+        **attributes: 初期属性
+
+    Returns:
+        ContextManager[Span]: スパンのコンテキストマネージャー
+    """
+    return get_tracer().span(name, **attributes)
+
+
+def current_span() -> Optional[Span]:
+    """
+    現在のスパンを取得する
+
+    Returns:
+        Optional[Span]: 現在のスパン（スパンの外ではNone）
+    """
+    return _current_span.get()
@@ -0,0 +1,329 @@
+"""
+スキーマのベクトルのスナップショット
+
+Qdrant のコレクションに登録した埋め込みを、ペイロードと合わせて1つの npz ファイルに保存し、
+別の環境で Qdrant に一括登録、またはメモリ上のインデックスとして読み込む。
+スナップショットには埋め込みに使用したモデル名とスキーマCSVのハッシュを記録し、
+モデルが異なるスナップショットは復元しない（CSVが異なる場合は警告のみ）。
+
+ファイルの構成（すべて pickle を使わずに読める配列）:
+    vectors   (件数, 次元数) の float32
+    ids       ポイントIDの文字列
+    payloads  ペイロードのJSON文字列
+    meta      バージョン・モデル名・CSVハッシュ・次元数のJSON文字列
+"""
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from .qdrant_settings import (
+    build_hnsw_config,
+    build_quantization_config,
+    build_vectors_config,
+    payload_index_fields,
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+# Qdrant から読み出し・書き込みする1回あたりの件数
+SNAPSHOT_BATCH_SIZE = 256
+
+
+class SnapshotMismatchError(ValueError):
+    """スナップショットが現在のモデルと一致しない場合のエラー"""
+
+
+@dataclass
+class VectorSnapshot:
+    """
+    コレクションのベクトルとペイロード
+    """
+    model_name: str  # 埋め込みに使用したモデル名
+    csv_hash: str  # スキーマCSVのハッシュ
+    ids: List[Union[int, str]]  # ポイントID
+    vectors: np.ndarray  # (件数, 次元数) の float32
+    payloads: List[Dict[str, Any]]  # ペイロード
+
+    @property
+    def dimension(self) -> int:
+        return int(self.vectors.shape[1]) if self.vectors.ndim == 2 else 0
+
+
+def csv_fingerprint(csv_paths: Iterable[Path]) -> str:
+    """
+    スキーマCSVの内容のハッシュを計算する（存在しないファイルは除く）
+
+    Args:
+        csv_paths: CSVファイルのパス
+
+    Returns:
+        str: SHA-256 の16進文字列
+    """
+    digest = hashlib.sha256()
+    for csv_path in csv_paths:
+        if not csv_path.exists():
+            continue
+        digest.update(csv_path.name.encode("utf-8"))
+        digest.update(csv_path.read_bytes())
+    return digest.hexdigest()
+
+
+def save_snapshot(snapshot: VectorSnapshot, path: Path) -> None:
+    """
+    スナップショットをファイルに保存する
+
+    Args:
+        snapshot: スナップショット
+        path: 保存先（.npz）
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "model_name": snapshot.model_name,
+        "csv_hash": snapshot.csv_hash,
+        "dimension": snapshot.dimension,
+        "count": len(snapshot.ids),
+    }
+    with path.open("wb") as f:
+        np.savez_compressed(
+            f,
+            vectors=np.asarray(snapshot.vectors, dtype=np.float32),
+            ids=np.array([str(point_id) for point_id in snapshot.ids], dtype=str),
+            payloads=np.array(
+                [json.dumps(payload, ensure_ascii=False) for payload in snapshot.payloads], dtype=str
+            ),
+            meta=np.array(json.dumps(meta, ensure_ascii=False)),
+        )
+
+
+def load_snapshot(path: Path) -> VectorSnapshot:
+    """
+    スナップショットをファイルから読み込む
+
+    Args:
+        path: スナップショットのパス
+
+    Returns:
+        VectorSnapshot: スナップショット
+
+    Raises:
+        FileNotFoundError: ファイルが存在しない場合
+        ValueError: 対応していないバージョンの場合
+    """
+    if not path.exists():
+        raise FileNotFoundError(f"スナップショットが見つかりません: {path}")
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"対応していないスナップショットのバージョンです: {meta.get('version')}")
+        return VectorSnapshot(
+            model_name=meta["model_name"],
+            csv_hash=meta["csv_hash"],
+            ids=[int(point_id) if point_id.isdigit() else point_id for point_id in data["ids"].tolist()],
+            vectors=data["vectors"].astype(np.float32, copy=False),
+            payloads=[json.loads(payload) for payload in data["payloads"].tolist()],
+        )
+
+
+def check_snapshot(snapshot: VectorSnapshot, model_name: str, csv_hash: Optional[str] = None) -> None:
+    """
+    スナップショットが現在の設定で使用できるか確認する
+
+    Args:
+        snapshot: スナップショット
+        model_name: 現在のモデル名
+        csv_hash: 現在のスキーマCSVのハッシュ（指定しない場合は確認しない）
+
+    Raises:
+        SnapshotMismatchError: モデル名が異なる場合
+    """
+    if snapshot.model_name != model_name:
+        raise SnapshotMismatchError(
+            f"スナップショットのモデル（{snapshot.model_name}）が設定のモデル（{model_name}）と異なります"
+        )
+    if csv_hash is not None and snapshot.csv_hash != csv_hash:
+        logger.warning("スナップショット作成後にスキーマCSVが変更されています（import-ga4-schema で再作成してください）")
+
+
+def export_collection(
+    client: QdrantClient, collection_name: str, model_name: str, csv_hash: str
+) -> VectorSnapshot:
+    """
+    Qdrant のコレクションからベクトルとペイロードを読み出す
+
+    Args:
+        client: Qdrantクライアント
+        collection_name: コレクション名
+        model_name: 埋め込みに使用したモデル名
+        csv_hash: スキーマCSVのハッシュ
+
+    Returns:
+        VectorSnapshot: スナップショット
+    """
+    ids: List[Union[int, str]] = []
+    vectors: List[List[float]] = []
+    payloads: List[Dict[str, Any]] = []
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=SNAPSHOT_BATCH_SIZE,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        for point in points:
+            ids.append(point.id)
+            vectors.append(point.vector)
+            payloads.append(point.payload or {})
+        if offset is None:
+            break
+    return VectorSnapshot(
+        model_name=model_name,
+        csv_hash=csv_hash,
+        ids=ids,
+        vectors=np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1),
+        payloads=payloads,
+    )
+
+
+def restore_collection(
+    client: QdrantClient,
+    collection_name: str,
+    snapshot: VectorSnapshot,
+    qdrant_settings: Dict[str, Any],
+) -> int:
+    """
+    スナップショットからコレクションを作り直して一括登録する
+
+    Args:
+        client: Qdrantクライアント
+        collection_name: コレクション名
+        snapshot: スナップショット
+        qdrant_settings: qdrant セクションの設定（コレクションの作成に使用）
+
+    Returns:
+        int: 登録したポイント数
+    """
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=build_vectors_config(snapshot.dimension, qdrant_settings),
+        hnsw_config=build_hnsw_config(qdrant_settings),
+        quantization_config=build_quantization_config(qdrant_settings),
+    )
+    for field_name in payload_index_fields(qdrant_settings):
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=models.PayloadSchemaType.KEYWORD,
+        )
+    client.upload_collection(
+        collection_name=collection_name,
+        vectors=snapshot.vectors,
+        payload=snapshot.payloads,
+        ids=snapshot.ids,
+        batch_size=SNAPSHOT_BATCH_SIZE,
+        wait=True,
+    )
+    return len(snapshot.ids)
+
+
+@dataclass
+class LocalHit:
+    """
+    LocalVectorIndex の検索結果（Qdrant の ScoredPoint と同じ属性名）
+    """
+    id: Union[int, str]
+    score: float
+    payload: Dict[str, Any]
+
+
+class LocalVectorIndex:
+    """
+    スナップショットをメモリ上で全件検索するインデックス
+
+    スキーマは数百件程度のため、正規化したベクトルの内積で全件を比較しても十分に速い。
+    FieldResolver から Qdrant クライアントの代わりに使えるよう search の引数を合わせている。
+    """
+
+    def __init__(self, snapshot: VectorSnapshot):
+        """
+        Args:
+            snapshot: スナップショット
+        """
+        self.model_name = snapshot.model_name
+        self.ids = snapshot.ids
+        self.payloads = snapshot.payloads
+        norms = np.linalg.norm(snapshot.vectors, axis=1, keepdims=True)
+        self.vectors = snapshot.vectors / np.clip(norms, 1e-12, None)
+
+    @classmethod
+    def from_file(cls, path: Path) -> "LocalVectorIndex":
+        """
+        スナップショットのファイルからインデックスを作成する
+
+        Args:
+            path: スナップショットのパス
+
+        Returns:
+            LocalVectorIndex: インデックス
+        """
+        return cls(load_snapshot(path))
+
+    def _matches(self, payload: Dict[str, Any], query_filter: Optional[models.Filter]) -> bool:
+        """must / must_not の完全一致条件（build_source_filter の形式）のみ評価する"""
+        if query_filter is None:
+            return True
+        return all(
+            payload.get(condition.key) == condition.match.value for condition in query_filter.must or []
+        ) and not any(
+            payload.get(condition.key) == condition.match.value for condition in query_filter.must_not or []
+        )
+
+    def search(
+        self,
+        query_vector: Sequence[float],
+        limit: int = 10,
+        query_filter: Optional[models.Filter] = None,
+        with_payload: Union[bool, Sequence[str]] = True,
+        **kwargs: Any,
+    ) -> List[LocalHit]:
+        """
+        コサイン類似度の高い順に検索する
+
+        Args:
+            query_vector: 検索するベクトル
+            limit: 最大件数
+            query_filter: ペイロードの条件
+            with_payload: 返すペイロードのフィールド（True の場合はすべて）
+            **kwargs: Qdrant クライアントとの互換のための引数（collection_name、search_params など、使用しない）
+
+        Returns:
+            List[LocalHit]: 検索結果
+        """
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        scores = self.vectors @ query
+        hits: List[LocalHit] = []
+        for index in np.argsort(-scores, kind="stable"):
+            payload = self.payloads[index]
+            if not self._matches(payload, query_filter):
+                continue
+            if with_payload is not True:
+                payload = {key: payload[key] for key in (with_payload or []) if key in payload}
+            hits.append(LocalHit(id=self.ids[index], score=float(scores[index]), payload=payload))
+            if len(hits) >= limit:
+                break
+        return hits
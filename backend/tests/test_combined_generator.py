@@ -0,0 +1,133 @@
+import json
+from unittest import mock
+
+import pytest
+
+from analytics_chat_agent.core import combined_generator
+from analytics_chat_agent.core.analyzer import analysis_service
+from analytics_chat_agent.core.analyzer.analysis_service import AnalysisService
+from analytics_chat_agent.core.combined_generator import CombinedGenerator, CombinedResponseError
+from analytics_chat_agent.core.llm_response import intent_from_dict, parse_json_response
+from analytics_chat_agent.core.query_router import ENGINE_BIGQUERY, ENGINE_POSTGRES, RouteDecision
+from analytics_chat_agent.core.sql_templates import SqlTemplateMatcher
+from analytics_chat_agent.types import Field, FieldMappingResult, QueryResult
+
+TABLE = "ungift.analytics_336047273.events_*"
+CANDIDATES = FieldMappingResult(
+    fields=[Field(name="event_name", type="string"), Field(name="device.category", type="string")],
+    description="イベント名",
+)
+VALID_SQL = (
+    f"SELECT event_date, COUNT(*) AS pv FROM `{TABLE}` "
+    "WHERE _TABLE_SUFFIX >= FORMAT_DATE('%Y%m%d', DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)) "
+    "AND event_name = 'page_view' GROUP BY event_date ORDER BY event_date"
+)
+
+
+def _response(sql=VALID_SQL, fields=("event_name",), key="page_view"):
+    return json.dumps({
+        "intent": {
+            "key": key,
+            "description": "PV数",
+            "parameters": {"time_range": "7d", "other_params": ""},
+        },
+        "fields": list(fields),
+        "sql": sql,
+    })
+
+
+def test_parse_json_response_accepts_code_fence_and_python_dict():
+    assert parse_json_response('```json\n{"key": "page_view"}\n```') == {"key": "page_view"}
+    assert parse_json_response("{'key': 'page_view'}") == {"key": "page_view"}
+    with pytest.raises(ValueError):
+        parse_json_response("意図は page_view です")
+    with pytest.raises(ValueError):
+        parse_json_response("[1, 2]")
+    with pytest.raises(ValueError):
+        intent_from_dict({"key": "page_view", "description": "PV数", "parameters": "7d"})
+
+
+def test_generate_returns_intent_fields_and_sql_in_one_call():
+    generator = CombinedGenerator(TABLE)
+    with mock.patch.object(combined_generator, "call_gpt", return_value=_response()) as gpt:
+        answer = generator.generate("先週のPV数", CANDIDATES)
+
+    gpt.assert_called_once()
+    assert gpt.call_args.kwargs["response_format"]["type"] == "json_schema"
+    assert answer.intent.key == "page_view"
+    assert answer.intent.parameters["time_range"] == "7d"
+    assert [f.name for f in answer.field_mapping.fields] == ["event_name"]
+    assert answer.sql == VALID_SQL
+
+
+def test_generate_repairs_invalid_response_once():
+    generator = CombinedGenerator(TABLE, response_format="json_object")
+    invalid = _response(sql="SELECT COUNT(*) FROM events_*", fields=("page_title",))
+    with mock.patch.object(combined_generator, "call_gpt", side_effect=[invalid, _response()]) as gpt:
+        answer = generator.generate("先週のPV数", CANDIDATES)
+
+    assert gpt.call_count == 2
+    repair_prompt = gpt.call_args.args[0]
+    assert "候補にないフィールド" in repair_prompt
+    assert "_TABLE_SUFFIX" in repair_prompt
+    assert answer.sql == VALID_SQL
+
+    with mock.patch.object(combined_generator, "call_gpt", return_value="not json") as gpt:
+        with pytest.raises(CombinedResponseError):
+            generator.generate("先週のPV数", CANDIDATES)
+    assert gpt.call_count == 2
+
+
+def test_analyze_falls_back_to_separate_calls_when_combined_generation_fails():
+    resolver = mock.Mock()
+    resolver.resolve_fields.return_value = CANDIDATES
+    service = AnalysisService(
+        resolver, max_sql_regenerations=0, combined_generator=CombinedGenerator(TABLE, max_repairs=0)
+    )
+
+    intent_json = '{"key": "page_view", "description": "PV数", "parameters": {"time_range": "7d"}}'
+    with mock.patch.object(combined_generator, "call_gpt", side_effect=[_response(), "not json"]) as gpt, \
+            mock.patch.object(analysis_service, "call_gemini", return_value=intent_json) as gemini, \
+            mock.patch.object(analysis_service, "generate_sql", return_value="SELECT 1") as generate, \
+            mock.patch.object(analysis_service, "run_bigquery_query",
+                              return_value=[QueryResult(values={"pv": 10})]):
+        combined = service.analyze("先週のPV数")
+        fallback = service.analyze("先週のPV数")
+
+    assert gpt.call_count == 2
+    assert combined["sql"] == VALID_SQL
+    assert combined["fields"]["fields"] == [{"name": "event_name", "type": "string"}]
+    gemini.assert_called_once()
+    generate.assert_called_once()
+    assert fallback["sql"] == "SELECT 1"
+    assert fallback["intent"]["key"] == "page_view"
+
+
+def test_combined_answer_prefers_local_and_template_over_generated_sql():
+    resolver = mock.Mock()
+    resolver.resolve_fields.return_value = CANDIDATES
+    router = mock.Mock()
+    router.route.side_effect = [
+        RouteDecision(engine=ENGINE_POSTGRES, reason="ローカルの保持期間内"),
+        RouteDecision(engine=ENGINE_BIGQUERY, reason="保持期間外"),
+    ]
+    router.run_local.return_value = [{"pv": 3}]
+    service = AnalysisService(
+        resolver,
+        max_sql_regenerations=0,
+        query_router=router,
+        sql_templates=SqlTemplateMatcher({"project_id": "ungift", "dataset_id": "analytics_336047273"}, None),
+        combined_generator=CombinedGenerator(TABLE, max_repairs=0),
+    )
+
+    with mock.patch.object(combined_generator, "call_gpt", return_value=_response()), \
+            mock.patch.object(analysis_service, "generate_postgres_sql", return_value="SELECT 1 AS pv"), \
+            mock.patch.object(analysis_service, "run_bigquery_query",
+                              return_value=[QueryResult(values={"pv": 10})]) as run:
+        local = service.analyze("先週のPV数")
+        template = service.analyze("先週のPV数")
+
+    assert (local["engine"], local["sql"], local["results"]) == (ENGINE_POSTGRES, "SELECT 1 AS pv", [{"pv": 3}])
+    assert template["engine"] == ENGINE_BIGQUERY
+    assert template["sql"] != VALID_SQL and "page_view_count" in template["sql"]
+    run.assert_called_once_with(template["sql"])
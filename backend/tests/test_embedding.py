@@ -0,0 +1,73 @@
+import csv
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from analytics_chat_agent.config import get_settings
+from analytics_chat_agent.core.embedding import EmbeddingBackend, SentenceTransformerBackend
+from analytics_chat_agent.core.embedding.onnx_runtime import l2_normalize, mean_pool
+
+
+class DummyBackend(EmbeddingBackend):
+    model_name = "dummy"
+
+    def __init__(self):
+        self.batches = []
+
+    def _encode_batch(self, texts):
+        self.batches.append(len(texts))
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+
+def test_mean_pool_ignores_padding_tokens():
+    hidden = np.array([[[1.0, 2.0], [3.0, 4.0], [100.0, 100.0]]])
+    mask = np.array([[1, 1, 0]])
+
+    pooled = mean_pool(hidden, mask)
+
+    np.testing.assert_allclose(pooled, [[2.0, 3.0]])
+    np.testing.assert_allclose(np.linalg.norm(l2_normalize(pooled), axis=1), [1.0])
+
+
+def test_encode_splits_batches_and_returns_vector_for_single_text():
+    backend = DummyBackend()
+
+    assert backend.encode("abc").shape == (2,)
+    assert backend.encode(["a", "bb", "ccc"], batch_size=2).shape == (3, 2)
+    assert backend.batches == [1, 2, 1]
+
+
+def _schema_texts():
+    csv_path = Path(get_settings()["ga4_schema"]["csv_path"])
+    with csv_path.open(encoding="utf-8") as f:
+        return [
+            f"{row['description']} [{row['field_type']}] → {row['name']}"
+            for row in csv.DictReader(f)
+        ]
+
+
+@pytest.mark.parametrize("quantized", [False, True])
+def test_onnx_embeddings_match_torch_on_schema_corpus(quantized):
+    pytest.importorskip("onnxruntime")
+    from analytics_chat_agent.core.embedding import OnnxEmbeddingBackend
+
+    model_settings = get_settings()["model"]
+    model_dir = Path(model_settings["onnx"]["path"])
+    if not (model_dir / "embedding_config.json").exists():
+        pytest.skip(f"ONNXモデルがエクスポートされていません: {model_dir}")
+
+    texts = _schema_texts()
+    torch_embeddings = SentenceTransformerBackend(model_settings["name"]).encode(texts)
+    onnx_embeddings = OnnxEmbeddingBackend(model_dir, quantized=quantized).encode(texts)
+
+    cosine = np.sum(l2_normalize(torch_embeddings) * l2_normalize(onnx_embeddings), axis=1)
+    assert cosine.min() > (0.97 if quantized else 0.9999)
+
+    # 各フィールドに最も近いフィールドの順位が変わらないこと
+    torch_neighbours = np.argsort(-(torch_embeddings @ torch_embeddings.T), axis=1)[:, 1]
+    onnx_neighbours = np.argsort(-(onnx_embeddings @ onnx_embeddings.T), axis=1)[:, 1]
+    assert np.mean(torch_neighbours == onnx_neighbours) > (0.9 if quantized else 0.99)
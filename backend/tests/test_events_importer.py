@@ -0,0 +1,90 @@
+import json
+from collections import namedtuple
+from datetime import date, datetime, timezone
+
+from analytics_chat_agent.core.importer import EventsImporter
+
+Row = namedtuple(
+    "Row",
+    ["event_bundle_sequence_id", "event_date", "event_timestamp", "event_name",
+     "user_pseudo_id", "batch_event_index", "param_key", "param_value"],
+)
+
+
+class DummyPostgresConnection:
+    def __init__(self, virtual_keys):
+        self.virtual_keys = virtual_keys
+        self.inserted = []
+
+    def iter_query(self, query, params=None, **kwargs):
+        yield from self.execute_query(query, params)
+
+    def execute_query(self, query, params=None):
+        if "FROM virtual_keys" in query:
+            return self.virtual_keys
+        if "pg_inherits" in query:
+            return []
+        return None
+
+    def insert_rows(self, table, columns, rows, page_size=1000):
+        self.inserted.append((table, columns, rows))
+
+
+def _row(event_id, key, **value):
+    return Row(event_id, date(2024, 1, 1), None, "page_view", "user_1", 0, key, value)
+
+
+def test_events_with_different_keys_share_one_layout():
+    pg_conn = DummyPostgresConnection([
+        {"name": "page_location", "field_type": "STRING", "storage": "column"},
+        {"name": "ga_session_id", "field_type": "INTEGER", "storage": "column"},
+        {"name": "engagement_time_msec", "field_type": "INTEGER", "storage": "jsonb"},
+    ])
+    importer = EventsImporter(None, pg_conn, param_storage="columns")
+
+    rows = importer._normalize_events([
+        _row(1, "page_location", string_value="/top"),
+        _row(2, "ga_session_id", int_value=42),
+        _row(2, "engagement_time_msec", int_value=1200),
+    ])
+    importer._insert_events(rows)
+
+    [(table, columns, inserted)] = pg_conn.inserted
+    assert table == "events"
+    assert all(len(row) == len(columns) for row in inserted)
+    first, second = (dict(zip(columns, row)) for row in inserted)
+    assert first["bq_column_page_location"] == "/top"
+    assert first["bq_column_ga_session_id"] is None
+    assert first["event_params"] is None
+    assert second["bq_column_ga_session_id"] == 42
+    assert json.loads(second["event_params"]) == {"engagement_time_msec": 1200}
+    # 同じイベント名の event_dimensions は同じ文字列を使い回す
+    assert first["event_dimensions"] is second["event_dimensions"]
+
+
+def test_events_sharing_a_bundle_are_kept_apart():
+    pg_conn = DummyPostgresConnection([
+        {"name": "page_location", "field_type": "STRING", "storage": "column"},
+    ])
+    importer = EventsImporter(None, pg_conn, param_storage="columns")
+    timestamp = datetime(2024, 1, 1, 9, 0, tzinfo=timezone.utc)
+
+    # 同じバッチで送信された page_view と scroll、パラメータを持たない user_engagement
+    rows = importer._normalize_events([
+        Row(7, date(2024, 1, 1), timestamp, "page_view", "user_1", 1, "page_location",
+            {"string_value": "/top"}),
+        Row(7, date(2024, 1, 1), timestamp, "scroll", "user_1", 2, "page_location",
+            {"string_value": "/top"}),
+        Row(7, date(2024, 1, 1), timestamp, "user_engagement", "user_1", 3, None, None),
+    ])
+
+    columns = importer.layout.columns
+    events = [dict(zip(columns, row)) for row in rows]
+    assert [(e["event_name"], e["batch_event_index"]) for e in events] == [
+        ("page_view", 1), ("scroll", 2), ("user_engagement", 3),
+    ]
+    assert [e["bq_column_page_location"] for e in events] == ["/top", "/top", None]
+    # パラメータのないイベントも取得する
+    query = importer._build_base_query("2024-01-01")
+    assert "LEFT JOIN UNNEST(ARRAY(SELECT param FROM UNNEST(event_params) AS param" in query
+    assert "batch_event_index" in query
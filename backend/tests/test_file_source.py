@@ -0,0 +1,90 @@
+import gzip
+import json
+from datetime import date, datetime, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from analytics_chat_agent.core.importer import EventsImporter, FileEventSource
+from analytics_chat_agent.core.importer.file_source import discover_export_files, iter_param_rows
+
+
+def _event(event_id, day, **params):
+    return {
+        "event_date": day,
+        "event_timestamp": 1704067200000000 + event_id,
+        "event_name": "page_view",
+        "event_bundle_sequence_id": event_id,
+        "user_pseudo_id": "user_1",
+        "event_params": [
+            {"key": key, "value": {"string_value": None, "int_value": None, **value}}
+            for key, value in params.items()
+        ],
+    }
+
+
+def _write_exports(directory):
+    with gzip.open(directory / "events_20240101.ndjson.gz", "wt", encoding="utf-8") as f:
+        f.write(json.dumps(_event(1, "20240101", page_location={"string_value": "/top"})) + "\n")
+        f.write(json.dumps(_event(2, "20240101", ga_session_id={"int_value": 42})) + "\n")
+
+    (directory / "events_20240102").mkdir()
+    pq.write_table(
+        pa.Table.from_pylist([_event(3, "20240102", page_location={"string_value": "/cart"})]),
+        directory / "events_20240102" / "000000000000.parquet",
+    )
+    (directory / "README.txt").write_text("not an export")
+
+
+class DummyPostgresConnection:
+    def __init__(self):
+        self.virtual_keys = []
+        self.inserted = []
+
+    def iter_query(self, query, params=None, **kwargs):
+        yield from self.execute_query(query, params)
+
+    def execute_query(self, query, params=None):
+        if "FROM virtual_keys" in query:
+            return self.virtual_keys
+        if "INSERT INTO virtual_keys" in query:
+            self.virtual_keys.append(params)
+        if "information_schema.columns" in query or "pg_inherits" in query:
+            return []
+        return None
+
+    def insert_rows(self, table, columns, rows, page_size=1000):
+        self.inserted.append((table, columns, rows))
+
+
+def test_export_files_are_flattened_like_bigquery_rows(tmp_path):
+    _write_exports(tmp_path)
+
+    files = discover_export_files(tmp_path)
+    assert [(f.event_date, f.format) for f in files] == [
+        (date(2024, 1, 1), "json"),
+        (date(2024, 1, 2), "parquet"),
+    ]
+    assert [f.event_date for f in discover_export_files(tmp_path, date(2024, 1, 2))] == [date(2024, 1, 2)]
+
+    [row] = iter_param_rows(files[1])
+    assert row.event_date == date(2024, 1, 2)
+    assert row.event_timestamp == datetime(2024, 1, 1, 0, 0, 0, 3, tzinfo=timezone.utc)
+    assert (row.param_key, row.param_value["string_value"]) == ("page_location", "/cart")
+
+
+def test_import_events_from_files_adds_keys_then_inserts_each_file(tmp_path):
+    _write_exports(tmp_path)
+    pg_conn = DummyPostgresConnection()
+    importer = EventsImporter(None, pg_conn, param_storage="jsonb")
+    importer.rollup_builder = None
+
+    count = importer.import_events_from_files(FileEventSource(tmp_path, workers=1))
+
+    assert count == 3
+    assert sorted(importer.virtual_keys) == ["ga_session_id", "page_location"]
+    [(_, columns, first), (_, _, second)] = pg_conn.inserted
+    rows = [dict(zip(columns, row)) for row in first + second]
+    params = [json.loads(row["event_params"]) for row in rows]
+    assert params == [{"page_location": "/top"}, {"ga_session_id": 42}, {"page_location": "/cart"}]
+    assert [row["event_date"] for row in rows] == [date(2024, 1, 1), date(2024, 1, 1), date(2024, 1, 2)]
@@ -0,0 +1,109 @@
+from collections import namedtuple
+
+import psycopg2
+import pytest
+
+from analytics_chat_agent.core.importer import EventsImporter
+from analytics_chat_agent.core.importer.checkpoints import RetryPolicy, run_with_retry
+
+TableRow = namedtuple("TableRow", ["suffix"])
+
+
+class DummyBigQueryConnection:
+    def execute_query(self, query):
+        assert "INFORMATION_SCHEMA.TABLES" in query
+        return [TableRow("20240101"), TableRow("20240102"), TableRow("20240103")]
+
+
+class DummyPostgresConnection:
+    def iter_query(self, query, params=None, **kwargs):
+        yield from []
+
+    def execute_query(self, query, params=None):
+        return []
+
+
+class DummyCheckpointStore:
+    def __init__(self, run_id, completed):
+        self.run_id = run_id
+        self.completed = completed
+        self.done = []
+        self.finished = []
+
+    def find_resumable_run(self, mode, source):
+        return self.run_id
+
+    def start_run(self, mode, source):
+        return 99
+
+    def reopen_run(self, run_id):
+        pass
+
+    def completed_chunks(self, run_id):
+        return self.completed
+
+    def mark_chunk_done(self, run_id, chunk, row_count, attempts):
+        self.done.append((run_id, chunk, attempts))
+
+    def finish_run(self, run_id, status, error=None):
+        self.finished.append((run_id, status))
+
+
+@pytest.fixture
+def importer(monkeypatch):
+    importer = EventsImporter(DummyBigQueryConnection(), DummyPostgresConnection())
+    importer.rollup_builder = None
+    importer.retry_policy = RetryPolicy(max_attempts=3, backoff_seconds=0)
+    monkeypatch.setattr(importer, "_delete_events_by_date", lambda target_date: None)
+    monkeypatch.setattr(importer, "_delete_all_events", lambda: pytest.fail("resume must not delete all"))
+    monkeypatch.setattr(importer, "_recover_connection", lambda: None)
+    return importer
+
+
+def test_resume_skips_completed_tables_and_retries_transient_errors(importer, monkeypatch):
+    importer.checkpoints = DummyCheckpointStore(run_id=7, completed={"20240101"})
+    failures = {"20240103": 1}
+    queried = []
+
+    def import_events(query):
+        suffix = query.split("_TABLE_SUFFIX = '")[1][:8]
+        queried.append(suffix)
+        if failures.get(suffix):
+            failures[suffix] -= 1
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        return 10
+
+    monkeypatch.setattr(importer, "_import_events", import_events)
+
+    assert importer.import_all_events(resume=True) == 20
+    assert queried == ["20240102", "20240103", "20240103"]
+    assert importer.checkpoints.done == [(7, "20240102", 1), (7, "20240103", 2)]
+    assert importer.checkpoints.finished == [(7, "completed")]
+
+
+def test_failed_run_is_recorded_after_retries_are_exhausted(importer, monkeypatch):
+    importer.checkpoints = DummyCheckpointStore(run_id=7, completed=set())
+
+    def import_events(query):
+        raise psycopg2.OperationalError("could not connect to server")
+
+    monkeypatch.setattr(importer, "_import_events", import_events)
+
+    with pytest.raises(psycopg2.OperationalError):
+        importer.import_all_events(resume=True)
+    assert importer.checkpoints.done == []
+    assert importer.checkpoints.finished == [(7, "failed")]
+
+
+def test_run_with_retry_does_not_retry_other_errors():
+    waits = []
+    calls = []
+
+    def func():
+        calls.append(1)
+        raise ValueError("bad row")
+
+    with pytest.raises(ValueError):
+        run_with_retry(func, RetryPolicy(max_attempts=3), "test", sleep=waits.append)
+    assert len(calls) == 1
+    assert waits == []
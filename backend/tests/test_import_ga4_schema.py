@@ -45,8 +45,8 @@ def test_import_schema_vector_size_none(monkeypatch, tmp_path):
             return np.array([0.1, 0.2, 0.3])
 
     monkeypatch.setattr(
-        "analytics_chat_agent.core.importer.import_ga4_schema.SentenceTransformer",
-        lambda name: DummyModel(),
+        "analytics_chat_agent.core.importer.import_ga4_schema.get_embedding_backend",
+        lambda model_settings: DummyModel(),
     )
 
     class DummyQdrantClient:
@@ -104,8 +104,8 @@ def test_import_schema_success(monkeypatch, tmp_path):
             return np.array([0.1, 0.2, 0.3])
 
     monkeypatch.setattr(
-        "analytics_chat_agent.core.importer.import_ga4_schema.SentenceTransformer",
-        lambda name: DummyModel(),
+        "analytics_chat_agent.core.importer.import_ga4_schema.get_embedding_backend",
+        lambda model_settings: DummyModel(),
     )
 
     class DummyQdrantClient:
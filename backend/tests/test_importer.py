@@ -30,8 +30,8 @@ def dummy_csv(tmp_path):
 
 def test_import_schema_success(monkeypatch, dummy_csv):
     monkeypatch.setattr(
-        "analytics_chat_agent.core.importer.import_ga4_schema.SentenceTransformer",
-        lambda name: DummyModel(),
+        "analytics_chat_agent.core.importer.import_ga4_schema.get_embedding_backend",
+        lambda model_settings: DummyModel(),
     )
     monkeypatch.setattr(
         "analytics_chat_agent.core.importer.import_ga4_schema.QdrantClient",
@@ -0,0 +1,124 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from analytics_chat_agent.core import intent_extractor
+from analytics_chat_agent.core.intent_classifier import IntentClassifier, read_intent_examples
+from analytics_chat_agent.core.lexical_index import SOURCE_SCHEMA, SOURCE_VIRTUAL, FieldEntry, LexicalFieldIndex
+from analytics_chat_agent.core.time_range import parse_time_phrase
+
+
+class DummyClient:
+    def __init__(self, hits):
+        self.hits = hits
+        self.calls = []
+
+    def search(self, **kwargs):
+        self.calls.append(kwargs)
+        return [
+            SimpleNamespace(payload={"key": hit[0], "question": hit[2] if len(hit) > 2 else ""}, score=hit[1])
+            for hit in self.hits
+        ]
+
+
+INDEX = LexicalFieldIndex([
+    FieldEntry("device.category", "デバイスのカテゴリ", "STRING", SOURCE_SCHEMA),
+    FieldEntry("page_location", "ページのURL", "STRING", SOURCE_VIRTUAL),
+])
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("過去30日のPV", "30d"),
+    ("直近２週間のユーザー数", "2w"),
+    ("ここ3ヶ月の売上", "3m"),
+    ("page views in the last 7 days", "7d"),
+    ("past 2 months revenue", "2m"),
+    ("先週のPV数", "7d"),
+    ("先月の売上", "30d"),
+    ("昨日のイベント数", "1d"),
+    ("ページビュー数", None),
+])
+def test_parse_time_phrase(text, expected):
+    assert parse_time_phrase(text) == expected
+
+
+def test_classifies_locally_when_neighbours_agree():
+    client = DummyClient([
+        ("page_view", 0.9, "過去7日間のページビュー"),
+        ("page_view", 0.85, "直近30日のPVを日別に"),
+        ("user_count", 0.5, "過去30日間のアクティブユーザー数"),
+    ])
+    classifier = IntentClassifier(client, "ga4_schema", k=3)
+
+    intent = classifier.classify("過去30日間のページビュー", [0.1, 0.2])
+
+    assert intent.key == "page_view"
+    assert intent.parameters == {"time_range": "30d", "other_params": ""}
+    assert client.calls[0]["query_filter"].must[0].match.value == "intent_example"
+    assert classifier.local_rate == 1.0
+
+
+def test_filter_phrases_are_kept_for_downstream():
+    classifier = IntentClassifier(DummyClient([("page_view", 0.9, "先週のPV数")]), "ga4_schema")
+
+    intent = classifier.classify("先週のモバイルのみのPV数", [0.1])
+
+    assert intent.parameters["other_params"] == "先週のモバイルのみのPV数"
+
+
+@pytest.mark.parametrize("question, examples", [
+    ("モバイルのユーザー数", ["先週のユーザー数を教えて", "日別のユーザー数の推移"]),
+    ("/productページのPV", ["先週のPV数", "ページごとの閲覧数"]),
+    ("デバイス別のPV", ["先週のPV数", "直近30日のPVを日別に"]),
+    ("先週の page_location ごとのPV数", ["先週のPV数"]),
+])
+def test_unexplained_filters_and_dimensions_are_kept_for_downstream(question, examples):
+    client = DummyClient([("page_view", 0.9, example) for example in examples])
+    classifier = IntentClassifier(client, "ga4_schema", lexical_index=INDEX)
+
+    intent = classifier.classify(question, [0.1])
+
+    assert intent.parameters["other_params"] == question
+    assert client.calls[0]["with_payload"] == ["key", "question"]
+
+
+def test_questions_explained_by_examples_and_time_phrases():
+    client = DummyClient([("page_view", 0.9, "先週のPV数"), ("page_view", 0.8, "直近30日のPVを日別に")])
+    classifier = IntentClassifier(client, "ga4_schema", lexical_index=INDEX)
+
+    for question in ("過去14日のPV数", "先月のPVを日別に"):
+        assert classifier.classify(question, [0.1]).parameters["other_params"] == "", question
+
+
+def test_falls_back_when_confidence_or_similarity_is_low():
+    split = IntentClassifier(DummyClient([("page_view", 0.8), ("user_count", 0.8)]), "ga4_schema")
+    distant = IntentClassifier(DummyClient([("page_view", 0.5)]), "ga4_schema")
+    empty = IntentClassifier(DummyClient([]), "ga4_schema")
+
+    assert split.classify("PVとユーザー", [0.1]) is None
+    assert distant.classify("全く別の質問", [0.1]) is None
+    assert empty.classify("質問", [0.1]) is None
+    assert split.local_rate == 0.0
+
+
+def test_extract_intent_uses_gemini_only_on_fallback():
+    confident = IntentClassifier(DummyClient([("user_count", 0.95)]), "ga4_schema")
+    unsure = IntentClassifier(DummyClient([("user_count", 0.3)]), "ga4_schema")
+    response = "{'key': 'retention', 'description': 'リテンション', 'parameters': {'time_range': '30d'}}"
+
+    with mock.patch.object(intent_extractor, "call_gemini", return_value=response) as gemini:
+        assert intent_extractor.extract_intent("先週のユーザー数", confident, [0.1]).key == "user_count"
+        gemini.assert_not_called()
+        assert intent_extractor.extract_intent("継続率", unsure, [0.1]).key == "retention"
+        gemini.assert_called_once()
+
+
+def test_read_intent_examples_skips_unknown_and_duplicates():
+    rows = [
+        {"question": "先週のPV数", "key": "page_view"},
+        {"question": "先週のPV数", "key": "page_view"},
+        {"question": "何か", "key": "unknown"},
+        {"question": "", "key": "user_count"},
+    ]
+    assert read_intent_examples(rows) == [{"question": "先週のPV数", "key": "page_view"}]
@@ -0,0 +1,119 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+from analytics_chat_agent.core.field_resolver import FieldResolver
+from analytics_chat_agent.core.lexical_index import (
+    LexicalFieldIndex,
+    NameTrie,
+    reciprocal_rank_fusion,
+    tokenize,
+)
+
+
+def _write_csvs(tmp_path):
+    schema_csv = tmp_path / "ga4_schema.csv"
+    schema_csv.write_text(
+        "name,description,field_type,mode\n"
+        "device,構造化された複数フィールドの集合。,RECORD,NULLABLE\n"
+        "device.category,デバイスのカテゴリ（mobile、desktop）。,STRING,NULLABLE\n"
+        "device.language,デバイスの言語設定。,STRING,NULLABLE\n"
+        "geo.country,ユーザーの国。,STRING,NULLABLE\n"
+        "event_name,イベントの名前。,STRING,NULLABLE\n",
+        encoding="utf-8",
+    )
+    virtual_csv = tmp_path / "ga4_virtual_key.csv"
+    virtual_csv.write_text(
+        "id,name,description,parent_field,field_type\n"
+        "0,page_location,表示されたページのURL。,event_params.key,STRING\n"
+        "1,ga_session_id,セッションを識別するID。,event_params.key,INTEGER\n",
+        encoding="utf-8",
+    )
+    return schema_csv, virtual_csv
+
+
+def _resolver(index, hits):
+    resolver = FieldResolver.__new__(FieldResolver)
+    resolver.collection_name = "ga4_schema"
+    resolver.model = mock.Mock(encode=mock.Mock(return_value=np.zeros(3, dtype=np.float32)))
+    resolver.client = mock.Mock(search=mock.Mock(return_value=[
+        SimpleNamespace(payload={"name": name, "description": f"{name}の説明"}, score=0.5)
+        for name in hits
+    ]))
+    resolver.search_params = None
+    resolver.lexical_settings = {"candidates": 10}
+    resolver.lexical_index = index
+    return resolver
+
+
+def test_tokenize_splits_identifiers_and_japanese():
+    assert tokenize("device.category") == ["device", "category"]
+    assert tokenize("ga_session_id") == ["ga", "session", "id"]
+    assert tokenize("国別") == ["国別"]
+    assert tokenize("ページの言語") == ["ペー", "ージ", "ジの", "の言", "言語"]
+
+
+def test_name_trie_exact_and_prefix():
+    trie = NameTrie()
+    for entry_id, name in enumerate(["device.category", "device.language", "device", "geo.country"]):
+        trie.insert(name, entry_id)
+    assert trie.exact("Device.Category") == [0]
+    assert trie.exact("device.cat") == []
+    assert trie.prefix("device") == [2, 0, 1]
+    assert trie.prefix("os") == []
+
+
+def test_exact_matches_skip_records(tmp_path):
+    index = LexicalFieldIndex.from_csv(*_write_csvs(tmp_path))
+    names = [entry.name for entry in index.exact_matches("device別の event_params.page_location の件数")]
+    assert names == ["page_location"]
+    assert index.get("ga_session_id").source == "virtual"
+
+
+def test_search_ranks_descriptions_and_prefixes(tmp_path):
+    index = LexicalFieldIndex.from_csv(*_write_csvs(tmp_path))
+    assert index.search("ユーザーの国ごと")[0][0].name == "geo.country"
+    top_three = {entry.name for entry, _ in index.search("device別の件数")[:3]}
+    assert top_three == {"device", "device.category", "device.language"}
+
+
+def test_reciprocal_rank_fusion_deduplicates():
+    fused = reciprocal_rank_fusion([(["a", "b"], 1.0), (["b", "c"], 1.0)], k=60)
+    assert [name for name, _ in fused] == ["b", "a", "c"]
+
+
+def test_exact_hit_skips_embedding(tmp_path):
+    index = LexicalFieldIndex.from_csv(*_write_csvs(tmp_path))
+    resolver = _resolver(index, ["event_name"])
+
+    result = resolver.resolve_fields("ga_session_id ごとのイベント数")
+
+    assert [field.name for field in result.fields] == ["ga_session_id"]
+    assert result.description == "セッションを識別するID。"
+    resolver.model.encode.assert_not_called()
+    resolver.client.search.assert_not_called()
+
+
+def test_fuzzy_query_fuses_vector_and_lexical(tmp_path):
+    index = LexicalFieldIndex.from_csv(*_write_csvs(tmp_path))
+    resolver = _resolver(index, ["event_name", "geo.country"])
+
+    result = resolver.resolve_fields("ユーザーの国ごとの件数", limit=2)
+
+    assert [field.name for field in result.fields] == ["geo.country", "event_name"]
+    assert result.description == "geo.countryの説明"
+    resolver.model.encode.assert_called_once()
+
+
+def test_source_restricts_lexical_and_vector_search(tmp_path):
+    index = LexicalFieldIndex.from_csv(*_write_csvs(tmp_path))
+    resolver = _resolver(index, ["page_location"])
+
+    result = resolver.resolve_fields("event_name ごとのページのURL", source="virtual")
+
+    assert result.fields[0].name == "page_location"
+    assert "event_name" not in [field.name for field in result.fields]
+    kwargs = resolver.client.search.call_args.kwargs
+    assert kwargs["query_filter"].must[0].match.value == "virtual"
+    assert kwargs["with_payload"] == ["name", "description"]
@@ -0,0 +1,87 @@
+import pytest
+from psycopg2.extras import RealDictCursor
+
+from analytics_chat_agent.core.database import PostgresConnection
+
+ROWS = [(1, "page_view"), (2, "scroll"), (3, "click")]
+
+
+class DummyNamedCursor:
+    def __init__(self, name, cursor_factory):
+        self.name = name
+        self.cursor_factory = cursor_factory
+        self.itersize = None
+        self.description = None
+        self.closed = False
+        self._position = 0
+        self.fetch_sizes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.closed = True
+
+    def execute(self, query, params=None):
+        self.query = query
+
+    def _row(self, row):
+        if self.cursor_factory is RealDictCursor:
+            return {"id": row[0], "event_name": row[1]}
+        return row
+
+    def __iter__(self):
+        for row in ROWS:
+            yield self._row(row)
+
+    def fetchmany(self, size):
+        self.fetch_sizes.append(size)
+        self.description = (("id",), ("event_name",))
+        rows = ROWS[self._position:self._position + size]
+        self._position += len(rows)
+        return [self._row(row) for row in rows]
+
+
+class DummyConnection:
+    def __init__(self):
+        self.cursors = []
+
+    def cursor(self, name=None, cursor_factory=None):
+        cursor = DummyNamedCursor(name, cursor_factory)
+        self.cursors.append(cursor)
+        return cursor
+
+
+@pytest.fixture
+def pg_conn():
+    conn = PostgresConnection({})
+    conn._connection = DummyConnection()
+    return conn
+
+
+def test_iter_query_streams_with_named_cursor(pg_conn):
+    rows = pg_conn.iter_query("SELECT id, event_name FROM events", itersize=500)
+
+    assert next(rows) == {"id": 1, "event_name": "page_view"}
+    [cursor] = pg_conn.connection.cursors
+    assert cursor.name.startswith("iter_")
+    assert cursor.itersize == 500
+    assert cursor.cursor_factory is RealDictCursor
+
+    # 途中で止めてもカーソルは閉じられる
+    rows.close()
+    assert cursor.closed
+
+
+def test_iter_query_returns_tuples_and_columnar_batches(pg_conn):
+    assert list(pg_conn.iter_query("SELECT 1", row_format="tuple")) == ROWS
+
+    batches = list(pg_conn.iter_query("SELECT 1", itersize=2, row_format="columnar"))
+    assert batches == [
+        {"id": [1, 2], "event_name": ["page_view", "scroll"]},
+        {"id": [3], "event_name": ["click"]},
+    ]
+    assert pg_conn.connection.cursors[-1].fetch_sizes == [2, 2, 2]
+
+    with pytest.raises(ValueError):
+        list(pg_conn.iter_query("SELECT 1", row_format="arrow"))
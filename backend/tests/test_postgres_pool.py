@@ -0,0 +1,128 @@
+import threading
+import time
+
+import psycopg2
+import pytest
+
+from analytics_chat_agent.core.database import postgres_pool
+from analytics_chat_agent.core.database.postgres_pool import PooledPostgresConnection
+
+
+class DummyCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query, params=None):
+        if self.conn.broken:
+            raise psycopg2.OperationalError("server closed the connection")
+
+
+class DummyConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.status = psycopg2.extensions.STATUS_READY
+
+    def cursor(self):
+        return DummyCursor(self)
+
+    def rollback(self):
+        pass
+
+
+class DummyPool:
+    def __init__(self, minconn, maxconn, **kwargs):
+        self.idle = []
+        self.created = 0
+
+    def getconn(self):
+        if self.idle:
+            return self.idle.pop()
+        self.created += 1
+        return DummyConnection()
+
+    def putconn(self, conn, close=False):
+        if not close:
+            self.idle.append(conn)
+
+    def closeall(self):
+        self.idle = []
+
+
+@pytest.fixture
+def pooled(monkeypatch):
+    monkeypatch.setattr(postgres_pool, "ThreadedConnectionPool", DummyPool)
+    return PooledPostgresConnection({
+        "host": "localhost",
+        "port": 5432,
+        "database": "ga4_db",
+        "user": "ga4_user",
+        "pool": {"max_size": 2, "checkout_timeout_seconds": 1, "health_check_interval_seconds": 0},
+    })
+
+
+def test_checkout_binds_connection_to_thread(pooled):
+    with pooled.checkout() as conn:
+        assert pooled.connection is conn
+        assert pooled.stats().in_use == 1
+    assert pooled.stats().in_use == 0
+    assert pooled.stats().checkouts == 1
+
+
+def test_broken_connection_is_discarded(pooled):
+    with pooled.checkout() as conn:
+        pass
+    conn.broken = True
+
+    with pooled.checkout() as new_conn:
+        assert new_conn is not conn
+    assert pooled.stats().discarded == 1
+
+
+def test_waits_for_free_connection(pooled):
+    released = threading.Event()
+
+    def hold():
+        with pooled.checkout():
+            time.sleep(0.2)
+        released.set()
+
+    threads = [threading.Thread(target=hold) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+
+    with pooled.checkout():
+        assert released.is_set()
+    for thread in threads:
+        thread.join()
+
+    stats = pooled.stats()
+    assert stats.peak_in_use == 2
+    assert stats.waits == 1
+    assert stats.max_wait_seconds > 0
+
+
+def test_checkout_timeout(pooled):
+    pooled.checkout_timeout = 0.05
+    errors = []
+
+    def acquire():
+        try:
+            pooled.connection
+        except psycopg2.pool.PoolError as e:
+            errors.append(e)
+
+    with pooled.checkout():
+        for _ in range(2):
+            thread = threading.Thread(target=acquire)
+            thread.start()
+            thread.join()
+
+    assert len(errors) == 1
@@ -0,0 +1,24 @@
+from click.testing import CliRunner
+
+from analytics_chat_agent.cli.main import cli
+
+
+def test_profile_option_writes_cpu_and_memory_reports(tmp_path):
+    result = CliRunner().invoke(cli, ["--profile", "--profile-dir", str(tmp_path), "version"])
+
+    assert result.exit_code == 0, result.output
+    files = sorted(path.name for path in tmp_path.iterdir())
+    assert len(files) == 3
+    assert any(name.endswith("-version.prof") for name in files)
+
+    cpu_report = next(tmp_path.glob("*-version-cpu.txt")).read_text(encoding="utf-8")
+    assert "累積時間順" in cpu_report
+    memory_report = next(tmp_path.glob("*-version-memory.txt")).read_text(encoding="utf-8")
+    assert "ピークメモリ使用量" in memory_report
+
+
+def test_no_profile_without_option(tmp_path):
+    result = CliRunner().invoke(cli, ["--profile-dir", str(tmp_path), "version"])
+
+    assert result.exit_code == 0, result.output
+    assert not any(tmp_path.iterdir())
@@ -0,0 +1,119 @@
+from types import SimpleNamespace
+
+import numpy as np
+from qdrant_client.http import models
+
+from analytics_chat_agent.core.importer.import_ga4_schema import SchemaImporter
+from analytics_chat_agent.core.qdrant_settings import (
+    build_hnsw_config,
+    build_quantization_config,
+    build_search_params,
+    build_source_filter,
+    build_vectors_config,
+)
+
+QDRANT_SETTINGS = {
+    "collection": {
+        "on_disk": True,
+        "hnsw": {"m": 32, "ef_construct": 200},
+        "quantization": {"enabled": True, "quantile": 0.99, "always_ram": True},
+        "payload_indexes": ["source"],
+    },
+    "search": {"hnsw_ef": 64, "rescore": True, "oversampling": 2.0},
+}
+
+
+class DummyModel:
+    def get_sentence_embedding_dimension(self):
+        return 3
+
+    def encode(self, texts):
+        return np.zeros((len(texts), 3), dtype=np.float32)
+
+
+class DummyQdrantClient:
+    def __init__(self, collections=()):
+        self.collections = [SimpleNamespace(name=name) for name in collections]
+        self.created = []
+        self.payload_indexes = []
+
+    def get_collections(self):
+        return SimpleNamespace(collections=self.collections)
+
+    def create_collection(self, **kwargs):
+        self.created.append(kwargs)
+
+    def create_payload_index(self, **kwargs):
+        self.payload_indexes.append((kwargs["field_name"], kwargs["field_schema"]))
+
+    def upsert(self, **kwargs):
+        self.upserted = kwargs["points"]
+
+
+def _importer(client):
+    importer = SchemaImporter.__new__(SchemaImporter)
+    importer.model = DummyModel()
+    importer.qdrant_client = client
+    importer.collection_name = "ga4_schema"
+    importer.qdrant_settings = QDRANT_SETTINGS
+    return importer
+
+
+def test_collection_config_from_settings():
+    vectors = build_vectors_config(384, QDRANT_SETTINGS)
+    assert (vectors.size, vectors.distance, vectors.on_disk) == (384, models.Distance.COSINE, True)
+    hnsw = build_hnsw_config(QDRANT_SETTINGS)
+    assert (hnsw.m, hnsw.ef_construct) == (32, 200)
+    quantization = build_quantization_config(QDRANT_SETTINGS)
+    assert quantization.scalar.type == models.ScalarType.INT8
+    assert build_quantization_config({}) is None
+    assert build_hnsw_config({}) is None
+
+
+def test_search_params_rescore_only_when_quantized():
+    params = build_search_params(QDRANT_SETTINGS)
+    assert params.hnsw_ef == 64
+    assert params.quantization.rescore is True
+    assert params.quantization.oversampling == 2.0
+    assert build_search_params({}).quantization is None
+    assert build_search_params({}).hnsw_ef == 128
+
+
+def test_source_filter():
+    excluded = build_source_filter(None).must_not[0]
+    assert (excluded.key, excluded.match.value) == ("source", "intent_example")
+    condition = build_source_filter("virtual").must[0]
+    assert (condition.key, condition.match.value) == ("source", "virtual")
+
+
+def test_importer_creates_tuned_collection_and_payload_index():
+    client = DummyQdrantClient()
+    _importer(client)._create_collection_if_not_exists()
+
+    [created] = client.created
+    assert created["vectors_config"].on_disk is True
+    assert created["hnsw_config"].m == 32
+    assert created["quantization_config"] is not None
+    assert client.payload_indexes == [("source", models.PayloadSchemaType.KEYWORD)]
+
+
+def test_importer_keeps_existing_collection():
+    client = DummyQdrantClient(collections=["ga4_schema"])
+    _importer(client)._create_collection_if_not_exists()
+
+    assert client.created == []
+    assert client.payload_indexes == [("source", models.PayloadSchemaType.KEYWORD)]
+
+
+def test_importer_stores_intent_examples_with_stable_ids(tmp_path):
+    csv_path = tmp_path / "intent_examples.csv"
+    csv_path.write_text("question,key\n先週のPV数,page_view\n継続率,retention\n", encoding="utf-8")
+    client = DummyQdrantClient(collections=["ga4_schema"])
+    importer = _importer(client)
+
+    assert importer.import_intent_examples(csv_path) == 2
+    first_ids = [point.id for point in client.upserted]
+    importer.import_intent_examples(csv_path)
+
+    assert [point.id for point in client.upserted] == first_ids
+    assert client.upserted[0].payload == {"question": "先週のPV数", "key": "page_view", "source": "intent_example"}
@@ -0,0 +1,104 @@
+import os
+import time
+from datetime import date, datetime, timezone
+from unittest import mock
+
+from analytics_chat_agent.core import query_cache
+from analytics_chat_agent.core.query_cache import (
+    QueryResultCache,
+    TableSnapshot,
+    normalize_sql,
+)
+
+SNAPSHOT = TableSnapshot(table_suffix="20240101", last_modified=1704153600000)
+
+
+def test_normalize_sql_ignores_whitespace_comments_and_case():
+    a = """
+        SELECT event_name, COUNT(*) AS cnt  -- 件数
+        FROM `ungift.analytics_336047273.events_*`
+        WHERE _TABLE_SUFFIX = '20240101'
+        GROUP BY event_name;
+    """
+    b = "select event_name, count(*) as cnt /* 件数 */ from `ungift.analytics_336047273.events_*` where _table_suffix = '20240101' group by event_name"
+    assert normalize_sql(a) == normalize_sql(b)
+
+
+def test_normalize_sql_keeps_string_literals():
+    a = "SELECT * FROM t WHERE page_title = 'Top  Page'"
+    b = "SELECT * FROM t WHERE page_title = 'top page'"
+    assert normalize_sql(a) != normalize_sql(b)
+
+
+def test_put_and_get_roundtrip(tmp_path):
+    cache = QueryResultCache(tmp_path, max_size_bytes=10 * 1024 * 1024)
+    rows = [
+        {"event_date": date(2024, 1, 1), "event_name": "page_view", "cnt": 10},
+        {"event_date": date(2024, 1, 2), "event_name": "scroll", "cnt": None},
+    ]
+    assert cache.get("SELECT 1", SNAPSHOT) is None
+
+    cache.put("SELECT 1", SNAPSHOT, rows)
+    assert cache.get("select  1;", SNAPSHOT) == rows
+
+
+def test_new_snapshot_misses(tmp_path):
+    cache = QueryResultCache(tmp_path, max_size_bytes=10 * 1024 * 1024)
+    cache.put("SELECT 1", SNAPSHOT, [{"a": 1}])
+
+    new_snapshot = TableSnapshot(table_suffix="20240102", last_modified=1704240000000)
+    assert cache.get("SELECT 1", new_snapshot) is None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = QueryResultCache(tmp_path, max_size_bytes=10 * 1024 * 1024)
+    rows = [{"value": "x" * 1000, "n": i} for i in range(100)]
+    cache.put("SELECT 1", SNAPSHOT, rows)
+    cache.put("SELECT 2", SNAPSHOT, rows)
+
+    # SELECT 1 を古くしてからSELECT 2を参照し、2件分に満たない上限で追加する
+    old = time.time() - 100
+    os.utime(cache._entry_path(cache.make_key("SELECT 1", SNAPSHOT)), (old, old))
+    assert cache.get("SELECT 2", SNAPSHOT) is not None
+    entry_size = cache._entry_path(cache.make_key("SELECT 2", SNAPSHOT)).stat().st_size
+    cache.max_size_bytes = entry_size * 2 + entry_size // 2
+    cache.put("SELECT 3", SNAPSHOT, rows)
+
+    assert cache.get("SELECT 1", SNAPSHOT) is None
+    assert cache.get("SELECT 2", SNAPSHOT) is not None
+    assert cache.get("SELECT 3", SNAPSHOT) is not None
+
+
+def test_snapshot_is_reused_within_ttl(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_fetch(client, project_id, dataset_id):
+        calls.append((project_id, dataset_id))
+        return SNAPSHOT
+
+    monkeypatch.setattr(
+        "analytics_chat_agent.core.query_cache.fetch_table_snapshot", fake_fetch
+    )
+    cache = QueryResultCache(tmp_path, max_size_bytes=1024, snapshot_ttl_seconds=60)
+
+    assert cache.get_snapshot(None, "p", "d") == SNAPSHOT
+    assert cache.get_snapshot(None, "p", "d") == SNAPSHOT
+    assert len(calls) == 1
+
+
+def test_current_date_queries_miss_after_midnight(tmp_path):
+    cache = QueryResultCache(tmp_path, max_size_bytes=10 * 1024 * 1024, timezone="Asia/Tokyo")
+    relative = "SELECT COUNT(*) FROM t WHERE d >= DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)"
+    fixed = "SELECT COUNT(*) FROM t WHERE d >= '2024-01-01'"
+    before = datetime(2024, 1, 1, 14, 59, tzinfo=timezone.utc)  # 東京で 23:59
+    after = datetime(2024, 1, 1, 15, 1, tzinfo=timezone.utc)  # 東京で翌日 00:01
+
+    with mock.patch.object(query_cache, "datetime", wraps=datetime) as clock:
+        clock.now.return_value = before
+        cache.put(relative, SNAPSHOT, [{"n": 1}])
+        cache.put(fixed, SNAPSHOT, [{"n": 2}])
+        assert cache.get(relative, SNAPSHOT) == [{"n": 1}]
+
+        clock.now.return_value = after
+        assert cache.get(relative, SNAPSHOT) is None
+        assert cache.get(fixed, SNAPSHOT) == [{"n": 2}]
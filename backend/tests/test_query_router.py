@@ -0,0 +1,96 @@
+from datetime import date
+
+from analytics_chat_agent.core.query_router import (
+    ENGINE_BIGQUERY,
+    ENGINE_POSTGRES,
+    QueryRouter,
+)
+from analytics_chat_agent.core.time_range import parse_time_range
+from analytics_chat_agent.types import Field, FieldMappingResult, Intent
+
+
+class DummyPostgresConnection:
+    def __init__(self, imported_days):
+        self.imported_days = imported_days
+        self.key_usage = []
+
+    def iter_query(self, query, params=None, **kwargs):
+        yield from self.execute_query(query, params)
+
+    def execute_query(self, query, params=None):
+        if "information_schema.columns" in query:
+            return [
+                {"column_name": name}
+                for name in ("id", "event_date", "event_name", "event_params", "bq_column_page_location")
+            ]
+        if "FROM virtual_keys" in query:
+            return [
+                {"name": "page_location", "field_type": "STRING", "storage": "column"},
+                {"name": "ga_session_id", "field_type": "INTEGER", "storage": "column"},
+                {"name": "engagement_time_msec", "field_type": "INTEGER", "storage": "jsonb"},
+            ]
+        if "UPDATE virtual_keys" in query:
+            self.key_usage.append(params["keys"])
+            return None
+        if "COUNT(DISTINCT event_date)" in query:
+            return [{"days": self.imported_days}]
+        raise AssertionError(query)
+
+
+def _mapping(*names):
+    return FieldMappingResult(
+        fields=[Field(name=name, type="string") for name in names],
+        description="",
+    )
+
+
+def test_parse_time_range():
+    assert parse_time_range("7d", today=date(2024, 1, 10)) == (
+        date(2024, 1, 3),
+        date(2024, 1, 9),
+    )
+    assert parse_time_range("1y", today=date(2024, 1, 10))[0] == date(2023, 1, 10)
+    assert parse_time_range("先週") is None
+    assert parse_time_range(None) is None
+
+
+def test_routes_to_postgres_when_fields_and_dates_are_local():
+    router = QueryRouter(DummyPostgresConnection(imported_days=7))
+    intent = Intent(key="page_view", description="", parameters={"time_range": "7d"})
+
+    decision = router.route(intent, _mapping("page_location", "event_name", "event_params.key"))
+
+    assert decision.engine == ENGINE_POSTGRES
+    assert decision.columns["bq_column_page_location"] == "TEXT"
+    assert (decision.end_date - decision.start_date).days == 6
+
+
+def test_routes_to_bigquery_when_field_is_missing_locally():
+    router = QueryRouter(DummyPostgresConnection(imported_days=7))
+    intent = Intent(key="page_view", description="", parameters={"time_range": "7d"})
+
+    # ga_session_id は virtual_keys にあるが events にカラムがない
+    decision = router.route(intent, _mapping("page_location", "ga_session_id"))
+
+    assert decision.engine == ENGINE_BIGQUERY
+
+
+def test_routes_to_bigquery_when_dates_are_not_imported():
+    router = QueryRouter(DummyPostgresConnection(imported_days=3))
+    intent = Intent(key="page_view", description="", parameters={"time_range": "7d"})
+
+    decision = router.route(intent, _mapping("page_location"))
+
+    assert decision.engine == ENGINE_BIGQUERY
+
+
+def test_jsonb_keys_are_referenced_by_expression_and_usage_is_recorded():
+    pg_conn = DummyPostgresConnection(imported_days=7)
+    router = QueryRouter(pg_conn)
+    intent = Intent(key="custom", description="", parameters={"time_range": "7d"})
+
+    decision = router.route(intent, _mapping("engagement_time_msec", "event_name"))
+
+    assert decision.engine == ENGINE_POSTGRES
+    assert decision.columns["(event_params->>'engagement_time_msec')::INTEGER"] == "INTEGER"
+    assert pg_conn.key_usage == [["engagement_time_msec"]]
@@ -0,0 +1,119 @@
+from unittest import mock
+
+import numpy as np
+
+from analytics_chat_agent.core.analyzer import analysis_service
+from analytics_chat_agent.core.analyzer.analysis_service import AnalysisService
+from analytics_chat_agent.core.analyzer.question_cache import QuestionCache
+from analytics_chat_agent.types import Field, FieldMappingResult, Intent, QueryResult
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+INTENT = Intent(key="page_view", description="PV数", parameters={"time_range": "7d"})
+MAPPING = FieldMappingResult(fields=[Field(name="event_name", type="string")], description="イベント名")
+
+
+def _cache(tmp_path, **kwargs):
+    return QuestionCache(tmp_path / "questions.json", MODEL_NAME, similarity_threshold=0.9, **kwargs)
+
+
+def test_lookup_reuses_similar_question_and_persists(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("先週のPV数", [1.0, 0.0], INTENT, MAPPING, "SELECT 1", "bigquery")
+
+    assert cache.lookup("全く別の質問", [0.0, 1.0]) is None
+    entry, similarity = _cache(tmp_path).lookup("過去1週間のページビュー", [0.95, 0.05])
+
+    assert similarity > 0.99
+    assert entry.sql == "SELECT 1"
+    assert entry.to_intent() == INTENT
+    assert entry.to_field_mapping() == MAPPING
+
+
+def test_lookup_requires_same_period_and_numbers(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("過去7日間のPV数", [1.0, 0.0], INTENT, MAPPING, "SELECT 7", "bigquery")
+
+    assert cache.lookup("過去30日間のPV数", [1.0, 0.0]) is None
+    assert cache.lookup("過去７日間のページビュー", [1.0, 0.0]) is not None
+    assert cache.hit_rate == 0.5
+
+    cache.put("上位10ページのPV数", [0.0, 1.0], INTENT, MAPPING, "SELECT 10", "bigquery")
+    assert cache.lookup("上位5ページのPV数", [0.0, 1.0]) is None
+
+
+def test_lookup_compares_time_phrases_not_digits(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("先週のPV数", [1.0, 0.0], INTENT, MAPPING, "SELECT 'week'", "bigquery")
+
+    entry, _ = cache.lookup("過去7日間のページビュー", [1.0, 0.0])
+    assert entry.sql == "SELECT 'week'"
+    assert cache.lookup("先月のPV数", [1.0, 0.0]) is None
+
+    # 時間範囲にならないカレンダー上の期間は表現ごとに区別する
+    cache.put("今月のPV数", [0.0, 1.0], INTENT, MAPPING, "SELECT 'month'", "bigquery")
+    assert cache.lookup("今週のPV数", [0.0, 1.0]) is None
+    assert cache.lookup("今月のページビュー", [0.0, 1.0]) is not None
+
+
+def test_expired_and_other_model_entries_are_ignored(tmp_path):
+    cache = _cache(tmp_path, ttl_seconds=60)
+    with mock.patch("time.time", return_value=1000.0):
+        cache.put("先週のPV数", [1.0, 0.0], INTENT, MAPPING, "SELECT 1", "bigquery")
+    with mock.patch("time.time", return_value=1100.0):
+        assert cache.lookup("先週のPV数", [1.0, 0.0]) is None
+
+    cache.put("先週のPV数", [1.0, 0.0], INTENT, MAPPING, "SELECT 1", "bigquery")
+    other = QuestionCache(tmp_path / "questions.json", "other-model")
+    assert other.lookup("先週のPV数", [1.0, 0.0]) is None
+
+
+def test_max_entries_keeps_frequently_hit_entries(tmp_path):
+    cache = _cache(tmp_path, max_entries=2)
+    cache.put("a", [1.0, 0.0, 0.0], INTENT, MAPPING, "SELECT 'a'", "bigquery")
+    cache.put("b", [0.0, 1.0, 0.0], INTENT, MAPPING, "SELECT 'b'", "bigquery")
+    assert cache.lookup("a", [1.0, 0.0, 0.0]) is not None
+    cache.put("c", [0.0, 0.0, 1.0], INTENT, MAPPING, "SELECT 'c'", "bigquery")
+
+    assert cache.lookup("a", [1.0, 0.0, 0.0]) is not None
+    assert cache.lookup("b", [0.0, 1.0, 0.0]) is None
+
+
+def test_hits_and_puts_are_written_in_batches(tmp_path):
+    cache = _cache(tmp_path, flush_interval_seconds=3600)
+    cache.put("先週のPV数", [1.0, 0.0], INTENT, MAPPING, "SELECT 1", "bigquery")
+    written = (tmp_path / "questions.json").read_text(encoding="utf-8")
+
+    # 再利用と間隔内の put はメモリ上だけで更新する
+    assert cache.lookup("先週のPV数", [1.0, 0.0]) is not None
+    cache.put("昨日のPV数", [0.0, 1.0], INTENT, MAPPING, "SELECT 2", "bigquery")
+    assert (tmp_path / "questions.json").read_text(encoding="utf-8") == written
+
+    cache.flush()
+    entries = {entry.question: entry for entry in _cache(tmp_path)._load()}
+    assert entries["先週のPV数"].hits == 1
+    assert entries["先週のPV数"].last_used_at > 0
+    assert "昨日のPV数" in entries
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_analyze_skips_llm_calls_on_cache_hit(tmp_path):
+    resolver = mock.Mock()
+    resolver.model.encode.return_value = np.array([1.0, 0.0])
+    resolver.resolve_fields.return_value = MAPPING
+    service = AnalysisService(resolver, max_sql_regenerations=0, question_cache=_cache(tmp_path))
+
+    intent_json = '{"key": "page_view", "description": "PV数", "parameters": {"time_range": "7d"}}'
+    with mock.patch.object(analysis_service, "call_gemini", return_value=intent_json) as gemini, \
+            mock.patch.object(analysis_service, "generate_sql", return_value="SELECT 1") as generate, \
+            mock.patch.object(analysis_service, "run_bigquery_query",
+                              return_value=[QueryResult(values={"pv": 10})]) as run:
+        first = service.analyze("先週のPV数")
+        second = service.analyze("先週のページビュー数")
+
+    assert gemini.call_count == 1
+    assert generate.call_count == 1
+    assert run.call_count == 2
+    assert second["sql"] == first["sql"] == "SELECT 1"
+    assert second["intent"]["key"] == "page_view"
+    assert second["fields"]["fields"] == [{"name": "event_name", "type": "string"}]
+    service.field_resolver.resolve_fields.assert_called_once_with("先週のPV数", query_vector=[1.0, 0.0])
@@ -0,0 +1,50 @@
+from analytics_chat_agent.core.analyzer.rollup_matcher import RollupMatcher
+from analytics_chat_agent.types import Intent
+
+
+class DummyPostgresConnection:
+    def __init__(self, rollup_days):
+        self.rollup_days = rollup_days
+        self.queries = []
+
+    def execute_query(self, query, params=None):
+        self.queries.append((query, params))
+        if "COUNT(*) AS days" in query:
+            return [{"days": self.rollup_days}]
+        return [{"event_date": params["start_date"], "page_view_count": 10}]
+
+
+def test_matches_page_view_without_filters():
+    matcher = RollupMatcher(DummyPostgresConnection(rollup_days=30))
+    intent = Intent(
+        key="page_view",
+        description="",
+        parameters={"time_range": "30d", "other_params": ""},
+    )
+
+    rollup_query = matcher.match(intent)
+
+    assert rollup_query is not None
+    assert "daily_event_rollup" in rollup_query.sql
+    assert matcher.run(rollup_query)[0]["page_view_count"] == 10
+
+
+def test_does_not_match_filtered_or_unknown_intents():
+    matcher = RollupMatcher(DummyPostgresConnection(rollup_days=30))
+
+    filtered = Intent(
+        key="page_view",
+        description="",
+        parameters={"time_range": "30d", "conditions": ["page_location = '/'"]},
+    )
+    unknown = Intent(key="retention", description="", parameters={"time_range": "30d"})
+
+    assert matcher.match(filtered) is None
+    assert matcher.match(unknown) is None
+
+
+def test_does_not_match_when_rollups_are_incomplete():
+    matcher = RollupMatcher(DummyPostgresConnection(rollup_days=5))
+    intent = Intent(key="user_count", description="", parameters={"time_range": "7d"})
+
+    assert matcher.match(intent) is None
@@ -0,0 +1,226 @@
+from datetime import date
+
+import pytest
+from psycopg2 import sql
+
+from analytics_chat_agent.core.schema import EVENT_PARTITIONED_TABLES, SchemaManager
+
+
+class DummyPostgresConnection:
+    def __init__(self, partitions):
+        self.partitions = partitions
+        self.queries = []
+
+    def execute_query(self, query, params=None):
+        if "pg_inherits" in query:
+            return [
+                {"table_name": table, "partition_name": name}
+                for table, name in self.partitions
+            ]
+        self.queries.append(query)
+        return None
+
+
+def test_ensure_event_partitions_creates_only_missing_days():
+    pg_conn = DummyPostgresConnection(
+        [(table, f"{table}_p20240101") for table in EVENT_PARTITIONED_TABLES]
+    )
+    manager = SchemaManager(pg_conn)
+
+    created = manager.ensure_event_partitions([date(2024, 1, 1), date(2024, 1, 2)])
+
+    assert created == [date(2024, 1, 2)]
+    [query] = pg_conn.queries
+    assert "CREATE TABLE events_p20240102\n" in query
+    assert "FOR VALUES FROM ('2024-01-02') TO ('2024-01-03')" in query
+    assert "events_p20240101" not in query
+    # 親テーブルのパーティションを先に作成する
+    assert query.index("PARTITION OF events\n") < query.index("PARTITION OF app_info\n")
+
+
+def test_drop_event_partitions_detaches_children_first():
+    pg_conn = DummyPostgresConnection([
+        ("events", "events_p20240101"),
+        ("device", "device_p20240101"),
+        ("web_info", "web_info_p20240101"),
+        ("events", "events_p20240102"),
+        ("events", "events_default"),
+    ])
+    manager = SchemaManager(pg_conn)
+
+    dropped = manager.drop_event_partitions([date(2024, 1, 1)])
+
+    assert dropped == [date(2024, 1, 1)]
+    [query] = pg_conn.queries
+    assert query.split(";") == [
+        "ALTER TABLE web_info DETACH PARTITION web_info_p20240101",
+        "DROP TABLE web_info_p20240101",
+        "ALTER TABLE device DETACH PARTITION device_p20240101",
+        "DROP TABLE device_p20240101",
+        "ALTER TABLE events DETACH PARTITION events_p20240101",
+        "DROP TABLE events_p20240101",
+    ]
+    assert manager.get_event_partition_dates() == [date(2024, 1, 1), date(2024, 1, 2)]
+
+
+class DummyKeyConnection:
+    def __init__(self, hot_keys):
+        self.hot_keys = hot_keys
+        self.queries = []
+
+    def execute_query(self, query, params=None):
+        self.queries.append((query, params))
+        if "FROM virtual_keys" in query:
+            return self.hot_keys
+        if "information_schema.columns" in query:
+            return [{"column_name": "bq_column_page_location"}]
+        return None
+
+
+def test_add_param_key_uses_existing_column_or_jsonb():
+    pg_conn = DummyKeyConnection([])
+    manager = SchemaManager(pg_conn)
+
+    assert manager.add_param_key("page_location", "https://example.com/") == "column"
+    assert manager.add_param_key("engagement_time_msec", 120) == "jsonb"
+    inserted = [params for query, params in pg_conn.queries if "INSERT INTO virtual_keys" in query]
+    assert inserted[1] == {"name": "engagement_time_msec", "field_type": "INTEGER", "storage": "jsonb"}
+    assert not any("ALTER TABLE" in query for query, _ in pg_conn.queries)
+
+
+class DummyPromotionConnection:
+    def __init__(self, hot_keys, invalid=0):
+        self.hot_keys = hot_keys
+        self.invalid = invalid
+        self.queries = []
+
+    def execute_query(self, query, params=None):
+        query = _render(query)
+        if "SELECT name, field_type" in query:
+            return self.hot_keys
+        if "pg_inherits" in query:
+            return [
+                {"table_name": "events", "partition_name": "events_p20240102"},
+                {"table_name": "events", "partition_name": "events_p20240101"},
+            ]
+        self.queries.append(query)
+        if "AS invalid" in query:
+            return [{"invalid": self.invalid}]
+        return None
+
+
+def test_promote_hot_keys_moves_values_into_column_per_partition():
+    pg_conn = DummyPromotionConnection([{"name": "engagement_time_msec", "field_type": "INTEGER"}])
+    manager = SchemaManager(pg_conn)
+
+    assert manager.promote_hot_keys(min_query_count=10) == ["engagement_time_msec"]
+    check, alter, copy_first, copy_second, switch, strip_first, strip_second = pg_conn.queries
+    assert "NOT CASE WHEN jsonb_typeof(event_params->'engagement_time_msec') = 'number'" in check
+    assert alter == (
+        'ALTER TABLE events ADD COLUMN IF NOT EXISTS "bq_column_engagement_time_msec" INTEGER DEFAULT NULL'
+    )
+    # 変換できる値だけを型変換し、パーティションごとに古い日付から更新する
+    assert copy_first.startswith('UPDATE "events_p20240101" SET "bq_column_engagement_time_msec" = CASE WHEN')
+    assert "THEN (event_params->>'engagement_time_msec')::INTEGER END" in copy_first
+    assert copy_second.startswith('UPDATE "events_p20240102"')
+    assert "event_params - " not in copy_first
+    assert switch == (
+        "UPDATE virtual_keys SET storage = 'column', field_type = 'INTEGER' WHERE name = 'engagement_time_msec'"
+    )
+    assert "event_params = event_params - 'engagement_time_msec'" in strip_first
+    assert strip_second.startswith('UPDATE "events_p20240102"')
+
+
+def test_promote_hot_keys_falls_back_to_text_and_quotes_keys():
+    pg_conn = DummyPromotionConnection([{"name": "discount%", "field_type": "INTEGER"}], invalid=2)
+    manager = SchemaManager(pg_conn)
+
+    assert manager.promote_hot_keys(min_query_count=10) == ["discount%"]
+    assert 'ADD COLUMN IF NOT EXISTS "bq_column_discount%" TEXT' in pg_conn.queries[1]
+    assert "field_type = 'STRING'" in pg_conn.queries[4]
+
+
+def _render(query):
+    """psycopg2.sql の SQL を接続なしで文字列にする（識別子は常に引用符で囲む）"""
+    if isinstance(query, str):
+        return query
+    if isinstance(query, sql.Composed):
+        return "".join(_render(part) for part in query.seq)
+    if isinstance(query, sql.Identifier):
+        return ".".join(f'"{name}"' for name in query.strings)
+    if isinstance(query, sql.Literal):
+        return f"'{query.wrapped}'"
+    return query.string
+
+
+class DummyMigrationConnection:
+    def __init__(self, relkind, columns):
+        self.relkind = relkind
+        self.columns = columns
+        self.queries = []
+
+    def execute_query(self, query, params=None):
+        query = _render(query)
+        if "to_regclass" in query:
+            return [{"relkind": self.relkind}]
+        if "FROM pg_attribute" in query:
+            return [
+                {"table_name": table, "column_name": name, "column_type": column_type}
+                for table, name, column_type in self.columns
+            ]
+        if "GROUP BY 1" in query:
+            return [{"day": date(2024, 1, 1), "count": 3}, {"day": None, "count": 1}]
+        self.queries.append(query)
+        return None
+
+
+def test_migrate_to_partitioned_copies_rows_into_daily_partitions():
+    pg_conn = DummyMigrationConnection("r", [
+        ("events", "id", "integer"),
+        ("events", "event_date", "date"),
+        ("events", "event_name", "text"),
+        ("events", "bq_column_custom_key", "text"),
+        ("device", "id", "integer"),
+        ("device", "parent_id", "bigint"),
+        ("web_info", "id", "integer"),
+        ("web_info", "parent_id", "bigint"),
+    ])
+    manager = SchemaManager(pg_conn)
+
+    assert manager.migrate_to_partitioned("CREATE TABLE events (id SERIAL);") == 3
+
+    [query] = pg_conn.queries
+    statements = query.split(";\n")
+    assert statements[:4] == [
+        'CREATE SCHEMA "ga4_legacy"',
+        'ALTER TABLE "events" SET SCHEMA "ga4_legacy"',
+        'ALTER TABLE "device" SET SCHEMA "ga4_legacy"',
+        'ALTER TABLE "web_info" SET SCHEMA "ga4_legacy"',
+    ]
+    assert statements[4] == "CREATE TABLE events (id SERIAL)"
+    assert 'ALTER TABLE "events" ADD COLUMN IF NOT EXISTS "bq_column_custom_key" text' in statements
+    assert (
+        'INSERT INTO "events" ("id", "event_name", "bq_column_custom_key", "event_date") '
+        'SELECT "src"."id", "src"."event_name", "src"."bq_column_custom_key", '
+        "COALESCE(event_date, event_timestamp::date) "
+        'FROM "ga4_legacy"."events" AS src WHERE COALESCE(event_date, event_timestamp::date) IS NOT NULL'
+    ) in statements
+    # 孫テーブルは移行済みの親テーブルから event_date を引き継ぐ
+    assert (
+        'INSERT INTO "web_info" ("id", "parent_id", "event_date") '
+        'SELECT "src"."id", "src"."parent_id", parent.event_date '
+        'FROM "ga4_legacy"."web_info" AS src JOIN "device" AS parent ON parent.id = src.parent_id'
+    ) in statements
+    assert query.index('INSERT INTO "device"') < query.index('INSERT INTO "web_info"')
+    assert query.index("PARTITION OF events\n") < query.index('INSERT INTO "events"')
+    assert statements[-1] == 'DROP SCHEMA "ga4_legacy" CASCADE'
+
+
+def test_migrate_to_partitioned_refuses_partitioned_or_undated_tables():
+    with pytest.raises(RuntimeError):
+        SchemaManager(DummyMigrationConnection("p", [])).migrate_to_partitioned("")
+    undated = DummyMigrationConnection("r", [("events", "id", "integer")])
+    with pytest.raises(RuntimeError):
+        SchemaManager(undated).migrate_to_partitioned("")
+    assert SchemaManager(undated).migrate_to_partitioned("CREATE TABLE events ()", copy_rows=False) == 0
+    assert 'INSERT INTO' not in undated.queries[0]
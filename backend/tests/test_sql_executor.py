@@ -0,0 +1,65 @@
+import types
+
+import pytest
+
+from analytics_chat_agent.core import sql_executor
+from analytics_chat_agent.core.sql_executor import (
+    QueryBudgetExceededError,
+    run_bigquery_query,
+)
+
+
+class DummyClient:
+    def __init__(self, dry_run_bytes):
+        self.dry_run_bytes = dry_run_bytes
+        self.executed = []
+
+    def query(self, query, job_config=None):
+        if job_config is not None and job_config.dry_run:
+            return types.SimpleNamespace(total_bytes_processed=self.dry_run_bytes)
+        self.executed.append(job_config)
+        return types.SimpleNamespace(
+            result=lambda: [{"cnt": 1}],
+            total_bytes_processed=self.dry_run_bytes,
+            total_bytes_billed=self.dry_run_bytes,
+        )
+
+
+@pytest.fixture
+def dummy_settings(monkeypatch, tmp_path):
+    credentials = tmp_path / "service-account.json"
+    credentials.write_text("{}")
+    settings = {
+        "bigquery": {
+            "project_id": "ungift",
+            "dataset_id": "analytics_336047273",
+            "credentials_path": str(credentials),
+            "dry_run": True,
+            "max_bytes_billed": 1000,
+        },
+        "query_cache": {"enabled": False},
+    }
+    monkeypatch.setattr(sql_executor, "get_settings", lambda: settings)
+    return settings
+
+
+def test_over_budget_query_is_rejected(monkeypatch, dummy_settings):
+    client = DummyClient(dry_run_bytes=5000)
+    monkeypatch.setattr(sql_executor.bigquery, "Client", lambda project: client)
+
+    with pytest.raises(QueryBudgetExceededError) as excinfo:
+        run_bigquery_query("SELECT 1")
+
+    assert excinfo.value.total_bytes_processed == 5000
+    assert excinfo.value.max_bytes_billed == 1000
+    assert client.executed == []
+
+
+def test_within_budget_query_runs_with_maximum_bytes_billed(monkeypatch, dummy_settings):
+    client = DummyClient(dry_run_bytes=500)
+    monkeypatch.setattr(sql_executor.bigquery, "Client", lambda project: client)
+
+    results = run_bigquery_query("SELECT 1")
+
+    assert [r.values for r in results] == [{"cnt": 1}]
+    assert client.executed[0].maximum_bytes_billed == 1000
@@ -0,0 +1,147 @@
+from datetime import date
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from analytics_chat_agent.core.analyzer import analysis_service
+from analytics_chat_agent.core.analyzer.analysis_service import AnalysisService
+from analytics_chat_agent.core.lexical_index import LexicalFieldIndex
+from analytics_chat_agent.core.sql_rewriter import SqlRewriter
+from analytics_chat_agent.core.sql_validator import SqlValidator
+from analytics_chat_agent.types import Field, FieldMappingResult, Intent, QueryResult
+
+DATA_DIR = Path(__file__).parent.parent / "data" / "ga4_schema"
+BIGQUERY_SETTINGS = {"project_id": "ungift", "dataset_id": "analytics_336047273"}
+INDEX = LexicalFieldIndex.from_csv(DATA_DIR / "ga4_schema.csv", DATA_DIR / "ga4_virtual_key.csv")
+TABLE = "`ungift.analytics_336047273.events_*`"
+TODAY = date(2024, 1, 10)
+LAST_30_DAYS = (
+    "_TABLE_SUFFIX BETWEEN FORMAT_DATE('%Y%m%d', DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY)) "
+    "AND FORMAT_DATE('%Y%m%d', CURRENT_DATE())"
+)
+WEEK = Intent(key="page_view", description="", parameters={"time_range": "7d"})
+PAGE_LOCATION = FieldMappingResult(fields=[Field(name="page_location", type="string")], description="")
+
+
+@pytest.fixture
+def rewriter():
+    return SqlRewriter.from_settings({"max_rows": 1000}, BIGQUERY_SETTINGS, INDEX)
+
+
+def test_narrows_suffix_prunes_star_and_limits_rows(rewriter):
+    sql = (
+        f"WITH base AS (SELECT * FROM {TABLE} WHERE {LAST_30_DAYS}) "
+        "SELECT event_name, user_pseudo_id FROM base WHERE event_name = 'page_view'"
+    )
+    result = rewriter.rewrite(sql, WEEK, PAGE_LOCATION, today=TODAY)
+
+    assert result.reduces_scan
+    assert len(result.changes) == 3
+    assert "INTERVAL 7 DAY" in result.sql
+    assert "INTERVAL 30 DAY" not in result.sql
+    assert "SELECT\n    event_name,\n    user_pseudo_id,\n    event_params\n" in result.sql
+    assert result.sql.endswith("LIMIT 1000")
+    assert SqlValidator.from_settings(BIGQUERY_SETTINGS, INDEX).validate(result.sql) == []
+
+
+def test_keeps_columns_referenced_through_cte_and_subquery_aliases(rewriter):
+    cte = (
+        f"WITH s AS (SELECT * FROM {TABLE} WHERE {LAST_30_DAYS}) "
+        "SELECT s.user_pseudo_id, event_date FROM s"
+    )
+    result = rewriter.rewrite(cte, today=TODAY)
+    assert "SELECT\n    user_pseudo_id,\n    event_date\n" in result.sql
+
+    subquery = (
+        f"SELECT t.device.category, COUNT(*) AS n FROM (SELECT * FROM {TABLE} WHERE {LAST_30_DAYS}) AS t GROUP BY 1"
+    )
+    result = rewriter.rewrite(subquery, today=TODAY)
+    assert result.changes == ["SELECT * を device に限定"]
+
+    # 外側で CTE の全カラムを参照している場合は SELECT * を置き換えない
+    outer_star = f"WITH s AS (SELECT * FROM {TABLE} WHERE {LAST_30_DAYS}) SELECT * FROM s WHERE event_name = 'x'"
+    assert rewriter.rewrite(outer_star, today=TODAY).changes == ["集計していないため LIMIT 1000 を追加"]
+
+
+def test_leaves_narrow_or_aggregated_queries_unchanged(rewriter):
+    queries = [
+        f"SELECT COUNT(*) AS n FROM {TABLE} WHERE _TABLE_SUFFIX BETWEEN '20240103' AND '20240110'",
+        f"SELECT * EXCEPT (event_params) FROM {TABLE} WHERE _TABLE_SUFFIX >= '20240103' LIMIT 10",
+        "SELEC 1",
+    ]
+    for sql in queries:
+        result = rewriter.rewrite(sql, WEEK, PAGE_LOCATION, today=TODAY)
+        assert result.changes == [] and result.sql == sql, sql
+
+    # 期間の指定がない意図では _TABLE_SUFFIX を変更しない
+    result = rewriter.rewrite(
+        f"SELECT event_name, COUNT(*) AS n FROM {TABLE} WHERE {LAST_30_DAYS} GROUP BY 1",
+        Intent(key="event_count", description="", parameters={}),
+        today=TODAY,
+    )
+    assert result.changes == []
+
+
+def test_keeps_calendar_ranges_and_period_comparisons(rewriter, caplog):
+    # 先月（9月）の日付を指定したSQLを、先月を近似した30日の時間範囲で絞り込まない
+    last_month = (
+        f"SELECT event_date, COUNT(*) AS pv FROM {TABLE} "
+        "WHERE _TABLE_SUFFIX BETWEEN '20260901' AND '20260930' AND event_name = 'page_view' GROUP BY event_date"
+    )
+    # 前週比のために14日分を読み、CASE で今週と前週に分けるSQLを7日に絞り込まない
+    week_over_week = (
+        "SELECT CASE WHEN _TABLE_SUFFIX >= FORMAT_DATE('%Y%m%d', DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)) "
+        "THEN 'this_week' ELSE 'last_week' END AS week, COUNT(*) AS pv "
+        f"FROM {TABLE} WHERE _TABLE_SUFFIX BETWEEN FORMAT_DATE('%Y%m%d', DATE_SUB(CURRENT_DATE(), INTERVAL 14 DAY)) "
+        "AND FORMAT_DATE('%Y%m%d', DATE_SUB(CURRENT_DATE(), INTERVAL 1 DAY)) GROUP BY week"
+    )
+    month = Intent(key="page_view", description="", parameters={"time_range": "30d"})
+    with caplog.at_level("WARNING"):
+        for sql, intent in ((last_month, month), (week_over_week, WEEK)):
+            result = rewriter.rewrite(sql, intent, today=date(2026, 10, 19))
+            assert result.changes == [] and result.sql == sql, sql
+    assert "カレンダー上の期間" in caplog.text
+    assert "WHERE 句以外でも参照" in caplog.text
+
+    # 「先週」「先月」を近似した時間範囲では、相対指定の期間も絞り込まない
+    sql = f"SELECT COUNT(*) AS n FROM {TABLE} WHERE {LAST_30_DAYS}"
+    assert rewriter.rewrite(sql, WEEK, today=TODAY, query="先週のPV数").changes == []
+    assert rewriter.rewrite(sql, WEEK, today=TODAY, query="過去7日のPV数").reduces_scan
+
+
+def test_analyze_runs_rewritten_sql_and_logs_savings(rewriter, caplog):
+    service = AnalysisService(mock.Mock(), max_sql_regenerations=0, max_sql_repairs=0, sql_rewriter=rewriter)
+    sql = f"SELECT event_name FROM {TABLE} WHERE {LAST_30_DAYS}"
+
+    with mock.patch.object(analysis_service, "generate_sql", return_value=sql), \
+            mock.patch.object(analysis_service, "estimate_bytes_saved", return_value=3 * 1024 ** 3) as estimate, \
+            mock.patch.object(analysis_service, "run_bigquery_query",
+                              return_value=[QueryResult(values={"event_name": "page_view"})]) as run, \
+            caplog.at_level("INFO"):
+        executed, _ = service._generate_and_run_sql(PAGE_LOCATION, intent=WEEK)
+
+    assert "INTERVAL 7 DAY" in executed and executed.endswith("LIMIT 1000")
+    run.assert_called_once_with(executed)
+    estimate.assert_called_once_with(sql, executed)
+    assert "3.0 GiB 削減" in caplog.text
+
+
+def test_analyze_keeps_original_sql_when_rewritten_sql_is_invalid(rewriter, caplog):
+    validator = mock.Mock()
+    validator.validate.side_effect = lambda sql: ["カラム x を参照できません"] if "LIMIT" in sql else []
+    service = AnalysisService(
+        mock.Mock(), max_sql_regenerations=0, max_sql_repairs=0, sql_validator=validator, sql_rewriter=rewriter
+    )
+    sql = f"SELECT event_name FROM {TABLE} WHERE {LAST_30_DAYS}"
+
+    with mock.patch.object(analysis_service, "generate_sql", return_value=sql), \
+            mock.patch.object(analysis_service, "estimate_bytes_saved") as estimate, \
+            mock.patch.object(analysis_service, "run_bigquery_query", return_value=[]) as run, \
+            caplog.at_level("WARNING"):
+        executed, _ = service._generate_and_run_sql(PAGE_LOCATION, intent=WEEK)
+
+    assert executed == sql
+    run.assert_called_once_with(sql)
+    estimate.assert_not_called()
+    assert "元のSQLを実行します" in caplog.text
@@ -0,0 +1,78 @@
+from datetime import date
+
+from analytics_chat_agent.core.lexical_index import SOURCE_SCHEMA, SOURCE_VIRTUAL, FieldEntry, LexicalFieldIndex
+from analytics_chat_agent.core.sql_templates import SqlTemplateMatcher
+from analytics_chat_agent.types import Field, FieldMappingResult, Intent
+
+TODAY = date(2024, 1, 10)
+BIGQUERY_SETTINGS = {"project_id": "ungift", "dataset_id": "analytics_336047273"}
+INDEX = LexicalFieldIndex([
+    FieldEntry("device.category", "デバイスのカテゴリ", "STRING", SOURCE_SCHEMA),
+    FieldEntry("ecommerce.purchase_revenue", "収益", "FLOAT", SOURCE_SCHEMA),
+    FieldEntry("page_location", "ページのURL", "STRING", SOURCE_VIRTUAL),
+])
+
+
+def _mapping(*names):
+    return FieldMappingResult(fields=[Field(name=name, type="string") for name in names], description="")
+
+
+def _intent(key, **parameters):
+    return Intent(key=key, description="", parameters={"time_range": "7d", **parameters})
+
+
+def test_page_view_template_without_dimension():
+    matcher = SqlTemplateMatcher(BIGQUERY_SETTINGS, INDEX)
+
+    template = matcher.match("先週のPV数", _intent("page_view"), _mapping("page_location"), today=TODAY)
+
+    assert template.dimension is None
+    assert "FROM `ungift.analytics_336047273.events_*`" in template.sql
+    assert "INTERVAL 7 DAY" in template.sql and "INTERVAL 1 DAY" in template.sql
+    assert "event_name = 'page_view'" in template.sql
+    assert "GROUP BY date\n" in template.sql
+
+
+def test_dimension_from_field_name_and_virtual_key():
+    matcher = SqlTemplateMatcher(BIGQUERY_SETTINGS, INDEX)
+
+    by_device = matcher.match(
+        "device.category 別のユーザー数", _intent("user_count"), _mapping("page_location"), today=TODAY
+    )
+    assert by_device.dimension == "device.category"
+    assert "device.category AS device_category" in by_device.sql
+    assert "GROUP BY date, device_category" in by_device.sql
+
+    by_page = matcher.match("page_location ごとのPV", _intent("page_view"), _mapping("device.category"), today=TODAY)
+    assert by_page.dimension == "page_location"
+    assert "UNNEST(event_params) WHERE key = 'page_location'" in by_page.sql
+
+    by_english = matcher.match("PV by event_params.page_location", _intent("page_view"), _mapping(), today=TODAY)
+    assert by_english.dimension == "page_location"
+
+
+def test_daily_phrases_do_not_add_a_dimension():
+    matcher = SqlTemplateMatcher(BIGQUERY_SETTINGS, INDEX)
+
+    for question in ("直近30日のPVを日別に", "毎日のPV数", "日ごとのPV数の推移"):
+        template = matcher.match(question, _intent("page_view"), _mapping("page_location"), today=TODAY)
+        assert template.dimension is None, question
+        assert "GROUP BY date\n" in template.sql, question
+
+
+def test_falls_back_to_gpt_when_template_cannot_answer():
+    matcher = SqlTemplateMatcher(BIGQUERY_SETTINGS, INDEX)
+
+    assert matcher.match("リテンション", _intent("retention"), _mapping(), today=TODAY) is None
+    assert matcher.match("PV数", _intent("page_view", other_params="モバイルのみ"), _mapping(), today=TODAY) is None
+    assert matcher.match("PV数", _intent("page_view", time_range="先週"), _mapping(), today=TODAY) is None
+    # 集計軸のフィールド名が明示されていない場合は解決したフィールドから推測しない
+    for question in ("デバイス別のPV数", "特別セールのPV数", "週ごとのPV数"):
+        assert matcher.match(question, _intent("page_view"), _mapping("page_location"), today=TODAY) is None, question
+    # 集計軸に使用できないフィールドの場合
+    assert matcher.match(
+        "ecommerce.purchase_revenue 別のPV数", _intent("page_view"), _mapping(), today=TODAY
+    ) is None
+    assert SqlTemplateMatcher(BIGQUERY_SETTINGS, None).match(
+        "device.category 別のPV数", _intent("page_view"), _mapping("device.category"), today=TODAY
+    ) is None
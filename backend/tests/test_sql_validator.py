@@ -0,0 +1,99 @@
+from datetime import date
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from analytics_chat_agent.core.analyzer import analysis_service
+from analytics_chat_agent.core.analyzer.analysis_service import AnalysisService
+from analytics_chat_agent.core.lexical_index import LexicalFieldIndex
+from analytics_chat_agent.core.sql_templates import SqlTemplateMatcher
+from analytics_chat_agent.core.sql_validator import SqlValidationError, SqlValidator
+from analytics_chat_agent.types import Field, FieldMappingResult, Intent, QueryResult
+
+DATA_DIR = Path(__file__).parent.parent / "data" / "ga4_schema"
+BIGQUERY_SETTINGS = {"project_id": "ungift", "dataset_id": "analytics_336047273"}
+INDEX = LexicalFieldIndex.from_csv(DATA_DIR / "ga4_schema.csv", DATA_DIR / "ga4_virtual_key.csv")
+TABLE = "`ungift.analytics_336047273.events_*`"
+SUFFIX = (
+    "_TABLE_SUFFIX BETWEEN FORMAT_DATE('%Y%m%d', DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)) "
+    "AND FORMAT_DATE('%Y%m%d', CURRENT_DATE())"
+)
+
+
+@pytest.fixture
+def validator():
+    return SqlValidator.from_settings(BIGQUERY_SETTINGS, INDEX)
+
+
+def test_accepts_valid_ga4_queries(validator):
+    queries = [
+        f"SELECT PARSE_DATE('%Y%m%d', event_date) AS date, COUNT(DISTINCT user_pseudo_id) AS users "
+        f"FROM {TABLE} WHERE {SUFFIX} GROUP BY date ORDER BY date",
+        f"SELECT e.device.category, (SELECT value.string_value FROM UNNEST(event_params) "
+        f"WHERE key = 'page_location') AS page, COUNT(*) AS n FROM {TABLE} AS e WHERE {SUFFIX} GROUP BY 1, 2",
+        f"SELECT it.item_name, SUM(it.item_revenue) AS revenue FROM {TABLE}, UNNEST(items) AS it "
+        f"WHERE {SUFFIX} GROUP BY 1",
+        f"WITH base AS (SELECT geo.city, user_pseudo_id FROM {TABLE} WHERE {SUFFIX}) "
+        f"SELECT city, COUNT(DISTINCT user_pseudo_id) AS users FROM base GROUP BY city",
+    ]
+    for sql in queries:
+        assert validator.validate(sql) == [], sql
+
+
+def test_template_sql_passes_validation(validator):
+    matcher = SqlTemplateMatcher(BIGQUERY_SETTINGS, INDEX)
+    mapping = FieldMappingResult(fields=[Field(name="device.category", type="string")], description="")
+    for key in ("user_count", "page_view", "event_count", "sales_trend", "conversion_rate"):
+        intent = Intent(key=key, description="", parameters={"time_range": "30d"})
+        for question in ("過去30日", "過去30日の device.category 別"):
+            template = matcher.match(question, intent, mapping, today=date(2024, 1, 10))
+            assert validator.validate(template.sql) == [], template.sql
+
+
+def test_reports_specific_problems(validator):
+    assert validator.validate("SELEC 1")[0].startswith("SQLを構文解析できません")
+    assert validator.validate(
+        "SELECT COUNT(*) FROM events_* WHERE event_name = 'page_view'"
+    ) == [
+        "テーブル events_* は使用できません（ungift.analytics_336047273.events_* をフルパスで指定してください）",
+        "WHERE句に _TABLE_SUFFIX による日付の条件がありません",
+    ]
+    assert validator.validate(f"SELECT device.colour, session_id FROM {TABLE} WHERE {SUFFIX}") == [
+        "スキーマに存在しないフィールドです: device.colour",
+        "スキーマに存在しないフィールドです: session_id",
+    ]
+    assert validator.validate(
+        f"SELECT event_params.value.string_value FROM {TABLE} WHERE {SUFFIX}"
+    ) == ["REPEATED の event_params は UNNEST してから参照してください（event_params.value.string_value）"]
+    assert validator.validate(
+        f"SELECT ep.value.string_value AS page FROM {TABLE}, UNNEST(event_params) AS ep "
+        f"WHERE {SUFFIX} AND ep.key IN ('page_location', 'page_locaton')"
+    ) == ["event_params に存在しないキーです: page_locaton（ga4_virtual_key.csv のキーを使用してください）"]
+
+    with pytest.raises(SqlValidationError) as excinfo:
+        validator.check(f"SELECT * FROM {TABLE}")
+    assert excinfo.value.problems == ["WHERE句に _TABLE_SUFFIX による日付の条件がありません"]
+
+
+def test_analyze_repairs_invalid_sql_before_bigquery(validator):
+    service = AnalysisService(mock.Mock(), max_sql_regenerations=0, max_sql_repairs=1, sql_validator=validator)
+    mapping = FieldMappingResult(fields=[Field(name="event_name", type="string")], description="")
+    valid_sql = f"SELECT COUNT(*) AS n FROM {TABLE} WHERE {SUFFIX}"
+
+    with mock.patch.object(analysis_service, "generate_sql",
+                           side_effect=["SELECT COUNT(*) FROM events_*", valid_sql]) as generate, \
+            mock.patch.object(analysis_service, "run_bigquery_query",
+                              return_value=[QueryResult(values={"n": 1})]) as run:
+        sql, results = service._generate_and_run_sql(mapping)
+
+    assert sql == valid_sql
+    assert "_TABLE_SUFFIX" in generate.call_args.kwargs["feedback"]
+    run.assert_called_once_with(valid_sql)
+
+    with mock.patch.object(analysis_service, "generate_sql", return_value="SELECT 1") as generate, \
+            mock.patch.object(analysis_service, "run_bigquery_query") as run:
+        with pytest.raises(SqlValidationError):
+            service._generate_and_run_sql(mapping)
+    assert generate.call_count == 2
+    run.assert_not_called()
@@ -0,0 +1,62 @@
+import pytest
+
+from analytics_chat_agent.core.tracing import (
+    InMemoryExporter,
+    PrometheusExporter,
+    Tracer,
+    current_span,
+)
+
+
+def test_nested_spans_share_trace_and_record_attributes():
+    exporter = InMemoryExporter()
+    tracer = Tracer([exporter])
+
+    with tracer.span("analyze") as root:
+        with tracer.span("bigquery.query", cache_hit=False) as child:
+            assert current_span() is child
+            child.set_attributes({"rows": 3, "bytes_processed": 1024})
+        root.set_attribute("engine", "bigquery")
+    assert current_span() is None
+
+    [query_span] = exporter.get("bigquery.query")
+    [analyze_span] = exporter.get("analyze")
+    assert query_span.parent_id == analyze_span.span_id
+    assert query_span.trace_id == analyze_span.trace_id
+    assert query_span.attributes == {"cache_hit": False, "rows": 3, "bytes_processed": 1024}
+    assert analyze_span.attributes["engine"] == "bigquery"
+    assert analyze_span.duration_seconds >= query_span.duration_seconds
+
+
+def test_span_records_error_and_reraises():
+    exporter = InMemoryExporter()
+    tracer = Tracer([exporter])
+
+    with pytest.raises(ValueError):
+        with tracer.span("intent_extraction"):
+            raise ValueError("invalid json")
+
+    [span] = exporter.spans
+    assert span.error == "ValueError: invalid json"
+
+
+def test_prometheus_exporter_renders_histogram_and_attribute_totals():
+    exporter = PrometheusExporter(buckets=(0.1, 1.0))
+    tracer = Tracer([exporter])
+
+    for rows in (2, 3):
+        with tracer.span("bigquery.query", cache_hit=True) as span:
+            span.set_attribute("rows", rows)
+
+    metrics = exporter.render()
+    assert 'analytics_chat_agent_span_duration_seconds_bucket{span="bigquery.query",le="+Inf"} 2' in metrics
+    assert 'analytics_chat_agent_span_duration_seconds_count{span="bigquery.query"} 2' in metrics
+    assert 'analytics_chat_agent_span_errors_total{span="bigquery.query"} 0' in metrics
+    assert 'analytics_chat_agent_span_attribute_total{span="bigquery.query",attribute="rows"} 5.0' in metrics
+    assert 'analytics_chat_agent_span_attribute_total{span="bigquery.query",attribute="cache_hit"} 2.0' in metrics
+
+
+def test_disabled_tracing_has_no_exporters():
+    assert Tracer.from_settings({"enabled": False}).exporters == []
+    with pytest.raises(ValueError):
+        Tracer.from_settings({"enabled": True, "exporters": ["unknown"]})
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from analytics_chat_agent.core.qdrant_settings import build_source_filter
+from analytics_chat_agent.core.vector_snapshot import (
+    LocalVectorIndex,
+    SnapshotMismatchError,
+    VectorSnapshot,
+    check_snapshot,
+    csv_fingerprint,
+    export_collection,
+    load_snapshot,
+    restore_collection,
+    save_snapshot,
+)
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def _snapshot():
+    return VectorSnapshot(
+        model_name=MODEL_NAME,
+        csv_hash="abc",
+        ids=[1, 2, 3],
+        vectors=np.array([[1, 0, 0], [0, 1, 0], [0.9, 0.1, 0]], dtype=np.float32),
+        payloads=[
+            {"name": "event_name", "description": "イベント名", "source": "schema", "full_text": "x"},
+            {"name": "page_location", "description": "URL", "source": "virtual", "full_text": "y"},
+            {"name": "page_title", "description": "タイトル", "source": "virtual", "full_text": "z"},
+        ],
+    )
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    path = tmp_path / "vectors" / "ga4_schema.npz"
+    save_snapshot(_snapshot(), path)
+
+    loaded = load_snapshot(path)
+
+    assert loaded.model_name == MODEL_NAME
+    assert loaded.ids == [1, 2, 3]
+    assert loaded.vectors.dtype == np.float32
+    assert loaded.payloads[1]["description"] == "URL"
+
+
+def test_check_snapshot_rejects_other_model():
+    with pytest.raises(SnapshotMismatchError):
+        check_snapshot(_snapshot(), "other-model")
+    check_snapshot(_snapshot(), MODEL_NAME, csv_hash="changed")
+
+
+def test_csv_fingerprint_changes_with_content(tmp_path):
+    csv_path = tmp_path / "ga4_schema.csv"
+    csv_path.write_text("name\nevent_name\n", encoding="utf-8")
+    before = csv_fingerprint([csv_path, tmp_path / "missing.csv"])
+    csv_path.write_text("name\nevent_date\n", encoding="utf-8")
+    assert csv_fingerprint([csv_path]) != before
+
+
+def test_local_index_search_filters_and_trims_payload():
+    index = LocalVectorIndex(_snapshot())
+
+    hits = index.search(query_vector=[1, 0, 0], limit=2, with_payload=["name"])
+    assert [hit.payload["name"] for hit in hits] == ["event_name", "page_title"]
+    assert hits[0].payload == {"name": "event_name"}
+
+    hits = index.search(query_vector=[1, 0, 0], limit=5, query_filter=build_source_filter("virtual"))
+    assert [hit.payload["name"] for hit in hits] == ["page_title", "page_location"]
+
+
+def test_restore_and_export_with_qdrant():
+    client = QdrantClient(":memory:")
+    count = restore_collection(client, "ga4_schema", _snapshot(), {"collection": {"payload_indexes": []}})
+    assert count == 3
+    assert client.get_collection("ga4_schema").config.params.vectors.distance == models.Distance.COSINE
+
+    exported = export_collection(client, "ga4_schema", MODEL_NAME, "abc")
+    assert sorted(exported.ids) == [1, 2, 3]
+    assert exported.vectors.shape == (3, 3)